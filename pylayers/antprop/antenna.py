@@ -13,6 +13,7 @@ import glob
 import re
 import pdb
 import sys
+import time
 import numpy as np
 import scipy.linalg as la
 import matplotlib.pylab as plt
@@ -208,8 +209,13 @@ class Pattern(PyLayers):
 
         #
         # evaluation of the specific Pattern__p function
+        # or interpolation of the tabulated pattern (see setgrid)
         #
-        Ft,Fp = eval('self._Pattern__p'+self.typ)(param=self.param)
+        if (getattr(self,'gridded',False) and (not self.grid) and
+            np.array_equal(self._Fgrid['fGHz'],self.fGHz)):
+            Ft,Fp = self.interpgrid(self.theta,self.phi)
+        else:
+            Ft,Fp = eval('self._Pattern__p'+self.typ)(param=self.param)
         if kwargs['inplace']:
             self.Ft = Ft
             self.Fp = Fp
@@ -218,6 +224,215 @@ class Pattern(PyLayers):
         else:
             return Ft,Fp
 
+    def setgrid(self, nth=181, nph=360, save=False, force=False):
+        """ enable the gridded mode
+
+        The pattern is tabulated once on a regular (theta,phi) grid for the
+        current frequencies. Subsequent eval on arbitrary directions (th,ph
+        or pt,pr) are served by bilinear interpolation of this table
+        (see interpgrid) instead of the exact synthesis.
+
+        Parameters
+        ----------
+
+        nth : int
+            number of theta values in [0,pi] (181 : 1 degree step)
+        nph : int
+            number of phi values in [0,2pi[ (360 : 1 degree step)
+        save : boolean
+            if True the table is saved in a .grd file (see savegrid) and
+            reloaded by the next setgrid call with the same parameters
+        force : boolean
+            if True the table is recomputed even if a .grd file exists
+
+        Notes
+        -----
+
+        The gridded mode is only used when eval is called for the
+        tabulated frequencies, otherwise the exact synthesis is done.
+        unsetgrid goes back to the exact synthesis.
+
+        See Also
+        --------
+
+        interpgrid
+        gridreport
+
+        """
+        self.gridded = False
+        if save and not force:
+            if self.loadgrid():
+                tab = self._Fgrid
+                if ((len(tab['th']) == nth) and (len(tab['ph']) == nph) and
+                    np.array_equal(tab['fGHz'], self.fGHz)):
+                    self.gridded = True
+                    return
+        Ft, Fp = self.eval(th0=0, th1=np.pi, nth=nth,
+                           ph0=0, ph1=2*np.pi, nph=nph, inplace=False)
+        self._Fgrid = {'fGHz': np.array(self.fGHz),
+                       'th': np.array(self.theta),
+                       'ph': np.array(self.phi),
+                       'Ft': Ft,
+                       'Fp': Fp}
+        self.gridded = True
+        if save:
+            self.savegrid(force=True)
+
+    def unsetgrid(self):
+        """ disable the gridded mode
+        """
+        self.gridded = False
+
+    def savegrid(self, force=False):
+        """ save the gridded pattern in a .grd file
+
+        The file is stored in the antenna directory with the same
+        convention as savevsh3
+
+        """
+        _filegrd = os.path.splitext(self._filename)[0]+'.grd'
+        filegrd = pyu.getlong(_filegrd, pstruc['DIRANT'])
+        if os.path.isfile(filegrd) and not force:
+            print(filegrd, ' already exist')
+        else:
+            print('create ', filegrd, ' file')
+            tab = self._Fgrid
+            io.savemat(filegrd, {'fGHz': tab['fGHz'],
+                                 'th': tab['th'],
+                                 'ph': tab['ph'],
+                                 'Ft': tab['Ft'],
+                                 'Fp': tab['Fp']}, appendmat=False)
+
+    def loadgrid(self):
+        """ load a gridded pattern from a .grd file
+
+        Returns
+        -------
+
+        boolean : True if the file exists
+
+        """
+        _filegrd = os.path.splitext(self._filename)[0]+'.grd'
+        filegrd = pyu.getlong(_filegrd, pstruc['DIRANT'])
+        if not os.path.isfile(filegrd):
+            return False
+        tab = io.loadmat(filegrd, appendmat=False)
+        nth = tab['th'].size
+        nph = tab['ph'].size
+        nf = tab['fGHz'].size
+        self._Fgrid = {'fGHz': tab['fGHz'].ravel(),
+                       'th': tab['th'].ravel(),
+                       'ph': tab['ph'].ravel(),
+                       'Ft': tab['Ft'].reshape(nth, nph, nf),
+                       'Fp': tab['Fp'].reshape(nth, nph, nf)}
+        return True
+
+    def interpgrid(self, theta, phi):
+        """ interpolate the gridded pattern
+
+        Parameters
+        ----------
+
+        theta : np.array (,Nd)
+        phi : np.array (,Nd)
+
+        Returns
+        -------
+
+        Ft : np.array (Nd x Nf)
+        Fp : np.array (Nd x Nf)
+
+        Notes
+        -----
+
+        Bilinear interpolation of the complex field in (theta,phi), phi is
+        periodic.
+
+        """
+        tab = self._Fgrid
+        th = tab['th']
+        ph = tab['ph']
+        nth = len(th)
+        nph = len(ph)
+        dth = (th[-1] - th[0]) / (nth - 1.)
+        dph = 2 * np.pi / nph
+        theta = np.asarray(theta, dtype=float)
+        phi = np.asarray(phi, dtype=float)
+        # theta index
+        x = np.clip((theta - th[0]) / dth, 0, nth - 1)
+        i0 = np.minimum(x.astype(int), nth - 2)
+        wt = x - i0
+        # phi index (periodic)
+        y = np.mod(phi - ph[0], 2 * np.pi) / dph
+        j0 = np.minimum(y.astype(int), nph - 1)
+        wp = y - j0
+        j1 = np.mod(j0 + 1, nph)
+
+        Ft = tab['Ft']
+        sh = (-1,) + (1,) * (Ft.ndim - 2)
+        w00 = ((1 - wt) * (1 - wp)).reshape(sh)
+        w01 = ((1 - wt) * wp).reshape(sh)
+        w10 = (wt * (1 - wp)).reshape(sh)
+        w11 = (wt * wp).reshape(sh)
+        lF = []
+        for F in (tab['Ft'], tab['Fp']):
+            lF.append(w00 * F[i0, j0] + w01 * F[i0, j1] +
+                      w10 * F[i0 + 1, j0] + w11 * F[i0 + 1, j1])
+        return lF[0], lF[1]
+
+    def gridreport(self, Nd=10000, GdBmin=-30):
+        """ accuracy of the gridded mode with respect to the exact synthesis
+
+        Parameters
+        ----------
+
+        Nd : int
+            number of random directions (uniform on the sphere)
+        GdBmin : float
+            gain errors are evaluated where the exact gain is larger than
+            GdBmin dB below the maximum
+
+        Returns
+        -------
+
+        report : dict
+            errmax : max error on (Ft,Fp) relative to max |F|
+            errrms : rms error on (Ft,Fp) relative to max |F|
+            GdBmax : max gain error (dB)
+            texact : time of the exact synthesis (s)
+            tgrid : time of the gridded evaluation (s)
+
+        """
+        assert hasattr(self, '_Fgrid'), 'call setgrid first'
+        gridded = self.gridded
+        u = np.random.rand(Nd)
+        th = np.arccos(1 - 2 * u)
+        ph = 2 * np.pi * np.random.rand(Nd)
+        fGHz = self._Fgrid['fGHz']
+
+        self.gridded = False
+        t0 = time.time()
+        Ft0, Fp0 = self.eval(th=th, ph=ph, fGHz=fGHz, inplace=False)
+        t1 = time.time()
+        self.gridded = True
+        Ft1, Fp1 = self.eval(th=th, ph=ph, fGHz=fGHz, inplace=False)
+        t2 = time.time()
+        self.gridded = gridded
+
+        G0 = np.real(Ft0 * np.conj(Ft0) + Fp0 * np.conj(Fp0))
+        G1 = np.real(Ft1 * np.conj(Ft1) + Fp1 * np.conj(Fp1))
+        Fmax = np.sqrt(np.max(G0))
+        err = np.sqrt(np.abs(Ft1 - Ft0) ** 2 + np.abs(Fp1 - Fp0) ** 2) / Fmax
+        G0dB = 10 * np.log10(np.maximum(G0, 1e-30))
+        G1dB = 10 * np.log10(np.maximum(G1, 1e-30))
+        u = G0dB > np.max(G0dB) + GdBmin
+        report = {'errmax': np.max(err),
+                  'errrms': np.sqrt(np.mean(err ** 2)),
+                  'GdBmax': np.max(np.abs(G1dB - G0dB)[u]),
+                  'texact': t1 - t0,
+                  'tgrid': t2 - t1}
+        return report
+
     def vsh(self,threshold=-1):
         if self.evaluated:
             vsh(self)
@@ -1233,30 +1448,7 @@ class Pattern(PyLayers):
             theta = self.theta
             phi = self.phi
 
-        Br  = self.C.Br.s3
-        lBr = self.C.Br.ind3[:, 0]
-        mBr = self.C.Br.ind3[:, 1]
-
-        Bi  = self.C.Bi.s3
-        Cr  = self.C.Cr.s3
-        Ci  = self.C.Ci.s3
-
-        L = lBr.max()
-        M = mBr.max()
-
-        # vector spherical harmonics basis functions
-
-        # V, W = VW(lBr, mBr, theta, phi)
-        V, W = VW(lBr, mBr, theta, phi)
-        Fth = np.dot(Br, np.real(V.T)) - \
-              np.dot(Bi, np.imag(V.T)) + \
-              np.dot(Ci, np.real(W.T)) + \
-              np.dot(Cr, np.imag(W.T))
-
-        Fph = -np.dot(Cr, np.real(V.T)) + \
-               np.dot(Ci, np.imag(V.T)) + \
-               np.dot(Bi, np.real(W.T)) + \
-               np.dot(Br, np.imag(W.T))
+        Fth, Fph = self._vsh3synth(theta, phi)
 
         # here Nf x Nd
 
@@ -1276,6 +1468,59 @@ class Pattern(PyLayers):
 
         return Ft,Fp
 
+    def _vsh3synth(self, theta, phi, nchunk=2048):
+        """ synthesis of a pattern from vsh3 coefficients
+
+        Parameters
+        ----------
+
+        theta : np.array (,Nd)
+        phi : np.array (,Nd)
+        nchunk : int
+            number of directions per basis block
+
+        Returns
+        -------
+
+        Fth : np.array (Nf x Nd)
+        Fph : np.array (Nf x Nd)
+
+        Notes
+        -----
+
+        The basis of each block of directions is taken from the process
+        wide cache spharm.vwcache and the synthesis is a single real matrix
+        product per block
+
+        Fth = Br.Re(V) - Bi.Im(V) + Ci.Re(W) + Cr.Im(W)
+        Fph = -Cr.Re(V) + Ci.Im(V) + Bi.Re(W) + Br.Im(W)
+
+        """
+        Br = self.C.Br.s3
+        Bi = self.C.Bi.s3
+        Cr = self.C.Cr.s3
+        Ci = self.C.Ci.s3
+        lBr = self.C.Br.ind3[:, 0]
+        mBr = self.C.Br.ind3[:, 1]
+
+        Nf = Br.shape[0]
+        Xth = np.hstack((Br, -Bi, Ci, Cr))
+        Xph = np.hstack((-Cr, Ci, Bi, Br))
+        X = np.vstack((np.real(Xth), np.imag(Xth), np.real(Xph), np.imag(Xph)))
+
+        theta = np.asarray(theta).ravel()
+        phi = np.asarray(phi).ravel()
+        Nd = len(theta)
+        Fth = np.empty((Nf, Nd), dtype=complex)
+        Fph = np.empty((Nf, Nd), dtype=complex)
+        for i0 in range(0, Nd, nchunk):
+            u = slice(i0, i0 + nchunk)
+            S = vwcache.basis(lBr, mBr, theta[u], phi[u])
+            R = np.dot(X, S)
+            Fth[:, u] = R[0:Nf] + 1j * R[Nf:2 * Nf]
+            Fph[:, u] = R[2 * Nf:3 * Nf] + 1j * R[3 * Nf:]
+        return Fth, Fph
+
     def __psh3(self,**kwargs):
         """ calculate pattern for sh3
 
@@ -4419,29 +4664,8 @@ class Antenna(Pattern):
 
             nray = len(theta)
 
-            Br  = self.C.Br.s3
-            lBr = self.C.Br.ind3[:, 0]
-            mBr = self.C.Br.ind3[:, 1]
-
-            Bi  = self.C.Bi.s3
-            Cr  = self.C.Cr.s3
-            Ci  = self.C.Ci.s3
-
-            L = lBr.max()
-            M = mBr.max()
-
-            # vector spherical harmonics basis functions
-            V, W = VW(lBr, mBr, theta, phi)
-
-            Fth = np.dot(Br, np.real(V.T)) - \
-                  np.dot(Bi, np.imag(V.T)) + \
-                  np.dot(Ci, np.real(W.T)) + \
-                  np.dot(Cr, np.imag(W.T))
-
-            Fph = -np.dot(Cr, np.real(V.T)) + \
-                   np.dot(Ci, np.imag(V.T)) + \
-                   np.dot(Bi, np.real(W.T)) + \
-                   np.dot(Br, np.imag(W.T))
+            # vector spherical harmonics synthesis (cached basis)
+            Fth, Fph = self._vsh3synth(theta, phi)
 
             if self.grid:
 
@@ -29,6 +29,7 @@ from mpl_toolkits.axes_grid1 import make_axes_locatable
 from mpl_toolkits.mplot3d import Axes3D
 from scipy.optimize import fmin
 import copy
+from multiprocessing.pool import ThreadPool
 
 try:
     import h5py
@@ -6113,7 +6114,7 @@ class Ctilde(PyLayers):
         self.Ctp.y = self.Ctp.y[u,:]
         self.Cpt.y = self.Cpt.y[u,:]
 
-    def prop2tran(self,a=[],b=[],Friis=True,debug=False):
+    def prop2tran(self,a=[],b=[],Friis=True,debug=False,nrchunk=0,nfchunk=0,nthreads=1):
         r""" transform propagation channel into transmission channel
 
         Parameters
@@ -6130,12 +6131,23 @@ class Ctilde(PyLayers):
             if True scale with :math:`-j\frac{\lambda}{f}`
         debug : boolean
             if True the antenna gain for each ray is stored
+        nrchunk : int
+            number of rays evaluated at once (0 : all)
+        nfchunk : int
+            number of frequency points evaluated at once (0 : all)
+        nthreads : int
+            number of threads working on the (ray,frequency) chunks
 
         Returns
         -------
 
         H : Tchannel(bs.FUsignal)
 
+        Notes
+        -----
+
+        If nrchunk or nfchunk is set (and not debug) the transmission
+        channel is evaluated by chunks (see _prop2tran_chunk).
 
         """
         freq  = self.fGHz
@@ -6151,6 +6163,12 @@ class Ctilde(PyLayers):
         if b ==[]:
             b = ant.Antenna('Omni',param={'pol':'t','GmaxdB':0},fGHz=self.fGHz)
 
+        if ((nrchunk > 0) or (nfchunk > 0)) and not debug:
+            H = self._prop2tran_chunk(a,b,Friis=Friis,nrchunk=nrchunk,
+                                      nfchunk=nfchunk,nthreads=nthreads)
+            if H is not None:
+                return H
+
         a.eval(th = self.tangl[:, 0], ph = self.tangl[:, 1])
         Fat = bs.FUsignal(a.fGHz, a.Ft)
         Fap = bs.FUsignal(a.fGHz, a.Fp)
@@ -6247,6 +6265,128 @@ class Ctilde(PyLayers):
 
         return H
 
+    def _prop2tran_chunk(self,a,b,Friis=True,nrchunk=0,nfchunk=0,nthreads=1):
+        r""" transmission channel evaluated by chunks of rays and frequencies
+
+        Parameters
+        ----------
+
+        a : antenna or array a
+        b : antenna or array b
+        Friis : boolean
+        nrchunk : int
+            number of rays per chunk (0 : all)
+        nfchunk : int
+            number of frequency points per chunk (0 : all)
+        nthreads : int
+
+        Returns
+        -------
+
+        H : Tchannel or None
+            None if the frequency bases of the antennas and of the channel
+            have no common points (prop2tran then resamples them)
+
+        Notes
+        -----
+
+        The output alpha (Nray x Nb x Na x Nf) is preallocated and each
+        (ray,frequency) block is written in place as
+
+        alpha = Fbt (Ctt Fat + Ctp Fap) + Fbp (Cpt Fat + Cpp Fap)
+
+        The antennas are evaluated once per ray chunk (Antenna.eval is not
+        thread safe), then the frequency chunks of the ray chunk are
+        dispatched on a thread pool. The temporaries are bounded by the
+        chunk size instead of the full 4D tensor.
+
+        """
+        nray = self.nray
+        if nray == 0:
+            return None
+        if nrchunk <= 0:
+            nrchunk = nray
+
+        # common frequency points (same rounding as prop2tran)
+        fc = (np.round(self.fGHz*100)).astype(int)
+        fa = (np.round(a.fGHz*100)).astype(int)
+        fb = (np.round(b.fGHz*100)).astype(int)
+        inter = np.intersect1d(np.intersect1d(fc,fa),fb)
+        if len(inter) == 0:
+            return None
+        uc = np.where(np.isin(fc,inter))[0]
+        ua = np.where(np.isin(fa,inter))[0]
+        ub = np.where(np.isin(fb,inter))[0]
+        fGHz = self.fGHz[uc]
+        nf = len(fGHz)
+        if (nfchunk <= 0) or (nfchunk > nf):
+            nfchunk = nf
+
+        # r x f
+        Ctt = self.Ctt.y.reshape(nray,-1)
+        Ctp = self.Ctp.y.reshape(nray,-1)
+        Cpt = self.Cpt.y.reshape(nray,-1)
+        Cpp = self.Cpp.y.reshape(nray,-1)
+        if Friis:
+            factor = -1j*0.3/(4*np.pi*fGHz)
+
+        alpha = None
+        for r0 in range(0,nray,nrchunk):
+            r1 = min(r0+nrchunk,nray)
+            Fat,Fap = a.eval(th = self.tangl[r0:r1, 0],
+                             ph = self.tangl[r0:r1, 1],inplace=False)
+            Fbt,Fbp = b.eval(th = self.rangl[r0:r1, 0],
+                             ph = self.rangl[r0:r1, 1],inplace=False)
+            # r x N x f
+            if Fat.ndim == 2:
+                Fat = Fat[:,None,:]
+                Fap = Fap[:,None,:]
+            if Fbt.ndim == 2:
+                Fbt = Fbt[:,None,:]
+                Fbp = Fbp[:,None,:]
+            if alpha is None:
+                alpha = np.empty((nray,Fbt.shape[1],Fat.shape[1],nf),dtype=complex)
+
+            def block(f0):
+                f1 = min(f0+nfchunk,nf)
+                kc = uc[f0:f1]
+                ka = ua[f0:f1]
+                kb = ub[f0:f1]
+                # r x Na x f
+                Ta = Fat[:,:,ka]
+                Pa = Fap[:,:,ka]
+                t1 = Ctt[r0:r1,None,kc]*Ta + Ctp[r0:r1,None,kc]*Pa
+                t2 = Cpt[r0:r1,None,kc]*Ta + Cpp[r0:r1,None,kc]*Pa
+                # r x Nb x Na x f
+                out = alpha[r0:r1,:,:,f0:f1]
+                np.multiply(Fbt[:,:,None,kb],t1[:,None,:,:],out=out)
+                out += Fbp[:,:,None,kb]*t2[:,None,:,:]
+                if Friis:
+                    out *= factor[f0:f1]
+
+            lf = range(0,nf,nfchunk)
+            if nthreads > 1:
+                pool = ThreadPool(nthreads)
+                pool.map(block,lf)
+                pool.close()
+                pool.join()
+            else:
+                for f0 in lf:
+                    block(f0)
+
+        self.fGHz = fGHz
+
+        # Bsignal copies y, H is built on the first ray then alpha is attached
+        H = Tchannel(x = fGHz,
+                     y = alpha[0:1],
+                     tau = self.tauk,
+                     dod = self.tang,
+                     doa = self.rang)
+        H.y = alpha
+        H.isFriis = Friis
+
+        return H
+
 if __name__ == "__main__":
     plt.ion()
     doctest.testmod()
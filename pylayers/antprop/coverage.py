@@ -29,7 +29,6 @@ else:
 
 import pdb
 import doctest
-from itertools import product
 
 try:
     from mayavi import mlab
@@ -271,7 +270,7 @@ class Coverage(PyLayers):
             except:
                 pass
 
-    def cover(self,sinr=True,snr=True,best=True):
+    def cover(self,sinr=True,snr=True,best=True,size=0,nproc=1,fileout=''):
         """ run the coverage calculation
 
         Parameters
@@ -280,6 +279,17 @@ class Coverage(PyLayers):
         sinr : boolean
         snr  : boolean
         best : boolean
+        size : int
+            number of grid points evaluated at once (tile size).
+            0 (default) : the whole grid is evaluated at once
+        nproc : int
+            number of processes used for evaluating the tiles (default 1).
+            The tiles are evaluated in process if the fork start method is
+            not available.
+        fileout : string
+            if not '', the coverage arrays are memory-mapped .npy files
+            <fileout>_<name>.npy in the output directory of the project
+            and they are filled tile by tile
 
         Examples
         --------
@@ -315,11 +325,17 @@ class Coverage(PyLayers):
         + snro : SNR polar o (H)
         + snrp : SNR polar p (H)
 
+        For large grids, `size` limits the number of links (size x na)
+        handled by `loss.Losst` at once and `fileout` avoids keeping
+        the (nf x ng x na) arrays in memory. In the tiled mode self.pa is
+        (3 x na) and self.pg is (3 x ng).
+
         See Also
         --------
 
         pylayers.antprop.loss.Losst
         pylayers.antprop.loss.PL
+        pylayers.antprop.coverage.covertile_func
 
         """
         #
@@ -371,104 +387,212 @@ class Coverage(PyLayers):
             self.ptdbm = self.ptdbm.reshape(1,1)
             self.pndbm = self.pndbm.reshape(1,1)
 
-        p = product(range(self.ng),lactiveAP)
+        self.lactiveAP = lactiveAP
+        self.nf = len(self.fGHz)
+
+        # retrieving dimensions along the 3 axis
+        na = len(lactiveAP)
+        self.na = na
+        ng = self.ng
+        nf = self.nf
+
+        if size == 0:
+            size = ng
+
         #
         # pa : access point
         # pg : grid point
         #
-        # 1 x na
-
-        for k in p:
-            pg = self.grid[k[0],:]
-            pa = np.array(self.dap[k[1]]['p'])
-            # exemple with 3 AP
-            # 321 0
-            # 321 1
-            # 321 2
-            # 322 0
-            try:
-                self.pa = np.vstack((self.pa,pa))
-            except:
-                self.pa = pa
-            try:
-                self.pg = np.vstack((self.pg,pg))
-            except:
-                self.pg = pg
+        # links are ordered grid point first, access point second
+        #
+        # exemple with 3 AP
+        # 321 0
+        # 321 1
+        # 321 2
+        # 322 0
+        #
+        if size == ng:
+            self.pa, self.pg = self._links(0,ng)
+        else:
+            self.pa, self.pg = self._links(0,1)
+            self.pg = np.vstack((self.grid[:,0:2].T,self.zgrid*np.ones(ng)))
 
-        self.pa = self.pa.T
-        shpa = self.pa.shape
-        shpg = self.pg.shape
+        #
+        # allocation of the (nf x ng x na) arrays
+        #
+        lname = ['Lwo','Lwp','Edo','Edp','freespace','CmWo','CmWp']
+        if snr:
+            lname = lname + ['snro','snrp']
+        if sinr:
+            lname = lname + ['sinro','sinrp']
+        if best:
+            lname = lname + ['bestsvo','bestsvp']
 
-        if shpa[0] != 3:
-            self.pa = np.vstack((self.pa,np.ones(shpa[1])))
-        self.pg = self.pg.T
-        self.pg = np.vstack((self.pg,self.zgrid*np.ones(shpg[0])))
+        for name in lname:
+            if fileout != '':
+                filename = pyu.getlong(fileout + '_' + name + '.npy',pstruc['DIRLNK'])
+                V = np.lib.format.open_memmap(filename,mode='w+',
+                                              dtype=float,shape=(nf,ng,na))
+            else:
+                V = np.empty((nf,ng,na))
+            setattr(self,name,V)
 
-        self.nf = len(self.fGHz)
+        #
+        # loop over tiles of the grid
+        #
+        ltile = [ (ig,min(ig+size,ng)) for ig in range(0,ng,size) ]
 
-        # retrieving dimensions along the 3 axis
-        na = len(lactiveAP)
-        self.na = na
-        ng = self.ng
+        global _cov
+
+        _cov = self
+        ctx = pyu.forkcontext()
+        pool = None
+        try:
+            if (nproc > 1) and (ctx is not None):
+                pool = ctx.Pool(nproc)
+                res = pool.imap(covertile_func,ltile)
+            else:
+                res = map(covertile_func,ltile)
+
+            for (ig0,ig1),dres in zip(ltile,res):
+                ig = slice(ig0,ig1)
+                for name in dres:
+                    getattr(self,name)[:,ig,:] = dres[name]
+                if snr:
+                    self.evsnr(ig=ig)
+                if sinr:
+                    self.evsinr(ig=ig)
+                if best:
+                    self.evbestsv(ig=ig)
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+            _cov = None
+
+        if fileout != '':
+            for name in lname:
+                getattr(self,name).flush()
+
+    def _links(self,ig0,ig1):
+        """ create the links between a tile of the grid and the active AP
+
+        Parameters
+        ----------
+
+        ig0 : int
+            first grid point index
+        ig1 : int
+            last grid point index (excluded)
+
+        Returns
+        -------
+
+        pa : np.array (3 x (ig1-ig0)*na)
+            access point coordinates
+        pg : np.array (3 x (ig1-ig0)*na)
+            grid point coordinates
+
+        """
+        na = len(self.lactiveAP)
+        ngt = ig1 - ig0
+        apos = np.array([ self.dap[iap]['p'] for iap in self.lactiveAP ]).reshape(na,-1)
+        if apos.shape[1] != 3:
+            apos = np.hstack((apos[:,0:2],np.ones((na,1))))
+        # grid point index varies slowly, access point index varies fast
+        pa = np.tile(apos.T,ngt)
+        pg = np.repeat(self.grid[ig0:ig1,0:2].T,na,axis=1)
+        pg = np.vstack((pg,self.zgrid*np.ones(ngt*na)))
+        return pa,pg
+
+    def _covertile(self,ig0,ig1):
+        """ evaluate the coverage on a tile of the grid
+
+        Parameters
+        ----------
+
+        ig0 : int
+            first grid point index
+        ig1 : int
+            last grid point index (excluded)
+
+        Returns
+        -------
+
+        dres : dict
+            (nf x (ig1-ig0) x na) arrays Lwo,Lwp,Edo,Edp,freespace,CmWo,CmWp
+
+        """
+        na = self.na
         nf = self.nf
+        ngt = ig1 - ig0
+        pa,pg = self._links(ig0,ig1)
 
-        for k,iap in enumerate(self.dap):
+        tgain = np.empty((nf,ngt,na))
+        for ka,iap in enumerate(self.lactiveAP):
             # select only one access point
-            u = na*np.arange(0,ng,1).astype('int')+k
-            if self.dap[iap]['on']:
-                pt = self.pa[:,u]
-                pr = self.pg[:,u]
-                azoffset = self.dap[iap]['phideg']*np.pi/180.
-                self.dap[iap].A.eval(fGHz=self.fGHz, pt=pt, pr=pr, azoffset=azoffset)
-
-                gain = (self.dap[iap].A.G).T
-                #pdb.set_trace()
-                # to handle omnidirectional antenna (nf,1,1)
-                if gain.shape[1]==1:
-                    gain = np.repeat(gain,ng,axis=1)
-                try:
-                    tgain = np.dstack((tgain,gain[:,:,None]))
-                except:
-                    tgain = gain[:,:,None]
+            u = na*np.arange(0,ngt,1).astype('int')+ka
+            pt = pa[:,u]
+            pr = pg[:,u]
+            azoffset = self.dap[iap]['phideg']*np.pi/180.
+            self.dap[iap].A.eval(fGHz=self.fGHz, pt=pt, pr=pr, azoffset=azoffset)
+
+            gain = (self.dap[iap].A.G).T
+            # to handle omnidirectional antenna (nf,1,1)
+            if gain.shape[1]==1:
+                gain = np.repeat(gain,ngt,axis=1)
+            tgain[:,:,ka] = gain
 
-        #Lwo,Lwp,Edo,Edp = loss.Losst(self.L,self.fGHz,self.pa,self.pg,dB=False)
-        Lwo,Lwp,Edo,Edp = loss.Losst(self.L,self.fGHz,self.pa,self.pg,dB=False)
+        Lwo,Lwp,Edo,Edp = loss.Losst(self.L,self.fGHz,pa,pg,dB=False)
 
-        self.Lwo = Lwo.reshape(nf,ng,na)
-        self.Edo = Edo.reshape(nf,ng,na)
-        self.Lwp = Lwp.reshape(nf,ng,na)
-        self.Edp = Edp.reshape(nf,ng,na)
+        dres = {}
+        dres['Lwo'] = Lwo.reshape(nf,ngt,na)
+        dres['Edo'] = Edo.reshape(nf,ngt,na)
+        dres['Lwp'] = Lwp.reshape(nf,ngt,na)
+        dres['Edp'] = Edp.reshape(nf,ngt,na)
 
-        freespace = loss.PL(self.fGHz,self.pa,self.pg,dB=False)
-        self.freespace = freespace.reshape(nf,ng,na)
+        freespace = loss.PL(self.fGHz,pa,pg,dB=False)
+        dres['freespace'] = freespace.reshape(nf,ngt,na)
 
         # transmitting power
         # f x g x a
 
         # CmW : Received Power coverage in mW
-        self.CmWo = 10**(self.ptdbm[np.newaxis,...]/10.)*self.Lwo*self.freespace*tgain
-        self.CmWp = 10**(self.ptdbm[np.newaxis,...]/10.)*self.Lwp*self.freespace*tgain
+        PtmW = 10**(self.ptdbm[np.newaxis,...]/10.)
+        dres['CmWo'] = PtmW*dres['Lwo']*dres['freespace']*tgain
+        dres['CmWp'] = PtmW*dres['Lwp']*dres['freespace']*tgain
 
+        return dres
 
-        if snr:
-            self.evsnr()
-        if sinr:
-            self.evsinr()
-        if best:
-            self.evbestsv()
-
-    def evsnr(self):
+    def evsnr(self,ig=slice(None)):
         """ calculates signal to noise ratio
+
+        Parameters
+        ----------
+
+        ig : slice
+            grid points to be evaluated (default all)
+
         """
 
         NmW = 10**(self.pndbm/10.)[np.newaxis,:]
 
-        self.snro = self.CmWo/NmW
-        self.snrp = self.CmWp/NmW
+        if ig == slice(None):
+            self.snro = self.CmWo/NmW
+            self.snrp = self.CmWp/NmW
+        else:
+            self.snro[:,ig,:] = self.CmWo[:,ig,:]/NmW
+            self.snrp[:,ig,:] = self.CmWp[:,ig,:]/NmW
 
-    def evsinr(self):
+    def evsinr(self,ig=slice(None)):
         """ calculates sinr
 
+        Parameters
+        ----------
+
+        ig : slice
+            grid points to be evaluated (default all)
+
         """
 
         # na : number of access point
@@ -480,40 +604,51 @@ class Coverage(PyLayers):
         # CmWo : received power in mW orthogonal polarization
         # CmWp : received power in mW parallel polarization
 
-        ImWo = np.einsum('ijkl,ijl->ijk',U,self.CmWo)
-        ImWp = np.einsum('ijkl,ijl->ijk',U,self.CmWp)
+        CmWo = self.CmWo[:,ig,:]
+        CmWp = self.CmWp[:,ig,:]
+
+        ImWo = np.einsum('ijkl,ijl->ijk',U,CmWo)
+        ImWp = np.einsum('ijkl,ijl->ijk',U,CmWp)
 
 
         NmW = 10**(self.pndbm/10.)[np.newaxis,:]
 
-        self.sinro = self.CmWo/(ImWo+NmW)
-        self.sinrp = self.CmWp/(ImWp+NmW)
+        if ig == slice(None):
+            self.sinro = CmWo/(ImWo+NmW)
+            self.sinrp = CmWp/(ImWp+NmW)
+        else:
+            self.sinro[:,ig,:] = CmWo/(ImWo+NmW)
+            self.sinrp[:,ig,:] = CmWp/(ImWp+NmW)
 
-    def evbestsv(self):
+    def evbestsv(self,ig=slice(None)):
         """ determine the best server map
 
+        Parameters
+        ----------
+
+        ig : slice
+            grid points to be evaluated (default all)
+
         Notes
         -----
 
-        C.bestsv
+        C.bestsvo[f,g,a] is a+1 if access point a is the best server of
+        grid point g at frequency f, 0 otherwise.
 
         """
         na = self.na
-        ng = self.ng
-        nf = self.nf
         # find best server regions
-        Vo = self.CmWo
-        Vp = self.CmWp
-        self.bestsvo = np.empty(nf*ng*na).reshape(nf,ng,na)
-        self.bestsvp = np.empty(nf*ng*na).reshape(nf,ng,na)
-        for kf in range(nf):
-            MaxVo = np.max(Vo[kf,:,:],axis=1)
-            MaxVp = np.max(Vp[kf,:,:],axis=1)
-            for ka in range(na):
-                uo = np.where(Vo[kf,:,ka]==MaxVo)
-                up = np.where(Vp[kf,:,ka]==MaxVp)
-                self.bestsvo[kf,uo,ka]=ka+1
-                self.bestsvp[kf,up,ka]=ka+1
+        Vo = self.CmWo[:,ig,:]
+        Vp = self.CmWp[:,ig,:]
+        ka = np.arange(1,na+1)[np.newaxis,np.newaxis,:]
+        bestsvo = (Vo == np.max(Vo,axis=2)[:,:,np.newaxis])*ka
+        bestsvp = (Vp == np.max(Vp,axis=2)[:,:,np.newaxis])*ka
+        if ig == slice(None):
+            self.bestsvo = bestsvo
+            self.bestsvp = bestsvp
+        else:
+            self.bestsvo[:,ig,:] = bestsvo
+            self.bestsvp[:,ig,:] = bestsvp
 
 
 #    def showEd(self,polar='o',**kwargs):
@@ -826,7 +961,12 @@ class Coverage(PyLayers):
             if kwargs['db']:
                 U = 10*np.log10(U)
 
-        D = np.sqrt(np.sum((self.pa-self.pg)*(self.pa-self.pg),axis=0))
+        if (self.pa.shape[1] == self.na) and (self.pg.shape[1] == self.ng):
+            # tiled mode : pa (3 x na) pg (3 x ng)
+            dp = self.pg[:,:,None] - self.pa[:,None,:]
+            D = np.sqrt(np.sum(dp*dp,axis=0)).reshape(self.ng*self.na)
+        else:
+            D = np.sqrt(np.sum((self.pa-self.pg)*(self.pa-self.pg),axis=0))
         if kwargs['a']!=-1:
             D = D.reshape(self.ng,self.na)
             ax.semilogx(D[:,kwargs['a']],U,'.',color=kwargs['col'],label=kwargs['label'])
@@ -1132,6 +1272,28 @@ class Coverage(PyLayers):
 
 
 
+
+def covertile_func(args):
+    """ evaluate a tile of a coverage grid
+
+    Parameters
+    ----------
+
+    args : tuple
+        (ig0,ig1) grid point indices of the tile
+
+    Notes
+    -----
+
+    This function is used by Coverage.cover. The Coverage object is read
+    from the module global variable _cov which is inherited by the forked
+    worker processes (see pyutil.forkcontext).
+
+    """
+    ig0, ig1 = args
+    return _cov._covertile(ig0,ig1)
+
+
 if (__name__ == "__main__"):
     doctest.testmod()
 
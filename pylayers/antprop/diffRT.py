@@ -38,12 +38,14 @@ def diff(fGHz,phi0,phi,si,sd,N,mat0,matN,beta=np.pi/2,mode='tab',debug=False):
     matN : Mat
     beta : np.array (Nb)
         skew incidence angle (rad)
-    mode : str ( 'tab','exact')
+    mode : str ( 'tab','exact','fast')
         if 'tab': the Fresnel function is interpolated
         ( increase speed)
         if 'exact': the Fresnel function is computed for each values
         ( increase accuracy)
         (see FreF)
+        if 'fast': the 4 terms are evaluated at once from the process-wide
+        table difftab (see DiffTab)
 
     Returns
     -------
@@ -93,6 +95,14 @@ def diff(fGHz,phi0,phi,si,sd,N,mat0,matN,beta=np.pi/2,mode='tab',debug=False):
     if not isinstance(beta,np.ndarray):
         beta = np.array([beta])
 
+    if mode == 'fast':
+        D = difftab.D(fGHz,phi0,phi,si,sd,N,beta)
+        Dsoft,Dhard = Dcomb(D,fGHz,phi0,phi,N,mat0,matN)
+        if debug:
+            return Dsoft,Dhard,D[0],D[1],D[2],D[3]
+        else:
+            return Dsoft,Dhard
+
     fGHz  = fGHz[:,None]
     phi0  = phi0[None,:]
     phi   = phi[None,:]
@@ -552,6 +562,215 @@ def FreF2(x):
     return(y)
 
 
+class DiffTab(object):
+    """ process-wide table of the UTD transition function
+
+    Attributes
+    ----------
+
+    xmin : float
+    xmax : float
+        F is linearly interpolated on a log10 grid over [xmin,xmax].
+        Above xmax the large argument expansion of FreF is used, below xmin
+        the small argument expansion ([1] eq 30).
+        The grid values use the Fresnel integral (FresnelI) for all x, the
+        large argument expansion used by FreF for x > 10 is only accurate
+        to 2e-4 near x = 10.
+    npts : int
+        number of points of the grid
+    lx : np.array
+        log10 grid
+    tab : np.array
+        F on the grid (built on first use)
+    dtab : np.array
+        first differences of tab
+    nbuild : int
+        number of table builds
+
+    Notes
+    -----
+
+    The table depends neither on frequency nor on geometry. It is built once
+    per process (module instance difftab) and shared by all the calls of
+    diff (mode='fast') and IntD.eval.
+
+    Examples
+    --------
+
+    >>> x = np.logspace(-6,0.9,1000)
+    >>> assert np.allclose(difftab.F(x),FreF(x)[0],atol=1e-5)
+
+    """
+    def __init__(self,xmin=1e-8,xmax=1e3,npts=6144):
+        self.xmin = xmin
+        self.xmax = xmax
+        self.npts = npts
+        self.lx = np.array([])
+        self.tab = np.array([])
+        self.nbuild = 0
+
+    def __repr__(self):
+        st = 'DiffTab : %d points [%g,%g]' % (self.npts,self.xmin,self.xmax)
+        if len(self.tab) == 0:
+            st = st + ' (not built)'
+        return st
+
+    def build(self):
+        """ build the table of F
+        """
+        self.lx = np.linspace(np.log10(self.xmin),np.log10(self.xmax),self.npts)
+        x = 10**self.lx
+        cst = (1.0 - 1j)*0.5*np.sqrt(np.pi/2)
+        self.tab = 2.0*np.sqrt(x)*1j*np.exp(1j*np.mod(x,2*np.pi))*(cst-FresnelI(x))
+        self.dtab = np.hstack((np.diff(self.tab),0))
+        self.nbuild += 1
+
+    def F(self,x):
+        """ transition function
+
+        Parameters
+        ----------
+
+        x : np.array
+            real argument (k L a)
+
+        Returns
+        -------
+
+        y : np.array (complex)
+            same shape as x
+
+        See Also
+        --------
+
+        FreF
+
+        """
+        if len(self.tab) != self.npts:
+            self.build()
+        x = np.abs(x)
+        with np.errstate(divide='ignore'):
+            p = (np.log10(x)-self.lx[0])*((self.npts-1)/(self.lx[-1]-self.lx[0]))
+        np.clip(p,0,self.npts-1.001,out=p)
+        i = p.astype(int)
+        p -= i
+        y = self.tab[i]
+        y += p*self.dtab[i]
+        # outside of the table (rare)
+        u = np.where((x > self.xmax).ravel())[0]
+        if len(u) > 0:
+            xu = x.ravel()[u]
+            y.ravel()[u] = 1-0.75/xu**2+4.6875/xu**4 + 1j*(0.5/xu-1.875/xu**3)
+        u = np.where((x < self.xmin).ravel())[0]
+        if len(u) > 0:
+            xu = x.ravel()[u]
+            y.ravel()[u] = (np.sqrt(np.pi*xu)-2*xu*np.exp(1j*np.pi/4)
+                            -(2/3.)*xu**2*np.exp(-1j*np.pi/4))*np.exp(1j*(np.pi/4+xu))
+        return y
+
+    def D(self,fGHz,phi0,phi,si,sd,N,beta=np.pi/2):
+        """ the 4 terms of the diffraction coefficient
+
+        Parameters
+        ----------
+
+        fGHz : np.array (Nf)
+        phi0 : np.array (Nr)
+        phi : np.array (Nr)
+        si : np.array (Nr)
+        sd : np.array (Nr)
+        N : np.array (Nr)
+        beta : np.array (Nr)
+
+        Returns
+        -------
+
+        D : np.array (4,Nf,Nr)
+            D1,D2,D3,D4 of diff (see Dfunc)
+
+        Notes
+        -----
+
+        The cotangent terms and k L a / k only depend on the geometry. They
+        are evaluated once for the 4 terms and all the rays (4,Nr), the
+        frequency only enters through k.
+
+        """
+        fGHz = np.atleast_1d(np.asarray(fGHz,dtype=float))
+        phi0 = np.atleast_1d(phi0)
+        phi = np.atleast_1d(phi)
+        si = np.atleast_1d(si)
+        sd = np.atleast_1d(sd)
+        N = np.atleast_1d(N)
+        beta = np.atleast_1d(beta)
+
+        k = 2*np.pi*fGHz/0.3
+        sign = np.array([1.,-1.,1.,-1.])[:,None]
+        dphi = np.vstack((phi-phi0,phi-phi0,phi+phi0,phi+phi0))
+        rnn = (dphi+np.pi*sign)/(2.0*N*np.pi)
+        nn = 1.*(rnn>0.5) + (rnn>1.5) - (rnn<-0.5) - (rnn<-1.5)
+        sb = np.sin(beta)
+        L = (si*sd*sb**2)/(si+sd)
+        AC = np.cos((2.0*N*nn*np.pi-dphi)/2.0)
+        LA = 2*L*AC**2
+        tan = np.tan((np.pi+sign*dphi)/(2.0*N))
+        with np.errstate(divide='ignore',invalid='ignore'):
+            cot = 1./tan
+            cste = (1.0-1.0*1j)/(4.0*N*np.sqrt(k[:,None]*np.pi)*sb)
+            D = -cste[None,:,:]*self.F(k[None,:,None]*LA[:,None,:])*cot[:,None,:]
+        it,ir = np.where(np.abs(tan)<1e-9)
+        D[it,:,ir] = 0.5*np.sqrt(L*np.ones(len(phi)))[ir,None]
+        return D
+
+difftab = DiffTab()
+
+def Dcomb(D,fGHz,phi0,phi,N,mat0,matN):
+    """ soft and hard diffraction coefficients from the 4 terms
+
+    Parameters
+    ----------
+
+    D : np.array (4,Nf,Nr)
+        D1,D2,D3,D4 (see DiffTab.D)
+    fGHz : np.array (Nf)
+    phi0 : np.array (Nr)
+    phi : np.array (Nr)
+    N : np.array (Nr)
+    mat0 : Mat
+    matN : Mat
+
+    Returns
+    -------
+
+    Ds : np.array (Nf,Nr)
+    Dh : np.array (Nf,Nr)
+
+    Notes
+    -----
+
+    Same combination as diff : D1+D2+Rn*D3+Ro*D4. As in diff the
+    permeability of face n is taken from mat0.
+
+    """
+    fGHz = np.atleast_1d(np.asarray(fGHz,dtype=float))
+    phi0 = np.atleast_1d(phi0)
+    phi = np.atleast_1d(phi)
+    N = np.atleast_1d(N)
+    k = 2*np.pi*fGHz[:,None]/0.3
+    c1 = phi > phi0
+    one = np.ones((len(fGHz),1))
+    tho = np.where(c1,phi0,phi)[None,:]*one
+    thn = np.where(c1,N*np.pi-phi,N*np.pi-phi0)[None,:]*one
+    ur0 = np.real(mat0['mur'])
+    urr0 = np.imag(mat0['mur'])
+    Rsofto,Rhardo = R(tho,k,np.real(mat0['epr']),np.imag(mat0['epr']),
+                      mat0['sigma'],ur0,urr0,mat0['roughness'])
+    Rsoftn,Rhardn = R(thn,k,np.real(matN['epr']),np.imag(matN['epr']),
+                      matN['sigma'],ur0,urr0,matN['roughness'])
+    Dsoft = D[0]+D[1]+Rsoftn*D[2]+Rsofto*D[3]
+    Dhard = D[0]+D[1]+Rhardn*D[2]+Rhardo*D[3]
+    return Dsoft,Dhard
+
 def R(th,k,er,err,sigma,ur,urr,deltah):
     """ R coeff
 
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+#
+# Chain product of interaction matrices (Rays.eval core)
+#
+# Compares rays.chainprod with the former broadcasted np.sum products on
+# random interactions, for a group of rays with l interactions evaluated
+# by chunks of nfchunk frequency points.
+#
+from __future__ import print_function
+import time
+import numpy as np
+from pylayers.antprop.rays import chainprod
+
+nray = 5000
+l = 4
+nfchunk = 64
+
+nI = nray*l
+I = np.random.rand(nfchunk,nI,3,3)+1j*np.random.rand(nfchunk,nI,3,3)
+B = np.random.rand(nI,3,3)
+B0 = np.random.rand(nray,3,3)
+rays = np.random.permutation(nI).reshape(l,nray)
+
+
+def legacy(I,B,B0,rays):
+    l,r = rays.shape
+    nf = I.shape[0]
+    B = B[None,...].swapaxes(2,3)
+    B0l = B0[None,...].swapaxes(2,3)
+    rrl = rays.reshape(r*l,order='F')
+    A = I[:,rrl,:,:].reshape(nf,r,l,3,3)
+    Bl = B[:,rrl,:,:].reshape(1,r,l,3,3)
+    for i in range(l):
+        if i == 0:
+            Z = np.sum(A[:,:,i][...,:,:,None]*B0l[...,None,:,:],axis=-2)
+        else:
+            Ztmp = np.sum(A[:,:,i][...,:,:,None]*Bl[:,:,i-1][...,None,:,:],axis=-2)
+            Z = np.sum(Ztmp[...,:,:,None]*Z[...,None,:,:],axis=-2)
+        if i == l-1:
+            Z = np.sum(Bl[:,:,i][...,:,:,None]*Z[...,None,:,:],axis=-2)
+    return Z
+
+t0 = time.time()
+Zl = legacy(I,B,B0,rays)
+tl = time.time()-t0
+
+buf = np.empty(35*nfchunk*nray,dtype=complex)
+t0 = time.time()
+Z = chainprod(I,B.swapaxes(1,2),B0.swapaxes(1,2),rays,buf=buf)
+tc = time.time()-t0
+
+print('legacy    : %.3f s' % tl)
+print('chainprod : %.3f s (x %.1f)  buffer %d MB' % (tc,tl/tc,buf.nbytes/2**20))
+print('max error : %g' % np.max(abs(Z-Zl[:,:,1:3,1:3])))
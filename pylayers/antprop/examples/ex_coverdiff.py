@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+#
+# Terrain diffraction coverage : profile by profile versus batched fans
+#
+# loss.cover evaluates Nphi x (Nr-3) terrain profiles. With batch=False each
+# profile is evaluated by the recursive deygout (or bullington) function,
+# with batch=True all the profiles of an azimuth are evaluated at once by
+# deygout_batch (or bullington_batch) and azimuths can be split between
+# nproc processes.
+#
+from __future__ import print_function
+import time
+import numpy as np
+from pylayers.antprop.loss import cover
+
+Nphi = 360
+Nr = 200
+Rmax = 4000
+fGHz = np.array([0.3])
+
+phi = np.linspace(0,2*np.pi,Nphi)[:,None]
+r = np.linspace(0.02,Rmax,Nr)[None,:]
+X = r*np.cos(phi)
+Y = r*np.sin(phi)
+# random walk terrain
+Z = 100 + np.cumsum(5*np.random.randn(Nphi,Nr),axis=1)
+
+for method in ['deygout','bullington']:
+    t0 = time.time()
+    L0 = cover(X,Y,Z,30,1.5,fGHz,1.3333,method=method,batch=False)
+    t_loop = time.time()-t0
+    t0 = time.time()
+    L1 = cover(X,Y,Z,30,1.5,fGHz,1.3333,method=method)
+    t_batch = time.time()-t0
+    t0 = time.time()
+    L2 = cover(X,Y,Z,30,1.5,fGHz,1.3333,method=method,nproc=4)
+    t_pool = time.time()-t0
+    print('%10s  loop %.2f s   batch %.2f s (x %.1f)   batch nproc=4 %.2f s (x %.1f)   max diff %.2e dB' %
+          (method,t_loop,t_batch,t_loop/t_batch,t_pool,t_loop/t_pool,
+           max(np.max(abs(L1-L0)),np.max(abs(L2-L0)))))
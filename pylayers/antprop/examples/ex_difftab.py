@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+#
+# Exact versus tabulated UTD diffraction coefficients
+#
+# mode='fast' evaluates the 4 terms of all the wedges at once from the
+# process-wide table difftab (built on the first call). mode='tab' is the
+# former interpolation, rebuilt at each call.
+#
+from __future__ import print_function
+import time
+import numpy as np
+from pylayers.antprop.slab import *
+from pylayers.antprop.diffRT import *
+
+dm = MatDB('matDB.ini')
+
+Nr = 400
+fGHz = np.linspace(2,11,11)
+N = np.random.uniform(1.2,1.9,Nr)
+phi0 = np.random.rand(Nr)*N*np.pi
+phi = np.random.rand(Nr)*N*np.pi
+si = np.random.uniform(0.5,20,Nr)
+sd = np.random.uniform(0.5,20,Nr)
+beta = np.random.uniform(0.3,np.pi/2,Nr)
+
+difftab.build()
+for name in ['METAL','BRICK']:
+    mat = dm[name]
+    t0 = time.time()
+    Dse,Dhe = diff(fGHz,phi0,phi,si,sd,N,mat,mat,beta=beta,mode='exact')
+    texact = time.time()-t0
+    print('%-6s exact : %.3f s' % (name,texact))
+    for mode in ['tab','fast']:
+        t0 = time.time()
+        Ds,Dh = diff(fGHz,phi0,phi,si,sd,N,mat,mat,beta=beta,mode=mode)
+        t = time.time()-t0
+        emax = max(np.max(np.abs(Ds-Dse)),np.max(np.abs(Dh-Dhe)))
+        print('%-6s %-5s : %.4f s (x %.0f)  max error %.2e' %
+              (name,mode,t,texact/t,emax))
+
+# large case (exact mode is not tractable)
+Nr = 5000
+fGHz = np.linspace(2,11,181)
+N = np.random.uniform(1.2,1.9,Nr)
+phi0 = np.random.rand(Nr)*N*np.pi
+phi = np.random.rand(Nr)*N*np.pi
+si = np.random.uniform(0.5,20,Nr)
+sd = np.random.uniform(0.5,20,Nr)
+beta = np.random.uniform(0.3,np.pi/2,Nr)
+mat = dm['BRICK']
+for mode in ['tab','fast']:
+    t0 = time.time()
+    Ds,Dh = diff(fGHz,phi0,phi,si,sd,N,mat,mat,beta=beta,mode=mode)
+    print('%d rays x %d freq %-5s : %.3f s' % (Nr,len(fGHz),mode,time.time()-t0))
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+#
+# Exact versus tabulated slab losses
+#
+# SlabDB.ntheta sets the number of angles of the loss tables over [0,pi].
+# The first call builds (and saves next to slabDB.ini) the table, next calls
+# are linear interpolations.
+#
+from __future__ import print_function
+import time
+from pylayers.antprop.slab import *
+
+sl = SlabDB('slabDB.ini')
+
+fGHz = np.array([2.4,3.5,5.0])
+theta = np.random.rand(20000)*np.pi/2.1
+
+lslab = ['WALL','PARTITION','CEIL','FLOOR','WOOD','3D_WINDOW_GLASS']
+lslab = [x for x in lslab if x in sl]
+
+t0 = time.time()
+lexact = []
+for name in lslab:
+    Lo,Lp = sl.losst(name,fGHz,theta)
+    do,dp = sl.excess_grdelay(name,theta)
+    lexact.append((Lo,Lp,do,dp))
+texact = time.time()-t0
+print('exact           : %.3f s' % texact)
+
+for ntheta in [91,181,901,1801]:
+    sl.ntheta = ntheta
+    # first pass builds the tables
+    for name in lslab:
+        sl.losst(name,fGHz,theta)
+        sl.excess_grdelay(name,theta)
+    t0 = time.time()
+    emax = 0
+    dmax = 0
+    for k,name in enumerate(lslab):
+        Lo,Lp = sl.losst(name,fGHz,theta)
+        do,dp = sl.excess_grdelay(name,theta)
+        emax = max(emax,np.max(abs(Lo-lexact[k][0])),np.max(abs(Lp-lexact[k][1])))
+        dmax = max(dmax,np.max(abs(do-lexact[k][2])),np.max(abs(dp-lexact[k][3])))
+    ttab = time.time()-t0
+    print('ntheta = %5d   : %.3f s (x %.0f)  max error %.3f dB  %.4f ns' %
+          (ntheta,ttab,texact/ttab,emax,dmax))
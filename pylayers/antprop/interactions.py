@@ -329,6 +329,9 @@ class Interactions(Inter,dict):
             alpha as described in JFL Thesis
         self.gamma :
             !! gamma**2 !!! (squared included) as described
+        self.nsaved :
+            number of slab evaluations saved by the angle-binned memo of
+            the SlabDB (self.slab.dtheta > 0, see SlabDB.evalRT)
 
         """
 
@@ -345,6 +348,8 @@ class Interactions(Inter,dict):
         self.si0 = np.zeros((self.nimax))
         self.alpha = np.ones((self.nimax), dtype=complex)
         self.gamma = np.ones((self.nimax), dtype=complex)
+        nreq = self.slab.nreq
+        neval = self.slab.neval
 
         # evaluate B and fill I 
         #OUT DATED , B MDA are stored outside of I
@@ -403,6 +408,7 @@ class Interactions(Inter,dict):
             #    print Warning('Warning Interaction.eval: No D interaction Evaluated,\ whereas Diffraction rays found')
             #    pdb.set_trace()
 
+        self.nsaved = (self.slab.nreq - nreq) - (self.slab.neval - neval)
         self.evaluated = True
 
 
@@ -663,12 +669,12 @@ class IntR(Inter):
                     # find the index of angles which satisfied the data
                     #if m not in self.slab:
                     #    m = m.lower()
-                    self.slab[m].eval(fGHz=fGHz, theta=ut, RT='R')
+                    Rm = self.slab.evalRT(m, fGHz, ut, RT='R')
                     try:
-                        R = np.concatenate((R, self.slab[m].R), axis=1)
+                        R = np.concatenate((R, Rm), axis=1)
                         mapp.extend(self.dusl[m])
                     except:
-                        R = self.slab[m].R
+                        R = Rm
                         mapp.extend(self.dusl[m])
 
             # replace in correct order the reflexion coeff
@@ -796,13 +802,13 @@ class IntT(Inter):
                         gamma = g
 
                     # find the index of angles which satisfied the data
-                    self.slab[m].eval(fGHz=fGHz, theta=ut, RT='T', compensate=True)
+                    Tm = self.slab.evalRT(m, fGHz, ut, RT='T', compensate=True)
 
                     try:
-                        T = np.concatenate((T, self.slab[m].T), axis=1)
+                        T = np.concatenate((T, Tm), axis=1)
                         mapp.extend(self.dusl[m])
                     except:
-                        T = self.slab[m].T
+                        T = Tm
                         mapp.extend(self.dusl[m])
             # replace in proper order the Transmission coeff
             self.A[:, np.array((mapp)), 1:, 1:] = T
@@ -818,10 +824,20 @@ class IntT(Inter):
 
 class IntD(Inter):
     """ diffraction interaction class
+
+        Attributes
+        ----------
+
+        mode : string
+            'fast' (default) : the 4 terms of all the wedges are evaluated at
+            once from the table difftab (see diffRT.DiffTab)
+            'tab' | 'exact' : diff is called for each pair of materials
+
     """
     def __init__(self, data=np.array(()), idx=[],fGHz=np.array([2.4]),slab={}):
         Inter.__init__(self, data=data, idx=idx, typ=1,slab=slab)
         self.dusl = {}
+        self.mode = 'fast'
 
     def __repr__(self):
         s = 'number of D interaction :' + str(np.shape(self.data)[0])
@@ -851,6 +867,8 @@ class IntD(Inter):
             self.N    = self.data[:,3]
             self.sinsout()
             D = np.zeros([self.nf, len(self.phi), 2, 2], dtype=complex)
+            if self.mode == 'fast':
+                Dt = difftab.D(self.fGHz,self.phi0,self.phi,self.si0,self.sout,self.N,self.beta)
             mapp=[]
             for m in self.dusl.keys():
                 idx = self.dusl[m]
@@ -866,7 +884,10 @@ class IntD(Inter):
                 # from IPython.core.debugger import Tracer
                 # Tracer()()
                 # Ds,Dh = diff(self.fGHz,self.phi0[idx],self.phi[idx],self.si0[idx],self.sout[idx],self.N[idx],mat0,matN,beta=self.beta[idx])
-                Ds,Dh = diff(self.fGHz,self.phi0[idx],self.phi[idx],self.si0[idx],self.sout[idx],self.N[idx],mat0,matN,mode='tab',beta=self.beta[idx])
+                if self.mode == 'fast':
+                    Ds,Dh = Dcomb(Dt[:,:,idx],self.fGHz,self.phi0[idx],self.phi[idx],self.N[idx],mat0,matN)
+                else:
+                    Ds,Dh = diff(self.fGHz,self.phi0[idx],self.phi[idx],self.si0[idx],self.sout[idx],self.N[idx],mat0,matN,mode=self.mode,beta=self.beta[idx])
                 #D[:,idx,0,0]=-Dh
                 #D[:,idx,1,1]=Ds
                 D[:,idx,1,1]=-Dh
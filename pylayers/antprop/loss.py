@@ -17,6 +17,7 @@ import numpy as np
 from scipy import io
 import matplotlib.pylab as plt
 import pylayers.gis.gisutil as gu
+import pylayers.util.pyutil as pyu
 import numpy.linalg as la
 import pdb
 import time
@@ -811,11 +812,18 @@ def Losst(L,fGHz,p1,p2,dB=True):
         >>> cb.set_label('dB')
         >>> plt.show()
 
+    Notes
+    -----
+
+    If L.sl.ntheta > 0 slab losses and excess delays are interpolated from
+    tables evaluated once on ntheta angles (see SlabDB.losst).
+
     See Also
     --------
 
     pylayers.antprop.coverage
     pylayers.slab.Interface.losst
+    pylayers.slab.SlabDB.losst
 
     """
 
@@ -874,11 +882,11 @@ def Losst(L,fGHz,p1,p2,dB=True):
         #
         # calculate Loss for slab slname
         #
-        lko,lkp  = L.sl[slname].losst(fGHz,data['a'][u])
+        lko,lkp  = L.sl.losst(slname,fGHz,data['a'][u])
         #
         # calculate Excess delay for slab slname
         #
-        do , dp  = L.sl[slname].excess_grdelay(theta=data['a'][u])
+        do , dp  = L.sl.excess_grdelay(slname,data['a'][u])
         # data['i'][u] links number
         indexu = data['i'][u]
         # reduce to involved links
@@ -927,11 +935,11 @@ def Losst(L,fGHz,p1,p2,dB=True):
         #
         # calculate Loss for slab CEIL
         #
-        lkco,lkcp  = L.sl['CEIL'].losst(fGHz,alphas)
+        lkco,lkcp  = L.sl.losst('CEIL',fGHz,alphas)
         #
         # calculate Excess delay for slab CEIL
         #
-        dco , dcp  = L.sl['CEIL'].excess_grdelay(theta=alphas)
+        dco , dcp  = L.sl.excess_grdelay('CEIL',alphas)
 
 
 
@@ -965,11 +973,11 @@ def Losst(L,fGHz,p1,p2,dB=True):
         #
         # calculate Loss for slab CEIL
         #
-        lkfo,lkfp  = L.sl['FLOOR'].losst(fGHz,alphas)
+        lkfo,lkfp  = L.sl.losst('FLOOR',fGHz,alphas)
         #
         # calculate Excess delay for slab CEIL
         #
-        dfo , dfp  = L.sl['FLOOR'].excess_grdelay(theta=alphas)
+        dfo , dfp  = L.sl.excess_grdelay('FLOOR',alphas)
 
 
 
@@ -1249,7 +1257,7 @@ def calnu(h,d1,d2,fGHz):
     return(nu)
 
 
-def route(X, Y, Z, Ha, Hb, fGHz, K, method='deygout'):
+def route(X, Y, Z, Ha, Hb, fGHz, K, method='deygout', batch=True):
     """ diffraction loss along a route
 
 
@@ -1268,6 +1276,9 @@ def route(X, Y, Z, Ha, Hb, fGHz, K, method='deygout'):
     fGHz : np.array (,Nf)
         frequency in GHz
     method : 'deygout' | 'bullington'
+    batch : boolean
+        if True all the profiles are evaluated at once
+        (see deygout_batch, bullington_batch)
 
     Returns
     -------
@@ -1281,6 +1292,20 @@ def route(X, Y, Z, Ha, Hb, fGHz, K, method='deygout'):
     if (type(fGHz) == float):
         fGHz = np.array([fGHz])
 
+    if batch:
+        D = np.sqrt((X-X[:, 0:1])**2+(Y-Y[:, 0:1])**2)
+        # effect of refraction in equivalent earth curvature
+        H = Z + D*D[:, ::-1]/(2*K*6375e3)
+        H[:, 0] = H[:, 0] + Ha
+        H[:, -1] = H[:, -1] + Hb
+        n = Nr*np.ones(Nphi, dtype=int)
+        LOS = 32.4 + 20*np.log10(fGHz)[None, :] + 20*np.log10(D[:, -1])[:, None]
+        if method == 'deygout':
+            LDiff = deygout_batch(D, H, n, fGHz)
+        if method == 'bullington':
+            LDiff, deq, heq = bullington_batch(D, H, n, fGHz)
+        return(LDiff+LOS)
+
     Nf = len(fGHz)
     L = np.zeros((Nphi, Nf))
     L0 = np.zeros(Nf)
@@ -1303,7 +1328,7 @@ def route(X, Y, Z, Ha, Hb, fGHz, K, method='deygout'):
         L[ip, :] = LDiff+LOS
     return(L)
 
-def cover(X, Y, Z, Ha, Hb, fGHz, K, method='deygout'):
+def cover(X, Y, Z, Ha, Hb, fGHz, K, method='deygout', batch=True, nproc=1):
     """ outdoor coverage on a region
 
     Parameters
@@ -1321,12 +1346,29 @@ def cover(X, Y, Z, Ha, Hb, fGHz, K, method='deygout'):
     fGHz : np.array (,Nf)
         frequency in GHz
     method : 'deygout' | 'bullington'
+    batch : boolean
+        if True all the profiles of an azimuth are evaluated at once
+        (see coverfan), otherwise profile by profile
+    nproc : int
+        number of processes evaluating azimuths (batch only).
+        Sequential if the fork start method is not available.
 
     Returns
     -------
 
     L : Losses (dB)
 
+    Examples
+    --------
+
+    >>> phi = np.linspace(0,2*np.pi,4)[:,None]
+    >>> r = np.linspace(0.02,4000,50)[None,:]
+    >>> X = r*np.cos(phi)
+    >>> Y = r*np.sin(phi)
+    >>> Z = 20*np.random.rand(4,50)
+    >>> L1 = cover(X,Y,Z,30,1.5,np.array([0.3]),1.333,batch=False)
+    >>> L2 = cover(X,Y,Z,30,1.5,np.array([0.3]),1.333)
+    >>> assert np.allclose(L1,L2)
 
     """
     Nphi, Nr = Z.shape
@@ -1336,6 +1378,27 @@ def cover(X, Y, Z, Ha, Hb, fGHz, K, method='deygout'):
 
     Nf = len(fGHz)
     L = np.zeros((Nphi, Nr, Nf))
+
+    if batch:
+        global _fan
+        _fan = (X, Y, Z, Ha, Hb, fGHz, K, method)
+        ctx = pyu.forkcontext()
+        try:
+            if (nproc > 1) and (ctx is not None):
+                pool = ctx.Pool(nproc)
+                try:
+                    res = pool.map(_coverfan_func, range(Nphi))
+                finally:
+                    pool.close()
+                    pool.join()
+            else:
+                res = [_coverfan_func(ip) for ip in range(Nphi)]
+        finally:
+            _fan = None
+        for ip in range(Nphi):
+            L[ip, :, :] = res[ip]
+        return(L)
+
     L0 = np.zeros(Nf)
     # loop over azimut
     for ip in range(Nphi):
@@ -1362,6 +1425,70 @@ def cover(X, Y, Z, Ha, Hb, fGHz, K, method='deygout'):
             L[ip, il, :] = LDiff[None, :]+LOS[None,:]
     return(L)
 
+def coverfan(x, y, z, Ha, Hb, fGHz, K, method='deygout'):
+    """ diffraction losses of all the profiles of a radial
+
+    Parameters
+    ----------
+
+    x : np.array (,Nr)
+    y : np.array (,Nr)
+    z : np.array (,Nr)
+        ground height along the radial, transmitter at index 0
+    Ha : float
+    Hb : float
+    fGHz : np.array (,Nf)
+    K : float
+    method : 'deygout' | 'bullington'
+
+    Returns
+    -------
+
+    L : np.array (Nr,Nf)
+        losses of the profiles [0,il] (il = 2 ... Nr-2), 0 elsewhere
+
+    Notes
+    -----
+
+    The Nr-3 profiles are stored left aligned in (P,Nr-1) arrays, the
+    earth curvature term of profile il is d[k]*d[il-k]/(2*K*Re).
+
+    """
+    Nr = len(z)
+    Nf = len(fGHz)
+    L = np.zeros((Nr, Nf))
+    if Nr < 4:
+        return(L)
+    N = Nr - 1
+    il = np.arange(2, Nr-1)
+    P = len(il)
+    rows = np.arange(P)
+    k = np.arange(N)
+    d = np.sqrt((x[:N]-x[0])**2+(y[:N]-y[0])**2)
+    jj = il[:, None] - k[None, :]
+    # effect of refraction in equivalent earth curvature
+    dh = d[None, :]*d[np.maximum(jj, 0)]/(2*K*6375e3)
+    H = np.where(jj >= 0, z[None, :N] + dh, 0)
+    H[:, 0] = H[:, 0] + Ha
+    H[rows, il] = H[rows, il] + Hb
+    D = np.repeat(d[None, :], P, axis=0)
+    LOS = 32.4 + 20*np.log10(fGHz)[None, :] + 20*np.log10(d[il])[:, None]
+    if method == 'deygout':
+        LDiff = deygout_batch(D, H, il+1, fGHz)
+    if method == 'bullington':
+        LDiff, deq, heq = bullington_batch(D, H, il+1, fGHz)
+    L[il, :] = LDiff + LOS
+    return(L)
+
+# arguments of cover shared with the forked worker processes
+# (see pyutil.forkcontext)
+_fan = None
+
+def _coverfan_func(ip):
+    """ coverfan of azimuth ip of the cover arguments stored in _fan
+    """
+    X, Y, Z, Ha, Hb, fGHz, K, method = _fan
+    return coverfan(X[ip, :], Y[ip, :], Z[ip, :], Ha, Hb, fGHz, K, method)
 
 def deygout(d, height, fGHz, L, depth):
     """ Deygout attenuation
@@ -1525,6 +1652,205 @@ def bullington(d, height, fGHz):
     L = np.maximum(6.9 + 20*np.log10(np.sqrt(w**2+1)+w), 0)
     return(L, deq, heq)
 
+def deygout_batch(D, H, n, fGHz, ndepth=2):
+    """ Deygout attenuation of a set of profiles
+
+    Parameters
+    ----------
+
+    D : np.array (P,N)
+        horizontal distance from the first point of each profile
+    H : np.array (P,N)
+        height profiles (left aligned)
+    n : np.array (,P)
+        number of points of each profile
+    fGHz : np.array (,Nf)
+        frequency GHz
+    ndepth : int
+        number of levels of edges (2 : main edge + 1 edge on each side)
+
+    Returns
+    -------
+
+    L : np.array (P,Nf)
+
+    Notes
+    -----
+
+    Iterative version of deygout : at each level the sub paths of all the
+    profiles (first point a, last point b) are processed at once, the
+    points outside ]a,b[ are masked.
+
+    See Also
+    --------
+
+    deygout
+
+    """
+    P, N = np.shape(H)
+    lmbda = 0.3/fGHz
+    L = np.zeros((P, len(fGHz)))
+    k = np.arange(N)
+    # sub paths [a,b] of profiles ip
+    ip = np.arange(P)
+    a = np.zeros(P, dtype=int)
+    b = np.asarray(n, dtype=int) - 1
+    for depth in range(ndepth):
+        u = (b - a + 1) > 3
+        ip = ip[u]
+        a = a[u]
+        b = b[u]
+        S = len(ip)
+        if S == 0:
+            break
+        rows = np.arange(S)
+        Ds = D[ip, :]
+        Hs = H[ip, :]
+        db = Ds[rows, b]
+        # l : straight line between termination (LOS)
+        v = (k[None, :] - a[:, None])/(b - a)[:, None].astype(float)
+        l = Hs[rows, a][:, None]*(1-v) + Hs[rows, b][:, None]*v
+        h = Hs - l
+        inside = (k[None, :] > a[:, None]) & (k[None, :] < b[:, None])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            nu = h*np.sqrt(2*(1/Ds+1/(db[:, None]-Ds)))
+        nu = np.where(inside & ~np.isnan(nu), nu, -np.inf)
+        imax = np.argmax(nu, axis=1)
+        # Fresnel parameter (engagement) of the main edge
+        hm = h[rows, imax][:, None]
+        dm = Ds[rows, imax][:, None]
+        numax = hm*np.sqrt((2/lmbda[None, :])*(1/dm+1/(db[:, None]-dm)))
+        f = (numax > -0.78).any(axis=1)
+        w = numax[f, :] - 0.1
+        np.add.at(L, ip[f], np.maximum(6.9 + 20*np.log10(np.sqrt(w**2+1)+w), 0))
+        # left and right sub paths
+        ip = np.hstack((ip[f], ip[f]))
+        a, b = np.hstack((a[f], imax[f])), np.hstack((imax[f], b[f]))
+    return(L)
+
+def bullington_batch(D, H, n, fGHz):
+    """ edges attenuation with Bullington method of a set of profiles
+
+    Parameters
+    ----------
+
+    D : np.array (P,N)
+        horizontal distance from the first point of each profile
+    H : np.array (P,N)
+        height profiles (left aligned), antenna heights included
+    n : np.array (,P)
+        number of points of each profile
+    fGHz : np.array (,Nf)
+
+    Returns
+    -------
+
+    L : np.array (P,Nf)
+        total loss
+    deq : np.array (,P)
+    heq : np.array (,P)
+
+    Notes
+    -----
+
+    Same interception points as bullington, the recursions on the left
+    and right parts of the profiles are replaced by iterations on the
+    windows [0,m] and [s,b] of all the profiles at once.
+
+    See Also
+    --------
+
+    bullington
+
+    """
+    P, N = np.shape(H)
+    lmbda = 0.3/fGHz
+    rows = np.arange(P)
+    k = np.arange(N)
+    b = np.asarray(n, dtype=int) - 1
+    db = D[rows, b]
+    inprof = k[None, :] <= b[:, None]
+
+    def relh(G, s, e):
+        """ heights w.r.t the line between points s and e (masked outside)
+        """
+        r = np.arange(len(s))
+        v = (k[None, :] - s[:, None])/(e - s)[:, None].astype(float)
+        l = G[r, s][:, None]*(1-v) + G[r, e][:, None]*v
+        inw = (k[None, :] >= s[:, None]) & (k[None, :] <= e[:, None])
+        return np.where(inw, G - l, -np.inf)
+
+    h = relh(H, np.zeros(P, dtype=int), b)
+    pos = ((h > 0) & inprof).any(axis=1)
+
+    deq = np.zeros(P)
+    heq = np.zeros(P)
+    #
+    # left interception point (recl)
+    #
+    idtx = np.ones(P, dtype=int)
+    m = b.copy()
+    act = np.where(pos)[0]
+    while len(act) > 0:
+        hw = relh(H[act, :], np.zeros(len(act), dtype=int), m[act])
+        r = np.arange(len(act))
+        imax = np.argmax(hw, axis=1)
+        hmax = hw[r, imax]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ul = k[None, :]/(imax-1.)[:, None]
+            el = hw[:, 0:1]*(1-ul) + hmax[:, None]*ul - hw
+        el = np.where(k[None, :] < imax[:, None], el, np.inf)
+        # a nan (imax=1) stops the recursion
+        split = (imax > 1) & (np.min(el, axis=1) < 0)
+        idtx[act] = np.where(imax > 0, imax+1, 1)
+        m[act[split]] = imax[split]
+        act = act[split]
+    #
+    # right interception point (recr)
+    #
+    idrx = b.copy()
+    st = np.zeros(P, dtype=int)
+    G = H.copy()
+    act = np.where(pos)[0]
+    while len(act) > 0:
+        s = st[act]
+        e = b[act]
+        hw = relh(G[act, :], s, e)
+        r = np.arange(len(act))
+        imax = np.argmax(hw, axis=1)
+        hmax = hw[r, imax]
+        nr = e - imax
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ur = (k[None, :] - imax[:, None])/(nr*1.)[:, None]
+            er = hmax[:, None]*(1-ur) + hw[r, e][:, None]*ur - hw
+        er = np.where((k[None, :] >= imax[:, None]) & (k[None, :] <= e[:, None]), er, np.inf)
+        split = (nr > 0) & (np.min(er, axis=1) < 0)
+        idrx[act] = imax
+        st[act[split]] = imax[split]
+        G[act[split], :] = np.where(np.isinf(hw[split, :]), 0, hw[split, :])
+        act = act[split]
+
+    u = np.where(pos)[0]
+    if len(u) > 0:
+        dtx = D[u, idtx[u]]
+        drx = db[u] - D[u, idrx[u]]
+        htx = h[u, idtx[u]-1]
+        hrx = h[u, idrx[u]]
+        deq[u] = (dtx*hrx)*db[u]/(drx*htx+dtx*hrx)
+        heq[u] = deq[u]*(htx/dtx)
+    u = np.where(~pos)[0]
+    if len(u) > 0:
+        hin = np.where((k[None, :] > 0) & (k[None, :] < b[u, None]),
+                       np.abs(h[u, :]), np.inf)
+        heq[u] = -np.min(hin, axis=1)
+        ieq = np.argmax((h[u, :] == heq[u][:, None]) & inprof[u, :], axis=1)
+        deq[u] = D[u, ieq]
+
+    nu = heq[:, None]*np.sqrt((2/lmbda[None, :])*(1/deq[:, None]+1/(db[:, None]-deq[:, None])))
+    w = nu - 0.1
+    L = np.maximum(6.9 + 20*np.log10(np.sqrt(w**2+1)+w), 0)
+    return(L, deq, heq)
+
 def two_rays_flatearth(fGHz, **kwargs):
     """
     Parameters
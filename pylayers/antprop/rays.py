@@ -47,6 +47,101 @@ import operator
 
 logger = logging.getLogger(__name__)
 
+def _mm(A, B, out, tmp):
+    """ matrix product of component first arrays
+
+    Parameters
+    ----------
+
+    A : np.array (m,n,...)
+    B : np.array (n,p,...)
+    out : np.array (m,p,...)
+    tmp : np.array (...)
+
+    Notes
+    -----
+
+    Each component is a contiguous array, the product is a sequence of
+    multiply-add on large arrays instead of a stack of tiny matrix products.
+
+    """
+    for i in range(np.shape(A)[0]):
+        for k in range(np.shape(B)[1]):
+            np.multiply(A[i, 0], B[0, k], out=out[i, k])
+            for j in range(1, np.shape(A)[1]):
+                np.multiply(A[i, j], B[j, k], out=tmp)
+                out[i, k] += tmp
+    return out
+
+
+def chainprod(I, Bt, B0t, rays, buf=None):
+    """ chain product of interaction matrices along a group of rays
+
+    Parameters
+    ----------
+
+    I : np.array (f,nI,3,3)
+        interaction matrices
+    Bt : np.array (nI,3,3)
+        transposed local basis at the output of each interaction
+    B0t : np.array (r,3,3)
+        transposed local basis at the transmitter
+    rays : np.array (l,r)
+        interaction index of the r rays with l interactions
+    buf : np.array
+        complex working buffer of size >= 35*f*r (allocated if too small)
+
+    Returns
+    -------
+
+    Z : np.array (f,r,2,2)
+        (theta,phi) components of Bt[l-1] I[l-1] ... Bt[0] I[0] B0t
+
+    Notes
+    -----
+
+    Interaction matrices are gathered and stored component first
+    (3,3,f,r) in the buffer. Only the 2 last columns of B0t are
+    propagated, each step is a (3x3).(3x2) product. Z is a view of buf.
+
+    Examples
+    --------
+
+    >>> I = np.random.rand(4,5,3,3)+0j
+    >>> Bt = np.random.rand(5,3,3)
+    >>> B0t = np.random.rand(2,3,3)
+    >>> rays = np.array([[0,1],[2,3]])
+    >>> Z = chainprod(I,Bt,B0t,rays)
+    >>> M = np.einsum('rij,frjk,rkl,frlm,rmn->frin',Bt[rays[1]],I[:,rays[1]],Bt[rays[0]],I[:,rays[0]],B0t)
+    >>> assert np.allclose(Z,M[:,:,1:3,1:3])
+
+    """
+    l, r = np.shape(rays)
+    nf = np.shape(I)[0]
+    n = nf * r
+    if (buf is None) or (buf.size < 35 * n):
+        buf = np.empty(35 * n, dtype=complex)
+    At = buf[0:9 * n].reshape(nf, r, 3, 3)
+    Ai = buf[9 * n:18 * n].reshape(3, 3, nf, r)
+    Z = buf[18 * n:24 * n].reshape(3, 2, nf, r)
+    W = buf[24 * n:30 * n].reshape(3, 2, nf, r)
+    out = buf[30 * n:34 * n].reshape(2, 2, nf, r)
+    tmp = buf[34 * n:35 * n].reshape(nf, r)
+    # 3 x 3 x nI
+    Bc = Bt.transpose(1, 2, 0)
+    # rays index are valid, mode='clip' avoids the buffering of take
+    np.take(I, rays[0], axis=1, out=At, mode='clip')
+    Ai[...] = At.transpose(2, 3, 0, 1)
+    _mm(Ai, B0t.transpose(1, 2, 0)[:, 1:3, :], Z, tmp)
+    for i in range(1, l):
+        _mm(Bc[:, :, rays[i - 1]], Z, W, tmp)
+        np.take(I, rays[i], axis=1, out=At, mode='clip')
+        Ai[...] = At.transpose(2, 3, 0, 1)
+        _mm(Ai, W, Z, tmp)
+    _mm(Bc[1:3, :, rays[l - 1]], Z, out, tmp)
+    return out.transpose(2, 3, 0, 1)
+
+
 class Rays(PyLayers, dict):
     """ Class handling a set of rays
 
@@ -2812,7 +2907,7 @@ class Rays(PyLayers, dict):
 
         self.filled = True
 
-    def eval(self,fGHz=np.array([2.4]),bfacdiv=False,ib=[]):
+    def eval(self,fGHz=np.array([2.4]),bfacdiv=False,ib=[],nfchunk=0):
         """  field evaluation of rays
 
         Parameters
@@ -2821,36 +2916,44 @@ class Rays(PyLayers, dict):
         fGHz : array
             frequency in GHz
         ib : list of interactions block
+        nfchunk : int
+            number of frequency points evaluated at once (0 : all)
+
+        Notes
+        -----
+
+        For each group of rays with l interactions, the 3x3 chain product
+        B(l-1) I(l-1) ... B(0) I(0) B0 is evaluated for all the rays and
+        frequencies at once in a preallocated buffer (see chainprod). Only the (theta,phi)
+        components of the result are kept.
+
+        Interactions are evaluated by chunks of nfchunk frequency points,
+        the memory used by self.I.I (nf x nI x 3 x 3) and by the buffers is
+        then bounded whatever the number of frequency points. With
+        chunking, self.I holds the interactions of the last chunk.
+
+        See Also
+        --------
+
+        chainprod
 
         """
 
         #print 'Rays evaluation'
 
         self.fGHz=fGHz
+        nf = len(fGHz)
+        if (nfchunk <= 0) or (nfchunk > nf):
+            nfchunk = nf
 
-        # evaluation of all interactions
-        #
-        # core calculation of all interactions is done here
-        #
-        
-        self.I.eval(fGHz)
-
-        # if np.isnan(self.I.I).any():
-        #     pdb.set_trace()
-        # evaluation of base B  (2x2)
         # B and B0 do no depend on frequency
-        # just an axis extension (np.newaxis)
-        #pdb.set_trace()
-
-        # 1 x i x 3 x 3
-        B  = self.B.data[np.newaxis,...]
-        B  = B.swapaxes(2,3)
-        # 1 x r x 3 x 3
-        B0 = self.B0.data[np.newaxis,...]
-        B0  = B0.swapaxes(2,3)
+        # i x 3 x 3
+        Bt = self.B.data.swapaxes(1,2)
+        # r x 3 x 3
+        B0t = self.B0.data.swapaxes(1,2)
 
-        # Ct : f x r x 3 x 3
-        Ct = np.zeros((self.I.nf, self.nray, 3, 3), dtype=complex)
+        # C : r x f x 2 x 2  (theta,phi) components
+        C = np.zeros((self.nray, nf, 2, 2), dtype=complex)
 
         # delays : ,r
         self.delays = np.zeros((self.nray))
@@ -2858,172 +2961,65 @@ class Rays(PyLayers, dict):
         # dis : ,r
         self.dis = np.zeros((self.nray))
 
-        #nf : number of frequency point
-        nf = self.I.nf
-
         aod= np.empty((2,self.nray))
         aoa= np.empty((2,self.nray))
         # loop on interaction blocks
         if ib==[]:
             ib=self.keys()
-        
-        # loop over group of interactions
+
+        rmax = 0
         for l in ib:
             # ir : ray index
-
             ir = self[l]['rayidx']
             aoa[:,ir]=self[l]['aoa']
             aod[:,ir]=self[l]['aod']
             if l != 0:
-                # l stands for the number of interactions
-                r = self[l]['nbrays']
-                # dirty fix should not be an array
-                if type(r)==np.ndarray:
-                    r = r[0]
-                # reshape in order to have a 1D list of index
-                # reshape ray index
-                rrl = self[l]['rays'].reshape(r*l,order='F')
-                # get the corresponding evaluated interactions
-                #
-                # reshape error can be tricky to debug.
-                #
-                # f , r , l , 2 , 2
-                A = self.I.I[:, rrl, :, :].reshape(self.I.nf, r, l, 3, 3)
-                # get the corresponding unitary matrix B
-                # 1 , r , l , 2 , 2
-                #Bl = B[:, rrl, :, :].reshape(self.I.nf, r, l, 2, 2,order='F')
-                Bl = B[:, rrl, :, :].reshape(1, r, l, 3, 3)
-                # get the first unitary matrix B0l
-                B0l = B0[:,ir,:, :]
-                # get alpha
-                alpha = self.I.alpha[rrl].reshape(r, l,order='F')
-                # # get gamma
-                gamma = self.I.gamma[rrl].reshape(r, l,order='F')
-                # # get si0
-                si0 = self.I.si0[rrl].reshape(r, l,order='F')
-                # # get sout
-                sout = self.I.sout[rrl].reshape(r, l,order='F')
-
-                try:
-                    del Z
-                except:
-                    pass
-
-
-                #print "\nrays",ir
-                #print "-----------------------"
-                ## loop on all the interactions of ray with l interactions
-                for i in range(0, l):
-
-
-    ############################################
-    ##                # Divergence factor D
-    ###                 not yet implementented
-    ############################################
-#                    if i == 0:
-#                        pdb.set_trace()
-#                        D0 = 1./si0[:,1]
-#                        rho1 = si0[:,1]*alpha[:,i]
-#                        rho2 = si0[:,1]*alpha[:,i]*gamma[:,i]
-#                        D =np.sqrt(
-#                         ( (rho1 ) / (rho1 + sout[:,i]) )
-#                         *( (rho2) / (rho2 + sout[:,i])))
-#                        D=D*D0
-#                        rho1=rho1+(sout[:,i]*alpha[:,i])
-#                        rho2=rho2+(sout[:,i]*alpha[:,i]*gamma[:,i])
-#
-#   ##                     gerer le loss
-#                        if np.isnan(D).any():
-#                            p=np.nonzero(np.isnan(D))[0]
-#                            D[p]=1./sout[p,1]
-#                    else :
-#                        D=np.sqrt(
-#                         ( (rho1 ) / (rho1 + sout[:,i]) )
-#                         *( (rho2) / (rho2 + sout[:,i])))
-#
-#                        rho1=rho1+(sout[:,i]*alpha[:,i])
-#                        rho2=rho2+(sout[:,i]*alpha[:,i]*gamma[:,i])
-    ############################################
-
-                    #  A0  (X dot Y)
-                    #  |    |     |
-                    #  v    v     v
-                    ##########################
-                    ## B  # I  # B  # I  # B #
-                    ##########################
-                    #      \_____/   \______/
-                    #         |         |
-                    #       Atmp(i)   Atmp(i+1)
-                    #
-                    # Z=Atmp(i) dot Atmp(i+1)
-
-                    #X = A [:, :, i, :, :]
-                    #Y = Bl[:, :, i, :, :]
-                    # pdb.set_trace()
-                    if i == 0:
-                    ## First Basis added
-                        Atmp = A[:, :, i, :, :]
-                        B00 = B0l[:, :,  :, :]
-                        Z = np.sum(Atmp[..., :, :, np.newaxis]
-                                  *B00[..., np.newaxis, :, :], axis=-2)
-                    else:
-                        Atmp = A[:, :, i, :, :]
-                        BB = Bl[:, :, i-1, :, :]
-                        Ztmp = np.sum(Atmp[..., :, :, np.newaxis]
-                                  *BB[..., np.newaxis, :, :], axis=-2)
-
-
-                        Z = np.sum(Ztmp[..., :, :, np.newaxis]
-                                  *Z[..., np.newaxis, :, :], axis=-2)
-
-                    if i == l-1:
-                        BB = Bl[:, :, i, :, :]
-                        Z = np.sum(BB[..., :, :, np.newaxis]
-                                  *Z[..., np.newaxis, :, :], axis=-2)
-
-
-                # fill the C tilde MDA
-
-                Ct[:,ir, :, :] = Z[:, :, :, :]
-
-                #
-                if bfacdiv:
-                    Ct[:,ir, :, :] = Ct[:, ir, :, :]*1./(self[l]['dis'][np.newaxis, :, np.newaxis, np.newaxis])
-                else:
-                    Ct[:,ir, :, :] = Ct[:, ir, :, :]*1./(self[l]['dis'][np.newaxis, :, np.newaxis, np.newaxis])
                 self.delays[ir] = self[l]['dis']/0.3
                 self.dis[ir] = self[l]['dis']
+                rmax = max(rmax, np.shape(self[l]['rays'])[1])
+
+        # working buffer of chainprod
+        buf = np.empty(35*nfchunk*rmax, dtype=complex)
+
+        # loop over frequency chunks
+        for f0 in range(0, nf, nfchunk):
+            f1 = min(f0 + nfchunk, nf)
+            # evaluation of all interactions
+            #
+            # core calculation of all interactions is done here
+            #
+            self.I.eval(fGHz[f0:f1])
+
+            # loop over group of interactions
+            for l in ib:
+                if l != 0:
+                    # l stands for the number of interactions
+                    ir = self[l]['rayidx']
+                    # l x r interaction index
+                    rays = self[l]['rays']
+                    # f x r x 2 x 2
+                    Z = chainprod(self.I.I, Bt, B0t[ir], rays, buf=buf)
+                    # fill the C tilde MDA
+                    C[ir, f0:f1, :, :] = (Z.swapaxes(0, 1) /
+                        self[l]['dis'][:, np.newaxis, np.newaxis, np.newaxis])
         #
         # true LOS when no interaction
         #
         if self.los:
-            Ct[:,0, :, :]= np.eye(3,3)[None,None,:,:]
+            C[0, :, :, :]= np.eye(2,2)[None,:,:]
             #self[0]['dis'] = self[0]['si'][0]
             # Fris
-            Ct[:,0, :, :] = Ct[:,0, :, :]*1./(self[0]['dis'][None, :, None, None])
+            C[0, :, :, :] = C[0, :, :, :]*1./(self[0]['dis'][:, None, None])
             self.delays[0] = self[0]['dis']/0.3
             self.dis[0] = self[0]['dis']
 
-
-        # To be corrected in a future version
         #
-        #  Ct : nf , Nray , theta , phi 
+        #  C : Nray x nf , theta , phi
         #
-        #  to 
-        #
-        #  Ct : Nray x nf , theta , phi 
-        #
-        Ct = np.swapaxes(Ct, 1, 0)
-
-        #c11 = Ct[:,:,0,0]
-        #c12 = Ct[:,:,0,1]
-        #c21 = Ct[:,:,1,0]
-        #c22 = Ct[:,:,1,1]
-        
-        c11 = Ct[:,:,1,1]
-        c12 = Ct[:,:,1,2]
-        c21 = Ct[:,:,2,1]
-        c22 = Ct[:,:,2,2]
+        c11 = C[:,:,0,0]
+        c12 = C[:,:,0,1]
+        c21 = C[:,:,1,0]
+        c22 = C[:,:,1,1]
 
 
         #
@@ -3035,15 +3031,15 @@ class Rays(PyLayers, dict):
         # Cn.Cpt = bs.FUsignal(self.I.fGHz, c12)
         # Cn.Ctp = bs.FUsignal(self.I.fGHz, c21)
         # Cn.Ctt = bs.FUsignal(self.I.fGHz, c22)
-        Cn.Ctt = bs.FUsignal(self.I.fGHz, c11)
-        Cn.Ctp = bs.FUsignal(self.I.fGHz, c12)
-        Cn.Cpt = bs.FUsignal(self.I.fGHz, c21)
-        Cn.Cpp = bs.FUsignal(self.I.fGHz, c22)
+        Cn.Ctt = bs.FUsignal(fGHz, c11)
+        Cn.Ctp = bs.FUsignal(fGHz, c12)
+        Cn.Cpt = bs.FUsignal(fGHz, c21)
+        Cn.Cpp = bs.FUsignal(fGHz, c22)
 
-        Cn.nfreq = self.I.nf
+        Cn.nfreq = nf
         Cn.nray = self.nray
         Cn.tauk = self.delays
-        Cn.fGHz = self.I.fGHz
+        Cn.fGHz = fGHz
         # r x 2
         Cn.tang = aod.T
         Cn.tangl = aod.T
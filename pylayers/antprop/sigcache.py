@@ -0,0 +1,432 @@
+#-*- coding:Utf-8 -*-
+from __future__ import print_function
+"""
+.. currentmodule:: pylayers.antprop.sigcache
+
+Signatures cache
+================
+
+Signatures only depend on the Layout, on the source and target cycles and
+on the exploration parameters (cutoff, threshold, nD, nR, nT, ...). They do
+not depend on the exact position of the link extremities inside those
+cycles. This module stores the result of `Signatures.run` on disk, in a
+directory named after a hash of the Layout, so that every link between the
+same pair of cycles reuses them.
+
+Each entry is stored as 3 .npy files which are loaded in memory-mapped mode
+
+    <key>_sig.npy   : all signature arrays flattened and concatenated
+    <key>_idx.npy   : (Nk x 3) array of (k, number of rows, offset)
+    <key>_ratio.npy : all ratio arrays concatenated
+
+A small in-memory LRU keeps the last entries opened and the on-disk cache is
+bounded by `maxbytes` (the least recently used entries are removed first).
+The size and the LRU order of the on-disk entries are tracked in memory, the
+cache directory is only scanned at the first eviction and then every
+`nscan` stored entries (other processes may write in the same directory).
+
+The cache is used by `Signatures.run` with cache=True.
+
+.. autosummary::
+    :members:
+
+"""
+import os
+import glob
+import shutil
+import hashlib
+import logging
+import numpy as np
+from collections import OrderedDict
+from pylayers.util.project import *
+
+logger = logging.getLogger(__name__)
+
+
+def layout_key(L):
+    """ hash of a Layout for signature caching
+
+    Parameters
+    ----------
+
+    L : Layout
+
+    Returns
+    -------
+
+    key : string
+        md5 of point coordinates, segment connectivity, airwalls
+        and size of the graph of interactions
+
+    Notes
+    -----
+
+    The hash is evaluated on the numpy representation of the Layout (g2npy)
+    and not on the .lay file, therefore a Layout modified in memory has a
+    different key.
+
+    """
+    md5 = hashlib.md5()
+    md5.update(np.ascontiguousarray(L.pt).tobytes())
+    md5.update(np.ascontiguousarray(L.tahe).tobytes())
+    md5.update(np.ascontiguousarray(L.tsg).tobytes())
+    lair = sorted(L.name.get('AIR',[]) + L.name.get('_AIR',[]))
+    md5.update(str(lair).encode('utf-8'))
+    if hasattr(L,'Gi'):
+        md5.update(str((len(L.Gi.nodes()),len(L.Gi.edges()))).encode('utf-8'))
+    return md5.hexdigest()
+
+
+class SigCache(PyLayers):
+    """ persistent cache of Signatures
+
+    Attributes
+    ----------
+
+    dirname : string
+        root directory of the cache
+    maxmem : int
+        maximum number of entries kept in memory
+    maxbytes : int
+        maximum size of the on-disk cache in bytes
+    hit : int
+        number of entries found in memory
+    hitdisk : int
+        number of entries found on disk
+    miss : int
+        number of entries not found
+    nscan : int
+        number of stored entries between two scans of the cache directory
+    disk : OrderedDict
+        size of the on-disk entries in LRU order (None : not scanned yet)
+
+    """
+
+    def __init__(self,dirname='',maxmem=64,maxbytes=2**30,nscan=1024):
+        """
+
+        Parameters
+        ----------
+
+        dirname : string
+            default <project>/output/sigcache
+        maxmem : int
+        maxbytes : int
+        nscan : int
+
+        """
+        if dirname == '':
+            dirname = os.path.join(basename,pstruc['DIRSIGC'])
+        self.dirname = dirname
+        self.maxmem = maxmem
+        self.maxbytes = maxbytes
+        self.nscan = nscan
+        self.mem = OrderedDict()
+        self.disk = None
+        self.size = 0
+        self._nput = 0
+        self.hit = 0
+        self.hitdisk = 0
+        self.miss = 0
+        self.nsave = 0
+        self.nevict = 0
+
+    def __repr__(self):
+        ntot = self.hit + self.hitdisk + self.miss
+        st = 'SigCache : ' + self.dirname + '\n'
+        st = st + 'entries in memory : ' + str(len(self.mem)) + '\n'
+        st = st + 'hit (memory) : ' + str(self.hit) + '\n'
+        st = st + 'hit (disk) : ' + str(self.hitdisk) + '\n'
+        st = st + 'miss : ' + str(self.miss) + '\n'
+        if ntot > 0:
+            st = st + 'hit ratio : %.2f' % ((self.hit + self.hitdisk) / (1. * ntot)) + '\n'
+        st = st + 'saved : ' + str(self.nsave) + ' evicted : ' + str(self.nevict)
+        return st
+
+    def stats(self):
+        """ return cache statistics as a dict
+        """
+        return {'hit': self.hit,
+                'hitdisk': self.hitdisk,
+                'miss': self.miss,
+                'saved': self.nsave,
+                'evicted': self.nevict}
+
+    def key(self,lkey,source,target,**kwargs):
+        """ build the entry name
+
+        Parameters
+        ----------
+
+        lkey : string
+            Layout key (see layout_key)
+        source : int
+        target : int
+        kwargs : parameters of Signatures.run
+
+        Returns
+        -------
+
+        (dirname, entry name)
+
+        Notes
+        -----
+
+        The entry name is <source>_<target>_<cutoff>_<hash of parameters>.
+        The cutoff is kept in clear for relabel.
+
+        """
+        lp = ['cutoff','threshold','delay_excess_max_ns','nD','nR','nT',
+              'bt','diffraction']
+        st = '_'.join([str(kwargs[k]) for k in lp if k in kwargs])
+        h = hashlib.md5(st.encode('utf-8')).hexdigest()[0:12]
+        cutoff = kwargs.get('cutoff',2)
+        name = str(source) + '_' + str(target) + '_' + str(cutoff) + '_' + h
+        return os.path.join(self.dirname,lkey),name
+
+    def get(self,S,**kwargs):
+        """ fill a Signatures object from the cache
+
+        Parameters
+        ----------
+
+        S : Signatures
+        kwargs : parameters of Signatures.run
+
+        Returns
+        -------
+
+        boolean : True if S has been filled from the cache
+
+        """
+        dname,name = self.key(layout_key(S.L),S.source,S.target,**kwargs)
+        fullname = os.path.join(dname,name)
+        if fullname in self.mem:
+            sig,idx,ratio = self.mem.pop(fullname)
+            self.mem[fullname] = (sig,idx,ratio)
+            self.hit += 1
+        else:
+            fileidx = fullname + '_idx.npy'
+            if not os.path.isfile(fileidx):
+                self.miss += 1
+                return False
+            try:
+                idx = np.load(fileidx)
+                if len(idx) > 0:
+                    sig = np.load(fullname + '_sig.npy',mmap_mode='c')
+                    ratio = np.load(fullname + '_ratio.npy',mmap_mode='c')
+                else:
+                    sig = np.array([],dtype=int)
+                    ratio = np.array([])
+            except:
+                logger.warning('SigCache : corrupted entry %s',name)
+                self.miss += 1
+                return False
+            # update access time for LRU eviction on disk
+            os.utime(fileidx,None)
+            if (self.disk is not None) and (fullname in self.disk):
+                self.disk[fullname] = self.disk.pop(fullname)
+            self.mem[fullname] = (sig,idx,ratio)
+            if len(self.mem) > self.maxmem:
+                self.mem.popitem(last=False)
+            self.hitdisk += 1
+
+        S.clear()
+        S.ratio = {}
+        oratio = 0
+        for k,nr,off in idx:
+            k = int(k)
+            nr = int(nr)
+            off = int(off)
+            S[k] = sig[off:off+nr*k].reshape(nr,k)
+            S.ratio[k] = ratio[oratio:oratio+nr//2]
+            oratio = oratio + nr//2
+        return True
+
+    def put(self,S,**kwargs):
+        """ store a Signatures object in the cache
+
+        Parameters
+        ----------
+
+        S : Signatures
+        kwargs : parameters of Signatures.run
+
+        """
+        dname,name = self.key(layout_key(S.L),S.source,S.target,**kwargs)
+        if not os.path.isdir(dname):
+            os.makedirs(dname)
+        fullname = os.path.join(dname,name)
+
+        lk = sorted(S.keys())
+        idx = np.zeros((len(lk),3),dtype=int)
+        off = 0
+        for i,k in enumerate(lk):
+            idx[i,:] = (k,S[k].shape[0],off)
+            off = off + S[k].size
+        if len(lk) > 0:
+            sig = np.hstack([np.asarray(S[k]).ravel() for k in lk]).astype(int)
+            ratio = np.hstack([np.asarray(S.ratio[k]).ravel() for k in lk])
+        else:
+            sig = np.array([],dtype=int)
+            ratio = np.array([])
+
+        np.save(fullname + '_sig.npy',sig)
+        np.save(fullname + '_ratio.npy',ratio)
+        # idx is written last, it marks the entry as valid
+        np.save(fullname + '_idx.npy',idx)
+        self.nsave += 1
+        self._nput += 1
+        if (self.disk is None) or (self._nput >= self.nscan):
+            self.scan()
+        else:
+            s = sum([os.path.getsize(fullname + e)
+                     for e in ('_idx.npy','_sig.npy','_ratio.npy')])
+            self.size = self.size - self.disk.pop(fullname,0) + s
+            self.disk[fullname] = s
+        self.evict()
+
+    def scan(self):
+        """ rebuild the index of the on-disk entries
+
+        The entries are sorted by modification time of their idx file.
+
+        """
+        lidx = glob.glob(os.path.join(self.dirname,'*','*_idx.npy'))
+        lentry = []
+        for fidx in lidx:
+            fullname = fidx[:-len('_idx.npy')]
+            lf = [fullname + e for e in ('_idx.npy','_sig.npy','_ratio.npy')]
+            try:
+                s = sum([os.path.getsize(f) for f in lf if os.path.isfile(f)])
+                lentry.append((os.path.getmtime(fidx),fullname,s))
+            except OSError:
+                # removed by another process
+                pass
+        lentry.sort()
+        self.disk = OrderedDict([(e[1],e[2]) for e in lentry])
+        self.size = sum([e[2] for e in lentry])
+        self._nput = 0
+
+    def evict(self):
+        """ remove least recently used entries if the cache is too large
+        """
+        if self.disk is None:
+            self.scan()
+        while (self.size > self.maxbytes) and (len(self.disk) > 1):
+            fullname,s = self.disk.popitem(last=False)
+            for e in ('_idx.npy','_sig.npy','_ratio.npy'):
+                try:
+                    os.remove(fullname + e)
+                except OSError:
+                    pass
+            self.mem.pop(fullname,None)
+            self.size = self.size - s
+            self.nevict += 1
+
+    def relabel(self,lkeyold,lkeynew,fmap):
+        """ transfer the entries of a Layout which has been locally modified
+
+        Parameters
+        ----------
+
+        lkeyold : string
+            Layout key before modification
+        lkeynew : string
+            Layout key after modification
+        fmap : function
+            fmap(source,target,cutoff) returns the (source,target) cycles
+            of the entry in the modified Layout or None if the signatures
+            of the entry depend on the modification
+
+        Returns
+        -------
+
+        nkeep : int
+            number of transferred entries
+        ntot : int
+            number of entries of the original Layout
+
+        Notes
+        -----
+
+        Signatures are sequences of segments and points, only the cycle
+        numbers of the entry name have to be changed. The entries of the
+        original Layout are kept unless lkeyold == lkeynew.
+
+        See Also
+        --------
+
+        pylayers.gis.layout.Layout.rebuild
+
+        """
+        dold = os.path.join(self.dirname,lkeyold)
+        dnew = os.path.join(self.dirname,lkeynew)
+        if not os.path.isdir(dold):
+            return 0,0
+        if dold == dnew:
+            dtmp = dold + '_old'
+            if os.path.isdir(dtmp):
+                shutil.rmtree(dtmp)
+            os.rename(dold,dtmp)
+            dold = dtmp
+        if not os.path.isdir(dnew):
+            os.makedirs(dnew)
+
+        lidx = glob.glob(os.path.join(dold,'*_idx.npy'))
+        nkeep = 0
+        for fidx in lidx:
+            name = os.path.basename(fidx)[:-len('_idx.npy')]
+            try:
+                source,target,cutoff,h = name.split('_')
+                u = fmap(int(source),int(target),int(cutoff))
+            except ValueError:
+                u = None
+            if u is None:
+                continue
+            newname = '_'.join((str(u[0]),str(u[1]),cutoff,h))
+            # idx is written last, it marks the entry as valid
+            for e in ('_sig.npy','_ratio.npy','_idx.npy'):
+                fsrc = os.path.join(dold,name + e)
+                fdst = os.path.join(dnew,newname + e)
+                if os.path.isfile(fdst):
+                    os.remove(fdst)
+                try:
+                    os.link(fsrc,fdst)
+                except (OSError,AttributeError):
+                    shutil.copyfile(fsrc,fdst)
+            nkeep += 1
+
+        for fullname in list(self.mem.keys()):
+            if fullname.startswith(dold) or fullname.startswith(dnew):
+                self.mem.pop(fullname)
+        if dold.endswith('_old'):
+            shutil.rmtree(dold)
+        # the entries have moved
+        self.disk = None
+        logger.info('SigCache : %d / %d entries kept',nkeep,len(lidx))
+        return nkeep,len(lidx)
+
+    def clear(self,L=[]):
+        """ remove cached entries
+
+        Parameters
+        ----------
+
+        L : Layout
+            if specified only the entries of this Layout are removed
+
+        """
+        if L == []:
+            lf = glob.glob(os.path.join(self.dirname,'*','*.npy'))
+        else:
+            lf = glob.glob(os.path.join(self.dirname,layout_key(L),'*.npy'))
+        for f in lf:
+            os.remove(f)
+        self.mem.clear()
+        self.disk = None
+
+#
+# process wide signature cache used by Signatures.run
+#
+sigcache = SigCache()
@@ -30,6 +30,7 @@ import pylayers.util.cone as cone
 import pylayers.util.pyutil as pyu
 import pylayers.util.plotutil as plu
 from pylayers.antprop.rays import Rays
+from pylayers.antprop.sigcache import sigcache
 from pylayers.util.project import *
 import heapq
 import shapely.geometry as sh
@@ -1112,6 +1113,9 @@ class Signatures(PyLayers,dict):
             maximum number of reflection
         nT : int
             maximum number of transmission
+        cache : boolean
+            if True (default False) the signatures are looked up in, and
+            stored to, the persistent cache (see pylayers.antprop.sigcache)
 
 
         See Also
@@ -1129,7 +1133,8 @@ class Signatures(PyLayers,dict):
                     'bt' : True,
                     'progress': True,
                     'diffraction' : True,
-                    'animation' : False
+                    'animation' : False,
+                    'cache' : False
                     }
         self.cpt = 0
         for k in defaults:
@@ -1154,6 +1159,15 @@ class Signatures(PyLayers,dict):
 
         self.filename = self.L._filename.split('.')[0] +'_' + str(self.source) +'_' + str(self.target) +'_' + str(self.cutoff) +'.sig'
 
+        #
+        # signatures only depend on the cycles and on the run parameters
+        # they are looked up first in the signature cache
+        #
+        if kwargs['cache']:
+            if sigcache.get(self,**kwargs):
+                logger.debug('Signatures %d %d loaded from cache',self.source,self.target)
+                return
+
         #
         # AIR : editable AIR separation
         # _AIR : constructed AIR separation
@@ -1814,6 +1828,9 @@ class Signatures(PyLayers,dict):
                     stack.pop()
                     #stack.pop()
 
+        if kwargs['cache']:
+            sigcache.put(self,**kwargs)
+
     def plot_cones(self,L,i=0,s=0,fig=[],ax=[],figsize=(10,10)):
         """ display cones of an unfolded signature
 
@@ -15,6 +15,9 @@ import doctest
 #import objxml
 import pdb
 import copy
+import hashlib
+import logging
+from collections import OrderedDict
 import numpy as np
 import scipy as sp
 from scipy.interpolate import interp1d
@@ -24,6 +27,8 @@ import pylayers.util.pyutil as pyu
 import pylayers.util.plotutil as plu
 from pylayers.util.project import *
 
+logger = logging.getLogger(__name__)
+
 """
 .. currentmodule:: pylayers.antprop.slab
 
@@ -1309,9 +1314,29 @@ class Slab(Interface,dict):
         self['lmat'] = []
 
         for matname in self['lmatname']:
-            mi = matDB[matname] 
+            mi = matDB[matname]
             self['lmat'].append(mi)
 
+    def tabkey(self):
+        """ hash of the Slab physical definition
+
+        Returns
+        -------
+
+        key : string
+            md5 of layer materials (epr,sigma,mur,roughness) and thicknesses
+
+        Notes
+        -----
+
+        The slab name is not part of the key, two slabs with the same
+        definition share the same loss table.
+
+        """
+        lm = [(m['epr'],m['sigma'],m['mur'],m['roughness']) for m in self['lmat']]
+        st = str((self['lmatname'],self['lthick'],lm))
+        return hashlib.md5(st.encode('utf-8')).hexdigest()
+
 
     def eval(self, fGHz=np.array([1.0]), theta=np.linspace(0, np.pi / 2, 50),compensate=False,RT='RT'):
         """ evaluation of the Slab
@@ -1666,6 +1691,43 @@ class Slab(Interface,dict):
         return fig,ax
 
 
+def interptab(T,theta):
+    """ linear interpolation of a table sampled on a uniform angle grid
+
+    Parameters
+    ----------
+
+    T : np.array (...,ntheta)
+        table sampled on np.linspace(0,pi,ntheta)
+    theta : np.array (,N)
+        angles (radians)
+
+    Returns
+    -------
+
+    V : np.array (...,N)
+
+    Examples
+    --------
+
+    >>> T = np.array([[0.,1.,np.inf]])
+    >>> V = interptab(T,np.array([0,np.pi/4,np.pi]))
+    >>> assert np.allclose(V[0,0:2],[0,0.5])
+    >>> assert np.isinf(V[0,2])
+
+    """
+    nth = T.shape[-1]
+    x = np.clip(theta,0,np.pi)*(nth-1)/np.pi
+    i0 = np.minimum(np.floor(x).astype(int),nth-2)
+    w = x - i0
+    T0 = T[...,i0]
+    T1 = T[...,i0+1]
+    # avoid inf-inf and 0*inf for infinite losses (e.g. METAL)
+    with np.errstate(invalid='ignore'):
+        V = np.where((T0==T1)|(w==0),T0,T0+w*(T1-T0))
+    return(V)
+
+
 class SlabDB(dict):
     """ Slab data base
 
@@ -1673,6 +1735,20 @@ class SlabDB(dict):
     ----------
 
     DB : slab dictionnary
+    ntheta : int
+        number of angles of the loss tables over [0,pi].
+        If 0 (default) losses are evaluated exactly.
+    tab : dict
+        loss and excess delay tables
+    dtheta : float
+        angular quantization (radians) of the R/T memo (see evalRT).
+        If 0 (default) R/T coefficients are evaluated exactly.
+    maxmemo : int
+        number of (slab,RT,frequency) entries kept in the memo
+    nreq : int
+        number of R/T coefficients requested to evalRT
+    neval : int
+        number of angles actually evaluated by Slab.eval
 
     """
     def __init__(self,fileslab='',
@@ -1704,6 +1780,16 @@ class SlabDB(dict):
         in  the Layout file .ini or from 2 specified file
 
         """
+        # angular resolution of loss tables (0 : exact evaluation)
+        self.ntheta = 0
+        self.tab = {}
+        self._tabloaded = False
+        # angular quantization of R/T coefficients (0 : exact evaluation)
+        self.dtheta = 0
+        self.maxmemo = 64
+        self.memo = OrderedDict()
+        self.nreq = 0
+        self.neval = 0
         # Load from file
         if (fileslab != ''):
             self.fileslab = fileslab
@@ -1998,6 +2084,257 @@ class SlabDB(dict):
         config.write(fd)
         fd.close()
 
+    def tabfile(self):
+        """ name of the file of loss tables
+
+        The file is stored next to the slab .ini file. A SlabDB built from a
+        Layout dict uses slabDB_tab.npz (table keys depend on the slab
+        definition, not on the slab name).
+
+        """
+        if hasattr(self,'fileslab'):
+            _filetab = os.path.splitext(os.path.basename(self.fileslab))[0] + '_tab.npz'
+        else:
+            _filetab = 'slabDB_tab.npz'
+        return pyu.getlong(_filetab, pstruc['DIRSLAB'])
+
+    def loadtab(self):
+        """ load loss tables from file
+        """
+        self._tabloaded = True
+        filetab = self.tabfile()
+        if os.path.isfile(filetab):
+            try:
+                d = np.load(filetab)
+                for k in d.files:
+                    if k not in self.tab:
+                        self.tab[k] = d[k]
+                d.close()
+            except:
+                logger.warning('SlabDB : unable to read %s',filetab)
+
+    def savetab(self):
+        """ save loss tables to file
+        """
+        filetab = self.tabfile()
+        try:
+            np.savez(filetab,**self.tab)
+        except (IOError,OSError):
+            logger.warning('SlabDB : unable to write %s',filetab)
+
+    def cleartab(self):
+        """ remove loss tables (memory and file)
+        """
+        self.tab = {}
+        filetab = self.tabfile()
+        if os.path.isfile(filetab):
+            os.remove(filetab)
+
+    def gettab(self,name,fGHz=[]):
+        """ get (and build if required) the tables of a slab
+
+        Parameters
+        ----------
+
+        name : string
+            slab name
+        fGHz : np.array
+            if [] the excess delay table is returned
+
+        Returns
+        -------
+
+        T : np.array
+            (2,nf,ntheta) loss table (o,p) in dB
+            or (2,ntheta) excess delay table (o,p) in ns
+
+        """
+        if not self._tabloaded:
+            self.loadtab()
+        th = np.linspace(0,np.pi,self.ntheta)
+        sk = self[name].tabkey()
+        if len(fGHz) == 0:
+            key = 'D_' + sk + '_' + str(self.ntheta)
+            if key not in self.tab:
+                do,dp = self[name].excess_grdelay(theta=th)
+                self.tab[key] = np.array([do,dp])
+                self.savetab()
+        else:
+            fGHz = np.asarray(fGHz,dtype=float).ravel()
+            fk = hashlib.md5(fGHz.tobytes()).hexdigest()[0:12]
+            key = 'L_' + sk + '_' + fk + '_' + str(self.ntheta)
+            if key not in self.tab:
+                Lo,Lp = self[name].losst(fGHz,th)
+                self.tab[key] = np.array([Lo,Lp])
+                self.savetab()
+        return self.tab[key]
+
+    def losst(self,name,fGHz,theta):
+        """ loss of a slab w.r.t angle and frequency
+
+        Parameters
+        ----------
+
+        name : string
+            slab name
+        fGHz : np.array
+        theta : np.array
+
+        Returns
+        -------
+
+        Lo : np.array (nf,ntheta)
+        Lp : np.array (nf,ntheta)
+
+        Notes
+        -----
+
+        If self.ntheta > 0 the loss is linearly interpolated from a table
+        built once per slab and per frequency array and stored in the file
+        returned by tabfile. Otherwise Slab.losst is called.
+
+        See Also
+        --------
+
+        Slab.losst
+
+        """
+        if self.ntheta == 0:
+            return self[name].losst(fGHz,theta)
+        if type(theta)==float:
+            theta = np.array([theta])
+        if not isinstance(fGHz, np.ndarray):
+            fGHz = np.array([fGHz])
+        T = self.gettab(name,fGHz)
+        V = interptab(T,np.asarray(theta))
+        return(V[0],V[1])
+
+    def excess_grdelay(self,name,theta):
+        """ excess group delay of a slab w.r.t angle
+
+        Parameters
+        ----------
+
+        name : string
+            slab name
+        theta : np.array
+
+        Returns
+        -------
+
+        delayo : np.array
+        delayp : np.array
+
+        See Also
+        --------
+
+        Slab.excess_grdelay
+
+        """
+        if self.ntheta == 0:
+            return self[name].excess_grdelay(theta=theta)
+        T = self.gettab(name)
+        V = interptab(T,np.asarray(theta))
+        return(V[0],V[1])
+
+    def evalRT(self,name,fGHz,theta,RT='R',compensate=False):
+        """ reflection or transmission matrices of a slab
+
+        Parameters
+        ----------
+
+        name : string
+            slab name
+        fGHz : np.array (,nf)
+        theta : np.array (,nt)
+            incidence angle (from normal) radians
+        RT : string
+            'R' or 'T'
+        compensate : boolean
+            see Slab.eval
+
+        Returns
+        -------
+
+        C : np.array (nf,nt,2,2)
+
+        Notes
+        -----
+
+        If self.dtheta > 0 the angles are rounded to a multiple of dtheta
+        and Slab.eval is only called on the bins which are not already
+        stored for the same slab definition, RT, compensate and frequency
+        array. The bins are kept across calls, hence across all the links
+        evaluated with the same SlabDB (Layout.sl). The memo of a key holds
+        at most pi/dtheta angles.
+
+        See Also
+        --------
+
+        Slab.eval
+        memoreport
+
+        """
+        fGHz = np.atleast_1d(np.asarray(fGHz,dtype=float))
+        theta = np.atleast_1d(np.asarray(theta))
+        nt = len(theta)
+        self.nreq += nt
+        S = self[name]
+        if self.dtheta == 0:
+            self.neval += nt
+            S.eval(fGHz=fGHz,theta=theta,RT=RT,compensate=compensate)
+            return getattr(S,RT)
+        fk = hashlib.md5(fGHz.tobytes()).hexdigest()[0:12]
+        key = (S.tabkey(),RT,compensate,fk,self.dtheta)
+        q = np.round(np.real(theta)/self.dtheta).astype(int)
+        uq,iq = np.unique(q,return_inverse=True)
+        if key in self.memo:
+            qm,Cm = self.memo.pop(key)
+        else:
+            qm = np.zeros(0,dtype=int)
+            Cm = np.zeros((len(fGHz),0,2,2),dtype=complex)
+        qn = uq[~np.isin(uq,qm)]
+        if len(qn) > 0:
+            S.eval(fGHz=fGHz,theta=qn*self.dtheta,RT=RT,compensate=compensate)
+            self.neval += len(qn)
+            qm = np.hstack((qm,qn))
+            Cm = np.concatenate((Cm,getattr(S,RT)),axis=1)
+            u = np.argsort(qm)
+            qm = qm[u]
+            Cm = Cm[:,u,:,:]
+        self.memo[key] = (qm,Cm)
+        if len(self.memo) > self.maxmemo:
+            self.memo.popitem(last=False)
+        return Cm[:,np.searchsorted(qm,uq)[iq],:,:]
+
+    def memoreport(self):
+        """ number of slab evaluations saved by the R/T memo
+
+        Returns
+        -------
+
+        d : dict
+            nreq : requested angles
+            neval : angles evaluated by Slab.eval
+            nsaved : nreq - neval
+            ratio : nsaved/nreq
+            nentry : number of memo entries
+
+        """
+        d = {'nreq':self.nreq,
+             'neval':self.neval,
+             'nsaved':self.nreq-self.neval,
+             'ratio':(self.nreq-self.neval)/max(self.nreq,1),
+             'nentry':len(self.memo)}
+        return d
+
+    def clearmemo(self):
+        """ remove the R/T memo and reset its counters
+        """
+        self.memo.clear()
+        self.nreq = 0
+        self.neval = 0
+
 
 
 # class Wedge(Interface,dict):
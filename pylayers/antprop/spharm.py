@@ -16,6 +16,7 @@ import os
 import re
 import sys
 import pdb
+import hashlib
 import numpy as np
 import scipy as sp
 import scipy.special as special
@@ -28,6 +29,7 @@ from pylayers.util.plotutil import *
 from matplotlib.font_manager import FontProperties
 from mpl_toolkits.mplot3d import axes3d
 from scipy import sparse
+from collections import OrderedDict
 from matplotlib import rc
 from matplotlib import cm
 
@@ -2028,6 +2030,340 @@ def VW(l, m, theta ,phi):
 
     return V, W
 
+def _vwcoeff(l, m):
+    """ Legendre recurrence coefficients for VWfast
+
+    Parameters
+    ----------
+
+    l : np.array (,K)
+    m : np.array (,K)
+
+    Returns
+    -------
+
+    co : dict
+        L : max level
+        a,b : (L+1 x L+2) coefficients of the recurrence along l
+        d : (L+1) coefficients of the diagonal recurrence
+        kl : list of the K index of each level
+        mm1, mp1 : (,K) column of m-1 and m+1
+        c1, c2 : (,K) factors of the m-1 and m+1 terms in V and W
+
+    Notes
+    -----
+
+    The normalized Legendre functions of AFLegendre are evaluated with
+
+    .. math::
+
+        \\bar{P}_{l}^{l} = -\\sqrt{\\frac{2l+1}{2l}}\\sqrt{1-x^2}\\bar{P}_{l-1}^{l-1}
+
+        \\bar{P}_{l}^{m} = a_{lm}(x\\bar{P}_{l-1}^{m}-b_{lm}\\bar{P}_{l-2}^{m})
+
+    """
+    L = int(np.max(l))
+    ll = np.arange(L + 1).reshape(L + 1, 1) * 1.
+    mm = np.arange(L + 2).reshape(1, L + 2) * 1.
+    a = np.zeros((L + 1, L + 2))
+    b = np.zeros((L + 1, L + 2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ua = np.where(mm < ll)
+        a[ua] = np.sqrt((4 * ll * ll - 1) / (ll * ll - mm * mm))[ua]
+        ub = np.where(mm < ll - 1)
+        b[ub] = np.sqrt(((ll - 1) ** 2 - mm * mm) / (4 * (ll - 1) ** 2 - 1))[ub]
+    d = np.zeros(L + 1)
+    d[1:] = -np.sqrt((2 * ll[1:, 0] + 1) / (2 * ll[1:, 0]))
+    kl = [np.where(l == k)[0] for k in range(L + 1)]
+    mm1 = np.where(m > 0, m - 1, 1)
+    sm1 = np.where(m > 0, 1., -1.)
+    mp1 = m + 1
+    t0 = (-1.0) ** l / (2 * np.sqrt(l * (l + 1)))
+    c1 = sm1 * t0 * np.sqrt((l + m) * (l - m + 1))
+    c2 = t0 * np.sqrt((l - m) * (l + m + 1))
+    return {'L': L, 'a': a, 'b': b, 'd': d, 'kl': kl,
+            'mm1': mm1, 'mp1': mp1, 'c1': c1, 'c2': c2}
+
+
+def VWfast(l, m, theta, phi, co={}, nchunk=4096, stacked=False):
+    """ evaluate vector Spherical Harmonics basis functions (vectorized)
+
+    Parameters
+    ----------
+
+    l    : ndarray (1 x K)
+        level
+    m    : ndarray (1 x K)
+        mode
+    theta : np.array (1 x Nray)
+    phi   : np.array (1 x Nray)
+    co : dict
+        recurrence coefficients (see _vwcoeff), evaluated if empty
+    nchunk : int
+        number of directions processed at once
+    stacked : boolean
+        if True return the real basis S
+
+    Returns
+    -------
+
+    V  : ndarray (Nray , K)
+    W  : ndarray (Nray , K)
+
+    or
+
+    S : ndarray (4K , Nray)
+        [Re(V).T ; Im(V).T ; Re(W).T ; Im(W).T]
+
+    Notes
+    -----
+
+    Same result as VW. The Legendre functions are obtained with a
+    recurrence along l vectorized over directions and modes instead of
+    one lpmn call per direction, and only the K needed (m-1,l) and (m+1,l)
+    values are kept.
+
+    See Also
+    --------
+
+    VW
+    VWCache
+
+    """
+    if (type(l) == float) or (type(l) == int):
+        l = np.array([l])
+    if (type(m) == float) or (type(m) == int):
+        m = np.array([m])
+
+    assert(l.shape == m.shape)
+    assert(np.shape(theta) == np.shape(phi))
+
+    if co == {}:
+        co = _vwcoeff(l, m)
+    L = co['L']
+    a = co['a'][:, :, np.newaxis]
+    b = co['b'][:, :, np.newaxis]
+    d = co['d']
+    c1 = co['c1'][:, np.newaxis]
+    c2 = co['c2'][:, np.newaxis]
+
+    # same dirty fix as VW (without modifying theta)
+    theta = np.array(theta, dtype=float)
+    index = np.where(abs(theta - np.pi / 2) < 1e-5)[0]
+    if len(index) > 0:
+        theta[index] = np.pi / 2 - 0.01
+    x = -np.cos(theta)
+
+    K = len(l)
+    Nr = len(x)
+    phi = np.asarray(phi).reshape(Nr)
+
+    M = int(np.max(m))
+    ma = np.arange(M + 1)[:, np.newaxis]
+
+    if stacked:
+        S = np.empty((4 * K, Nr))
+    else:
+        V = np.empty((Nr, K), dtype=complex)
+        W = np.empty((Nr, K), dtype=complex)
+
+    for i0 in range(0, Nr, nchunk):
+        xc = x[np.newaxis, i0:i0 + nchunk]
+        n = xc.shape[1]
+        sc = np.sqrt(np.maximum(1 - xc[0] * xc[0], 0))
+        # Pm : Legendre function of order m-1, Pp : of order m+1
+        Pm = np.empty((K, n))
+        Pp = np.empty((K, n))
+        P2 = np.zeros((L + 2, n))
+        P1 = np.zeros((L + 2, n))
+        Pd = np.sqrt(0.5) * np.ones(n)
+        for k in range(L + 1):
+            if k == 0:
+                P = np.zeros((L + 2, n))
+            else:
+                P = a[k] * (xc * P1 - b[k] * P2)
+                Pd = d[k] * sc * Pd
+            P[k, :] = Pd
+            u = co['kl'][k]
+            if len(u) > 0:
+                Pm[u, :] = P[co['mm1'][u], :]
+                Pp[u, :] = P[co['mp1'][u], :]
+            P2 = P1
+            P1 = P
+
+        # Y1 / x and Y2 including the normalization of V and W
+        Pm *= c1
+        Pp *= c2
+        Y2 = Pm - Pp
+        Y1 = Pm + Pp
+        Y1 /= xc
+        # cos(m phi), sin(m phi) evaluated once per mode
+        mphi = ma * phi[np.newaxis, i0:i0 + n]
+        cosm = np.cos(mphi)[m, :]
+        sinm = np.sin(mphi)[m, :]
+        if stacked:
+            u = slice(i0, i0 + n)
+            np.multiply(Y2, cosm, out=S[0:K, u])
+            np.multiply(Y2, sinm, out=S[K:2 * K, u])
+            np.multiply(Y1, cosm, out=S[2 * K:3 * K, u])
+            np.multiply(Y1, sinm, out=S[3 * K:, u])
+        else:
+            Ephi = cosm + 1j * sinm
+            V[i0:i0 + n] = (Y2 * Ephi).T
+            W[i0:i0 + n] = (Y1 * Ephi).T
+
+    if stacked:
+        return S
+    return V, W
+
+
+class VWCache(PyLayers):
+    """ cache of vector spherical harmonics basis functions
+
+    Attributes
+    ----------
+
+    maxbytes : int
+        maximum size of the cached bases in bytes
+    maxentry : int
+        maximum size of a single entry, larger bases are not cached
+    mem : OrderedDict
+        LRU of real bases S (see VWfast) keyed by
+        (lmax, hash of (l,m,theta,phi))
+    co : OrderedDict
+        recurrence coefficients keyed by (lmax, hash of (l,m))
+    hit : int
+    miss : int
+    nevict : int
+
+    Notes
+    -----
+
+    A basis is reused when an antenna is evaluated again on the same set of
+    directions (coverage grids, pattern display). When only the directions
+    change (rays DoD/DoA) the recurrence coefficients are reused by VWfast.
+
+    Examples
+    --------
+
+    >>> l = np.array([1,1,2,2,2])
+    >>> m = np.array([0,1,0,1,2])
+    >>> th = np.linspace(0.1,3,10)
+    >>> ph = np.linspace(0,6,10)
+    >>> C = VWCache()
+    >>> S = C.basis(l,m,th,ph)
+    >>> S = C.basis(l,m,th,ph)
+    >>> C.hit,C.miss
+    (1, 1)
+    >>> V,W = VW(l,m,th,ph)
+    >>> assert np.allclose(S[0:5,:],np.real(V.T))
+
+    """
+
+    def __init__(self, maxbytes=2**28, maxentry=2**26, maxcoeff=16):
+        """
+
+        Parameters
+        ----------
+
+        maxbytes : int
+        maxentry : int
+        maxcoeff : int
+            number of coefficient sets kept
+
+        """
+        self.maxbytes = maxbytes
+        self.maxentry = maxentry
+        self.maxcoeff = maxcoeff
+        self.mem = OrderedDict()
+        self.co = OrderedDict()
+        self.nbytes = 0
+        self.hit = 0
+        self.miss = 0
+        self.nevict = 0
+
+    def __repr__(self):
+        st = 'VWCache : ' + str(len(self.mem)) + ' bases, '
+        st = st + '%.1f MB / %.1f MB\n' % (self.nbytes / 2.**20, self.maxbytes / 2.**20)
+        st = st + 'hit : ' + str(self.hit) + ' miss : ' + str(self.miss)
+        st = st + ' evicted : ' + str(self.nevict)
+        return st
+
+    def clear(self):
+        """ remove all entries
+        """
+        self.mem.clear()
+        self.co.clear()
+        self.nbytes = 0
+
+    def coeff(self, l, m):
+        """ recurrence coefficients of an (l,m) index set
+
+        Returns
+        -------
+
+        key : tuple (lmax, hash of (l,m))
+        co : dict (see _vwcoeff)
+
+        """
+        md5 = hashlib.md5()
+        md5.update(np.ascontiguousarray(l, dtype=int).tobytes())
+        md5.update(np.ascontiguousarray(m, dtype=int).tobytes())
+        key = (int(np.max(l)), md5.hexdigest())
+        if key in self.co:
+            co = self.co.pop(key)
+        else:
+            co = _vwcoeff(l, m)
+            while len(self.co) >= self.maxcoeff:
+                self.co.popitem(last=False)
+        self.co[key] = co
+        return key, co
+
+    def basis(self, l, m, theta, phi):
+        """ real vector Spherical Harmonics basis
+
+        Parameters
+        ----------
+
+        l    : ndarray (1 x K)
+        m    : ndarray (1 x K)
+        theta : np.array (1 x Nray)
+        phi   : np.array (1 x Nray)
+
+        Returns
+        -------
+
+        S : ndarray (4K , Nray)
+            [Re(V).T ; Im(V).T ; Re(W).T ; Im(W).T] read only if cached
+
+        """
+        l = np.asarray(l)
+        m = np.asarray(m)
+        ckey, co = self.coeff(l, m)
+        md5 = hashlib.md5(ckey[1].encode('utf-8'))
+        md5.update(np.ascontiguousarray(theta, dtype=float).tobytes())
+        md5.update(np.ascontiguousarray(phi, dtype=float).tobytes())
+        key = (ckey[0], md5.hexdigest())
+        if key in self.mem:
+            S = self.mem.pop(key)
+            self.mem[key] = S
+            self.hit += 1
+            return S
+        self.miss += 1
+        S = VWfast(l, m, theta, phi, co=co, stacked=True)
+        if S.nbytes <= min(self.maxentry, self.maxbytes):
+            while self.nbytes + S.nbytes > self.maxbytes:
+                _, So = self.mem.popitem(last=False)
+                self.nbytes -= So.nbytes
+                self.nevict += 1
+            S.setflags(write=False)
+            self.mem[key] = S
+            self.nbytes += S.nbytes
+        return S
+
+# process-wide cache used by Antenna.Fsynth3 and Pattern.eval
+vwcache = VWCache()
+
 def VW0(n, m, x, phi, Pmm1n, Pmp1n):
     """ evaluate vector Spherical Harmonics basis functions
 
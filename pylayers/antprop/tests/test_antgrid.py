@@ -0,0 +1,35 @@
+# -*- coding:Utf-8 -*-
+import unittest
+import numpy as np
+from pylayers.antprop.antenna import Antenna
+from numpy.testing import (TestCase, assert_, assert_allclose)
+
+class TestAntennaGrid(TestCase):
+    def setUp(self):
+        self.A = Antenna('Gauss', fGHz=np.array([2.4, 5.]))
+        self.A.setgrid(nth=181, nph=360)
+
+    def test_interp(self):
+        th = np.random.rand(200) * np.pi
+        ph = np.random.rand(200) * 4 * np.pi - np.pi
+        Ft, Fp = self.A.eval(th=th, ph=ph, inplace=False)
+        self.A.unsetgrid()
+        Ft0, Fp0 = self.A.eval(th=th, ph=ph, inplace=False)
+        assert_(Ft.shape == Ft0.shape)
+        assert_allclose(Ft, Ft0, atol=1e-2 * np.max(np.abs(Ft0)))
+
+    def test_nodes(self):
+        # interpolation is exact on the grid nodes
+        tab = self.A._Fgrid
+        th = tab['th'][[0, 10, 90, 180]]
+        ph = tab['ph'][[0, 359, 45, 180]]
+        Ft, Fp = self.A.interpgrid(th, ph)
+        assert_allclose(Ft, tab['Ft'][[0, 10, 90, 180], [0, 359, 45, 180]])
+
+    def test_report(self):
+        r = self.A.gridreport(Nd=2000)
+        assert_(r['errmax'] < 1e-2)
+        assert_(self.A.gridded)
+
+if __name__ == "__main__":
+    unittest.main()
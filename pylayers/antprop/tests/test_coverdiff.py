@@ -0,0 +1,36 @@
+import unittest
+import numpy as np
+from pylayers.antprop.loss import cover, route
+
+
+class TestCoverDiff(unittest.TestCase):
+
+    def setUp(self):
+        phi = np.linspace(0, 2*np.pi, 6)[:, None]
+        r = np.linspace(0.02, 4000, 60)[None, :]
+        self.X = r*np.cos(phi)
+        self.Y = r*np.sin(phi)
+        self.Z = 100 + np.cumsum(10*np.random.randn(6, 60), axis=1)
+        self.fGHz = np.array([0.3, 0.9])
+
+    def test_cover(self):
+        for method in ['deygout', 'bullington']:
+            L0 = cover(self.X, self.Y, self.Z, 30, 1.5, self.fGHz, 1.333,
+                       method=method, batch=False)
+            L1 = cover(self.X, self.Y, self.Z, 30, 1.5, self.fGHz, 1.333,
+                       method=method)
+            L2 = cover(self.X, self.Y, self.Z, 30, 1.5, self.fGHz, 1.333,
+                       method=method, nproc=2)
+            np.testing.assert_allclose(L1, L0, atol=1e-9)
+            np.testing.assert_allclose(L2, L0, atol=1e-9)
+
+    def test_route(self):
+        for method in ['deygout', 'bullington']:
+            L0 = route(self.X, self.Y, self.Z, 30, 1.5, self.fGHz, 1.333,
+                       method=method, batch=False)
+            L1 = route(self.X, self.Y, self.Z, 30, 1.5, self.fGHz, 1.333,
+                       method=method)
+            np.testing.assert_allclose(L1, L0, atol=1e-9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# -*- coding:Utf-8 -*-
+import unittest
+import numpy as np
+import scipy.special as sps
+from pylayers.antprop.slab import SlabDB
+from pylayers.antprop.diffRT import diff, difftab
+from pylayers.antprop.interactions import IntD
+from numpy.testing import (TestCase, assert_allclose)
+
+dm = {'AIR':{'mur':(1+0j),'epr':(1+0j),'roughness':0.0,'sigma':0.0},
+      'METAL':{'mur':(1+0j),'epr':(1+0j),'roughness':0.0,'sigma':10000000},
+      'BRICK':{'mur':(1+0j),'epr':(4.1+0j),'roughness':0.0,'sigma':0.3}}
+ds = {'WALL':{'lmatname':['BRICK'],'lthick':[0.07],'color':'grey','linewidth':1},
+      'METALIC':{'lmatname':['METAL'],'lthick':[0.1],'color':'black','linewidth':1}}
+
+class TestDiffTab(TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.sl = SlabDB(ds=ds,dm=dm)
+        self.fGHz = np.linspace(2,11,5)
+        Nr = 200
+        self.N = np.random.uniform(1.2,1.9,Nr)
+        self.phi0 = np.random.rand(Nr)*self.N*np.pi
+        self.phi = np.random.rand(Nr)*self.N*np.pi
+        self.si = np.random.uniform(0.5,20,Nr)
+        self.sd = np.random.uniform(0.5,20,Nr)
+        self.beta = np.random.uniform(0.3,np.pi/2,Nr)
+
+    def test_F(self):
+        x = np.logspace(-10,5,10000)
+        c = np.sqrt(np.pi/2)
+        S,C = sps.fresnel(np.sqrt(x)/c)
+        F = 2j*np.sqrt(x)*np.exp(1j*x)*c*((0.5-C)-1j*(0.5-S))
+        assert_allclose(difftab.F(x),F,rtol=1e-6)
+
+    def test_exact(self):
+        for m in ['METAL','BRICK']:
+            mat = self.sl.mat[m]
+            E = diff(self.fGHz,self.phi0,self.phi,self.si,self.sd,self.N,
+                     mat,mat,beta=self.beta,mode='exact',debug=True)
+            F = diff(self.fGHz,self.phi0,self.phi,self.si,self.sd,self.N,
+                     mat,mat,beta=self.beta,mode='fast',debug=True)
+            for k in range(6):
+                assert_allclose(F[k],E[k],rtol=1e-3,atol=1e-6)
+
+    def test_IntD(self):
+        Nr = len(self.N)
+        data = np.vstack((self.phi0,self.phi,self.beta,self.N,self.si,self.sd)).T
+        D = IntD(data=data,slab=self.sl)
+        D.idx = list(range(Nr))
+        D.dusl = {'WALL@WALL':np.arange(0,Nr//2),
+                  'METALIC@WALL':np.arange(Nr//2,Nr)}
+        A = D.eval(fGHz=self.fGHz).copy()
+        D.mode = 'exact'
+        Ae = D.eval(fGHz=self.fGHz)
+        assert_allclose(A,Ae,rtol=1e-3,atol=1e-6)
+
+if __name__ == "__main__":
+    unittest.main()
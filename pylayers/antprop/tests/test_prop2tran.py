@@ -0,0 +1,39 @@
+# -*- coding:Utf-8 -*-
+import copy
+import unittest
+import numpy as np
+import pylayers.signal.bsignal as bs
+import pylayers.antprop.antenna as ant
+from pylayers.antprop.channel import Ctilde
+from numpy.testing import (TestCase, assert_, assert_allclose)
+
+class TestProp2tranChunk(TestCase):
+    def setUp(self):
+        nray = 150
+        fGHz = np.linspace(2, 6, 41)
+        C = Ctilde()
+        C.fGHz = fGHz
+        C.nfreq = len(fGHz)
+        C.nray = nray
+        for k in ['Ctt', 'Ctp', 'Cpt', 'Cpp']:
+            y = np.random.randn(nray, len(fGHz)) + 1j * np.random.randn(nray, len(fGHz))
+            setattr(C, k, bs.FUsignal(x=fGHz, y=y))
+        C.tang = np.random.rand(nray, 2) * np.pi
+        C.rang = np.random.rand(nray, 2) * np.pi
+        C.tangl = C.tang
+        C.rangl = C.rang
+        C.tauk = np.random.rand(nray) * 100
+        self.C = C
+        self.a = ant.Antenna('Gauss', fGHz=fGHz)
+        self.b = ant.Antenna('Omni', param={'pol': 't', 'GmaxdB': 0}, fGHz=fGHz)
+
+    def test_siso(self):
+        H0 = copy.deepcopy(self.C).prop2tran(a=self.a, b=self.b)
+        H1 = self.C.prop2tran(a=self.a, b=self.b, nrchunk=40, nfchunk=8, nthreads=2)
+        assert_(H1.y.shape == H0.y.shape)
+        assert_allclose(H1.x, H0.x)
+        assert_allclose(H1.y, H0.y)
+        assert_(H1.isFriis)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+# -*- coding:Utf-8 -*-
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from pylayers.antprop.sigcache import SigCache, layout_key
+from numpy.testing import (TestCase, assert_equal, assert_)
+
+class FakeLayout(object):
+    def __init__(self):
+        self.pt = np.array([[0.,1.,1.],[0.,0.,1.]])
+        self.tahe = np.array([[0,1],[1,2]])
+        self.tsg = np.array([1,2])
+        self.name = {'AIR':[2]}
+
+class FakeSignatures(dict):
+    def __init__(self,L,source,target):
+        self.L = L
+        self.source = source
+        self.target = target
+        self.ratio = {}
+
+class TestSigCache(TestCase):
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.L = FakeLayout()
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_putget(self):
+        print("testing SigCache put/get")
+        cache = SigCache(self.dirname,maxmem=1)
+        S = FakeSignatures(self.L,1,3)
+        S[1] = np.array([[5],[2]])
+        S.ratio[1] = np.array([1.])
+        S[2] = np.array([[5,7],[2,3],[8,9],[3,3]])
+        S.ratio[2] = np.array([0.5,0.7])
+        cache.put(S,cutoff=3,threshold=0.1)
+        S2 = FakeSignatures(self.L,1,3)
+        assert_(not cache.get(S2,cutoff=4,threshold=0.1))
+        assert_(cache.get(S2,cutoff=3,threshold=0.1))
+        assert_(cache.get(S2,cutoff=3,threshold=0.1))
+        assert_equal(S2[2],S[2])
+        assert_equal(S2.ratio[2],S.ratio[2])
+        assert_equal(cache.stats()['miss'],1)
+        assert_equal(cache.stats()['hitdisk'],1)
+        assert_equal(cache.stats()['hit'],1)
+
+    def test_relabel(self):
+        print("testing SigCache relabel")
+        cache = SigCache(self.dirname)
+        for s,t in [(1,3),(2,3)]:
+            S = FakeSignatures(self.L,s,t)
+            S[1] = np.array([[5],[2]])
+            S.ratio[1] = np.array([1.])
+            cache.put(S,cutoff=3)
+        k1 = layout_key(self.L)
+        # cycle 1 becomes cycle 4, signatures of cycle 2 are invalidated
+        fmap = lambda s,t,c : (4,t) if s==1 else None
+        nkeep,ntot = cache.relabel(k1,k1,fmap)
+        assert_equal((nkeep,ntot),(1,2))
+        assert_(cache.get(FakeSignatures(self.L,4,3),cutoff=3))
+        assert_(not cache.get(FakeSignatures(self.L,1,3),cutoff=3))
+        assert_(not cache.get(FakeSignatures(self.L,2,3),cutoff=3))
+
+    def test_evict(self):
+        print("testing SigCache evict")
+        cache = SigCache(self.dirname,maxbytes=2000,nscan=4)
+        for s in range(10):
+            S = FakeSignatures(self.L,s,0)
+            S[1] = np.array([[5],[2]])
+            S.ratio[1] = np.array([1.])
+            cache.put(S,cutoff=3)
+        # the tracked size is the size on disk
+        size = cache.size
+        cache.scan()
+        assert_equal(cache.size,size)
+        assert_(cache.size <= 2000)
+        assert_(cache.nevict > 0)
+        # most recent entries are kept
+        assert_(cache.get(FakeSignatures(self.L,9,0),cutoff=3))
+        assert_(not cache.get(FakeSignatures(self.L,0,0),cutoff=3))
+
+    def test_layout_key(self):
+        print("testing sigcache.layout_key")
+        k1 = layout_key(self.L)
+        self.L.pt[0,2] = 2.
+        k2 = layout_key(self.L)
+        assert_(k1 != k2)
+
+if __name__ == "__main__":
+    unittest.main()
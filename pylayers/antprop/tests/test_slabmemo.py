@@ -0,0 +1,45 @@
+# -*- coding:Utf-8 -*-
+import unittest
+import numpy as np
+from pylayers.antprop.slab import SlabDB
+from numpy.testing import (TestCase, assert_, assert_allclose)
+
+dm = {'AIR':{'mur':(1+0j),'epr':(1+0j),'roughness':0.0,'sigma':0.0},
+      'BRICK':{'mur':(1+0j),'epr':(4.1+0j),'roughness':0.0,'sigma':0.3}}
+ds = {'WALL':{'lmatname':['BRICK'],'lthick':[0.07],'color':'grey','linewidth':1},
+      'WALL2':{'lmatname':['BRICK'],'lthick':[0.07],'color':'red','linewidth':2}}
+
+class TestSlabMemo(TestCase):
+    def setUp(self):
+        self.sl = SlabDB(ds=ds,dm=dm)
+        self.fGHz = np.array([2.4,5.])
+
+    def test_exact(self):
+        theta = np.random.rand(50)*np.pi/2
+        R = self.sl.evalRT('WALL',self.fGHz,theta,RT='R')
+        self.sl['WALL'].eval(fGHz=self.fGHz,theta=theta,RT='R')
+        assert_allclose(R,self.sl['WALL'].R)
+        assert_(self.sl.memoreport()['nsaved']==0)
+
+    def test_memo(self):
+        theta = np.random.rand(500)*np.pi/2.1
+        T0 = self.sl.evalRT('WALL',self.fGHz,theta,RT='T',compensate=True)
+        R0 = self.sl.evalRT('WALL',self.fGHz,theta,RT='R')
+        self.sl.clearmemo()
+        self.sl.dtheta = 0.1*np.pi/180
+        T = self.sl.evalRT('WALL',self.fGHz,theta,RT='T',compensate=True)
+        R = self.sl.evalRT('WALL',self.fGHz,theta,RT='R')
+        assert_allclose(T,T0,atol=5e-3)
+        assert_allclose(R,R0,atol=5e-3)
+        # same definition, same angles : no new evaluation
+        neval = self.sl.neval
+        R2 = self.sl.evalRT('WALL2',self.fGHz,theta[::-1],RT='R')
+        assert_(self.sl.neval==neval)
+        assert_allclose(R2,R[:,::-1])
+        d = self.sl.memoreport()
+        assert_(d['nreq']==1500)
+        assert_(d['nsaved']==d['nreq']-d['neval'])
+        assert_(d['neval']<=2*(int(np.pi/2.1/self.sl.dtheta)+2))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+# -*- coding:Utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from pylayers.antprop.slab import SlabDB, interptab
+from numpy.testing import (TestCase, assert_, assert_allclose)
+
+dm = {'AIR':{'mur':(1+0j),'epr':(1+0j),'roughness':0.0,'sigma':0.0},
+      'BRICK':{'mur':(1+0j),'epr':(4.1+0j),'roughness':0.0,'sigma':0.3}}
+ds = {'WALL':{'lmatname':['BRICK'],'lthick':[0.07],'color':'grey','linewidth':1},
+      'WALL2':{'lmatname':['BRICK'],'lthick':[0.07],'color':'red','linewidth':2}}
+
+class TestSlabTab(TestCase):
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        filetab = os.path.join(self.dirname,'slabDB_tab.npz')
+        self.sl = SlabDB(ds=ds,dm=dm)
+        self.sl.tabfile = lambda : filetab
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_accuracy(self):
+        fGHz = np.array([2.4,5.])
+        theta = np.random.rand(100)*np.pi/2.2
+        Lo,Lp = self.sl.losst('WALL',fGHz,theta)
+        do,dp = self.sl.excess_grdelay('WALL',theta)
+        self.sl.ntheta = 901
+        Lot,Lpt = self.sl.losst('WALL',fGHz,theta)
+        dot,dpt = self.sl.excess_grdelay('WALL',theta)
+        assert_allclose(Lot,Lo,atol=0.01)
+        assert_allclose(Lpt,Lp,atol=0.01)
+        assert_allclose(dot,do,atol=1e-3)
+        assert_allclose(dpt,dp,atol=1e-3)
+
+    def test_persist(self):
+        fGHz = np.array([2.4])
+        self.sl.ntheta = 91
+        self.sl.losst('WALL',fGHz,np.array([0.1]))
+        # same definition : same table
+        self.sl.losst('WALL2',fGHz,np.array([0.1]))
+        assert_(len(self.sl.tab)==1)
+        sl = SlabDB(ds=ds,dm=dm)
+        sl.tabfile = self.sl.tabfile
+        sl.loadtab()
+        assert_(list(sl.tab.keys())==list(self.sl.tab.keys()))
+
+    def test_interptab(self):
+        T = np.array([[0.,1.,np.inf]])
+        V = interptab(T,np.array([0,np.pi/4,np.pi/2]))
+        assert_allclose(V[0],[0,0.5,1])
+
+if __name__ == "__main__":
+    unittest.main()
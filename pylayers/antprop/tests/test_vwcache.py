@@ -0,0 +1,42 @@
+# -*- coding:Utf-8 -*-
+import unittest
+import numpy as np
+from pylayers.antprop.spharm import VW, VWfast, VWCache
+from numpy.testing import (TestCase, assert_equal, assert_, assert_allclose)
+
+class TestVWCache(TestCase):
+    def setUp(self):
+        L = 12
+        self.l = np.array([a for a in range(1, L + 1) for b in range(a + 1)])
+        self.m = np.array([b for a in range(1, L + 1) for b in range(a + 1)])
+        self.theta = np.random.rand(500) * np.pi
+        self.phi = np.random.rand(500) * 2 * np.pi
+
+    def test_vwfast(self):
+        V0, W0 = VW(self.l, self.m, self.theta.copy(), self.phi)
+        V1, W1 = VWfast(self.l, self.m, self.theta, self.phi, nchunk=128)
+        assert_allclose(V1, V0, atol=1e-12 * abs(V0).max())
+        assert_allclose(W1, W0, atol=1e-10 * abs(W0).max())
+        S = VWfast(self.l, self.m, self.theta, self.phi, stacked=True)
+        K = len(self.l)
+        assert_allclose(S[0:K], np.real(V1.T))
+        assert_allclose(S[3 * K:], np.imag(W1.T))
+
+    def test_cache(self):
+        S = VWfast(self.l, self.m, self.theta, self.phi, stacked=True)
+        C = VWCache(maxbytes=2 * S.nbytes)
+        for k in range(3):
+            C.basis(self.l, self.m, self.theta + k * 1e-3, self.phi)
+        S2 = C.basis(self.l, self.m, self.theta + 2e-3, self.phi)
+        assert_equal(C.miss, 3)
+        assert_equal(C.hit, 1)
+        assert_equal(C.nevict, 1)
+        assert_(C.nbytes <= C.maxbytes)
+        assert_(not S2.flags.writeable)
+        # larger than maxentry : computed but not kept
+        C = VWCache(maxentry=S.nbytes - 1)
+        C.basis(self.l, self.m, self.theta, self.phi)
+        assert_equal(len(C.mem), 0)
+
+if __name__ == "__main__":
+    unittest.main()
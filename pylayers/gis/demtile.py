@@ -0,0 +1,305 @@
+#-*- coding:Utf-8 -*-
+from __future__ import print_function
+"""
+.. currentmodule:: pylayers.gis.demtile
+
+Tiled elevation store
+=====================
+
+A TileStore gives access to the heights of a region covered by several
+1x1 degree DEM tiles without building the mosaic in memory. Tiles are
+opened in memory-mapped mode, only the pages which contain the requested
+samples are read, and a small LRU keeps the last opened tiles.
+
+Supported tile files (searched in this order in `dirname`)
+
+    <prefix>.npy                 2D array (any dtype)
+    <prefix>.HGT | <prefix>.hgt  SRTM big endian int16 (1201x1201 or 3601x3601)
+
+where prefix is the SRTM tile name of the lower left corner (e.g. N48W002).
+Row 0 of a tile is the northern border and column 0 the western border,
+adjacent tiles share their border rows and columns.
+
+.. autosummary::
+    :members:
+
+"""
+import os
+import doctest
+import logging
+import numpy as np
+from collections import OrderedDict
+from pylayers.util.project import *
+
+logger = logging.getLogger(__name__)
+
+# SRTM void value
+VOID = -32768
+
+
+def tilename(ilon, ilat):
+    """ tile prefix from the integer coordinates of its lower left corner
+
+    Parameters
+    ----------
+
+    ilon : int
+        longitude (degrees)
+    ilat : int
+        latitude (degrees)
+
+    Returns
+    -------
+
+    prefix : string
+
+    Examples
+    --------
+
+    >>> tilename(-2,48)
+    'N48W002'
+    >>> tilename(0,-1)
+    'S01E000'
+
+    """
+    slat = 'N' if ilat >= 0 else 'S'
+    slon = 'E' if ilon >= 0 else 'W'
+    return '%s%02d%s%03d' % (slat, abs(ilat), slon, abs(ilon))
+
+
+class TileStore(PyLayers):
+    """ memory-mapped DEM tiles with an LRU cache
+
+    Attributes
+    ----------
+
+    dirname : string
+        directory of the tile files
+    maxtile : int
+        maximum number of tiles kept open
+    fill : float
+        height of missing tiles and void samples
+    hit : int
+        number of tile accesses served by the cache
+    miss : int
+        number of tile openings
+
+    Examples
+    --------
+
+    >>> import tempfile
+    >>> dirname = tempfile.mkdtemp()
+    >>> a = np.arange(121,dtype='>i2').reshape(11,11)
+    >>> a.tofile(os.path.join(dirname,'N48W002.HGT'))
+    >>> T = TileStore(dirname)
+    >>> h = T.height(np.array([-1.95,-1.9]),np.array([48.95,48.5]))
+    >>> assert np.allclose(h,[6,56])
+
+    """
+
+    def __init__(self, dirname='', maxtile=16, fill=0.):
+        """
+
+        Parameters
+        ----------
+
+        dirname : string
+            default <project>/gis/srtm
+        maxtile : int
+        fill : float
+
+        """
+        if dirname == '':
+            dirname = os.path.join(basename, 'gis', 'srtm')
+        self.dirname = dirname
+        self.maxtile = maxtile
+        self.fill = fill
+        self.mem = OrderedDict()
+        self.hit = 0
+        self.miss = 0
+
+    def __repr__(self):
+        st = 'TileStore : ' + self.dirname + '\n'
+        st = st + 'open tiles : ' + ' '.join([tilename(*k) for k in self.mem
+                                               if self.mem[k] is not None]) + '\n'
+        st = st + 'hit : ' + str(self.hit) + ' miss : ' + str(self.miss)
+        return st
+
+    def stats(self):
+        """ return cache statistics as a dict
+        """
+        return {'hit': self.hit,
+                'miss': self.miss,
+                'open': len(self.mem)}
+
+    def open(self, prefix):
+        """ open a tile file in memory-mapped mode
+
+        Returns
+        -------
+
+        tile : np.memmap | None
+            None if there is no file for this tile
+
+        """
+        filename = os.path.join(self.dirname, prefix + '.npy')
+        if os.path.isfile(filename):
+            return np.load(filename, mmap_mode='r')
+        for ext in ['.HGT', '.hgt']:
+            filename = os.path.join(self.dirname, prefix + ext)
+            if os.path.isfile(filename):
+                n = int(np.sqrt(os.path.getsize(filename) // 2))
+                return np.memmap(filename, dtype='>i2', mode='r', shape=(n, n))
+        logger.info('TileStore : no tile %s in %s', prefix, self.dirname)
+        return None
+
+    def tile(self, ilon, ilat):
+        """ get a tile from its lower left corner
+
+        Parameters
+        ----------
+
+        ilon : int
+        ilat : int
+
+        Returns
+        -------
+
+        tile : np.memmap | None
+
+        """
+        key = (int(ilon), int(ilat))
+        if key in self.mem:
+            t = self.mem.pop(key)
+            self.mem[key] = t
+            self.hit += 1
+            return t
+        self.miss += 1
+        t = self.open(tilename(*key))
+        self.mem[key] = t
+        if len(self.mem) > self.maxtile:
+            self.mem.popitem(last=False)
+        return t
+
+    def height(self, lon, lat):
+        """ bilinear interpolation of heights
+
+        Parameters
+        ----------
+
+        lon : np.array
+            longitudes (degrees), any shape
+        lat : np.array
+            latitudes (degrees), same shape as lon
+
+        Returns
+        -------
+
+        h : np.array
+            heights (meters), same shape as lon
+
+        Notes
+        -----
+
+        Points are grouped by tile and each tile is read once, the samples
+        of a tile are gathered with fancy indexing on the memory map.
+
+        """
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        shape = lon.shape
+        lon = lon.ravel()
+        lat = lat.ravel()
+        h = self.fill * np.ones(len(lon))
+        if len(lon) == 0:
+            return h.reshape(shape)
+        ilon = np.floor(lon).astype(int)
+        ilat = np.floor(lat).astype(int)
+        ukey, inv = np.unique(np.vstack((ilon, ilat)), axis=1, return_inverse=True)
+        inv = np.ravel(inv)
+        order = np.argsort(inv, kind='mergesort')
+        bound = np.searchsorted(inv[order], np.arange(ukey.shape[1] + 1))
+        for k in range(ukey.shape[1]):
+            t = self.tile(ukey[0, k], ukey[1, k])
+            if t is None:
+                continue
+            u = order[bound[k]:bound[k + 1]]
+            ny, nx = t.shape
+            # fractional pixel coordinates (row 0 is north)
+            fx = (lon[u] - ukey[0, k]) * (nx - 1)
+            fy = (ukey[1, k] + 1 - lat[u]) * (ny - 1)
+            cx = np.clip(np.floor(fx).astype(int), 0, nx - 2)
+            cy = np.clip(np.floor(fy).astype(int), 0, ny - 2)
+            dx = fx - cx
+            dy = fy - cy
+            h00 = np.asarray(t[cy, cx], dtype=float)
+            h01 = np.asarray(t[cy, cx + 1], dtype=float)
+            h10 = np.asarray(t[cy + 1, cx], dtype=float)
+            h11 = np.asarray(t[cy + 1, cx + 1], dtype=float)
+            hu = ((1 - dx) * (1 - dy) * h00 + dx * (1 - dy) * h01 +
+                  (1 - dx) * dy * h10 + dx * dy * h11)
+            void = (h00 == VOID) | (h01 == VOID) | (h10 == VOID) | (h11 == VOID)
+            hu[void] = self.fill
+            h[u] = hu
+        return h.reshape(shape)
+
+    def profiles(self, pa, pb, Npt=1000):
+        """ batch extraction of profiles along straight lines in (lon,lat)
+
+        Parameters
+        ----------
+
+        pa : np.array (N x 2)
+            (lon,lat) of the first terminations
+        pb : np.array (N x 2)
+            (lon,lat) of the second terminations
+        Npt : int
+            number of points of each profile
+
+        Returns
+        -------
+
+        h : np.array (N x Npt)
+            heights
+        lon : np.array (N x Npt)
+        lat : np.array (N x Npt)
+
+        Notes
+        -----
+
+        Profile points are equally spaced in (lon,lat) which is accurate
+        enough for the few km links of a coverage. Use Ezone.profiles for
+        points equally spaced in cartesian coordinates.
+
+        """
+        pa = np.atleast_2d(pa)
+        pb = np.atleast_2d(pb)
+        s = np.linspace(0, 1, Npt)[None, :]
+        lon = pa[:, 0:1] + (pb[:, 0:1] - pa[:, 0:1]) * s
+        lat = pa[:, 1:2] + (pb[:, 1:2] - pa[:, 1:2]) * s
+        return self.height(lon, lat), lon, lat
+
+    def grid(self, extent, Nlon, Nlat):
+        """ resample a region which may span several tiles
+
+        Parameters
+        ----------
+
+        extent : (lonmin,lonmax,latmin,latmax)
+        Nlon : int
+        Nlat : int
+
+        Returns
+        -------
+
+        h : np.array (Nlat x Nlon)
+            heights, row 0 is north (as self.hgts)
+
+        """
+        lon = np.linspace(extent[0], extent[1], Nlon)
+        lat = np.linspace(extent[3], extent[2], Nlat)
+        return self.height(lon[None, :] * np.ones((Nlat, 1)),
+                           lat[:, None] * np.ones((1, Nlon)))
+
+if __name__ == "__main__":
+    doctest.testmod()
@@ -29,6 +29,9 @@ from shapely.geometry import Polygon
 from pylayers.gis.gisutil import *
 import pylayers.gis.kml as gkml
 import pylayers.gis.srtm as srtm
+from pylayers.gis.demtile import TileStore
+from pylayers.util.spatialindex import SegGrid
+from matplotlib.path import Path
 from mpl_toolkits.basemap import Basemap
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 from mpl_toolkits.axes_grid1.colorbar import colorbar
@@ -487,6 +490,167 @@ class Ezone(PyLayers):
 
         self.height = th
 
+    def bldgindex(self, cellsize=0):
+        """ build the spatial index of building footprints
+
+        Parameters
+        ----------
+
+        cellsize : float
+            cell size of the grid (meters), 0 : about one wall per cell
+
+        Notes
+        -----
+
+        The footprints of all the subtiles of self.dbldg are converted in
+        cartesian coordinates and their walls are stored in a uniform grid
+        (SegGrid). The index is saved by saveh5 and restored by loadh5.
+
+        + self.bpt  : (2,Nv) footprint vertices (cartesian)
+        + self.bptr : (Nb+1) vertices of building k are bpt[:,bptr[k]:bptr[k+1]]
+        + self.bh   : (Nb) building heights (nan if unknown)
+        + self.bseg : (Nw) building of each wall
+        + self.bidx : SegGrid of the walls
+
+        """
+        lpoly = []
+        lh = []
+        for k in self.dbldg:
+            h, lp = self.dbldg[k][0], self.dbldg[k][1]
+            h = np.atleast_2d(h)
+            for i, p in enumerate(lp):
+                if len(p) < 3:
+                    continue
+                lpoly.append(np.asarray(p, dtype=float))
+                if (h.shape[1] > 3) and (i < h.shape[0]):
+                    lh.append(h[i, 3])
+                else:
+                    lh.append(np.nan)
+        nv = np.array([len(p) for p in lpoly], dtype=int)
+        self.bptr = np.hstack((0, np.cumsum(nv)))
+        self.bh = np.array(lh, dtype=float)
+        if len(lpoly) > 0:
+            lonlat = np.vstack(lpoly)
+            x, y = self.m(lonlat[:, 0], lonlat[:, 1])
+            self.bpt = np.vstack((x, y))
+        else:
+            self.bpt = np.zeros((2, 0))
+        self.bseg = np.repeat(np.arange(len(nv)), nv)
+        self._bidx(cellsize=cellsize)
+
+    def _bidx(self, cellsize=0, grid=None):
+        """ walls of the footprints and their grid index
+
+        Parameters
+        ----------
+
+        cellsize : float
+            cell size of the grid (meters), 0 : about one wall per cell
+        grid : dict
+            grid saved by saveh5 (the index is not rebuilt)
+
+        """
+        # wall k goes from vertex k to the next vertex of the same footprint
+        inext = np.arange(self.bpt.shape[1]) + 1
+        inext[self.bptr[1:] - 1] = self.bptr[:-1]
+        self.bta = self.bpt
+        self.bhe = self.bpt[:, inext]
+        if self.bpt.shape[1] > 0:
+            self.bidx = SegGrid(self.bta, self.bhe, cellsize=cellsize,
+                                grid=grid)
+
+    def bldgcross(self, pa, pb):
+        """ buildings crossed by a set of links
+
+        Parameters
+        ----------
+
+        pa : np.array (N x 2)
+            (lon,lat) of terminations a
+        pb : np.array (N x 2)
+            (lon,lat) of terminations b
+
+        Returns
+        -------
+
+        il : np.array
+            link index
+        ib : np.array
+            building index (see bldgindex)
+        lin : np.array
+            length of link il inside building ib (meters)
+
+        Notes
+        -----
+
+        Only the walls of the grid cells crossed by a link are tested.
+        When a termination lies inside a footprint the length is counted
+        up to that termination.
+
+        Inside and outside parts alternate along a link, except when an
+        odd number of walls is crossed (a termination is inside) or when
+        a footprint vertex is hit (the link may only touch the footprint).
+        In these cases the sub-intervals between crossings are classified
+        by testing their middle point.
+        A link which crosses no wall (inside a single footprint) is not
+        reported.
+
+        """
+        if 'bidx' not in self.__dict__:
+            return (np.array([], dtype=int), np.array([], dtype=int),
+                    np.array([]))
+        pa = np.atleast_2d(pa)
+        pb = np.atleast_2d(pb)
+        p1 = np.vstack(self.m(pa[:, 0], pa[:, 1]))
+        p2 = np.vstack(self.m(pb[:, 0], pb[:, 1]))
+        il, iw = self.bidx.pairs(p1, p2)
+        # link / wall intersection
+        r = p2[:, il] - p1[:, il]
+        s = self.bhe[:, iw] - self.bta[:, iw]
+        q = self.bta[:, iw] - p1[:, il]
+        den = r[0]*s[1] - r[1]*s[0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (q[0]*s[1] - q[1]*s[0])/den
+            u = (q[0]*r[1] - q[1]*r[0])/den
+        ok = (den != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u < 1)
+        il = il[ok]
+        ib = self.bseg[iw[ok]]
+        t = t[ok]
+        # crossing at a footprint vertex
+        vertex = (u[ok] < 1e-9) | (u[ok] > 1 - 1e-9)
+        if len(il) == 0:
+            return il, ib, t
+        # sort crossings by link, building, then along the link
+        order = np.lexsort((t, ib, il))
+        il = il[order]
+        ib = ib[order]
+        t = t[order]
+        vertex = vertex[order]
+        code = il*len(self.bh) + ib
+        ucode, start, count = np.unique(code, return_index=True,
+                                        return_counts=True)
+        lil = ucode // len(self.bh)
+        lib = ucode % len(self.bh)
+        # alternate signs : inside length = sum (t1-t0) + (t3-t2) + ...
+        rank = np.arange(len(t)) - np.repeat(start, count)
+        sgn = np.where(rank % 2 == 0, -1., 1.)
+        tin = np.add.reduceat(sgn*t, start)
+        # odd number of crossings or vertex : classify the sub-intervals
+        check = (count % 2 == 1) | (np.add.reduceat(vertex, start) > 0)
+        for k in np.where(check)[0]:
+            b = lib[k]
+            l = lil[k]
+            poly = Path(self.bpt[:, self.bptr[b]:self.bptr[b+1]].T)
+            tk = np.unique(np.hstack((0, t[start[k]:start[k]+count[k]], 1)))
+            tm = (tk[:-1] + tk[1:])/2.
+            pm = p1[:, l][:, None] + (p2[:, l] - p1[:, l])[:, None]*tm[None, :]
+            inside = poly.contains_points(pm.T)
+            tin[k] = np.sum(np.diff(tk)[inside])
+        # links which only touch a footprint
+        k = np.where(tin > 0)[0]
+        D = np.sqrt(np.sum((p2 - p1)**2, axis=0))
+        return lil[k], lib[k], tin[k]*D[lil[k]]
+
     def ls(self):
         files = os.listdir(os.path.join(basename,'gis','h5'))
         for f in files:
@@ -693,6 +857,9 @@ class Ezone(PyLayers):
             frequency in GHz
         source : string
             'aster' | 'srtm'
+        bldg : boolean
+            if True, buildings crossed by the link are evaluated
+            (default False, see bldgcross)
 
         Returns
         -------
@@ -711,6 +878,10 @@ class Ezone(PyLayers):
             height of the line of sight
         ellFresnel : (2,N)
             Fresnel ellipsoid set of points
+        bldg : np.array
+            buildings crossed by the link (see bldgindex), empty if not bldg
+        lbldg : np.array
+            length of the link inside each crossed building
 
         """
 
@@ -720,7 +891,8 @@ class Ezone(PyLayers):
                     'K': 1.3333,
                     'fGHz': .868,
                     'threshold': -np.sqrt(2),
-                    'source': 'srtm'}
+                    'source': 'srtm',
+                    'bldg': False}
 
         for key in defaults:
             if key not in kwargs:
@@ -729,6 +901,12 @@ class Ezone(PyLayers):
         # wavelength
         lmbda = 0.3/kwargs['fGHz']
 
+        # buildings crossed by the link
+        if kwargs['bldg']:
+            il, ib, lin = self.bldgcross(np.array([pa]), np.array([pb]))
+        else:
+            ib, lin = np.array([], dtype=int), np.array([])
+
         # transmitter cartesian coordinates
         x_a, y_a = self.m(pa[0], pa[1])
 
@@ -749,40 +927,45 @@ class Ezone(PyLayers):
 
         lon, lat = self.m(x, y, inverse=True)
 
-        Dx = (lon - self.extent[0]) / self.lonstep
-        Dy = (self.extent[3]-lat) / self.latstep
-        rx = np.floor(Dx).astype(int)
-        ry = np.floor(Dy).astype(int)
-        dx = Dx-rx
-        dy = Dy-ry
-
-        rx_old = np.round((lon - self.extent[0]) / self.lonstep).astype(int)
-        ry_old = np.round((self.extent[3]-lat) / self.latstep).astype(int)
-
-        # add earth sphericity deviation to hgt (depends on K factor)
-        if kwargs['source'] == 'srtm':
-            hll = self.hgts[ry, rx]
-            hlr = self.hgts[ry, rx+1]
-            hul = self.hgts[ry+1, rx]
-            hur = self.hgts[ry+1, rx+1]
-            wll = np.sqrt(dx**2+(1-dy)**2)
-            wlr = np.sqrt((1-dx)**2+(1-dy)**2)
-            wul = np.sqrt(dx**2+dy**2)
-            wur = np.sqrt((1-dx)**2+dy**2)
-            height = (wll*hll+wlr*hlr+wul*hul+wur*hur)/(wll+wlr+wul+wur)
-            height_old = self.hgts[ry_old, rx_old] + dh
-
-        if kwargs['source'] == 'aster':
-            hll = self.hgta[ry, rx]
-            hlr = self.hgta[ry, rx+1]
-            hul = self.hgta[ry+1, rx]
-            hur = self.hgta[ry+1, rx+1]
-            wll = np.sqrt(dx**2+(1-dy)**2)
-            wlr = np.sqrt((1-dx)**2+(1-dy)**2)
-            wul = np.sqrt(dx**2+dy**2)
-            wur = np.sqrt((1-dx)**2+dy**2)
-            height = (wll*hll+wlr*hlr+wul*hul+wur*hur)/(wll+wlr+wul+wur)
-            height_old = self.hgta[ry,rx] + dh
+        if 'store' in self.__dict__:
+            # tile store (see usetiles)
+            height = self.getheight(lon, lat)
+            height_old = height + dh
+        else:
+            Dx = (lon - self.extent[0]) / self.lonstep
+            Dy = (self.extent[3]-lat) / self.latstep
+            rx = np.floor(Dx).astype(int)
+            ry = np.floor(Dy).astype(int)
+            dx = Dx-rx
+            dy = Dy-ry
+
+            rx_old = np.round((lon - self.extent[0]) / self.lonstep).astype(int)
+            ry_old = np.round((self.extent[3]-lat) / self.latstep).astype(int)
+
+            # add earth sphericity deviation to hgt (depends on K factor)
+            if kwargs['source'] == 'srtm':
+                hll = self.hgts[ry, rx]
+                hlr = self.hgts[ry, rx+1]
+                hul = self.hgts[ry+1, rx]
+                hur = self.hgts[ry+1, rx+1]
+                wll = np.sqrt(dx**2+(1-dy)**2)
+                wlr = np.sqrt((1-dx)**2+(1-dy)**2)
+                wul = np.sqrt(dx**2+dy**2)
+                wur = np.sqrt((1-dx)**2+dy**2)
+                height = (wll*hll+wlr*hlr+wul*hul+wur*hur)/(wll+wlr+wul+wur)
+                height_old = self.hgts[ry_old, rx_old] + dh
+
+            if kwargs['source'] == 'aster':
+                hll = self.hgta[ry, rx]
+                hlr = self.hgta[ry, rx+1]
+                hul = self.hgta[ry+1, rx]
+                hur = self.hgta[ry+1, rx+1]
+                wll = np.sqrt(dx**2+(1-dy)**2)
+                wlr = np.sqrt((1-dx)**2+(1-dy)**2)
+                wul = np.sqrt(dx**2+dy**2)
+                wur = np.sqrt((1-dx)**2+dy**2)
+                height = (wll*hll+wlr*hlr+wul*hul+wur*hur)/(wll+wlr+wul+wur)
+                height_old = self.hgta[ry,rx] + dh
 
         # seek for local maxima along link profile
 
@@ -822,11 +1005,117 @@ class Ezone(PyLayers):
              'hlos':hlos,
              'ellFresnel':ellFresnel[0],
              'LFS':LFS,
-             'L':L }
+             'L':L,
+             'bldg':ib,
+             'lbldg':lin }
 
         return data
 
 
+    def usetiles(self, dirname='', maxtile=16, fill=0.):
+        """ read heights from memory-mapped tiles
+
+        Parameters
+        ----------
+
+        dirname : string
+            directory of the tiles (default <project>/gis/srtm)
+        maxtile : int
+            number of tiles kept open
+        fill : float
+            height of missing tiles
+
+        Notes
+        -----
+
+        Once set, cover, profile, profiles and route interpolate the tiles
+        of the store (bilinear) instead of self.hgts, hence a zone may span
+        several tiles without loading them in memory.
+
+        See Also
+        --------
+
+        pylayers.gis.demtile.TileStore
+
+        """
+        self.store = TileStore(dirname=dirname, maxtile=maxtile, fill=fill)
+
+    def getheight(self, lon, lat, source='srtm'):
+        """ ground height at (lon,lat) points
+
+        Parameters
+        ----------
+
+        lon : np.array
+        lat : np.array
+        source : string
+            'srtm' | 'aster' (ignored if a tile store is used)
+
+        """
+        if 'store' in self.__dict__:
+            return self.store.height(lon, lat)
+        rx = np.floor((lon - self.extent[0]) / self.lonstep).astype(int)
+        ry = np.floor((self.extent[3]-lat) / self.latstep).astype(int)
+        if source == 'aster':
+            return self.hgta[ry, rx]
+        return self.hgts[ry, rx]
+
+    def profiles(self, pa, pb, **kwargs):
+        """ batch profile extraction
+
+        Parameters
+        ----------
+
+        pa : np.array (N x 2)
+            (lon,lat) of terminations a
+        pb : np.array (N x 2)
+            (lon,lat) of terminations b
+        Npt : int
+            number of points per profile
+        K : float
+            K factor
+        source : string
+            'aster' | 'srtm'
+
+        Returns
+        -------
+
+        height : np.array (N x Npt)
+            ground height including earth curvature
+        d : np.array (N x Npt)
+            horizontal distance along each link
+
+        Examples
+        --------
+
+        >>> E = Ezone('N48W002')
+        >>> E.usetiles()
+        >>> pa = np.array([[-1.63,48.12],[-1.63,48.12]])
+        >>> pb = np.array([[-1.60,48.10],[-1.65,48.15]])
+        >>> height,d = E.profiles(pa,pb,Npt=200)
+
+        """
+        defaults = {'Npt': 1000,
+                    'K': 1.3333,
+                    'source': 'srtm'}
+
+        for key in defaults:
+            if key not in kwargs:
+                kwargs[key] = defaults[key]
+
+        pa = np.atleast_2d(pa)
+        pb = np.atleast_2d(pb)
+        x_a, y_a = self.m(pa[:, 0], pa[:, 1])
+        x_b, y_b = self.m(pb[:, 0], pb[:, 1])
+        s = np.linspace(0, 1, kwargs['Npt'])[None, :]
+        x = x_a[:, None] + (x_b - x_a)[:, None]*s
+        y = y_a[:, None] + (y_b - y_a)[:, None]*s
+        d = np.sqrt((x_b - x_a)**2 + (y_b - y_a)**2)[:, None]*s
+        dh = d*(d[:, ::-1])/(2*kwargs['K']*6375e3)
+        lon, lat = self.m(x, y, inverse=True)
+        height = self.getheight(lon, lat, source=kwargs['source']) + dh
+        return height, d
+
     def route(self, pa, pb, **kwargs):
         """ coverage on a route
 
@@ -850,6 +1139,8 @@ class Ezone(PyLayers):
         source :
         binterb : boolean
             interpolation (default True)
+        bldg : boolean
+            if True, self.lbldg is evaluated (default False)
 
         Returns
         -------
@@ -858,6 +1149,12 @@ class Ezone(PyLayers):
         lon
         lat
 
+        Notes
+        -----
+
+        With bldg=True and if the building index exists (bldgindex),
+        self.lbldg is the length (meters) of each link inside buildings.
+
         """
 
         self.pa = pa
@@ -871,6 +1168,7 @@ class Ezone(PyLayers):
         source = kwargs.pop('source','srtm')
         binterp = kwargs.pop('binterp',True)
         divider = kwargs.pop('divider',[])
+        bldg = kwargs.pop('bldg',False)
 
         x_a, y_a = self.m(pa[0], pa[1])
         x_b, y_b = self.m(pb[:, 0], pb[:, 1])
@@ -886,13 +1184,17 @@ class Ezone(PyLayers):
         # equivalent earth curvature
         dh = d*(d[:,::-1])/(2*K*6375e3)
 
-        Dlon = (lon - self.extent[0]) / self.lonstep
-        Dlat= (self.extent[3]-lat) / self.latstep
+        if 'store' not in self.__dict__:
+            Dlon = (lon - self.extent[0]) / self.lonstep
+            Dlat= (self.extent[3]-lat) / self.latstep
         #
         # Interpolation
         #
 
-        if binterp:
+        if 'store' in self.__dict__:
+            # tile store (see usetiles)
+            height = self.getheight(lon, lat) + dh
+        elif binterp:
             rlon = np.floor(Dlon).astype(int)
             rlat = np.floor(Dlat).astype(int)
             dlon = Dlon - rlon
@@ -926,6 +1228,11 @@ class Ezone(PyLayers):
 
         self.L = loss.route(x, y, height, Ha, Hb, fGHz, K, method=method)
 
+        # length of each link inside buildings
+        if bldg:
+            il, ib, lin = self.bldgcross(np.tile(pa, (len(pb), 1)), pb)
+            self.lbldg = np.bincount(il, weights=lin, minlength=len(pb))
+
         return(self.L,lon,lat)
 
     def cover(self, **kwargs):
@@ -948,6 +1255,10 @@ class Ezone(PyLayers):
             Transmitter height
         K : float
             K factor
+        method : 'deygout' | 'bullington'
+            diffraction method
+        nproc : int
+            number of processes evaluating azimuths (see loss.cover)
 
         """
         defaults = {'pc': (-1.627449, 48.124648),
@@ -959,7 +1270,9 @@ class Ezone(PyLayers):
                     'K': 1.3333,
                     'fGHz': .3,
                     'source': 'srtm',
-                    'divider': []
+                    'divider': [],
+                    'method': 'deygout',
+                    'nproc': 1
                     }
 
         for key in defaults:
@@ -1005,18 +1318,11 @@ class Ezone(PyLayers):
 
         lon, lat = self.m(x, y, inverse=True)
 
-        rx = np.floor((lon - self.extent[0]) / self.lonstep).astype(int)
-        ry = np.floor((self.extent[3]-lat) / self.latstep).astype(int)
-
         # height
-        #cov = self.hgts[ry, rx]
-        if kwargs['source'] == 'srtm':
-            height = self.hgts[ry, rx]
-
-        if kwargs['source'] == 'aster':
-            height = self.hgta[ry, rx]
+        height = self.getheight(lon, lat, source=kwargs['source'])
 
-        L = loss.cover(x, y, height, Ht, Hr, fGHz, K, method='deygout')
+        L = loss.cover(x, y, height, Ht, Hr, fGHz, K,
+                       method=kwargs['method'], nproc=kwargs['nproc'])
         self.triang = triang
         self.coverage  = L 
         return triang, L
@@ -1464,6 +1770,8 @@ class Ezone(PyLayers):
             u'ia-b'
                 info
                 poly
+        bldgidx  (footprint index, see bldgindex)
+            bpt bptr bh bseg cellptr cellseg
 
         """
         _fileh5 = self.prefix+'.h5'
@@ -1492,10 +1800,21 @@ class Ezone(PyLayers):
                 llon = [ eval(x.split('-')[0]) for x in l1 ]
                 llat = [ eval(x.split('-')[1]) for x in l1 ]
 
-                self.blom = min(llon)
-                self.bloM = max(llon)
-                self.blam = min(llat)
-                self.blaM = max(llat)
+                if len(self.dbldg) > 0:
+                    self.blom = min(llon)
+                    self.bloM = max(llon)
+                    self.blam = min(llat)
+                    self.blaM = max(llat)
+                else:
+                    del self.dbldg
+            if 'bldgidx' in fh:
+                bidx = fh['bldgidx']
+                for k in ['bpt', 'bptr', 'bh', 'bseg']:
+                    self.__dict__[k] = bidx[k][:]
+                grid = dict(bidx.attrs)
+                grid['cellptr'] = bidx['cellptr'][:]
+                grid['cellseg'] = bidx['cellseg'][:]
+                self._bidx(grid=grid)
 
 
     def saveh5(self):
@@ -1559,6 +1878,20 @@ class Ezone(PyLayers):
                 bldg[k]['info'] = np.array(self.dbldg[k][0])
                 bldg[k]['poly'] = self.dbldg[k][1]
 
+        if 'bidx' in self.__dict__:
+            # footprint index (see bldgindex)
+            if u'bldgidx' in f:
+                del f[u'bldgidx']
+            bidx = f.create_group(u'bldgidx')
+            for k in ['bpt', 'bptr', 'bh', 'bseg']:
+                bidx.create_dataset(k, data=self.__dict__[k])
+            grid = self.bidx.todict()
+            for k in grid:
+                if isinstance(grid[k], np.ndarray):
+                    bidx.create_dataset(k, data=grid[k])
+                else:
+                    bidx.attrs[k] = grid[k]
+
         f.close()
 
     def build(self,_fileosm,_filehgt,_filelcv):
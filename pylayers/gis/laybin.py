@@ -0,0 +1,337 @@
+#-*- coding:Utf-8 -*-
+from __future__ import print_function
+"""
+.. currentmodule:: pylayers.gis.laybin
+
+Binary Layout dump
+==================
+
+A binary dump is a directory which contains
+
++ one .npy file per numpy array (loaded with memory mapping)
++ the graphs stored as CSR adjacency arrays (see graph2arr)
++ meta.pickle : format version, hash of the .lay file and the small
+  python attributes of the Layout
++ G?_attr.pickle : the node and edge attributes of each graph which
+  can not be stored as arrays
+
+Arrays are opened with np.load(mmap_mode='r'), hence the processes which
+load the same Layout share the same pages of the system file cache.
+
+Interactions (nodes of Gi) are stored in an (N,4) table [length,i0,i1,i2].
+The 'output' dictionnaries of Gi edges are packed in 3 arrays
+(outptr,outidx,outprob) : the outputs of edge k are the nodes
+outidx[outptr[k]:outptr[k+1]] with probabilities outprob[outptr[k]:outptr[k+1]].
+
+.. autosummary::
+    :members:
+
+"""
+import os
+import shutil
+import pickle
+import logging
+import doctest
+import numpy as np
+import networkx as nx
+import scipy.sparse as sparse
+from pylayers.util.project import *
+
+logger = logging.getLogger(__name__)
+
+# increase VERSION each time the content of the dump is modified
+VERSION = 1
+
+
+def nodes2arr(lnodes):
+    """ convert a list of graph nodes into an array
+
+    Parameters
+    ----------
+
+    lnodes : list
+        int or tuple of int (interactions)
+
+    Returns
+    -------
+
+    a : np.array
+        (,N) if all the nodes are int, (N,4) [length,i0,i1,i2] otherwise
+
+    Examples
+    --------
+
+    >>> a = nodes2arr([(1,),(2,3),(2,3,4)])
+    >>> assert (a[1] == np.array([2,2,3,0])).all()
+    >>> assert arr2nodes(a) == [(1,),(2,3),(2,3,4)]
+
+    """
+    if all([not isinstance(n, tuple) for n in lnodes]):
+        return np.array(lnodes, dtype=np.int64)
+    a = np.zeros((len(lnodes), 4), dtype=np.int64)
+    for k, n in enumerate(lnodes):
+        a[k, 0] = len(n)
+        a[k, 1:1 + len(n)] = n
+    return a
+
+
+def arr2nodes(a):
+    """ convert an array into a list of graph nodes
+
+    See Also
+    --------
+
+    nodes2arr
+
+    """
+    if a.ndim == 1:
+        return a.tolist()
+    return [tuple(r[1:1 + r[0]]) for r in a.tolist()]
+
+
+def graph2arr(G, prefix=''):
+    """ convert a graph into arrays
+
+    Parameters
+    ----------
+
+    G : nx.Graph | nx.DiGraph
+    prefix : string
+        prefix of the array names
+
+    Returns
+    -------
+
+    darr : dict
+        nodes, indptr, indices, pos (+ outptr, outidx, outprob if the edges
+        have an 'output' attribute)
+    dattr : dict
+        'graph', 'node' and 'edge' attributes which are not stored as arrays
+
+    """
+    lnodes = list(G.nodes())
+    dindex = {n: k for k, n in enumerate(lnodes)}
+    indptr = np.zeros(len(lnodes) + 1, dtype=np.int64)
+    indices = []
+    ledges = []
+    for k, n in enumerate(lnodes):
+        lnb = list(G[n])
+        indices.extend([dindex[m] for m in lnb])
+        ledges.extend([(n, m) for m in lnb])
+        indptr[k + 1] = len(indices)
+
+    darr = {}
+    darr[prefix + 'nodes'] = nodes2arr(lnodes)
+    darr[prefix + 'indptr'] = indptr
+    darr[prefix + 'indices'] = np.array(indices, dtype=np.int64)
+
+    # node positions
+    gpos = getattr(G, 'pos', {})
+    ndim = 2
+    if len(gpos) > 0:
+        ndim = len(next(iter(gpos.values())))
+    pos = np.nan * np.ones((len(lnodes), ndim))
+    for k, n in enumerate(lnodes):
+        if n in gpos:
+            pos[k, :] = gpos[n]
+    darr[prefix + 'pos'] = pos
+
+    dnode = {n: G.nodes[n] for n in lnodes if len(G.nodes[n]) > 0}
+    dedge = {}
+    boutput = False
+    for e in ledges:
+        d = G[e[0]][e[1]]
+        if 'output' in d:
+            boutput = True
+        d = {k: d[k] for k in d if k != 'output'}
+        if len(d) > 0:
+            dedge[e] = d
+
+    #
+    # packing of Gi outputs, edge order is the CSR order
+    #
+    if boutput:
+        outptr = np.zeros(len(ledges) + 1, dtype=np.int64)
+        outidx = []
+        outprob = []
+        for k, e in enumerate(ledges):
+            output = G[e[0]][e[1]].get('output', {})
+            for i in output:
+                outidx.append(dindex[i])
+                outprob.append(output[i])
+            outptr[k + 1] = len(outidx)
+        darr[prefix + 'outptr'] = outptr
+        darr[prefix + 'outidx'] = np.array(outidx, dtype=np.int64)
+        darr[prefix + 'outprob'] = np.array(outprob, dtype=float)
+
+    dattr = {'graph': dict(G.graph),
+             'directed': G.is_directed(),
+             'node': dnode,
+             'edge': dedge,
+             'pos': hasattr(G, 'pos')}
+    return darr, dattr
+
+
+def arr2graph(darr, dattr, prefix=''):
+    """ convert arrays into a graph
+
+    Parameters
+    ----------
+
+    darr : dict
+        arrays (possibly memory mapped)
+    dattr : dict
+    prefix : string
+
+    Returns
+    -------
+
+    G : nx.Graph | nx.DiGraph
+
+    See Also
+    --------
+
+    graph2arr
+
+    """
+    if dattr['directed']:
+        G = nx.DiGraph(**dattr['graph'])
+    else:
+        G = nx.Graph(**dattr['graph'])
+
+    lnodes = arr2nodes(np.asarray(darr[prefix + 'nodes']))
+    indptr = np.asarray(darr[prefix + 'indptr'])
+    indices = np.asarray(darr[prefix + 'indices'])
+    src = np.repeat(np.arange(len(lnodes)), np.diff(indptr)).tolist()
+    dst = indices.tolist()
+
+    G.add_nodes_from(lnodes)
+    for n in dattr['node']:
+        G.nodes[n].update(dattr['node'][n])
+
+    if (prefix + 'outptr') in darr:
+        outptr = np.asarray(darr[prefix + 'outptr']).tolist()
+        outidx = np.asarray(darr[prefix + 'outidx']).tolist()
+        outprob = np.asarray(darr[prefix + 'outprob']).tolist()
+        for k in range(len(src)):
+            u0 = outptr[k]
+            u1 = outptr[k + 1]
+            output = {lnodes[i]: p for i, p in zip(outidx[u0:u1], outprob[u0:u1])}
+            G.add_edge(lnodes[src[k]], lnodes[dst[k]], output=output)
+    else:
+        G.add_edges_from([(lnodes[i], lnodes[j]) for i, j in zip(src, dst)])
+
+    for e in dattr['edge']:
+        G[e[0]][e[1]].update(dattr['edge'][e])
+
+    if dattr['pos']:
+        pos = np.asarray(darr[prefix + 'pos'])
+        upos = np.where(~np.isnan(pos[:, 0]))[0]
+        G.pos = {lnodes[k]: tuple(pos[k, :].tolist()) for k in upos}
+    return G
+
+
+def sparse2arr(M, prefix=''):
+    """ convert a scipy sparse matrix into CSR arrays
+    """
+    M = sparse.csr_matrix(M)
+    return {prefix + 'data': M.data,
+            prefix + 'indices': M.indices,
+            prefix + 'indptr': M.indptr,
+            prefix + 'shape': np.array(M.shape)}
+
+
+def arr2sparse(darr, prefix=''):
+    """ convert CSR arrays into a scipy CSR matrix
+    """
+    shape = tuple(np.asarray(darr[prefix + 'shape']).tolist())
+    return sparse.csr_matrix((darr[prefix + 'data'],
+                              darr[prefix + 'indices'],
+                              darr[prefix + 'indptr']), shape=shape)
+
+
+def write(path, darr, meta, dattr={}):
+    """ write a binary dump
+
+    Parameters
+    ----------
+
+    path : string
+        dump directory (replaced if it exists)
+    darr : dict
+        {name : np.array}
+    meta : dict
+        small picklable data
+    dattr : dict
+        {name : picklable} written in separated files (read on demand)
+
+    Notes
+    -----
+
+    The dump is written in a temporary directory which is then renamed,
+    a reader never sees a partial dump.
+
+    """
+    tmp = path + '.tmp'
+    if os.path.isdir(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(tmp)
+    for k in darr:
+        np.save(os.path.join(tmp, k + '.npy'), np.ascontiguousarray(darr[k]))
+    for k in dattr:
+        with open(os.path.join(tmp, k + '.pickle'), 'wb') as fd:
+            pickle.dump(dattr[k], fd, protocol=2)
+    meta = dict(meta)
+    meta['version'] = VERSION
+    meta['arrays'] = list(darr.keys())
+    with open(os.path.join(tmp, 'meta.pickle'), 'wb') as fd:
+        pickle.dump(meta, fd, protocol=2)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.rename(tmp, path)
+
+
+def read(path, mmap_mode='r'):
+    """ read a binary dump
+
+    Parameters
+    ----------
+
+    path : string
+        dump directory
+    mmap_mode : string
+        'r' (default) | None
+
+    Returns
+    -------
+
+    meta : dict | None
+        None if the dump does not exist or has not the current version
+    darr : dict
+        {name : np.memmap}
+
+    """
+    filemeta = os.path.join(path, 'meta.pickle')
+    if not os.path.isfile(filemeta):
+        return None, {}
+    with open(filemeta, 'rb') as fd:
+        meta = pickle.load(fd)
+    if meta.get('version') != VERSION:
+        logger.info('%s : binary dump version %s, expected %s',
+                    path, meta.get('version'), VERSION)
+        return None, {}
+    darr = {}
+    for k in meta['arrays']:
+        darr[k] = np.load(os.path.join(path, k + '.npy'), mmap_mode=mmap_mode)
+    return meta, darr
+
+
+def readattr(path, name):
+    """ read a pickled attribute of a binary dump
+    """
+    with open(os.path.join(path, name + '.pickle'), 'rb') as fd:
+        return pickle.load(fd)
+
+
+if __name__ == "__main__":
+    doctest.testmod()
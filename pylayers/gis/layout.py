@@ -35,6 +35,7 @@ import matplotlib.pyplot as plt
 import matplotlib.colors as clr
 import networkx as nx
 from itertools import combinations, product
+from collections import deque
 import ast
 from networkx.readwrite import write_gpickle, read_gpickle
 from mpl_toolkits.basemap import Basemap
@@ -46,8 +47,6 @@ from numpy import array
 import PIL.Image as Image
 import hashlib
 import pylayers.gis.kml as gkml
-from pathos.multiprocessing import ProcessingPool as Pool
-from pathos.multiprocessing import cpu_count
 from functools import partial
 
 if sys.version_info.major==2:
@@ -57,7 +56,7 @@ else:
     from  urllib.request import urlopen
     import configparser as ConfigParser
 # from cStringIO import StringIO
-# from multiprocessing import Pool
+import multiprocessing as mp
 
 def _pickle_method(method):
 	func_name = method.im_func.__name__
@@ -92,11 +91,14 @@ from pylayers.util import plotutil as plu
 from pylayers.util import pyutil as pyu
 from pylayers.util import graphutil as gru
 from pylayers.util import cone
+from pylayers.util.spatialindex import SegGrid
+from pylayers.antprop.sigcache import sigcache, layout_key
 
 # Handle furnitures
 
 import pylayers.gis.furniture as fur
 import pylayers.gis.osmparser as osm
+import pylayers.gis.laybin as laybin
 from pylayers.gis.selectl import SelectL
 import pylayers.util.graphutil as gph
 import pylayers.util.project as pro
@@ -369,11 +371,18 @@ class Layout(pro.PyLayers):
             self.zfloor = 0.
             self.zceil = self.maxheight
 
+        binloaded = False
         if not newfile:
             if loadlay:
                 filename = pyu.getlong(self._filename, pro.pstruc['DIRLAY'])
                 if os.path.exists(filename):  # which exists
-                    self.load()
+                    # the binary dump already contains the completed Gs,
+                    # the numpy arrays and the graphs (see loadbin).
+                    # It is only used if it matches the .lay file.
+                    if bgraphs and not bbuild:
+                        binloaded = self.loadbin()
+                    if not binloaded:
+                        self.load()
                 else:  # which do not exist
                     newfile = True
                     print("new file - creating a void Layout", self._filename)
@@ -422,6 +431,11 @@ class Layout(pro.PyLayers):
                     self.lbltg.append('s')
                     self.dumpw()
                 #
+                # graphs already loaded from the binary dump
+                #
+                elif binloaded:
+                    pass
+                #
                 # load graphs from file
                 #
                 elif bgraphs:
@@ -1041,6 +1055,7 @@ class Layout(pro.PyLayers):
         + self.lsss : list of iso segments
         + self.maxheight :
         + self.normal :
+        + self.segidx : uniform grid index of segments (SegGrid)
 
         assert self.pt[self.iupnt[-1]] == self.pt[:,self.iupnt[-1]]
 
@@ -1368,6 +1383,12 @@ class Layout(pro.PyLayers):
         # self.maxheight=3.
         # calculate extremum of segments
         self.extrseg()
+        # spatial index of segments
+        if self.Ns > 0:
+            self.segidx = SegGrid(self.pt[:,self.tahe[0,:]],
+                                  self.pt[:,self.tahe[1,:]])
+        elif hasattr(self,'segidx'):
+            del self.segidx
 
     def importshp(self, **kwargs):
         """ import layout from shape file
@@ -1563,6 +1584,11 @@ class Layout(pro.PyLayers):
             distance in meter from the geocoded address (def 200 m )
         cart : boolean
             conversion in cartesian coordinates
+        stream : boolean
+            use the streaming parser osm.osmstream (osm file only)
+        bbox : list
+            (lonmin,latmin,lonmax,latmax) ways outside bbox are ignored
+            (stream only)
 
         Notes
         -----
@@ -1586,7 +1612,9 @@ class Layout(pro.PyLayers):
                     'typ': 'indoor',
                     'latlon': '0',
                     'dist_m': 200,
-                    'cart': False
+                    'cart': False,
+                    'stream': False,
+                    'bbox': []
                     }
 
         for k in defaults:
@@ -1628,12 +1656,15 @@ class Layout(pro.PyLayers):
                     str(lon).replace('.', '_') + '.ini'
         else:  # by reading an osm file
             fileosm = pyu.getlong(kwargs['_fileosm'], os.path.join('struc', 'osm'))
+            self.coordinates = 'latlon'
+            self._filename = kwargs['_fileosm'].replace('osm', 'lay')
+            if kwargs['stream']:
+                self._importosmstream(fileosm, kwargs['bbox'], kwargs['cart'])
+                return
             #coords, nodes, ways, relations, m = osm.osmparse(fileosm, typ=self.typ)
             # typ outdoor parse ways.buildings
             # typ indoor parse ways.ways
             coords, nodes, ways, relations, m = osm.osmparse(fileosm)
-            self.coordinates = 'latlon'
-            self._filename = kwargs['_fileosm'].replace('osm', 'lay')
 
         # 2 valid typ : 'indoor' and 'building'
 
@@ -1776,6 +1807,12 @@ class Layout(pro.PyLayers):
              self.Gs.pos = {k: (x[i], y[i]) for i, k in enumerate(self.Gs.pos)}
              self.coordinates = 'cart'
 
+        self._importosmend()
+
+    def _importosmend(self):
+        """ slabs, numpy arrays and boundary of an imported osm layout
+        """
+
         # del coords
         # del nodes
         # del ways
@@ -1815,7 +1852,99 @@ class Layout(pro.PyLayers):
         # save ini file
         self.save()
 
-        #
+    def _importosmstream(self, fileosm, bbox=[], cart=False):
+        """ import an osm file with the streaming parser
+
+        Parameters
+        ----------
+
+        fileosm : string
+            osm file (full path)
+        bbox : list
+            (lonmin,latmin,lonmax,latmax)
+        cart : boolean
+            conversion in cartesian coordinates
+
+        Notes
+        -----
+
+        Nodes and segments come as arrays from osm.osmstream. Nodes with
+        the same coordinates are merged with np.unique, points are
+        numbered -1..-Np and the segments are added in one call to
+        add_segments. The segment tags are handled as in importosm
+        ('name', 'z', 'offset').
+
+        See Also
+        --------
+
+        pylayers.gis.osmparser.osmstream
+
+        """
+        dosm = osm.osmstream(fileosm, typ=self.typ, bbox=bbox)
+
+        # merge duplicated nodes
+        lonlat, inv = np.unique(dosm['lonlat'], axis=0, return_inverse=True)
+        inv = np.ravel(inv)
+        tahe = inv[dosm['tahe']]
+        u = np.where(tahe[0, :] != tahe[1, :])[0]
+        tahe = tahe[:, u]
+        iway = dosm['iway'][u]
+
+        self.Np = lonlat.shape[0]
+
+        coords = osm.Coords()
+        coords.clean()
+        if self.Np > 0:
+            coords.boundary = np.hstack((np.min(lonlat, axis=0),
+                                         np.max(lonlat, axis=0)))
+        else:
+            coords.boundary = np.array(bbox)
+        self.m = coords.cartesian(cart=False)
+        self.extent = (self.m.lonmin, self.m.lonmax, self.m.latmin, self.m.latmax)
+        self.pll = self.m(self.extent[0], self.extent[2])
+        self.pur = self.m(self.extent[1], self.extent[3])
+        self.extent_c = (self.pll[0], self.pur[0], self.pll[1], self.pur[1])
+
+        if cart:
+            x, y = self.m(lonlat[:, 0], lonlat[:, 1])
+            lonlat = np.vstack((x, y)).T
+            self.coordinates = 'cart'
+
+        lpt = (-(np.arange(self.Np) + 1)).tolist()
+        self.Gs.add_nodes_from(lpt)
+        self.Gs.pos.update({lpt[k]: (lonlat[k, 0], lonlat[k, 1])
+                            for k in range(self.Np)})
+        lpt = np.array(lpt, dtype=int)
+
+        # segment attributes from way tags
+        if self.typ == 'indoor':
+            zdef = (0, 3)
+        else:
+            zdef = (0, 3000)
+        lname = []
+        lz = []
+        loffset = []
+        for d in dosm['tags']:
+            for key in d:
+                try:
+                    d[key] = ast.literal_eval(d[key])
+                except:
+                    pass
+            lname.append(d.get('name', 'WALL'))
+            lz.append(d.get('z', zdef))
+            loffset.append(d.get('offset', 0))
+
+        for iw in np.unique(iway):
+            self.zfloor = min(self.zfloor, lz[iw][0])
+            self.zceil = max(self.zceil, lz[iw][1])
+
+        self.add_segments(lpt[tahe[0, :]], lpt[tahe[1, :]],
+                          name=[lname[k] for k in iway],
+                          z=[lz[k] for k in iway],
+                          offset=[loffset[k] for k in iway])
+        self.Nss = 0
+
+        self._importosmend()
 
     def exportosm(self):
         """  export layout in osm file format
@@ -2723,6 +2852,9 @@ class Layout(pro.PyLayers):
 
         """
 
+        # save the built graphs before modification (see rebuild)
+        self._snapshot()
+
         # if 2 points are selected
 
         if ((n1 < 0) & (n2 < 0) & (n1 != n2)):
@@ -2836,6 +2968,122 @@ class Layout(pro.PyLayers):
 
         return(num)
 
+    def add_segments(self, n1, n2, name=[], z=[], offset=[]):
+        """ add a set of segments
+
+        Parameters
+        ----------
+
+        n1 : np.array of int < 0
+        n2 : np.array of int < 0
+        name : list of string
+            default 'PARTITION'
+        z : list of tuple
+            default (0,40000000)
+        offset : list of float
+            default 0
+
+        Returns
+        -------
+
+        lnum : np.array
+            segment numbers (>0), 0 for a dropped _AIR segment
+
+        Notes
+        -----
+
+        Bulk version of add_segment : the segments have the same attributes,
+        the new numbers follow the greatest existing segment number and iso
+        segments are found once for all from the end points pairs, instead
+        of scanning Gs for each segment. As in add_segment, an _AIR segment
+        is not added if a segment with the same end points exists.
+        Degenerated segments (n1==n2) must be removed by the caller.
+
+        See Also
+        --------
+
+        add_segment
+
+        """
+        self._snapshot()
+
+        n1 = np.asarray(n1, dtype=int).tolist()
+        n2 = np.asarray(n2, dtype=int).tolist()
+        N = len(n1)
+        if name == []:
+            name = ['PARTITION'] * N
+        if z == []:
+            z = [(0.0, 40000000)] * N
+        if offset == []:
+            offset = [0] * N
+
+        nseg = [s for s in self.Gs.node if s > 0]
+        if len(nseg) > 0:
+            num0 = max(nseg) + 1
+        else:
+            num0 = 1
+
+        p1 = np.array([self.Gs.pos[n] for n in n1]).reshape(N, 2)
+        p2 = np.array([self.Gs.pos[n] for n in n2]).reshape(N, 2)
+        p2mp1 = p2 - p1
+        t = p2mp1 / np.sqrt(np.sum(p2mp1 * p2mp1, axis=1))[:, None]
+        norm = np.vstack((t[:, 1], -t[:, 0], np.zeros(N))).T
+        pm = (p1 + p2) / 2.
+
+        # segments sharing the same end points (existing and new ones)
+        dpair = {}
+        for k in nseg:
+            c = self.Gs.node[k]['connect']
+            dpair.setdefault((min(c), max(c)), []).append(k)
+        #
+        # Impossible to have duplicated _AIR (see add_segment)
+        #
+        lnum = []
+        num = num0
+        for k in range(N):
+            pair = (min(n1[k], n2[k]), max(n1[k], n2[k]))
+            if (name[k] == '_AIR') and (pair in dpair):
+                lnum.append(0)
+            else:
+                dpair.setdefault(pair, []).append(num)
+                lnum.append(num)
+                num = num + 1
+
+        lnodes = []
+        ledges = []
+        for k in range(N):
+            num = lnum[k]
+            if num == 0:
+                continue
+            iso = [x for x in dpair[(min(n1[k], n2[k]), max(n1[k], n2[k]))] if x != num]
+            lnodes.append((num, {'name': name[k],
+                                 'z': z[k],
+                                 'norm': norm[k],
+                                 'transition': name[k] == '_AIR',
+                                 'offset': offset[k],
+                                 'connect': [n1[k], n2[k]],
+                                 'iso': iso,
+                                 'ncycles': []}))
+            ledges.append((n1[k], num))
+            ledges.append((n2[k], num))
+            # iso of the existing segments
+            for x in iso:
+                if (x < num0) and (num not in self.Gs.node[x]['iso']):
+                    self.Gs.node[x]['iso'].append(num)
+            self.Gs.pos[num] = tuple(pm[k])
+            self.name.setdefault(name[k], []).append(num)
+            self.labels[num] = str(num)
+            self._shseg[num] = sh.LineString((tuple(p1[k]), tuple(p2[k])))
+
+        self.Gs.add_nodes_from(lnodes)
+        self.Gs.add_edges_from(ledges)
+        self.Ns = self.Ns + len(lnodes)
+        for nm in set(name):
+            if nm not in self.display['layers']:
+                self.display['layers'].append(nm)
+
+        return(np.array(lnum))
+
     def merge_segment(self,n1,n2):
         """ merge segment n2 included in n1
 
@@ -3090,6 +3338,9 @@ class Layout(pro.PyLayers):
 
         """
 
+        # save the built graphs before modification (see rebuild)
+        self._snapshot()
+
         # compute the four points
         p0 = origin
         u = np.array([np.cos(angle * np.pi / 180),
@@ -3210,6 +3461,9 @@ class Layout(pro.PyLayers):
         100% of time is in g2npy
 
         """
+        # save the built graphs before modification (see rebuild)
+        self._snapshot()
+
         if (type(le) == np.ndarray):
             le = list(le)
 
@@ -3516,6 +3770,9 @@ class Layout(pro.PyLayers):
             + ss_offset : list of offset in [0,1]
         """
 
+        # save the built graphs before modification (see rebuild)
+        self._snapshot()
+
         if data == {}:
             pass
         else:
@@ -3908,10 +4165,19 @@ class Layout(pro.PyLayers):
                (0, 65, 0.29145678877830505)],
               dtype=[('i', '<i8'), ('s', '<i8'), ('a', '<f4')])
 
+        Notes
+        -----
+
+        If the segment grid index self.segidx is available (built in g2npy),
+        each link is only tested against the segments of the grid cells it
+        crosses, otherwise all the segments in the bounding box of the links
+        are tested against all the links.
+
         See Also
         --------
 
         antprop.loss.Losst
+        pylayers.util.spatialindex.SegGrid
 
         """
 
@@ -3938,6 +4204,72 @@ class Layout(pro.PyLayers):
         # 3 x N
         un = u / nu[np.newaxis, :]
 
+        if hasattr(self, 'segidx'):
+            #
+            # only the (link,segment) pairs sharing a cell of the
+            # segment grid index are tested
+            #
+            ilink, seglist = self.segidx.pairs(p1[0:2], p2[0:2])
+
+            # get segment height bounds
+            useg, iuseg = np.unique(seglist, return_inverse=True)
+            z = np.array([self.Gs.node[x]['z'] for x in self.tsg[useg]]).reshape(-1, 2)
+            zmin = z[iuseg, 0]
+            zmax = z[iuseg, 1]
+
+            Pta = self.pt[:, self.tahe[0, seglist]]
+            Phe = self.pt[:, self.tahe[1, seglist]]
+            Nscreen = len(seglist)
+            # centroid of the screen
+            Pg = np.vstack(((Phe + Pta) / 2., (zmax + zmin) / 2.))
+            Ptahe = Phe - Pta
+            L1 = np.sqrt(np.sum(Ptahe * Ptahe, axis=0))
+            # 3 x Nscreen U1 is in plane xy
+            U1 = np.vstack((Ptahe / L1, np.zeros(Nscreen)))
+            L2 = zmax - zmin
+            U2 = np.array([0, 0, 1])[:, None]  # 3 x 1  U2 is along z
+
+            bo = geu.intersect3p(p1[:, ilink], p2[:, ilink], Pg, U1, U2, L1, L2)
+            ubo = (ilink[bo], seglist[bo])
+        else:
+            ubo, seglist = self._angleonlink3_dense(p1, p2)
+
+        Nseg = len(ubo[0])
+        data = np.zeros(Nseg, dtype=[('i', 'i8'), ('s', 'i8'), ('a', np.float32)])
+
+        data['i'] = ubo[0]
+        data['s'] = self.tsg[ubo[1]]
+
+        #
+        # Calculate angle of incidence refered from segment normal
+        #
+
+        norm = self.normal[:, ubo[1]]
+        # vector along the link
+        uu = un[:, ubo[0]]
+        unn = abs(np.sum(uu * norm, axis=0))
+        angle = np.arccos(unn)
+
+        data['a'] = angle
+
+        return(data)
+
+    def _angleonlink3_dense(self, p1, p2):
+        """ (link,segment) intersections without spatial index
+
+        Parameters
+        ----------
+
+        p1 : np.array (3 x N)
+        p2 : np.array (3 x N)
+
+        Returns
+        -------
+
+        ubo : tuple
+            (link index, segment index in tahe) of intersected segments
+
+        """
         #
         # warning : seglist contains the segment number in tahe not in Gs
         #
@@ -3946,18 +4278,6 @@ class Layout(pro.PyLayers):
         #seglist  = np.unique(self.seginframe(p1[0:2], p2[0:2]))
 
         upos = np.nonzero(seglist >= 0)[0]
-        uneg = np.nonzero(seglist < 0)[0]
-
-
-        # nNLOS = len(uneg) + 1
-        # # retrieve the number of segments per link
-        # if nNLOS > 1:
-        #     llink = np.hstack(
-        #         (uneg[0], np.hstack((uneg[1:], array([len(seglist)]))) - uneg - 1))
-        # else:
-        #     llink = np.array([len(seglist)])
-        # [(link id,number of seg),...]
-        # nl = zip(np.arange(nlink),llink)n
 
         seglist = seglist[upos]
 
@@ -3993,25 +4313,7 @@ class Layout(pro.PyLayers):
         bo, pt = geu.intersect3(p1, p2, Pg, U1, U2, L1, L2)
         ubo = np.where(bo)
 
-        Nseg = len(ubo[0])
-        data = np.zeros(Nseg, dtype=[('i', 'i8'), ('s', 'i8'), ('a', np.float32)])
-
-        data['i'] = ubo[0]
-        data['s'] = self.tsg[seglist[ubo[1]]]
-
-        #
-        # Calculate angle of incidence refered from segment normal
-        #
-
-        norm = self.normal[:, seglist[ubo[1]]]
-        # vector along the link
-        uu = un[:, ubo[0]]
-        unn = abs(np.sum(uu * norm, axis=0))
-        angle = np.arccos(unn)
-
-        data['a'] = angle
-
-        return(data)
+        return (ubo[0], seglist[ubo[1]]), seglist
 
     def angleonlink(self, p1=np.array([0, 0]), p2=np.array([10, 3])):
         """ angleonlink(self,p1,p2) return (seglist,angle) between p1 and p2
@@ -5457,7 +5759,7 @@ class Layout(pro.PyLayers):
 
         return fig, ax
 
-    def build(self, graph='tvirw',verbose=False,difftol=0.15,multi=False):
+    def build(self, graph='tvirw',verbose=False,difftol=0.15,multi=False,nproc=1):
         """ build graphs
 
         Parameters
@@ -5472,7 +5774,9 @@ class Layout(pro.PyLayers):
         verbose : boolean
         difftol : diffraction tolerance
         multi : boolean
-            enable multi processing
+            enable multi processing (equivalent to nproc=0)
+        nproc : int
+            number of worker processes (1 : sequential, 0 : cpu_count())
 
         Notes
         -----
@@ -5481,7 +5785,19 @@ class Layout(pro.PyLayers):
 
         Warning : by default the layout is saved (dumpw) after each build
 
+        With nproc > 1 the work of each stage is split over cycles (Gt
+        polygons, diffraction points, Gv, Gi) or over Gi edges (outputGi).
+        Workers are forked and share the Layout read-only, results are
+        merged in the same order as in the sequential build, hence the
+        graphs are identical.
+
+        The duration of each stage (in seconds) is stored in self.tbuild.
+
         """
+        if multi:
+            nproc = 0
+        self.tbuild = {}
+        self.isbuilt = False
         # list of built graphs
         if not self.hasboundary:
             self.boundary()
@@ -5494,21 +5810,26 @@ class Layout(pro.PyLayers):
         if verbose:
             Buildpbar.update(1)
         if 't' in graph:
-            self.buildGt(difftol=difftol, verbose=verbose, tqdmpos=1)
+            tic = time.time()
+            self.buildGt(difftol=difftol, verbose=verbose, tqdmpos=1, nproc=nproc)
+            self.tbuild['Gt'] = time.time() - tic
             self.lbltg.extend('t')
         if verbose:
             Buildpbar.update(1)
         if 'v' in graph:
-            self.buildGv(verbose=verbose, tqdmpos=1)
+            tic = time.time()
+            self.buildGv(verbose=verbose, tqdmpos=1, nproc=nproc)
+            self.tbuild['Gv'] = time.time() - tic
             self.lbltg.extend('v')
         if verbose:
             Buildpbar.update(1)
         if 'i' in graph:
-            self.buildGi(verbose=verbose, tqdmpos=1)
-            if not multi:
-                self.outputGi(verbose=verbose,tqdmpos=1)
-            else:
-                self.outputGi_mp()
+            tic = time.time()
+            self.buildGi(verbose=verbose, tqdmpos=1, nproc=nproc)
+            self.tbuild['Gi'] = time.time() - tic
+            tic = time.time()
+            self.outputGi(verbose=verbose, tqdmpos=1, nproc=nproc)
+            self.tbuild['outputGi'] = time.time() - tic
             self.lbltg.extend('i')
         if verbose:
             Buildpbar.update(1)
@@ -5531,10 +5852,275 @@ class Layout(pro.PyLayers):
         self.Gt.add_node(0, hash=_hash)
 
         # There is a dumpw after each build
+        tic = time.time()
         self.dumpw()
+        self.tbuild['dumpw'] = time.time() - tic
         self.isbuilt = True
+        self._snap = None
         if verbose:
             Buildpbar.update(1)
+            for k in self.tbuild:
+                print('%10s : %.2f s' % (k, self.tbuild[k]))
+
+    def _snapshot(self):
+        """ save the built graphs before a local modification
+
+        Notes
+        -----
+
+        Called by the editing methods (add_segment, del_segment, edit_seg,
+        add_furniture). Only the first call after a build is effective. The
+        graphs are not copied (they are replaced by the next build), the
+        context of each cycle is evaluated from Gs which is modified in
+        place.
+
+        See Also
+        --------
+
+        rebuild
+
+        """
+        if (not self.isbuilt) or (getattr(self, '_snap', None) is not None):
+            return
+        if not (hasattr(self, 'Gt') and hasattr(self, 'Gi')):
+            return
+        lcy = [cy for cy in self.Gt.node if cy != 0]
+        f = lambda c: c
+        self._snap = {'Gt': self.Gt,
+                      'Gi': self.Gi,
+                      'dGv': getattr(self, 'dGv', {}),
+                      'ddiff': dict(self.ddiff),
+                      'air': set(self.name['AIR'] + self.name['_AIR']),
+                      'key': layout_key(self),
+                      'ctx': {cy: self._cyclectx(cy, f) for cy in lcy},
+                      'vn': {frozenset(self.Gt.node[cy]['polyg'].vnodes): cy
+                             for cy in lcy}}
+
+    def _cyclectx(self, cy, f):
+        """ context of a cycle
+
+        Parameters
+        ----------
+
+        cy : int
+            cycle number
+        f : function
+            cycle renumbering
+
+        Returns
+        -------
+
+        ctx : tuple
+            all the data of Gs, Gt and ddiff on which Gv, Gi and outputGi
+            of cycle cy depend
+
+        """
+        vnodes = self.Gt.node[cy]['polyg'].vnodes
+        lctx = [f(cy), self.Gt.node[cy].get('indoor')]
+        for n in sorted(set(vnodes)):
+            if n > 0:
+                d = self.Gs.node[n]
+                ncy = frozenset((f(c), self.Gt.node[c].get('indoor'))
+                                for c in d['ncycles'])
+                pos = tuple(tuple(self.Gs.pos[p]) for p in self.Gs[n])
+                lctx.append((n, d['name'], tuple(d['iso']), ncy, pos))
+            else:
+                diff = self.ddiff.get(n)
+                if diff is not None:
+                    diff = (frozenset(f(c) for c in diff[0]), diff[1])
+                lctx.append((n, tuple(self.Gs.pos[n]), frozenset(self.Gs[n]), diff))
+        return tuple(lctx)
+
+    def rebuild(self, difftol=0.15, verbose=False, nproc=1):
+        """ incremental build after local modifications
+
+        Parameters
+        ----------
+
+        difftol : diffraction tolerance
+        verbose : boolean
+        nproc : int
+            number of worker processes
+
+        Notes
+        -----
+
+        Gt is rebuilt entirely (the triangulation keeps the existing air
+        walls, hence cycles which are not affected by the modifications are
+        rebuilt identically but with a different number). Cycles are matched
+        with the cycles of the previous build by their vnodes and a cycle is
+        unchanged if its context (segments, points, diffraction, adjacent
+        cycles) is unchanged (see _cyclectx).
+
+        For unchanged cycles the visibility graph, the Gi edges and the
+        output of Gi edges are taken from the previous build, they are only
+        evaluated for the cycles in the neighborhood of the modifications
+        (self.cydirty).
+
+        Cached signatures (pylayers.antprop.sigcache) which cannot reach the
+        modified cycles with less than cutoff interactions are transferred
+        to the new Layout, the others are invalidated.
+
+        If the Layout has not been modified since the last build, a full
+        build is done.
+
+        Examples
+        --------
+
+        >>> from pylayers.gis.layout import *
+        >>> L = Layout('defstr.lay')
+        >>> L.build()
+        >>> L.edit_seg(1,data={'name':'METAL'})
+        >>> L.rebuild()
+
+        See Also
+        --------
+
+        build
+        pylayers.antprop.sigcache.SigCache.relabel
+
+        """
+        snap = getattr(self, '_snap', None)
+        if (snap is None) or (not self.isbuilt):
+            self.build(difftol=difftol, verbose=verbose, nproc=nproc)
+            return
+
+        self.tbuild = {}
+        self.isbuilt = False
+        tic = time.time()
+        self.buildGt(difftol=difftol, verbose=verbose, nproc=nproc)
+        self.tbuild['Gt'] = time.time() - tic
+
+        #
+        # match new cycles with unchanged cycles of the previous build
+        #
+        tic = time.time()
+        cymap = {0: 0}
+        for cy in self.Gt.node:
+            if cy != 0:
+                k = frozenset(self.Gt.node[cy]['polyg'].vnodes)
+                if k in snap['vn']:
+                    cymap[cy] = snap['vn'][k]
+        f = lambda c: cymap.get(c, ('new', c))
+        clean = set([cy for cy in cymap if cy != 0 and
+                     self._cyclectx(cy, f) == snap['ctx'][cymap[cy]]])
+        # old cycle -> new cycle
+        g = {cymap[cy]: cy for cy in cymap}
+        self.cydirty = [cy for cy in self.Gt.node if cy != 0 and cy not in clean]
+        self.tbuild['match'] = time.time() - tic
+
+        #
+        # Gv
+        #
+        tic = time.time()
+        dGv = {cy: snap['dGv'][cymap[cy]] for cy in clean
+               if cymap[cy] in snap['dGv']}
+        self.buildGv(verbose=verbose, nproc=nproc, dGv=dGv)
+        self.tbuild['Gv'] = time.time() - tic
+
+        #
+        # Gi
+        #
+        # edges of the previous Gi are assigned to the cycle in which they
+        # have been created (output cycle of the first interaction).
+        # DD edges are directly evaluated from Gv.
+        #
+        tic = time.time()
+        doldedges = {}
+        for e in snap['Gi'].edges():
+            if len(e[0]) > 1:
+                cy = e[0][-1]
+            elif len(e[1]) > 1:
+                cy = e[1][1]
+            else:
+                continue
+            if cy in g and g[cy] in clean:
+                doldedges.setdefault(g[cy], []).append(e)
+        dGi = {}
+        for cy in clean:
+            vnodes = self.Gt.node[cy]['polyg'].vnodes
+            npt = [x for x in vnodes if x < 0 and x in self.ddiff
+                   and cy in self.ddiff[x][0]]
+            ledges = [(_relabel(e[0], g), _relabel(e[1], g))
+                      for e in doldedges.get(cy, [])]
+            for p in npt:
+                if p in self.Gv.node:
+                    ledges.extend([((p,), (q,)) for q in self.Gv[p]
+                                   if q in npt and q != p])
+            dGi[cy] = (ledges, npt)
+        self.buildGi(verbose=verbose, nproc=nproc, dGi=dGi)
+        self.tbuild['Gi'] = time.time() - tic
+
+        #
+        # output of Gi edges
+        #
+        # the output of an interaction (R or T) is unchanged if both its
+        # cycles are unchanged
+        #
+        tic = time.time()
+        doutput = {}
+        Giold = snap['Gi']
+        for e in self.Gi.edges():
+            i0, i1 = e
+            if len(i1) > 1 and all([c in clean for c in i1[1:]]):
+                try:
+                    o0 = _relabel(i0, cymap)
+                    o1 = _relabel(i1, cymap)
+                except KeyError:
+                    continue
+                if Giold.has_edge(o0, o1) and ('output' in Giold[o0][o1]):
+                    succ = set([_relabel(x, cymap) for x in self.Gi[i1]])
+                    if succ == set(Giold[o1]):
+                        doutput[e] = {_relabel(k, g): v for k, v in
+                                      Giold[o0][o1]['output'].items()}
+        self.outputGi(verbose=verbose, nproc=nproc, doutput=doutput)
+        self.tbuild['outputGi'] = time.time() - tic
+
+        #
+        # cached signatures
+        #
+        tic = time.time()
+        air = set(self.name['AIR'] + self.name['_AIR'])
+        dnew = _cydist(self.Gt, self.cydirty, air, self.ddiff)
+        oldclean = set([cymap[cy] for cy in clean])
+        lolddirty = [cy for cy in snap['Gt'].node if cy != 0 and cy not in oldclean]
+        dold = _cydist(snap['Gt'], lolddirty, snap['air'], snap['ddiff'])
+
+        def fmap(source, target, cutoff):
+            if (source not in oldclean) or (target not in oldclean):
+                return None
+            ns = g[source]
+            nt = g[target]
+            if min(dnew.get(ns, np.inf), dold.get(source, np.inf)) <= cutoff:
+                return None
+            for c, nc in ((source, ns), (target, nt)):
+                try:
+                    inter = [_relabel(x, g) for x in snap['Gt'].node[c].get('inter', [])]
+                except KeyError:
+                    return None
+                if inter != self.Gt.node[nc].get('inter', []):
+                    return None
+            return (ns, nt)
+
+        sigcache.relabel(snap['key'], layout_key(self), fmap)
+        self.tbuild['sigcache'] = time.time() - tic
+
+        self.lbltg.extend('tvi')
+        filelay = pyu.getlong(self._filename, pro.pstruc['DIRLAY'])
+        fd = open(filelay,'rb')
+        _hash = hashlib.md5(fd.read()).hexdigest()
+        fd.close()
+        self.Gt.add_node(0, hash=_hash)
+
+        tic = time.time()
+        self.dumpw()
+        self.tbuild['dumpw'] = time.time() - tic
+        self.isbuilt = True
+        self._snap = None
+        if verbose:
+            print('%d / %d cycles updated' % (len(self.cydirty), len(self.Gt.node) - 1))
+            for k in self.tbuild:
+                print('%10s : %.2f s' % (k, self.tbuild[k]))
 
     def dumpw(self):
         """ write a dump of given Graph
@@ -5584,6 +6170,7 @@ class Layout(pro.PyLayers):
         # write_gpickle(getattr(self,'sla'),os.path.join(path,'sla.gpickle'))
         if hasattr(self, 'm'):
             write_gpickle(getattr(self, 'm'), os.path.join(path, 'm.gpickle'))
+        self.dumpbin()
 
     def dumpr(self, graphs='stvirw'):
         """ read of given graphs
@@ -5660,52 +6247,216 @@ class Layout(pro.PyLayers):
         if os.path.isfile(filem):
             setattr(self, 'm', read_gpickle(filem))
 
-    def polysh2geu(self, poly):
-        """ transform sh.Polygon into geu.Polygon
-        """
-        try:
+    def dumpbin(self):
+        """ write the binary dump of the Layout
 
-            Gsnodes = np.array(self.Gs.nodes())
-            # get node coordinates
-            nodept = [self.Gs.pos[i] for i in Gsnodes]
-            # transform into shapely points
-            shpt = [sh.Point(pt) for pt in nodept]
-            # IV 1 get nodes and vnodes
-            # Create a ring to avoid taking points inside the polygon.
-            # This helps to avoid polygon inside polygons
-            # take exterior of polygon. embose it with buffer and find difference with original polygon*.
-            # polye = poly.intersection((poly.exterior).buffer(1e-3))
+        Notes
+        -----
 
-            uvn = np.where([poly.exterior.buffer(1e-3).contains(p)
-                            for p in shpt])[0]
-            vnodes = Gsnodes[uvn]
-            # IV 1.b transform vnodes to an ordered cycle with Cycle class
-            # NOTE ! Using class cycle is MANDATORY
-            # because, some extra vnodes can be pickup during the contain
-            # process before
-            S = nx.subgraph(self.Gs, vnodes)
-            cycle = nx.cycle_basis(S)
+        The dump is stored in the bin directory next to the .gpickle files.
+        It contains the numpy arrays of the Layout (pt, tahe, normal, tsg,
+        ...), the graphs Gs and self.lbltg as CSR arrays, the packed outputs
+        of Gi and the other attributes (see pylayers.gis.laybin).
 
-            if len(cycle) > 1:
-                lc = np.array([len(c) for c in cycle])
-                dif = abs(lc - len(vnodes))
-                ud = np.where(dif == min(dif))[0]
-                cycle = cycle[ud]
-            else:
-                cycle = cycle[0]
-            if cycle[0] > 0:
-                cycle = np.roll(cycle, -1)
-            pos = [self.Gs.pos[c] for c in cycle if c < 0]
-            # IV 1.c create a new polygon with correct vnodes and correct
-            # points
-            P = geu.Polygon(p=pos, vnodes=cycle)
+        See Also
+        --------
 
-        except:
-            import ipdb
-            ipdb.set_trace()
-        return P
+        loadbin
+        pylayers.gis.laybin
 
-    def getangles(self, poly, unit='rad', inside=True):
+        """
+        if os.path.splitext(self._filename)[1]=='.ini':
+            dirname = self._filename.replace('.ini','')
+        if os.path.splitext(self._filename)[1]=='.lay':
+            dirname = self._filename.replace('.lay','')
+        path = os.path.join(pro.basename, 'struc', 'gpickle', dirname, 'bin')
+
+        # attributes which are rebuilt at load
+        lskip = ['segidx', '_shseg', 'm', '_snap',
+                 '_lazy', '_lzbuild', '_bin', '_binpath', '_binsparse']
+        for k in list(self.__dict__.get('_lazy', [])):
+            getattr(self, k)
+        lgraph = []
+        for g in ['s'] + self.lbltg:
+            if ('G' + g not in lgraph) and hasattr(self, 'G' + g):
+                lgraph.append('G' + g)
+        for g in lgraph:
+            getattr(self, g)
+
+        darr = {}
+        dattr = {}
+        dsparse = {}
+        lattr = []
+        dmeta = {}
+        for g in lgraph:
+            darrg, dattr[g + '_attr'] = laybin.graph2arr(getattr(self, g),
+                                                         prefix=g + '_')
+            darr.update(darrg)
+        for k in list(self.__dict__.keys()):
+            v = self.__dict__[k]
+            if (k in lskip) or (k in lgraph) or isinstance(v, nx.Graph):
+                continue
+            if isinstance(v, np.ndarray) and (v.dtype != object):
+                darr['a_' + k] = v
+                lattr.append(k)
+            elif sparse.issparse(v):
+                darr.update(laybin.sparse2arr(v, prefix='sp_' + k + '_'))
+                dsparse[k] = v.format
+            else:
+                dmeta[k] = v
+
+        if self.isbuilt:
+            _hash = self.Gt.node[0]['hash']
+        else:
+            _hash = self._hash
+        meta = {'hash': _hash,
+                'attr': dmeta,
+                'lattr': lattr,
+                'lgraph': lgraph,
+                'sparse': dsparse}
+        laybin.write(path, darr, meta, dattr)
+
+    def loadbin(self):
+        """ load the Layout from its binary dump
+
+        Returns
+        -------
+
+        boolean
+            False if there is no dump of the current version or if the .lay
+            file has been modified since the dump
+
+        Notes
+        -----
+
+        The numpy arrays are memory mapped (read only). The graphs, the
+        sparse matrices, the segment index and the shapely segments are
+        built at their first access.
+
+        Examples
+        --------
+
+        >>> from pylayers.gis.layout import *
+        >>> L = Layout('defstr.lay',bbuild=True)
+        >>> L2 = Layout('defstr.lay',bgraphs=True)
+
+        See Also
+        --------
+
+        dumpbin
+        pylayers.gis.laybin
+
+        """
+        if os.path.splitext(self._filename)[1]=='.ini':
+            dirname = self._filename.replace('.ini','')
+        if os.path.splitext(self._filename)[1]=='.lay':
+            dirname = self._filename.replace('.lay','')
+        path = os.path.join(pro.basename, 'struc', 'gpickle', dirname, 'bin')
+        meta, darr = laybin.read(path)
+        if meta is None:
+            return False
+        filelay = pyu.getlong(self._filename, pro.pstruc['DIRLAY'])
+        fd = open(filelay,'rb')
+        _hash = hashlib.md5(fd.read()).hexdigest()
+        fd.close()
+        if meta['hash'] != _hash:
+            logging.info('%s has changed since its binary dump', self._filename)
+            return False
+
+        for k in meta['attr']:
+            setattr(self, k, meta['attr'][k])
+        for k in meta['lattr']:
+            setattr(self, k, darr['a_' + k])
+        self._hash = _hash
+        self._bin = darr
+        self._binpath = path
+        self._binsparse = meta['sparse']
+        self._lazy = set(meta['lgraph']) | set(meta['sparse']) | set(['_shseg'])
+        if self.Ns > 0:
+            self._lazy.add('segidx')
+        for k in self._lazy:
+            self.__dict__.pop(k, None)
+
+        filem = os.path.join(os.path.dirname(path), 'm.gpickle')
+        if os.path.isfile(filem):
+            setattr(self, 'm', read_gpickle(filem))
+        return True
+
+    def __getattr__(self, name):
+        """ build a lazy attribute of a Layout loaded by loadbin
+        """
+        lazy = self.__dict__.get('_lazy', set())
+        if name not in lazy:
+            raise AttributeError(name)
+        building = self.__dict__.setdefault('_lzbuild', set())
+        if name in building:
+            raise AttributeError(name)
+        # name stays lazy until it is built (a failed build can be retried)
+        building.add(name)
+        try:
+            if name[0] == 'G':
+                dattr = laybin.readattr(self._binpath, name + '_attr')
+                value = laybin.arr2graph(self._bin, dattr, prefix=name + '_')
+            elif name in self._binsparse:
+                value = laybin.arr2sparse(self._bin, prefix='sp_' + name + '_')
+                value = value.asformat(self._binsparse[name])
+            elif name == 'segidx':
+                value = SegGrid(self.pt[:,self.tahe[0,:]], self.pt[:,self.tahe[1,:]])
+            else:
+                self.updateshseg()
+                value = self._shseg
+        finally:
+            building.discard(name)
+        setattr(self, name, value)
+        lazy.discard(name)
+        return value
+
+    def polysh2geu(self, poly):
+        """ transform sh.Polygon into geu.Polygon
+        """
+        try:
+
+            Gsnodes = np.array(self.Gs.nodes())
+            # get node coordinates
+            nodept = [self.Gs.pos[i] for i in Gsnodes]
+            # transform into shapely points
+            shpt = [sh.Point(pt) for pt in nodept]
+            # IV 1 get nodes and vnodes
+            # Create a ring to avoid taking points inside the polygon.
+            # This helps to avoid polygon inside polygons
+            # take exterior of polygon. embose it with buffer and find difference with original polygon*.
+            # polye = poly.intersection((poly.exterior).buffer(1e-3))
+
+            uvn = np.where([poly.exterior.buffer(1e-3).contains(p)
+                            for p in shpt])[0]
+            vnodes = Gsnodes[uvn]
+            # IV 1.b transform vnodes to an ordered cycle with Cycle class
+            # NOTE ! Using class cycle is MANDATORY
+            # because, some extra vnodes can be pickup during the contain
+            # process before
+            S = nx.subgraph(self.Gs, vnodes)
+            cycle = nx.cycle_basis(S)
+
+            if len(cycle) > 1:
+                lc = np.array([len(c) for c in cycle])
+                dif = abs(lc - len(vnodes))
+                ud = np.where(dif == min(dif))[0]
+                cycle = cycle[ud]
+            else:
+                cycle = cycle[0]
+            if cycle[0] > 0:
+                cycle = np.roll(cycle, -1)
+            pos = [self.Gs.pos[c] for c in cycle if c < 0]
+            # IV 1.c create a new polygon with correct vnodes and correct
+            # points
+            P = geu.Polygon(p=pos, vnodes=cycle)
+
+        except:
+            import ipdb
+            ipdb.set_trace()
+        return P
+
+    def getangles(self, poly, unit='rad', inside=True):
         """ find angles of a polygon
 
         Parameters
@@ -6080,7 +6831,7 @@ class Layout(pro.PyLayers):
 
         return T, map_vertices
 
-    def buildGt(self, check=True,difftol=0.01,verbose=False,tqdmpos=0):
+    def buildGt(self, check=True,difftol=0.01,verbose=False,tqdmpos=0,nproc=1):
         """ build graph of convex cycles
 
         Parameters
@@ -6090,6 +6841,9 @@ class Layout(pro.PyLayers):
         difftol : float
         verbose : boolean
         tqdmpos : progressbar
+        nproc : int
+            number of worker processes for polygons vnodes and
+            diffraction points
 
         todo :
         - add an option to only take outside polygon
@@ -6141,7 +6895,12 @@ class Layout(pro.PyLayers):
         # get_points(p) : get points from polygon
         # this is for limiting the search region for large Layout
         #
-        [ polygon.setvnodes_new(self.get_points(polygon), self) for polygon in lTP ]
+        if nproc == 1:
+            [ polygon.setvnodes_new(self.get_points(polygon), self) for polygon in lTP ]
+        else:
+            lvnodes = _bmap(self, _vnodes_func, list(range(len(lTP))), nproc, data=lTP)
+            for polygon, vnodes in zip(lTP, lvnodes):
+                polygon.vnodes = vnodes
 
         if verbose:
             pbartmp.update(100.)
@@ -6434,7 +7193,7 @@ class Layout(pro.PyLayers):
         self.g2npy()
         # find diffraction points : updating self.ddiff
         tqdmkwargs={'total':100.,'desc':'Find Diffractions','position':1}
-        self._find_diffractions(difftol=difftol,verbose=verbose,tqdmkwargs=tqdmkwargs)
+        self._find_diffractions(difftol=difftol,verbose=verbose,tqdmkwargs=tqdmkwargs,nproc=nproc)
         if verbose:
             Gtpbar.update(100./12.)
             # print('find diffraction...Done 8/12')
@@ -7021,7 +7780,7 @@ class Layout(pro.PyLayers):
         return polys
 
 
-    def buildGv(self, show=False,verbose=False,tqdmpos=0):
+    def buildGv(self, show=False,verbose=False,tqdmpos=0,nproc=1,dGv=None):
         """ build visibility graph
 
         Parameters
@@ -7031,6 +7790,11 @@ class Layout(pro.PyLayers):
             default False
         verbose : boolean 
         tqdmpos : progressbar
+        nproc : int
+            number of worker processes (cycles are split between workers)
+        dGv : dict
+            {cycle : Gv} already known visibility graphs of cycles
+            (see rebuild)
 
         Examples
         --------
@@ -7047,6 +7811,8 @@ class Layout(pro.PyLayers):
         This method exploits cycles convexity.
 
         """
+        if dGv is None:
+            dGv = {}
         if not hasattr(self,'ddiff'):
             self.ddiff={}
         Gvpbar = pbar(verbose,total=100., desc ='build Gv',position=tqdmpos)
@@ -7058,173 +7824,214 @@ class Layout(pro.PyLayers):
         self.dGv = {}  # dict of Gv graph
 
         cpt = 1./(len(self.Gt.node) + 1.)
+
+        lcy = [icycle for icycle in self.Gt.node if icycle != 0]
+        lcyc = [icycle for icycle in lcy if icycle not in dGv]
+        if nproc == 1:
+            lGv = []
+            for icycle in lcyc:
+                if verbose:
+                    Gvpbar.update(100.*cpt)
+                lGv.append(self._buildGv_cycle(icycle))
+        else:
+            lGv = _bmap(self,_buildGv_func,lcyc,nproc)
+        dGvc = dict(zip(lcyc,lGv))
+
+        #
+        # Graph Gv composition
+        #
+        for icycle in lcy:
+            if icycle in dGvc:
+                Gv = dGvc[icycle]
+            else:
+                Gv = dGv[icycle]
+            self.Gv.add_nodes_from(Gv.nodes())
+            self.Gv.add_edges_from(Gv.edges())
+            self.dGv[icycle] = Gv
+
+    def _buildGv_cycle(self, icycle):
+        """ build the visibility graph of a convex cycle
+
+        Parameters
+        ----------
+
+        icycle : int
+            cycle number (>0)
+
+        Returns
+        -------
+
+        Gv : nx.Graph
+
+        """
+        #if self.indoor or not self.Gt.node[icycle]['indoor']:
+            #print(icycle)
+        #    pass
+        #
+        #  If indoor or outdoor all visibility are calculated
+        #  If outdoor only visibility between iso = 'AIR' and '_AIR' are calculated 
+        # 
+        #if self.indoor or not self.Gt.node[icycle]['indoor']:
+        polyg = self.Gt.node[icycle]['polyg']
+
+        # plt.show(polyg.plot(fig=plt.gcf(),ax=plt.gca())
         
-        for icycle in self.Gt.node:
-            if verbose:
-                Gvpbar.update(100.*cpt)
-            if icycle != 0:
-                #if self.indoor or not self.Gt.node[icycle]['indoor']:
-                    #print(icycle)
-                #    pass
-                #
-                #  If indoor or outdoor all visibility are calculated
-                #  If outdoor only visibility between iso = 'AIR' and '_AIR' are calculated 
-                # 
-                #if self.indoor or not self.Gt.node[icycle]['indoor']:
-                polyg = self.Gt.node[icycle]['polyg']
+        # take a single segment between 2 points 
+        
+        vnodes = polyg.vnodes
 
-                # plt.show(polyg.plot(fig=plt.gcf(),ax=plt.gca())
-                
-                # take a single segment between 2 points 
-                
-                vnodes = polyg.vnodes
+        # list of index of points in vodes
+        unodes = np.where(vnodes<0)[0]
+        
+        # list of position of an incomplete list of segments 
+        # used rule : after a point there is always a segment 
+        useg = np.mod(unodes+1,len(vnodes))
+        
+        # list of points 
+        #npt  = filter(lambda x: x < 0, vnodes)
+        npt = [ x for x in vnodes if x <0 ]
+        
+        nseg_full = [x for x in vnodes if x > 0]
+        # nseg : incomplete list of segments
+        #
+        # if mode outdoor and cycle is indoor only 
+        # the part above the building (AIR and _AIR) is considered
+        if ((self.typ=='outdoor') and (self.Gt.node[icycle]['indoor'])):
+            nseg = [ x for x in nseg_full if ((self.Gs.node[x]['name']=='AIR') or (self.Gs.node[x]['name']=='_AIR') ) ]
+        else:
+            nseg = vnodes[useg]
 
-                # list of index of points in vodes
-                unodes = np.where(vnodes<0)[0]
-                
-                # list of position of an incomplete list of segments 
-                # used rule : after a point there is always a segment 
-                useg = np.mod(unodes+1,len(vnodes))
-                
-                # list of points 
-                #npt  = filter(lambda x: x < 0, vnodes)
-                npt = [ x for x in vnodes if x <0 ]
-                
-                nseg_full = [x for x in vnodes if x > 0]
-                # nseg : incomplete list of segments
-                #
-                # if mode outdoor and cycle is indoor only 
-                # the part above the building (AIR and _AIR) is considered
-                if ((self.typ=='outdoor') and (self.Gt.node[icycle]['indoor'])):
-                    nseg = [ x for x in nseg_full if ((self.Gs.node[x]['name']=='AIR') or (self.Gs.node[x]['name']=='_AIR') ) ]
-                else:
-                    nseg = vnodes[useg]
+        
+        # # nseg_full : full list of segments
+        # #nseg_full = filter(lambda x: x > 0, vnodes)
 
-                
-                # # nseg_full : full list of segments
-                # #nseg_full = filter(lambda x: x > 0, vnodes)
+        # # keep only airwalls without iso single (_AIR)
+        # nseg_single = filter(lambda x: len(self.Gs.node[x]['iso'])==0, nseg)
 
-                # # keep only airwalls without iso single (_AIR)
-                # nseg_single = filter(lambda x: len(self.Gs.node[x]['iso'])==0, nseg)
+        # lair1 = self.name['AIR'] 
+        # lair2 = self.name['_AIR']
+        # lair  = lair1 + lair2
 
-                # lair1 = self.name['AIR'] 
-                # lair2 = self.name['_AIR']
-                # lair  = lair1 + lair2
+        # # list of airwalls in nseg_single
 
-                # # list of airwalls in nseg_single
+        # airwalls = filter(lambda x: x in lair, nseg_single)
 
-                # airwalls = filter(lambda x: x in lair, nseg_single)
+        # diffraction points 
 
-                # diffraction points 
+        ndiff = [x for x in npt if x in self.ddiff.keys()]
+        #
+        # Create a graph
+        #
 
-                ndiff = [x for x in npt if x in self.ddiff.keys()]
-                #
-                # Create a graph
-                #
+        Gv = nx.Graph(name='Gv')
+        #
+        # in convex case :
+        #
+        #    i)  every non aligned segments see each other
+        #
+        for nk in combinations(nseg, 2):
+            nk0 = self.tgs[nk[0]]
+            nk1 = self.tgs[nk[1]]
+            tahe0 = self.tahe[:, nk0]
+            tahe1 = self.tahe[:, nk1]
 
-                Gv = nx.Graph(name='Gv')
-                #
-                # in convex case :
-                #
-                #    i)  every non aligned segments see each other
-                #
-                for nk in combinations(nseg, 2):
-                    nk0 = self.tgs[nk[0]]
-                    nk1 = self.tgs[nk[1]]
-                    tahe0 = self.tahe[:, nk0]
-                    tahe1 = self.tahe[:, nk1]
-
-                    pta0 = self.pt[:, tahe0[0]]
-                    phe0 = self.pt[:, tahe0[1]]
-                    pta1 = self.pt[:, tahe1[0]]
-                    phe1 = self.pt[:, tahe1[1]]
-
-                    aligned = geu.is_aligned4(pta0,phe0,pta1,phe1)
-                    # A0 = np.vstack((pta0, phe0, pta1))
-                    # A0 = np.hstack((A0, np.ones((3, 1))))
-
-                    # A1 = np.vstack((pta0, phe0, phe1))
-                    # A1 = np.hstack((A1, np.ones((3, 1))))
-
-                    # d0 = np.linalg.det(A0)
-                    # d1 = np.linalg.det(A1)
-
-                    #if not ((abs(d0) < 1e-1) & (abs(d1) < 1e-1)):
-                    if not aligned:
-                        if ((0 not in self.Gs.node[nk[0]]['ncycles']) and
-                            (0 not in self.Gs.node[nk[1]]['ncycles'])):
-                            # get the iso segments of both nk[0] and nk[1]
-                            if ((self.typ=='indoor') or (not self.Gt.node[icycle]['indoor'])):
-                                l0 = [nk[0]]+self.Gs.node[nk[0]]['iso']
-                                l1 = [nk[1]]+self.Gs.node[nk[1]]['iso']
-                            else:
-                                l0 = [nk[0]]
-                                l1 = [nk[1]]
+            pta0 = self.pt[:, tahe0[0]]
+            phe0 = self.pt[:, tahe0[1]]
+            pta1 = self.pt[:, tahe1[0]]
+            phe1 = self.pt[:, tahe1[1]]
+
+            aligned = geu.is_aligned4(pta0,phe0,pta1,phe1)
+            # A0 = np.vstack((pta0, phe0, pta1))
+            # A0 = np.hstack((A0, np.ones((3, 1))))
+
+            # A1 = np.vstack((pta0, phe0, phe1))
+            # A1 = np.hstack((A1, np.ones((3, 1))))
+
+            # d0 = np.linalg.det(A0)
+            # d1 = np.linalg.det(A1)
+
+            #if not ((abs(d0) < 1e-1) & (abs(d1) < 1e-1)):
+            if not aligned:
+                if ((0 not in self.Gs.node[nk[0]]['ncycles']) and
+                    (0 not in self.Gs.node[nk[1]]['ncycles'])):
+                    # get the iso segments of both nk[0] and nk[1]
+                    if ((self.typ=='indoor') or (not self.Gt.node[icycle]['indoor'])):
+                        l0 = [nk[0]]+self.Gs.node[nk[0]]['iso']
+                        l1 = [nk[1]]+self.Gs.node[nk[1]]['iso']
+                    else:
+                        l0 = [nk[0]]
+                        l1 = [nk[1]]
+
+                    for vlink in product(l0,l1):
+                        #printicycle,vlink[0],vlink[1]
+                        Gv.add_edge(vlink[0], vlink[1])
 
-                            for vlink in product(l0,l1):
-                                #printicycle,vlink[0],vlink[1]
-                                Gv.add_edge(vlink[0], vlink[1])
+        #
+        # Handle diffraction points
+        #
+        #    ii) all non adjascent valid diffraction points see each other
+        #    iii) all valid diffraction points see segments non aligned
+        #    with adjascent segments
+        #
+        #if diffraction:
+        #
+        # diffraction only if indoor or outdoor cycle if outdoor
+        # 
+        if ((self.typ=='indoor') or (not self.Gt.node[icycle]['indoor'])):
+            ndiffvalid = [ x for x in ndiff if icycle in self.ddiff[x][0]]
 
+                # non adjascent segment of vnodes see valid diffraction
+                # points
+            for idiff in ndiffvalid:
                 #
-                # Handle diffraction points
+                # segments voisins du point de diffraction valide
                 #
-                #    ii) all non adjascent valid diffraction points see each other
-                #    iii) all valid diffraction points see segments non aligned
-                #    with adjascent segments
+                # v1.1 nsneigh = [x for x in 
+                #           nx.neighbors(self.Gs, idiff) 
+                #           if x in nseg_full]
+                nsneigh = [x for x in self.Gs[idiff] if x in nseg_full]
+                # segvalid : not adjascent segment
+                seen_from_neighbors = []
+
                 #
-                #if diffraction:
+                # point to point
                 #
-                # diffraction only if indoor or outdoor cycle if outdoor
-                # 
-                if ((self.typ=='indoor') or (not self.Gt.node[icycle]['indoor'])):
-                    ndiffvalid = [ x for x in ndiff if icycle in self.ddiff[x][0]]
-
-                        # non adjascent segment of vnodes see valid diffraction
-                        # points
-                    for idiff in ndiffvalid:
-                        #
-                        # segments voisins du point de diffraction valide
-                        #
-                        # v1.1 nsneigh = [x for x in 
-                        #           nx.neighbors(self.Gs, idiff) 
-                        #           if x in nseg_full]
-                        nsneigh = [x for x in self.Gs[idiff] if x in nseg_full]
-                        # segvalid : not adjascent segment
-                        seen_from_neighbors = []
-
-                        #
-                        # point to point
-                        #
-                        for npoint in ndiffvalid:
-                            if npoint != idiff:
-                                Gv.add_edge(idiff, npoint)
-
-                        #
-                        # All the neighbors segment in visibility which are not connected to cycle 0
-                        # and which are not neighbors of the point idiff
-                        #
-                        for x in nsneigh:
-                            # v1.1 neighbx = [ y for y in nx.neighbors(Gv, x) 
-                            #            if 0 not in self.Gs.node[y]['ncycles'] 
-                            #            and y not in nsneigh]
-                            neighbx = [ y for y in Gv[x] 
-                                        if 0 not in self.Gs.node[y]['ncycles'] 
-                                        and y not in nsneigh]
-                            seen_from_neighbors += neighbx
-
-                        for ns in seen_from_neighbors:
-                            Gv.add_edge(idiff, ns)
+                for npoint in ndiffvalid:
+                    if npoint != idiff:
+                        Gv.add_edge(idiff, npoint)
 
                 #
-                # Graph Gv composition
+                # All the neighbors segment in visibility which are not connected to cycle 0
+                # and which are not neighbors of the point idiff
                 #
+                for x in nsneigh:
+                    # v1.1 neighbx = [ y for y in nx.neighbors(Gv, x) 
+                    #            if 0 not in self.Gs.node[y]['ncycles'] 
+                    #            and y not in nsneigh]
+                    neighbx = [ y for y in Gv[x] 
+                                if 0 not in self.Gs.node[y]['ncycles'] 
+                                and y not in nsneigh]
+                    seen_from_neighbors += neighbx
+
+                for ns in seen_from_neighbors:
+                    Gv.add_edge(idiff, ns)
 
-                self.Gv = nx.compose(self.Gv, Gv)
-                self.dGv[icycle] = Gv
+        return Gv
 
-    def buildGi(self,verbose=False,tqdmpos=0):
+    def buildGi(self,verbose=False,tqdmpos=0,nproc=1,dGi=None):
         """ build graph of interactions
 
+        Parameters
+        ----------
+
+        verbose : boolean
+        tqdmpos : progressbar
+        nproc : int
+            number of worker processes (cycles are split between workers)
+        dGi : dict
+            {cycle : (ledges,npt)} already known Gi edges of cycles
+            (see rebuild and _buildGi_cycle)
+
         Notes
         -----
 
@@ -7241,6 +8048,8 @@ class Layout(pro.PyLayers):
 
         """
 
+        if dGi is None:
+            dGi = {}
         Gipbar = pbar(verbose,total=100., desc ='Build Gi',position=tqdmpos)
         if verbose:
             Gipbar.update(0.)
@@ -7325,141 +8134,26 @@ class Layout(pro.PyLayers):
         pbartmp = pbar(verbose,total=100., desc ='Create Gi nodes',position=tqdmpos+1)
 
 
-        for cy in self.Gt.node:
-            if verbose:
-                pbartmp.update(cpt)
+        lcy = [cy for cy in self.Gt.node if cy > 0]
+        lcyc = [cy for cy in lcy if cy not in dGi]
+        if nproc == 1:
+            lres = []
             # for all >0 convex cycles
-            if cy > 0:
-                vnodes = self.Gt.node[cy]['polyg'].vnodes
-                npt = []
-                #
-                # find all diffraction points involved in the cycle cy 
-                #
-                for x in vnodes:
-                    if x < 0:
-                        if x in self.ddiff:
-                            for y in self.ddiff[x][0]:
-                                if y == cy:
-                                    npt.append(x)
-
-                nseg = [ k for k in vnodes if k>0 ]
-                # all segments and diffraction points of the cycle
-                vnodes = nseg + npt
-
-                for nstr in vnodes:
-
-                    if nstr in self.Gv.nodes():
-                        # list 1 of interactions
-
-                        li1 = []
-                        if nstr > 0:
-                            # output cycle 
-                            # cy -> cyo1 
-                            cyo1 = self.Gs.node[nstr]['ncycles']
-                            cyo1 = [ x for x in cyo1 if x!= cy] [0]
-                            #cyo1 = filter(lambda x: x != cy, cyo1)[0]
-
-                            # R , Tin , Tout
-                            if cyo1 > 0:
-                                if (nstr, cy) in self.Gi.nodes():
-                                    li1.append((nstr, cy))  # R 
-                                if (nstr, cy, cyo1) in self.Gi.nodes():
-                                    li1.append((nstr, cy, cyo1)) # T cy -> cyo1 
-                                if (nstr, cyo1, cy) in self.Gi.nodes():
-                                    li1.append((nstr, cyo1, cy)) # T : cyo1 -> cy 
-                                # if (nstr,cy) in self.Gi.nodes():
-                                #     li1 = [(nstr,cy),(nstr,cy,cyo1),(nstr,cyo1,cy)]
-                                # else:# no reflection on airwall
-                                #     li1 = [(nstr,cyo1,cy)]
-                            else:
-                                if (nstr, cy) in self.Gi.nodes():
-                                    li1 = [(nstr, cy)]
-                                # else:
-                                #     li1 =[]
-                        else:
-                            # D
-                            li1 = [(nstr,)]
-                        # list of cycle entities in visibility of nstr
-                        # v1.1 lneighb = nx.neighbors(self.Gv, nstr)
-                        lneighb = list(dict(self.Gv[nstr]).keys())
-                        #if (self.Gs.node[nstr]['name']=='AIR') or (
-                        #        self.Gs.node[nstr]['name']=='_AIR'):
-                        #    lneighcy = lneighb
-                        #else:
-                        # list of cycle entities in visibility of nstr in the same cycle 
-                        lneighcy = [ x for x in lneighb if x in vnodes ] 
-                        # lneighcy = filter(lambda x: x in vnodes, lneighb)
-
-                        for nstrb in lneighcy:
-                            if nstrb in self.Gv.nodes():
-                                li2 = []
-                                if nstrb > 0:
-                                    cyo2 = self.Gs.node[nstrb]['ncycles']
-                                    cyo2 = [ x for x in cyo2 if x!= cy] [0]
-                                    #cyo2 = filter(lambda x: x != cy, cyo2)[0]
-                                    if cyo2 > 0:
-                                        if (nstrb, cy) in self.Gi.nodes():
-                                            li2.append((nstrb, cy))
-                                        if (nstrb, cy, cyo2) in self.Gi.nodes():
-                                            li2.append((nstrb, cy, cyo2))
-                                        if (nstrb, cyo2, cy) in self.Gi.nodes():
-                                            li2.append((nstrb, cyo2, cy))
-                                        # if (nstrb,cy) in self.Gi.nodes():
-                                        #     li2 = [(nstrb,cy),(nstrb,cy,cyo2),(nstrb,cyo2,cy)]
-                                        # else: #no reflection on airwall
-                                        #     li2 = [(nstrb,cy,cyo2),(nstrb,cyo2,cy)]
-                                    else:
-                                        if (nstrb, cy) in self.Gi.nodes():
-                                            li2 = [(nstrb, cy)]
-                                else:
-                                    li2 = [(nstrb,)]
-
-                                # if cy==4:
-                                #     printnstr,nstrb
-                                #if iprint:
-                                #     print("li1",li1)
-                                #     print("li2",li2)
-                                #if cy == 91:
-                                #    print("     ",li2)
-                                
-                                for i1 in li1:
-                                    for i2 in li2:
-                                        if (i1[0] != i2[0]):
-                                            if ((len(i1) == 2) & (len(i2) == 2)):
-                                                # print"RR"
-                                                self.Gi.add_edge(i1, i2)
-                                                self.Gi.add_edge(i2, i1)
-                                            if ((len(i1) == 2) & (len(i2) == 3)):
-                                                # print"RT"
-                                                if i1[1] == i2[1]:
-                                                    self.Gi.add_edge(i1, i2)
-                                            if ((len(i1) == 3) & (len(i2) == 2)):
-                                                # print"TR"
-                                                if i1[2] == i2[1]:
-                                                    self.Gi.add_edge(i1, i2)
-                                            if ((len(i1) == 3) & (len(i2) == 3)):
-                                                # print"TT"
-                                                if i1[2] == i2[1]:
-                                                    self.Gi.add_edge(i1, i2)
-                                                if i2[2] == i1[1]:
-                                                    self.Gi.add_edge(i2, i1)
-                                            if ((len(i1) == 1) & (len(i2) == 3)):
-                                                # print"DT"
-                                                if i2[1] == cy:
-                                                    self.Gi.add_edge(i1, i2)
-                                            if ((len(i1) == 3) & (len(i2) == 1)):
-                                                # print"TD"
-                                                if i1[2] == cy:
-                                                    self.Gi.add_edge(i1, i2)
-                                            if ((len(i1) == 1) & (len(i2) == 2)):
-                                                # print"DR"
-                                                self.Gi.add_edge(i1, i2)
-                                            if ((len(i1) == 2) & (len(i2) == 1)):
-                                                # print"RD"
-                                                self.Gi.add_edge(i1, i2)
-                                            if ((len(i1) == 1) & (len(i2) == 1)):
-                                                # print"DD"
-                                                self.Gi.add_edge(i1, i2)
+            for cy in lcyc:
+                if verbose:
+                    pbartmp.update(cpt)
+                lres.append(self._buildGi_cycle(cy))
+        else:
+            lres = _bmap(self,_buildGi_func,lcyc,nproc)
+        dres = dict(zip(lcyc,lres))
+
+        for cy in lcy:
+            if cy in dres:
+                ledges,npt = dres[cy]
+            else:
+                ledges,npt = dGi[cy]
+            self.Gi.add_edges_from(ledges)
+
         if verbose :
             Gipbar.update(66.)
         # updating the list of interactions of a given cycle
@@ -7511,6 +8205,162 @@ class Layout(pro.PyLayers):
         #store list of nodes of Gi ( for keeping order)
         self.Gi_no = self.Gi.nodes()
 
+    def _buildGi_cycle(self, cy):
+        """ Gi edges between the interactions of a convex cycle
+
+        Parameters
+        ----------
+
+        cy : int
+            cycle number (>0)
+
+        Returns
+        -------
+
+        ledges : list
+            list of Gi edges (in order of creation)
+        npt : list
+            diffraction points of the cycle
+
+        Notes
+        -----
+
+        The nodes of Gi have to be created before calling this method.
+
+        """
+        ledges = []
+        vnodes = self.Gt.node[cy]['polyg'].vnodes
+        npt = []
+        #
+        # find all diffraction points involved in the cycle cy 
+        #
+        for x in vnodes:
+            if x < 0:
+                if x in self.ddiff:
+                    for y in self.ddiff[x][0]:
+                        if y == cy:
+                            npt.append(x)
+
+        nseg = [ k for k in vnodes if k>0 ]
+        # all segments and diffraction points of the cycle
+        vnodes = nseg + npt
+
+        for nstr in vnodes:
+
+            if nstr in self.Gv.nodes():
+                # list 1 of interactions
+
+                li1 = []
+                if nstr > 0:
+                    # output cycle 
+                    # cy -> cyo1 
+                    cyo1 = self.Gs.node[nstr]['ncycles']
+                    cyo1 = [ x for x in cyo1 if x!= cy] [0]
+                    #cyo1 = filter(lambda x: x != cy, cyo1)[0]
+
+                    # R , Tin , Tout
+                    if cyo1 > 0:
+                        if (nstr, cy) in self.Gi.nodes():
+                            li1.append((nstr, cy))  # R 
+                        if (nstr, cy, cyo1) in self.Gi.nodes():
+                            li1.append((nstr, cy, cyo1)) # T cy -> cyo1 
+                        if (nstr, cyo1, cy) in self.Gi.nodes():
+                            li1.append((nstr, cyo1, cy)) # T : cyo1 -> cy 
+                        # if (nstr,cy) in self.Gi.nodes():
+                        #     li1 = [(nstr,cy),(nstr,cy,cyo1),(nstr,cyo1,cy)]
+                        # else:# no reflection on airwall
+                        #     li1 = [(nstr,cyo1,cy)]
+                    else:
+                        if (nstr, cy) in self.Gi.nodes():
+                            li1 = [(nstr, cy)]
+                        # else:
+                        #     li1 =[]
+                else:
+                    # D
+                    li1 = [(nstr,)]
+                # list of cycle entities in visibility of nstr
+                # v1.1 lneighb = nx.neighbors(self.Gv, nstr)
+                lneighb = list(dict(self.Gv[nstr]).keys())
+                #if (self.Gs.node[nstr]['name']=='AIR') or (
+                #        self.Gs.node[nstr]['name']=='_AIR'):
+                #    lneighcy = lneighb
+                #else:
+                # list of cycle entities in visibility of nstr in the same cycle 
+                lneighcy = [ x for x in lneighb if x in vnodes ] 
+                # lneighcy = filter(lambda x: x in vnodes, lneighb)
+
+                for nstrb in lneighcy:
+                    if nstrb in self.Gv.nodes():
+                        li2 = []
+                        if nstrb > 0:
+                            cyo2 = self.Gs.node[nstrb]['ncycles']
+                            cyo2 = [ x for x in cyo2 if x!= cy] [0]
+                            #cyo2 = filter(lambda x: x != cy, cyo2)[0]
+                            if cyo2 > 0:
+                                if (nstrb, cy) in self.Gi.nodes():
+                                    li2.append((nstrb, cy))
+                                if (nstrb, cy, cyo2) in self.Gi.nodes():
+                                    li2.append((nstrb, cy, cyo2))
+                                if (nstrb, cyo2, cy) in self.Gi.nodes():
+                                    li2.append((nstrb, cyo2, cy))
+                                # if (nstrb,cy) in self.Gi.nodes():
+                                #     li2 = [(nstrb,cy),(nstrb,cy,cyo2),(nstrb,cyo2,cy)]
+                                # else: #no reflection on airwall
+                                #     li2 = [(nstrb,cy,cyo2),(nstrb,cyo2,cy)]
+                            else:
+                                if (nstrb, cy) in self.Gi.nodes():
+                                    li2 = [(nstrb, cy)]
+                        else:
+                            li2 = [(nstrb,)]
+
+                        # if cy==4:
+                        #     printnstr,nstrb
+                        #if iprint:
+                        #     print("li1",li1)
+                        #     print("li2",li2)
+                        #if cy == 91:
+                        #    print("     ",li2)
+                        
+                        for i1 in li1:
+                            for i2 in li2:
+                                if (i1[0] != i2[0]):
+                                    if ((len(i1) == 2) & (len(i2) == 2)):
+                                        # print"RR"
+                                        ledges.append((i1, i2))
+                                        ledges.append((i2, i1))
+                                    if ((len(i1) == 2) & (len(i2) == 3)):
+                                        # print"RT"
+                                        if i1[1] == i2[1]:
+                                            ledges.append((i1, i2))
+                                    if ((len(i1) == 3) & (len(i2) == 2)):
+                                        # print"TR"
+                                        if i1[2] == i2[1]:
+                                            ledges.append((i1, i2))
+                                    if ((len(i1) == 3) & (len(i2) == 3)):
+                                        # print"TT"
+                                        if i1[2] == i2[1]:
+                                            ledges.append((i1, i2))
+                                        if i2[2] == i1[1]:
+                                            ledges.append((i2, i1))
+                                    if ((len(i1) == 1) & (len(i2) == 3)):
+                                        # print"DT"
+                                        if i2[1] == cy:
+                                            ledges.append((i1, i2))
+                                    if ((len(i1) == 3) & (len(i2) == 1)):
+                                        # print"TD"
+                                        if i1[2] == cy:
+                                            ledges.append((i1, i2))
+                                    if ((len(i1) == 1) & (len(i2) == 2)):
+                                        # print"DR"
+                                        ledges.append((i1, i2))
+                                    if ((len(i1) == 2) & (len(i2) == 1)):
+                                        # print"RD"
+                                        ledges.append((i1, i2))
+                                    if ((len(i1) == 1) & (len(i2) == 1)):
+                                        # print"DD"
+                                        ledges.append((i1, i2))
+        return ledges, npt
+
     def filterGi(self, situ='outdoor'):
         """ filter Gi to manage indoor/outdoor situations
 
@@ -7542,13 +8392,18 @@ class Layout(pro.PyLayers):
 
 
 
-    def outputGi(self,verbose=False,tqdmpos=0.):
+    def outputGi(self,verbose=False,tqdmpos=0.,nproc=1,doutput=None):
         """ filter output of Gi edges
 
         Parameters
         ----------
 
-        L : Layout
+        verbose : boolean
+        tqdmpos : progressbar
+        nproc : int
+            number of worker processes (Gi edges are split between workers)
+        doutput : dict
+            {edge : output} already known outputs of Gi edges (see rebuild)
 
         Notes
         -----
@@ -7570,188 +8425,216 @@ class Layout(pro.PyLayers):
 
 
         assert('Gi' in self.__dict__)
+        if doutput is None:
+            doutput = {}
 
         oGipbar=pbar(verbose,total=100.,leave=False,desc='OutputGi',position=tqdmpos)
         # loop over all edges of Gi
-        Nedges = len(self.Gi.edges())
-        cpt = 100./Nedges
+        le = [e for e in self.Gi.edges() if e not in doutput]
+        Nedges = len(le)
+        cpt = 100./(Nedges+1)
         # print "Gi Nedges :",Nedges
-        for k, e in enumerate(self.Gi.edges()):
-
-            # if (k%100)==0:
-            # print"edge :  ",k
-            # extract  both termination interactions nodes
-            if verbose:
-                oGipbar.update(cpt)
-
-            i0 = e[0]
-            i1 = e[1]
-
-            nstr0 = i0[0]
-            nstr1 = i1[0]
-
-            # list of authorized outputs. Initialized void
-            output = []
+        if nproc == 1:
+            lres = []
+            for e in le:
+                # extract  both termination interactions nodes
+                if verbose:
+                    oGipbar.update(cpt)
+                lres.append(self._outputGi_edge(e))
+        else:
+            lres = _bmap(self,_outputGi_func,le,nproc)
 
-            # nstr1 : segment number of central interaction
-            if nstr1 > 0:
-                # central interaction is a segment
-                pseg1 = self.seg2pts(nstr1).reshape(2, 2).T
-                # list all potential successors of interaction i1
-                # v1.1 i2 = nx.neighbors(self.Gi, i1)
-                i2 = list(dict(self.Gi[i1]).keys())
-                # create a Cone object
-                cn = cone.Cone()
-                # if starting from segment
-                if nstr0 > 0:
-                    pseg0 = self.seg2pts(nstr0).reshape(2, 2).T
-                    # if nstr0 and nstr1 are connected segments
-                    # v1.1 if (len(np.intersect1d(nx.neighbors(self.Gs, nstr0), nx.neighbors(self.Gs, nstr1))) == 0):
-                    if (len(np.intersect1d(self.Gs[nstr0], self.Gs[nstr1])) == 0):
-                        # from 2 not connected segment
-                        cn.from2segs(pseg0, pseg1)
-                    else:
-                        # from 2 connected segments
-                        cn.from2csegs(pseg0, pseg1)
-                # if starting from a point
-                else:
-                    pt = np.array(self.Gs.pos[nstr0])
-                    cn.fromptseg(pt, pseg1)
-                    #
+        for e in doutput:
+            self.Gi.add_edge(e[0], e[1], output=doutput[e])
+        for i0,i1,dintprob in lres:
+            self.Gi.add_edge(i0, i1, output=dintprob)
 
-                ipoints = [x for x in i2 if len(x)==1 ]
-                # i0      i1     i2[x]
-                # Avoid to have the same diffaction point after reflection 
-                # exemple :  (-10,),(245,12),(-10,) impossible 
-                #                                 nstr0  nstr1 
-                if nstr0<0: 
-                    ipoints = [x for x in ipoints if x[0]!=nstr0] 
-                #ipoints = filter(lambda x: len(x) == 1, i2)
-                pipoints = np.array([self.Gs.pos[ip[0]] for ip in ipoints]).T
-                # filter tuple (R | T)
-                #istup = filter(lambda x : type(eval(x))==tuple,i2)
-                # map first argument segment number
-                #isegments = np.unique(map(lambda x : eval(x)[0],istup))
-                #isegments = np.unique(
-                #    filter(lambda y: y > 0, map(lambda x: x[0], i2)))
-                isegments = np.unique(np.array([ s for s in [ n[0] for n in i2]
-                                                if s >0 ] ))
-                # if nstr0 and nstr1 are adjescent segment remove nstr0 from
-                # potential next interaction
-                # Fix 01/2017
-                # This is not always True if the angle between
-                # the two adjascent segments is < pi/2
-                # v1.1 nb_nstr0 = self.Gs.neighbors(nstr0)
-                # v1.1 nb_nstr1 = self.Gs.neighbors(nstr1)
-                nb_nstr0 = self.Gs[nstr0]
-                nb_nstr1 = self.Gs[nstr1]
-                common_point = np.intersect1d(nb_nstr0,nb_nstr1)
+    def _outputGi_edge(self, e):
+        """ feasible outputs of a Gi edge
 
-                if len(common_point) == 1:
-                    num0 = [x for x in nb_nstr0 if x != common_point]
-                    num1 = [x for x in nb_nstr1 if x != common_point]
-                    p0 = np.array(self.Gs.pos[num0[0]])
-                    p1 = np.array(self.Gs.pos[num1[0]])
-                    pc = np.array(self.Gs.pos[common_point[0]])
-                    v0 = p0 - pc
-                    v1 = p1 - pc
-                    v0n = v0/np.sqrt(np.sum(v0*v0))
-                    v1n = v1/np.sqrt(np.sum(v1*v1))
-                    if np.dot(v0n,v1n)<=0:
-                        isegments = np.array([ x for x in isegments if x != nstr0 ])
-                    #    filter(lambda x: x != nstr0, isegments))
-                # there are one or more segments
-                if len(isegments) > 0:
-                    points = self.seg2pts(isegments)
-                    pta = points[0:2, :]
-                    phe = points[2:, :]
-                    # add difraction points
-                    # WARNING Diffraction points are added only if a segment is seen
-                    # it should be the case in 99% of cases
+        Parameters
+        ----------
 
-                    if len(ipoints) > 0:
-                        isegments = np.hstack((isegments, np.array(ipoints)[:, 0]))
-                        pta = np.hstack((pta, pipoints))
-                        phe = np.hstack((phe, pipoints))
+        e : tuple
+            Gi edge (i0,i1)
 
-                    # cn.show()
+        Returns
+        -------
 
-                    # if i0 == (38,79) and i1 == (135,79,23):
-                    #     printi0,i1
-                    #     import ipdb
-                    #     ipdb.set_trace()
-                    # i1 : interaction T
-                    if len(i1) == 3:
-                        #if ((e[0]==(53,17)) and (e[1]==(108,17,18))):
-                        #    typ, prob = cn.belong_seg(pta, phe,visu=True)
-                        #else:
-                        typ, prob = cn.belong_seg(pta, phe)
-                        # if bs.any():
-                        #    plu.displot(pta[:,bs],phe[:,bs],color='g')
-                        # if ~bs.any():
-                        #    plu.displot(pta[:,~bs],phe[:,~bs],color='k')
+        i0, i1, dintprob
+            dintprob : dict {interaction : probability} of feasible
+            outputs of i1 coming from i0
+
+        """
+        i0 = e[0]
+        i1 = e[1]
+
+        nstr0 = i0[0]
+        nstr1 = i1[0]
+
+        # list of authorized outputs. Initialized void
+        output = []
+        dintprob = {}
+
+        # nstr1 : segment number of central interaction
+        if nstr1 > 0:
+            # central interaction is a segment
+            pseg1 = self.seg2pts(nstr1).reshape(2, 2).T
+            # list all potential successors of interaction i1
+            # v1.1 i2 = nx.neighbors(self.Gi, i1)
+            i2 = list(dict(self.Gi[i1]).keys())
+            # create a Cone object
+            cn = cone.Cone()
+            # if starting from segment
+            if nstr0 > 0:
+                pseg0 = self.seg2pts(nstr0).reshape(2, 2).T
+                # if nstr0 and nstr1 are connected segments
+                # v1.1 if (len(np.intersect1d(nx.neighbors(self.Gs, nstr0), nx.neighbors(self.Gs, nstr1))) == 0):
+                if (len(np.intersect1d(self.Gs[nstr0], self.Gs[nstr1])) == 0):
+                    # from 2 not connected segment
+                    cn.from2segs(pseg0, pseg1)
+                else:
+                    # from 2 connected segments
+                    cn.from2csegs(pseg0, pseg1)
+            # if starting from a point
+            else:
+                pt = np.array(self.Gs.pos[nstr0])
+                cn.fromptseg(pt, pseg1)
+                #
 
-                    # i1 : interaction R --> mirror
-                    if len(i1) == 2:
-                        Mpta = geu.mirror(pta, pseg1[:, 0], pseg1[:, 1])
-                        Mphe = geu.mirror(phe, pseg1[:, 0], pseg1[:, 1])
-                        typ, prob = cn.belong_seg(Mpta, Mphe)
-                        # printi0,i1
-                        # if ((i0 == (6, 0)) & (i1 == (7, 0))):
-                        #    pdb.set_trace()
-                        # if bs.any():
-                        #    plu.displot(pta[:,bs],phe[:,bs],color='g')
-                        # if ~bs.any():
-                        #    plu.displot(pta[:,~bs],phe[:,~bs],color='m')
-                        #    plt.show()
-                        #    pdb.set_trace())
-                    ########
-                    # SOMETIMES PROBA IS 0 WHEReAS SEG IS SEEN
-                    ###########
-                    # # keep segment with prob above a threshold
-                    # isegkeep = isegments[prob>0]
-                    # # dict   {numint : proba}
-                    # dsegprob = {k:v for k,v in zip(isegkeep,prob[prob>0])}
-                    # 4 lines are replaced by
-                    # keep segment with prob above a threshold
-                    utypseg = typ != 0
-                    isegkeep = isegments[utypseg]
-                    # dict   {numint : proba}
-                    dsegprob = {k: v for k, v in zip(isegkeep, prob[utypseg])}
-                    #########
-                    # output = filter(lambda x: x[0] in isegkeep, i2)
-                    output = [x for x in i2 if x[0] in isegkeep]
-                    # probint = map(lambda x: dsegprob[x[0]], output)
-                    probint = [dsegprob[x[0]] for x in output]
-                    # dict interaction : proba
-                    dintprob = {k: v for k, v in zip(output, probint)}
+            ipoints = [x for x in i2 if len(x)==1 ]
+            # i0      i1     i2[x]
+            # Avoid to have the same diffaction point after reflection 
+            # exemple :  (-10,),(245,12),(-10,) impossible 
+            #                                 nstr0  nstr1 
+            if nstr0<0: 
+                ipoints = [x for x in ipoints if x[0]!=nstr0] 
+            #ipoints = filter(lambda x: len(x) == 1, i2)
+            pipoints = np.array([self.Gs.pos[ip[0]] for ip in ipoints]).T
+            # filter tuple (R | T)
+            #istup = filter(lambda x : type(eval(x))==tuple,i2)
+            # map first argument segment number
+            #isegments = np.unique(map(lambda x : eval(x)[0],istup))
+            #isegments = np.unique(
+            #    filter(lambda y: y > 0, map(lambda x: x[0], i2)))
+            isegments = np.unique(np.array([ s for s in [ n[0] for n in i2]
+                                            if s >0 ] ))
+            # if nstr0 and nstr1 are adjescent segment remove nstr0 from
+            # potential next interaction
+            # Fix 01/2017
+            # This is not always True if the angle between
+            # the two adjascent segments is < pi/2
+            # v1.1 nb_nstr0 = self.Gs.neighbors(nstr0)
+            # v1.1 nb_nstr1 = self.Gs.neighbors(nstr1)
+            nb_nstr0 = self.Gs[nstr0]
+            nb_nstr1 = self.Gs[nstr1]
+            common_point = np.intersect1d(nb_nstr0,nb_nstr1)
+
+            if len(common_point) == 1:
+                num0 = [x for x in nb_nstr0 if x != common_point]
+                num1 = [x for x in nb_nstr1 if x != common_point]
+                p0 = np.array(self.Gs.pos[num0[0]])
+                p1 = np.array(self.Gs.pos[num1[0]])
+                pc = np.array(self.Gs.pos[common_point[0]])
+                v0 = p0 - pc
+                v1 = p1 - pc
+                v0n = v0/np.sqrt(np.sum(v0*v0))
+                v1n = v1/np.sqrt(np.sum(v1*v1))
+                if np.dot(v0n,v1n)<=0:
+                    isegments = np.array([ x for x in isegments if x != nstr0 ])
+                #    filter(lambda x: x != nstr0, isegments))
+            # there are one or more segments
+            if len(isegments) > 0:
+                points = self.seg2pts(isegments)
+                pta = points[0:2, :]
+                phe = points[2:, :]
+                # add difraction points
+                # WARNING Diffraction points are added only if a segment is seen
+                # it should be the case in 99% of cases
+
+                if len(ipoints) > 0:
+                    isegments = np.hstack((isegments, np.array(ipoints)[:, 0]))
+                    pta = np.hstack((pta, pipoints))
+                    phe = np.hstack((phe, pipoints))
+
+                # cn.show()
+
+                # if i0 == (38,79) and i1 == (135,79,23):
+                #     printi0,i1
+                #     import ipdb
+                #     ipdb.set_trace()
+                # i1 : interaction T
+                if len(i1) == 3:
+                    #if ((e[0]==(53,17)) and (e[1]==(108,17,18))):
+                    #    typ, prob = cn.belong_seg(pta, phe,visu=True)
+                    #else:
+                    typ, prob = cn.belong_seg(pta, phe)
+                    # if bs.any():
+                    #    plu.displot(pta[:,bs],phe[:,bs],color='g')
+                    # if ~bs.any():
+                    #    plu.displot(pta[:,~bs],phe[:,~bs],color='k')
+
+                # i1 : interaction R --> mirror
+                if len(i1) == 2:
+                    Mpta = geu.mirror(pta, pseg1[:, 0], pseg1[:, 1])
+                    Mphe = geu.mirror(phe, pseg1[:, 0], pseg1[:, 1])
+                    typ, prob = cn.belong_seg(Mpta, Mphe)
+                    # printi0,i1
+                    # if ((i0 == (6, 0)) & (i1 == (7, 0))):
+                    #    pdb.set_trace()
+                    # if bs.any():
+                    #    plu.displot(pta[:,bs],phe[:,bs],color='g')
+                    # if ~bs.any():
+                    #    plu.displot(pta[:,~bs],phe[:,~bs],color='m')
+                    #    plt.show()
+                    #    pdb.set_trace())
+                ########
+                # SOMETIMES PROBA IS 0 WHEReAS SEG IS SEEN
+                ###########
+                # # keep segment with prob above a threshold
+                # isegkeep = isegments[prob>0]
+                # # dict   {numint : proba}
+                # dsegprob = {k:v for k,v in zip(isegkeep,prob[prob>0])}
+                # 4 lines are replaced by
+                # keep segment with prob above a threshold
+                utypseg = typ != 0
+                isegkeep = isegments[utypseg]
+                # dict   {numint : proba}
+                dsegprob = {k: v for k, v in zip(isegkeep, prob[utypseg])}
+                #########
+                # output = filter(lambda x: x[0] in isegkeep, i2)
+                output = [x for x in i2 if x[0] in isegkeep]
+                # probint = map(lambda x: dsegprob[x[0]], output)
+                probint = [dsegprob[x[0]] for x in output]
+                # dict interaction : proba
+                dintprob = {k: v for k, v in zip(output, probint)}
 
-                    # keep all segment above nstr1 and in Cone if T
-                    # keep all segment below nstr1 and in Cone if R
+                # keep all segment above nstr1 and in Cone if T
+                # keep all segment below nstr1 and in Cone if R
 
-            else:
-                # central interaction is a point (nstr1 <0) 
+        else:
+            # central interaction is a point (nstr1 <0) 
 
-                # 1) Simple approach
-                #       output interaction are all visible interactions
-                # 2) TO BE DONE
-                #
-                #       output of the diffraction points
-                #       exploring
-                # b
-                #          + right of ISB
-                #          + right of RSB
-                #
-                #  + using the wedge cone
-                #  + using the incident cone
-                #
+            # 1) Simple approach
+            #       output interaction are all visible interactions
+            # 2) TO BE DONE
+            #
+            #       output of the diffraction points
+            #       exploring
+            # b
+            #          + right of ISB
+            #          + right of RSB
+            #
+            #  + using the wedge cone
+            #  + using the incident cone
+            #
 
-                # v1.1 output = nx.neighbors(self.Gi, (nstr1,))
-                output = self.Gi[(nstr1,)]
-                nout = len(output)
-                probint = np.ones(nout)  # temporarybns
-                dintprob = {k: v for k, v in zip(output, probint)}
-            self.Gi.add_edge(i0, i1, output=dintprob)
+            # v1.1 output = nx.neighbors(self.Gi, (nstr1,))
+            output = self.Gi[(nstr1,)]
+            nout = len(output)
+            probint = np.ones(nout)  # temporarybns
+            dintprob = {k: v for k, v in zip(output, probint)}
+        return i0, i1, dintprob
 
 
     def outputGi_new(self,verbose=False,tqdmpos=0.):
@@ -8020,279 +8903,22 @@ class Layout(pro.PyLayers):
                 pass
 
 
-    def outputGi_mp(self):
-        """ filter output of Gi edges
+    def outputGi_mp(self,nproc=0):
+        """ filter output of Gi edges (multiprocessing)
 
         Parameters
         ----------
 
-        L : Layout
-
-        Notes
-        -----
-
-        Let assume a sequence (nstr0,nstr1,{nstr2A,nstr2B,...}) in a signature.
-        This function checks whether this sequence is feasible or not
-        , whatever the type of nstr0 and nstr1.
-        The feasible outputs from nstr0 to nstr1 are stored in an output field of
-        edge (nstr0,nstr1)
+        nproc : int
+            number of worker processes (0 : cpu_count())
 
         See Also
         --------
 
-        pylayers.util.cone.Cone.from2seg
-        pylayers.util.cone.Cone.belong_seg
-
+        outputGi
 
         """
-
-
-        # assert('Gi' in self.__dict__)
-
-        # oGipbar=pbar(verbose,total=100.,leave=False,desc='OutputGi',position=tqdmpos)
-        # # loop over all edges of Gi
-        # Nedges = len(self.Gi.edges())
-        # cpt = 100./Nedges
-        # print "Gi Nedges :",Nedges
-        e = self.Gi.edges()
-        #Gi_no = [self.Gi_no]*len(e)
-
-        # densify sparse matrix
-        #aGi_A = self.Gi_A.toarray()
-        #ap2pc = self.p2pc.toarray()
-        #asgsg = self.sgsg.toarray()
-        #as2pc = self.s2pc.toarray()
-        #as2pu = self.s2pu.toarray()
-
-        global Gi_A
-        global Gi_no
-        global p2pc
-        global sgsg
-        global s2pc
-        global s2pu
-
-        Gi_A = self.Gi_A
-        Gi_no = self.Gi_no
-        p2pc = self.p2pc
-        sgsg = self.sgsg
-        s2pc = self.s2pc
-        s2pu = self.s2pu
-
-
-        #Gi_A = [aGi_A]*len(e)
-        #p2pc = [ap2pc]*len(e)
-        #s2pc = [as2pc]*len(e)
-        #s2pu = [as2pu]*len(e)
-        #sgsg = [asgsg]*len(e)
-
-        pool = Pool(cpu_count())
-
-        # multiprocessing style
-        #Z=zip(e, Gi_no, Gi_A, p2pc, sgsg, s2pc, s2pu)
-        #res = pool.map(outputGi_func,Z)
-        Z = zip(e)
-        res = pool.map(outputGi_func,Z)
-        self.Gi.add_edges_from(res)
-
-
-
-
-        # res = pool.map(outputGi_func_test,e)
-        # print('e')
-        # time.sleep(1)
-        # res = pool.map(outputGi_func_test,Gi_no)
-        # print('no')
-        # time.sleep(1)
-        # res = pool.map(outputGi_func_test,Gi_A)
-        # print('A')
-        # time.sleep(1)
-        # res = pool.map(outputGi_func_test,Gspos)
-        # print('pos')
-        # time.sleep(1)
-        # res = pool.map(outputGi_func_test,sgsg)
-        # print('sgsg')
-        # time.sleep(1)
-        # res = pool.map(outputGi_func_test,s2pc)
-        # print('s2pc')
-        # time.sleep(1)
-        # res = pool.map(outputGi_func_test,s2pu)
-        # print('s2pu')
-        # time.sleep(1)
-        # res = pool.map(outputGi_func_test,Z)
-        # print('Z')
-        
-
-
-
-    #def outputGi_func(arg):
-           
-        # if (k%100)==0:
-        # print"edge :  ",k
-        # extract  both termination interactions nodes
-
-        #for k in arg:
-        #    Z=arg*arg
-        # e=arg[0]
-        # s2pc=arg[1]
-        # Gs=arg[2]
-        # Gi=arg[3]
-
-        # i0 = e[0]
-        # i1 = e[1]
-        # nstr0 = i0[0]
-        # nstr1 = i1[0]
-        # print(i0,i1)
-
-        # for k in range(1000):
-        #     y=k*k
-        # # list of authorized outputs. Initialized void
-        # output = []
-        # # nstr1 : segment number of central interaction
-        # if nstr1 > 0:
-        #     # central interaction is a segment
-        #     pseg1 = np.array(s2pc[nstr1,:].todense()).reshape(2, 2).T
-        #     # create a Cone object
-        #     cn = cone.Cone()
-        #     # if starting from segment
-        #     if nstr0 > 0:
-        #         pseg0 = np.array(s2pc[nstr0,:].todense()).reshape(2, 2).T
-        #         # if nstr0 and nstr1 are connected segments
-        #         if (len(np.intersect1d(nx.neighbors(Gs, nstr0), nx.neighbors(Gs, nstr1))) == 0):
-        #             # from 2 not connected segment
-        #             cn.from2segs(pseg0, pseg1)
-        #         else:
-        #             # from 2 connected segments
-        #             cn.from2csegs(pseg0, pseg1)
-        #     # if starting from a point
-        #     else:
-        #         pt = np.array(Gs.pos[nstr0])
-        #         cn.fromptseg(pt, pseg1)
-
-        #     # list all potential successors of interaction i1
-        #     i2 = nx.neighbors(Gi, i1)
-        #     ipoints = [x for x in i2 if len(x)==1 ]
-        #     #ipoints = [ x for x in rle if  len(x) == 1, i2)
-        #     pipoints = np.array([Gs.pos[ip[0]] for ip in ipoints]).T
-        #     # filter tuple (R | T)
-        #     #istup = filter(lambda x : type(eval(x))==tuple,i2)
-        #     # map first argument segment number
-        #     #isegments = np.unique(map(lambda x : eval(x)[0],istup))
-        #     isegments = np.unique(
-        #         filter(lambda y: y > 0, map(lambda x: x[0], i2)))
-        #     # if nstr0 and nstr1 are adjescent segment remove nstr0 from
-        #     # potential next interaction
-        #     # Fix 01/2017
-        #     # This is not always True if the angle between 
-        #     # the two adjascent segments is < pi/2
-        #     nb_nstr0 = Gs.neighbors(nstr0)
-        #     nb_nstr1 = Gs.neighbors(nstr1)
-        #     common_point = np.intersect1d(nb_nstr0,nb_nstr1)
-        #     if len(common_point) == 1:
-        #         num0 = [x for x in nb_nstr0 if x != common_point]
-        #         num1 = [x for x in nb_nstr1 if x != common_point]
-        #         p0 = np.array(Gs.pos[num0[0]])
-        #         p1 = np.array(Gs.pos[num1[0]])
-        #         pc = np.array(Gs.pos[common_point[0]])
-        #         v0 = p0-pc 
-        #         v1 = p1-pc 
-        #         v0n = v0/np.sqrt(np.sum(v0*v0))
-        #         v1n = v1/np.sqrt(np.sum(v1*v1))
-        #         if np.dot(v0n,v1n)<=0:
-        #             isegments = np.array([ x for x in isegments if x != nstr0 ]) 
-        #         #    [ x for x in rle if  x != nstr0, isegments))
-        #     # there are one or more segments
-        #     if len(isegments) > 0:
-        #         points = np.array(s2pc[isegments,:].todense()).T
-        #         pta = points[0:2, :]
-        #         phe = points[2:, :]
-        #         # add difraction points
-        #         # WARNING Diffraction points are added only if a segment is seen
-        #         # it should be the case in 99% of cases
-
-        #         if len(ipoints) > 0:
-        #             isegments = np.hstack(
-        #                 (isegments, np.array(ipoints)[:, 0]))
-        #             pta = np.hstack((pta, pipoints))
-        #             phe = np.hstack((phe, pipoints))
-
-        #         # cn.show()
-
-        #         # if i0 == (38,79) and i1 == (135,79,23):
-        #         #     printi0,i1
-        #         #     import ipdb
-        #         #     ipdb.set_trace()
-        #         # i1 : interaction T
-        #         if len(i1) == 3:
-        #             typ, prob = cn.belong_seg(pta, phe)
-        #             # if bs.any():
-        #             #    plu.displot(pta[:,bs],phe[:,bs],color='g')
-        #             # if ~bs.any():
-        #             #    plu.displot(pta[:,~bs],phe[:,~bs],color='k')
-
-        #         # i1 : interaction R --> mirror
-        #         if len(i1) == 2:
-        #             Mpta = geu.mirror(pta, pseg1[:, 0], pseg1[:, 1])
-        #             Mphe = geu.mirror(phe, pseg1[:, 0], pseg1[:, 1])
-        #             typ, prob = cn.belong_seg(Mpta, Mphe)
-        #             # printi0,i1
-        #             # if ((i0 == (6, 0)) & (i1 == (7, 0))):
-        #             #    pdb.set_trace()
-        #             # if bs.any():
-        #             #    plu.displot(pta[:,bs],phe[:,bs],color='g')
-        #             # if ~bs.any():
-        #             #    plu.displot(pta[:,~bs],phe[:,~bs],color='m')
-        #             #    plt.show()
-        #             #    pdb.set_trace())
-        #         ########
-        #         # SOMETIMES PROBA IS 0 WHEREAS SEG IS SEEN
-        #         ###########
-        #         # # keep segment with prob above a threshold
-        #         # isegkeep = isegments[prob>0]
-        #         # # dict   {numint : proba}
-        #         # dsegprob = {k:v for k,v in zip(isegkeep,prob[prob>0])}
-        #         # 4 lines are replaced by
-        #         # keep segment with prob above a threshold
-        #         utypseg = typ != 0
-        #         isegkeep = isegments[utypseg]
-        #         # dict   {numint : proba}
-        #         dsegprob = {k: v for k, v in zip(isegkeep, prob[utypseg])}
-        #         #########
-        #         # output = [ x for x in rle if  x[0] in isegkeep, i2)
-        #         output = [x for x in i2 if x[0] in isegkeep]
-        #         # probint = map(lambda x: dsegprob[x[0]], output)
-        #         probint = [dsegprob[x[0]] for x in output]
-        #         # dict interaction : proba
-        #         dintprob = {k: v for k, v in zip(output, probint)}
-
-        #         # keep all segment above nstr1 and in Cone if T
-        #         # keep all segment below nstr1 and in Cone if R
-
-        # else:
-        #     # central interaction is a point
-
-        #     # 1) Simple approach
-        #     #       output interaction are all visible interactions
-        #     # 2) TO BE DONE
-        #     #
-        #     #       output of the diffraction points
-        #     #       exploring
-        #     # b
-        #     #          + right of ISB
-        #     #          + right of RSB
-        #     #
-        #     #  + using the wedge cone
-        #     #  + using the incident cone
-        #     #
-
-        #     output = nx.neighbors(Gi, (nstr1,))
-        #     nout = len(output)
-        #     probint = np.ones(nout)  # temporarybns
-        #     dintprob = {k: v for k, v in zip(output, probint)}
-
-        # return(i0,i1,dintprob)
-        #self.Gi.add_edge(i0, i1, output=dintprob)
-
-        
+        self.outputGi(nproc=nproc)
 
     def intercy(self, ncy, typ='source'):
         """ return the list of interactions seen from a cycle
@@ -9438,7 +10064,7 @@ class Layout(pro.PyLayers):
 
         return dz_seg.values(),dz_sl.values()
 
-    def _find_diffractions(self, difftol=0.01,verbose = False,tqdmkwargs={}):
+    def _find_diffractions(self, difftol=0.01,verbose = False,tqdmkwargs={},nproc=1):
         """ find diffractions points of the Layout
 
         Parameters
@@ -9447,6 +10073,10 @@ class Layout(pro.PyLayers):
         difftol : float
 
             tolerance in radians
+        verbose : boolean
+        tqdmkwargs : dict
+        nproc : int
+            number of worker processes
 
         Returns
         -------
@@ -9473,85 +10103,112 @@ class Layout(pro.PyLayers):
         lpnt = [x for x in self.Gs.node if (x < 0 and x not in self.degree[0])]
 
         self.ddiff = {}
-        
-        if verbose :
-            cpt = 1./(len(lpnt)+1)
-            pbar = tqdm.tqdm(tqdmkwargs)
-        for k in lpnt:
+
+        if nproc == 1:
             if verbose :
-                pbar.update(100.*cpt)
-            # list of cycles associated with point k
-            lcyk = self.Gs.node[k]['ncycles']
-            if len(lcyk) > 2:
-                # Subgraph of connected cycles around k
-                Gtk = nx.subgraph(self.Gt, lcyk)
-                # ordered list of connections between cycles
-                try:
-                    lccyk = nx.find_cycle(Gtk)
-                except:
-                    pdb.set_trace()
+                cpt = 1./(len(lpnt)+1)
+                pbar = tqdm.tqdm(tqdmkwargs)
+            ldiff = []
+            for k in lpnt:
+                if verbose :
+                    pbar.update(100.*cpt)
+                ldiff.append(self._diffpoint(k,dangles,difftol))
+        else:
+            ldiff = _bmap(self,_diffpoint_func,lpnt,nproc,data=(dangles,difftol))
 
-                # list of segment neighbours
-                neigh = list(dict(self.Gs[k]).keys())
-                # sega : list of air segment in neighors
-                sega = [n for n in neigh if
-                        (self.Gs.node[n]['name'] == 'AIR' or
-                         self.Gs.node[n]['name'] == '_AIR')]
+        for k,diff in zip(lpnt,ldiff):
+            if diff is not None:
+                self.ddiff[k] = diff
 
-                sega_iso = [n for n in sega if len(self.Gs.node[n]['iso']) > 0]
-                sega_eff = list(set(sega).difference(set(sega_iso)))
-                nsector = len(neigh) - len(sega)
+    def _diffpoint(self, k, dangles, difftol=0.01):
+        """ diffraction of a point
 
-                dsector = {i: [] for i in range(nsector)}
-                #
-                # team building algo
-                #
-                ct = 0
-                # if k ==-44:
-                #     pdb.set_trace()
-                for ccy in lccyk:
-
-                    #segsep = self.Gt[ccy[0]][ccy[1]]['segment'][0]
-                    segsep = self.Gt[ccy[0]][ccy[1]]['segment']
-                    # filter only segments connected to point k (neigh)
-                    lvseg = [x for x in segsep if x in neigh]
-                    if len(lvseg) == 1 and (lvseg[0] in sega_eff):  # same sector
-                        dsector[ct].append(ccy[1])
-                    else:  # change sector
-                        ct = (ct + 1) % nsector
-                        dsector[ct].append(ccy[1])
-
-                    # typslab = self.Gs.node[segsep]['name']
-                    # if (typslab=='AIR' or typslab=='_AIR'): # same sector
-                        # dsector[ct].append(ccy[1])
-                    # else: # change sector
-                        # ct=(ct+1)%nsector
-                        # dsector[ct].append(ccy[1])
-                        # lcy2.append(ccy[1])
-                        # lcy1,lcy2 = lcy2,lcy1
-
-                dagtot = {s: 0 for s in range(nsector)}
-                save = []
-                for s in dsector:
-                    for cy in dsector[s]:
-                        da = dangles[cy]
-                        u = np.where(da[0, :].astype('int') == k)[0][0]
-                        save.append((cy, da[1, u]))
-                        dagtot[s] = dagtot[s] + da[1, u]
-                for s in dagtot:
-                    if dagtot[s] > (np.pi + difftol):
-                        self.ddiff[k] = (dsector[s], dagtot[s])
-                        break
-
-                # if agtot1 > (np.pi+tol):
-                #     self.ddiff[k]=(lcy1,agtot1)
-                # elif 2*np.pi-agtot1 > (np.pi+tol):
-                #     self.ddiff[k]=(lcy2,2*np.pi-agtot1)
-            else:
-                # diffraction by half-plane detected
-                if k in self.degree[1]:
-                    self.ddiff[k] = (lcyk, 2 * np.pi)
+        Parameters
+        ----------
 
+        k : int
+            point number
+        dangles : dict
+            {cy : polygon angles}
+        difftol : float
+
+        Returns
+        -------
+
+        None if k is not a diffraction point else ([ncy1,ncy2,...],wedge_angle)
+
+        """
+        # list of cycles associated with point k
+        lcyk = self.Gs.node[k]['ncycles']
+        if len(lcyk) > 2:
+            # Subgraph of connected cycles around k
+            Gtk = nx.subgraph(self.Gt, lcyk)
+            # ordered list of connections between cycles
+            try:
+                lccyk = nx.find_cycle(Gtk)
+            except:
+                pdb.set_trace()
+
+            # list of segment neighbours
+            neigh = list(dict(self.Gs[k]).keys())
+            # sega : list of air segment in neighors
+            sega = [n for n in neigh if
+                    (self.Gs.node[n]['name'] == 'AIR' or
+                     self.Gs.node[n]['name'] == '_AIR')]
+
+            sega_iso = [n for n in sega if len(self.Gs.node[n]['iso']) > 0]
+            sega_eff = list(set(sega).difference(set(sega_iso)))
+            nsector = len(neigh) - len(sega)
+
+            dsector = {i: [] for i in range(nsector)}
+            #
+            # team building algo
+            #
+            ct = 0
+            # if k ==-44:
+            #     pdb.set_trace()
+            for ccy in lccyk:
+
+                #segsep = self.Gt[ccy[0]][ccy[1]]['segment'][0]
+                segsep = self.Gt[ccy[0]][ccy[1]]['segment']
+                # filter only segments connected to point k (neigh)
+                lvseg = [x for x in segsep if x in neigh]
+                if len(lvseg) == 1 and (lvseg[0] in sega_eff):  # same sector
+                    dsector[ct].append(ccy[1])
+                else:  # change sector
+                    ct = (ct + 1) % nsector
+                    dsector[ct].append(ccy[1])
+
+                # typslab = self.Gs.node[segsep]['name']
+                # if (typslab=='AIR' or typslab=='_AIR'): # same sector
+                    # dsector[ct].append(ccy[1])
+                # else: # change sector
+                    # ct=(ct+1)%nsector
+                    # dsector[ct].append(ccy[1])
+                    # lcy2.append(ccy[1])
+                    # lcy1,lcy2 = lcy2,lcy1
+
+            dagtot = {s: 0 for s in range(nsector)}
+            save = []
+            for s in dsector:
+                for cy in dsector[s]:
+                    da = dangles[cy]
+                    u = np.where(da[0, :].astype('int') == k)[0][0]
+                    save.append((cy, da[1, u]))
+                    dagtot[s] = dagtot[s] + da[1, u]
+            for s in dagtot:
+                if dagtot[s] > (np.pi + difftol):
+                    return (dsector[s], dagtot[s])
+
+            # if agtot1 > (np.pi+tol):
+            #     self.ddiff[k]=(lcy1,agtot1)
+            # elif 2*np.pi-agtot1 > (np.pi+tol):
+            #     self.ddiff[k]=(lcy2,2*np.pi-agtot1)
+        else:
+            # diffraction by half-plane detected
+            if k in self.degree[1]:
+                return (lcyk, 2 * np.pi)
+        return None
 
     def buildGr(self):
         """ build the graph of rooms Gr
@@ -11018,236 +11675,165 @@ class Layout(pro.PyLayers):
         return paths
 
 
-def outputGi_func_test(args):
-    for k in range(10000):
-        y = k*k+k*k
-    return y
+def _relabel(i, cymap):
+    """ change the cycle numbers of an interaction
 
-def outputGi_func(args):
-# def outputGi_func(e, Gi_no, Gi_A, Gspos, sgsg, s2pc, s2pu):
+    Parameters
+    ----------
 
+    i : tuple
+        interaction (D, R or T)
+    cymap : dict
+        {cycle : new cycle}
 
-    # for k in range(10000):
-    #     y = k*k
-    #     # time.sleep(0.01)
-    # return y
+    """
+    if len(i) == 1:
+        return i
+    return (i[0],) + tuple([cymap[c] for c in i[1:]])
 
-    def Gspos(n):
-        if n>0:
-            #return np.mean(s2pc[n].reshape(2,2),axis=0)
-            return np.mean(s2pc[n].toarray().reshape(2,2),axis=0)
-        else:
-            return p2pc[-n]
-
-    e = args[0]
-    #Gi_no = args[1]
-    #Gi_A = args[2]
-    #p2pc = args[3]
-    #sgsg = args[4]
-    #s2pc = args[5]
-    #s2pu = args[6]
-
-    print(e)
-
-
-
-    i0 = e[0]
-    i1 = e[1]
-    nstr0 = i0[0]
-    nstr1 = i1[0]
-
-    # list of authorized outputs. Initialized void
-    output = []
-
-    # nstr1 : segment number of central interaction
-    if nstr1 > 0:
-        # central interaction is a segment
-        # pseg1 = self.s2pc[nstr1,:].toarray().reshape(2, 2).T
-        pseg1 = s2pc[nstr1,:].toarray().reshape(2, 2).T
-        # pseg1 = self.s2pc[nstr1,:].data.reshape(2, 2).T
-        # pseg1o = self.seg2pts(nstr1).reshape(2, 2).T
-
-        # create a Cone object
-        cn = cone.Cone()
-        # if starting from segment
-        if nstr0 > 0:
-            # pseg0 = self.s2pc[nstr0,:].toarray().reshape(2, 2).T
-            pseg0 = s2pc[nstr0,:].toarray().reshape(2, 2).T
-            # pseg0 = self.s2pc[nstr0,:].data.reshape(2, 2).T
-            # pseg0o = self.seg2pts(nstr0).reshape(2, 2).T
-
-            # if nstr0 and nstr1 are connected segments
-            if sgsg[nstr0,nstr1] == 0:
-                # from 2 not connected segment
-                cn.from2segs(pseg0, pseg1)
-            else:
-                # from 2 connected segments
-                cn.from2csegs(pseg0, pseg1)
-        # if starting from a point
+
+def _cydist(Gt, lcy, lair, ddiff):
+    """ distance of cycles from a set of cycles
+
+    Parameters
+    ----------
+
+    Gt : nx.Graph
+        graph of cycles
+    lcy : list
+        origin cycles
+    lair : set
+        air wall segments
+    ddiff : dict
+        diffraction points
+
+    Returns
+    -------
+
+    dist : dict
+        {cycle : distance}
+
+    Notes
+    -----
+
+    The distance is the minimum number of interactions counted in the
+    cutoff of Signatures.run : crossing an air wall costs 0, crossing another
+    segment or diffracting on a point costs 1. Cycle 0 is not crossed.
+
+    """
+    dpt = {}
+    for p in ddiff:
+        for c in ddiff[p][0]:
+            dpt.setdefault(c, []).append(p)
+    dist = {c: 0 for c in lcy}
+    dq = deque(lcy)
+    while dq:
+        c = dq.popleft()
+        d = dist[c]
+        lnb = []
+        for n in Gt[c]:
+            if n != 0:
+                w = 0 if len(lair.intersection(Gt[c][n]['segment'])) > 0 else 1
+                lnb.append((n, w))
+        for p in dpt.get(c, []):
+            lnb.extend([(n, 1) for n in ddiff[p][0] if n != 0])
+        for n, w in lnb:
+            if dist.get(n, np.inf) > d + w:
+                dist[n] = d + w
+                if w == 0:
+                    dq.appendleft(n)
+                else:
+                    dq.append(n)
+    return dist
+
+
+#
+# Parallel build
+#
+# The Layout is shared with the worker processes through the module global
+# _bL, which is set just before the creation of the pool. Workers are
+# forked (explicit fork context, see pyutil.forkcontext) and therefore
+# inherit the Layout (numpy geometry and graphs) without pickling. Only the
+# results are sent back to the parent process, in the order of the
+# arguments. Where fork is not available the build is sequential.
+#
+
+def _bmap(L, func, largs, nproc, data=None):
+    """ map func over largs in nproc worker processes
+
+    Parameters
+    ----------
+
+    L : Layout
+        shared with the workers as _bL
+    func : function
+        module level worker function
+    largs : list
+    nproc : int
+        number of processes (1 : sequential, 0 : cpu_count()).
+        Sequential if the fork start method is not available.
+    data : any
+        additional data shared with the workers as _bdata
+
+    Returns
+    -------
+
+    list of func(x) for x in largs
+
+    """
+    global _bL, _bdata
+    _bL = L
+    _bdata = data
+    if nproc == 0:
+        nproc = mp.cpu_count()
+    ctx = pyu.forkcontext()
+    try:
+        if (nproc == 1) or (len(largs) < 2) or (ctx is None):
+            res = [func(x) for x in largs]
         else:
-            pt = Gspos(nstr0)
-            cn.fromptseg(pt, pseg1)
-
-        # list all potential successors of interaction i1
-        ui2 = Gi_no.index(i1)
-        ui = np.where(Gi_A[ui2,:]!=0)[0]
-        i2 = [Gi_no[u] for u in ui]
-        # i2 = nx.neighbors(self.Gi, i1)
-
-        # how to find neighbors without network
-        # ngi=L.Gi.nodes()
-        # A=nx.adjacency_matrix(L.Gi)
-        # inter = ngi[10]
-        # u = ngi.index(inter)
-        # ui = A[u,:].indices
-        # neigh_inter = np.array([ngi[u] for u in ui])
-
-
-        ipoints = [x for x in i2 if len(x)==1 ]
-        #ipoints = filter(lambda x: len(x) == 1, i2)
-        pipoints = np.array([Gspos(ip[0]) for ip in ipoints]).T
-        # filter tuple (R | T)
-        #istup = filter(lambda x : type(eval(x))==tuple,i2)
-        # map first argument segment number
-        #isegments = np.unique(map(lambda x : eval(x)[0],istup))
-        # isegments = np.unique(
-        #     filter(lambda y: y > 0, map(lambda x: x[0], i2)))
-        isegments = np.unique([x[0] for x in i2 if x[0]>0])
-        
-        # if nstr0 and nstr1 are adjescent segment remove nstr0 from
-        # potential next interaction
-        # Fix 01/2017
-        # This is not always True if the angle between 
-        # the two adjascent segments is < pi/2
-        # nb_nstr0 = self.Gs.neighbors(nstr0)
-        # nb_nstr1 = self.Gs.neighbors(nstr1)
-        # nb_nstr0 = np.array([self.s2pu[nstr0,0],self.s2pu[nstr0,1]])
-        # nb_nstr1 = np.array([self.s2pu[nstr1,0],self.s2pu[nstr1,1]])
-        nb_nstr0 = s2pu[nstr0,:].toarray()[0]
-        nb_nstr1 = s2pu[nstr1,:].toarray()[0]
-        print('nb_nstr0',nb_nstr0)
-        #nb_nstr0 = s2pu[nstr0,:]
-        #nb_nstr1 = s2pu[nstr1,:]
-        # common_point = np.intersect1d(nb_nstr0,nb_nstr1)
-        common_point = np.array([x for x in nb_nstr0 if x in nb_nstr1])
-        # if len(common_point) == 1:
-        if common_point.any():
-            num0 = [x for x in nb_nstr0 if x != common_point]
-            num1 = [x for x in nb_nstr1 if x != common_point]
-            p0 = Gspos(num0[0])
-            p1 = Gspos(num1[0])
-            pc = Gspos(common_point[0])
-            v0 = p0-pc 
-            v1 = p1-pc 
-            v0n = v0/np.sqrt(np.sum(v0*v0))
-            v1n = v1/np.sqrt(np.sum(v1*v1))
-            if np.dot(v0n,v1n)<=0:
-                isegments = np.array([ x for x in isegments if x != nstr0 ]) 
-            #    filter(lambda x: x != nstr0, isegments))
-        # there are one or more segments
-        # if len(isegments) > 0:
-        if isegments.any():
-
-            li1 = len(i1)
-
-            points = self.s2pc[isegments,:].toarray().T
-            #points = s2pc[isegments,:].T
-            # points = self.s2pc[isegments,:].data.reshape(4,len(isegments))
-            # pointso = self.seg2pts(isegments)
-
-            pta = points[0:2, :]
-            phe = points[2:, :]
-            # add difraction points
-            # WARNING Diffraction points are added only if a segment is seen
-            # it should be the case in 99% of cases
-
-            if len(ipoints) > 0:
-                isegments = np.hstack(
-                    (isegments, np.array(ipoints)[:, 0]))
-                pta = np.hstack((pta, pipoints))
-                phe = np.hstack((phe, pipoints))
-
-            # cn.show()
-
-            # if i0 == (38,79) and i1 == (135,79,23):
-            #     printi0,i1
-            #     import ipdb
-            #     ipdb.set_trace()
-            # i1 : interaction T
-            if li1 == 3:
-                typ, prob = cn.belong_seg(pta, phe)
-                # if bs.any():
-                #    plu.displot(pta[:,bs],phe[:,bs],color='g')
-                # if ~bs.any():
-                #    plu.displot(pta[:,~bs],phe[:,~bs],color='k')
-
-            # i1 : interaction R --> mirror
-            elif li1 == 2:
-                Mpta = geu.mirror(pta, pseg1[:, 0], pseg1[:, 1])
-                Mphe = geu.mirror(phe, pseg1[:, 0], pseg1[:, 1])
-                typ, prob = cn.belong_seg(Mpta, Mphe)
-                # printi0,i1
-                # if ((i0 == (6, 0)) & (i1 == (7, 0))):
-                #    pdb.set_trace()
-                # if bs.any():
-                #    plu.displot(pta[:,bs],phe[:,bs],color='g')
-                # if ~bs.any():
-                #    plu.displot(pta[:,~bs],phe[:,~bs],color='m')
-                #    plt.show()
-                #    pdb.set_trace())
-            ########
-            # SOMETIMES PROBA IS 0 WHEREAS SEG IS SEEN
-            ###########
-            # # keep segment with prob above a threshold
-            # isegkeep = isegments[prob>0]
-            # # dict   {numint : proba}
-            # dsegprob = {k:v for k,v in zip(isegkeep,prob[prob>0])}
-            # 4 lines are replaced by
-            # keep segment with prob above a threshold
-            utypseg = typ != 0
-            isegkeep = isegments[utypseg]
-            # dict   {numint : proba}
-            dsegprob = {k: v for k, v in zip(isegkeep, prob[utypseg])}
-            #########
-            # output = filter(lambda x: x[0] in isegkeep, i2)
-            output = [x for x in i2 if x[0] in isegkeep]
-            # probint = map(lambda x: dsegprob[x[0]], output)
-            probint = [dsegprob[x[0]] for x in output]
-            # dict interaction : proba
-            dintprob = {k: v for k, v in zip(output, probint)}
+            pool = ctx.Pool(nproc)
+            try:
+                res = pool.map(func, largs)
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        _bL = None
+        _bdata = None
+    return res
+
+
+def _vnodes_func(k):
+    """ vnodes of polygon _bdata[k]
+    """
+    p = _bdata[k]
+    p.setvnodes_new(_bL.get_points(p), _bL)
+    return p.vnodes
 
-            # keep all segment above nstr1 and in Cone if T
-            # keep all segment below nstr1 and in Cone if R
 
-    else:
-        # central interaction is a point
+def _diffpoint_func(k):
+    """ diffraction of point k (see Layout._diffpoint)
+    """
+    dangles, difftol = _bdata
+    return _bL._diffpoint(k, dangles, difftol)
 
-        # 1) Simple approach
-        #       output interaction are all visible interactions
-        # 2) TO BE DONE
-        #
-        #       output of the diffraction points
-        #       exploring
-        # b
-        #          + right of ISB
-        #          + right of RSB
-        #
-        #  + using the wedge cone
-        #  + using the incident cone
-        #
 
-        # output = nx.neighbors(self.Gi, (nstr1,))
-        uout = Gi_no.index((nstr1,))
-        ui = np.where(Gi_A[uout,:]!=0)[0]
-        output = [Gi_no[u] for u in ui]
+def _buildGv_func(icycle):
+    """ visibility graph of cycle icycle (see Layout._buildGv_cycle)
+    """
+    return _bL._buildGv_cycle(icycle)
+
 
-        nout = len(output)
-        probint = np.ones(nout)  # temporarybns
-        dintprob = {k: v for k, v in zip(output, probint)}
+def _buildGi_func(cy):
+    """ Gi edges of cycle cy (see Layout._buildGi_cycle)
+    """
+    return _bL._buildGi_cycle(cy)
 
-    return (i0,i1, {'output':dintprob})
-    # self.Gi.add_edge(i0, i1, output=dintprob)
 
+def _outputGi_func(e):
+    """ output of Gi edge e (see Layout._outputGi_edge)
+    """
+    return _bL._outputGi_edge(e)
 
 if __name__ == "__main__":
     plt.ion()
@@ -29,6 +29,9 @@ except:
     print("Warning : imposm seems not to be installed")
 import networkx as nx
 import numpy as np
+import bz2
+import gzip
+import xml.etree.ElementTree as ET
 import pdb
 
 # classes that handle the OSM data file format.
@@ -906,6 +909,166 @@ def osmparse(_filename,typ='indoor',verbose=False,c=True,n=True,w=True,r=True,ca
     return coords,nodes,ways,relations,m
 
 
+def _osmopen(filename):
+    """ open an osm file (.osm, .osm.bz2 or .osm.gz)
+    """
+    if filename.endswith('.bz2'):
+        return bz2.BZ2File(filename, 'rb')
+    if filename.endswith('.gz'):
+        return gzip.GzipFile(filename, 'rb')
+    return open(filename, 'rb')
+
+
+def _iterosm(filename, tag):
+    """ iterate over the elements of an osm file without loading it
+
+    Parameters
+    ----------
+
+    filename : string
+    tag : string
+        'node' | 'way'
+
+    Notes
+    -----
+
+    Each yielded element is cleared afterwards, as are its previous
+    siblings, so the memory used by the parser does not grow with the
+    file size.
+
+    """
+    with _osmopen(filename) as fd:
+        context = ET.iterparse(fd, events=('start', 'end'))
+        _, root = next(context)
+        for event, elem in context:
+            if event != 'end':
+                continue
+            if elem.tag == tag:
+                yield elem
+            if elem.tag in ('node', 'way', 'relation'):
+                elem.clear()
+                root.clear()
+
+
+def osmstream(filename, typ='indoor', bbox=[], chunk=65536):
+    """ streaming two-pass parser of an osm file
+
+    Parameters
+    ----------
+
+    filename : string
+        osm file (.osm, .osm.bz2 or .osm.gz)
+    typ : string
+        'indoor' : all ways are kept
+        'outdoor' : only buildings are kept
+    bbox : list
+        (lonmin,latmin,lonmax,latmax), only the ways which have all their
+        nodes inside bbox are kept ([] : no filtering)
+    chunk : int
+        size of the node buffers
+
+    Returns
+    -------
+
+    dosm : dict
+        'lonlat' : np.array (Np x 2) coordinates of the kept nodes
+        'osmid' : np.array (Np) osm id of the kept nodes
+        'tahe' : np.array (2 x Ns) node index of the segments
+        'iway' : np.array (Ns) way index of the segments
+        'tags' : list of the tags of the kept ways
+
+    Notes
+    -----
+
+    The first pass reads the nodes and stores the ones inside bbox
+    in compact numpy arrays, sorted by osm id (searchsorted is used as
+    id -> index hash). The second pass reads the ways and converts their
+    references into node indices. Unlike osmparse, no python object is
+    created per node, and with a bbox the memory only depends on the
+    content of the bbox.
+
+    See Also
+    --------
+
+    pylayers.gis.layout.Layout.importosm
+
+    """
+    #
+    # pass 1 : nodes
+    #
+    lid = []
+    lll = []
+    bid = []
+    bll = []
+    for elem in _iterosm(filename, 'node'):
+        lon = float(elem.get('lon'))
+        lat = float(elem.get('lat'))
+        if len(bbox) > 0:
+            if ((lon < bbox[0]) or (lon > bbox[2]) or
+                (lat < bbox[1]) or (lat > bbox[3])):
+                continue
+        bid.append(int(elem.get('id')))
+        bll.append((lon, lat))
+        if len(bid) == chunk:
+            lid.append(np.array(bid, dtype=np.int64))
+            lll.append(np.array(bll, dtype=float))
+            bid = []
+            bll = []
+    lid.append(np.array(bid, dtype=np.int64))
+    lll.append(np.array(bll, dtype=float).reshape(-1, 2))
+    nid = np.hstack(lid)
+    nll = np.vstack(lll)
+    u = np.argsort(nid, kind='mergesort')
+    nid = nid[u]
+    nll = nll[u]
+
+    #
+    # pass 2 : ways
+    #
+    lref = []
+    lptr = [0]
+    ltags = []
+    for elem in _iterosm(filename, 'way'):
+        tags = {t.get('k'): t.get('v') for t in elem.iter('tag')}
+        if (typ == 'outdoor') and ('building' not in tags):
+            continue
+        refs = np.array([int(n.get('ref')) for n in elem.iter('nd')],
+                        dtype=np.int64)
+        if len(refs) < 2:
+            continue
+        ir = np.searchsorted(nid, refs)
+        ir = np.minimum(ir, len(nid) - 1)
+        if (len(nid) == 0) or (not (nid[ir] == refs).all()):
+            # a node is missing (outside bbox)
+            continue
+        lref.append(ir)
+        lptr.append(lptr[-1] + len(ir))
+        ltags.append(tags)
+
+    if len(lref) == 0:
+        return {'lonlat': np.zeros((0, 2)),
+                'osmid': np.zeros(0, dtype=np.int64),
+                'tahe': np.zeros((2, 0), dtype=int),
+                'iway': np.zeros(0, dtype=int),
+                'tags': []}
+    ref = np.hstack(lref)
+    ptr = np.array(lptr)
+    # segments : consecutive nodes of a way
+    last = np.zeros(len(ref), dtype=bool)
+    last[ptr[1:] - 1] = True
+    k = np.where(~last)[0]
+    iway = np.searchsorted(ptr, k, side='right') - 1
+    # keep only referenced nodes
+    used, inv = np.unique(ref, return_inverse=True)
+    inv = np.ravel(inv)
+    tahe = np.vstack((inv[k], inv[k + 1]))
+    return {'lonlat': nll[used],
+            'osmid': nid[used],
+            'tahe': tahe,
+            'iway': iway,
+            'tags': ltags}
+
+
 def extract(alat,alon,fileosm,fileout):
     """ extraction of an osm sub region using osmconvert
 
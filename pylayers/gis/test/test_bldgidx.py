@@ -0,0 +1,113 @@
+import os
+import unittest
+import numpy as np
+import pylayers.util.pyutil as pyu
+from pylayers.gis.ezone import Ezone
+
+
+def m(x, y, inverse=False):
+    """ identity projection (lon,lat) <-> (x,y)
+    """
+    return np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+
+
+def zone(prefix='test_bldgidx'):
+    """ flat zone with 2 square footprints of 10 m
+    """
+    E = Ezone.__new__(Ezone)
+    E.prefix = prefix
+    E.m = m
+    E.extent = (-50., 50., -50., 50.)
+    E.lonstep = 1.
+    E.latstep = 1.
+    E.hgts = np.zeros((102, 102))
+    A = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=float)
+    B = A + np.array([20, 0])
+    E.dbldg = {'i0-0': [np.array([[0, 0, 0, 10.], [0, 0, 0, 12.]]), [A, B]]}
+    return E
+
+
+class TestBldgIdx(unittest.TestCase):
+
+    def setUp(self):
+        self.E = zone()
+        self.E.bldgindex(cellsize=2)
+        # (pa, pb, {building : length inside})
+        s2 = np.sqrt(2)
+        self.links = [((-5, 5), (35, 5), {0: 10, 1: 10}),
+                      # termination inside
+                      ((5, 5), (-5, 5), {0: 5}),
+                      ((-5, 5), (25, 5), {0: 10, 1: 5}),
+                      ((22, 8), (35, 8), {1: 8}),
+                      # diagonal through 2 vertices
+                      ((-5, -5), (15, 15), {0: 10*s2}),
+                      # only touches the corner (0,0)
+                      ((-5, 5), (5, -5), {}),
+                      # no building
+                      ((-5, 20), (35, 20), {})]
+
+    def cross(self, E):
+        pa = np.array([l[0] for l in self.links], dtype=float)
+        pb = np.array([l[1] for l in self.links], dtype=float)
+        il, ib, lin = E.bldgcross(pa, pb)
+        d = {}
+        for k in range(len(il)):
+            d[(il[k], ib[k])] = lin[k]
+        return d
+
+    def test_bldgindex(self):
+        E = self.E
+        self.assertEqual(E.bidx.cs, 2)
+        self.assertEqual(len(E.bh), 2)
+        self.assertEqual(E.bh[1], 12)
+        self.assertEqual(E.bseg.tolist(), [0]*4 + [1]*4)
+
+    def test_bldgcross(self):
+        d = self.cross(self.E)
+        lk = [(k, b) for k, l in enumerate(self.links) for b in l[2]]
+        self.assertEqual(sorted(d.keys()), sorted(lk))
+        for k, l in enumerate(self.links):
+            for b in l[2]:
+                self.assertAlmostEqual(d[(k, b)], l[2][b])
+
+    def test_route_profile(self):
+        E = self.E
+        E.route(np.array([-5., 5.]), np.array([[35., 5.], [5., 5.], [-5., 20.]]),
+                Nr=20, bldg=True)
+        np.testing.assert_allclose(E.lbldg, [20, 5, 0])
+        data = E.profile((-5., 5.), (35., 5.), Npt=50, bldg=True)
+        np.testing.assert_allclose(data['lbldg'], [10, 10])
+        self.assertEqual(data['bldg'].tolist(), [0, 1])
+        data = E.profile((-5., 5.), (35., 5.), Npt=50)
+        self.assertEqual(len(data['lbldg']), 0)
+
+    def test_h5(self):
+        E = self.E
+        fileh5 = pyu.getlong(E.prefix + '.h5', os.path.join('gis', 'h5'))
+        if os.path.isfile(fileh5):
+            os.remove(fileh5)
+        if not os.path.isdir(os.path.dirname(fileh5)):
+            os.makedirs(os.path.dirname(fileh5))
+        # footprints are not saved : the index comes from the bldgidx group
+        del E.dbldg
+        E.saveh5()
+        try:
+            E2 = zone()
+            del E2.dbldg
+
+            def nobuild(*args, **kwargs):
+                raise AssertionError('bldgindex called')
+            E2.bldgindex = nobuild
+            E2.loadh5()
+        finally:
+            os.remove(fileh5)
+        g1 = E.bidx.todict()
+        g2 = E2.bidx.todict()
+        for k in g1:
+            np.testing.assert_array_equal(g1[k], g2[k])
+        for k in ['bpt', 'bptr', 'bh', 'bseg', 'bta', 'bhe']:
+            np.testing.assert_array_equal(E.__dict__[k], E2.__dict__[k])
+        self.assertEqual(self.cross(E), self.cross(E2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from pylayers.gis.demtile import TileStore, tilename
+
+
+class TestTileStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        # 4 adjacent tiles sampling the plane h = 100*lon + 20*lat
+        n = 21
+        for ilon in [-2, -1]:
+            for ilat in [47, 48]:
+                lon = np.linspace(ilon, ilon + 1, n)[None, :]
+                lat = np.linspace(ilat + 1, ilat, n)[:, None]
+                h = np.round(100*lon + 20*lat + 1000).astype('>i2')
+                h.tofile(os.path.join(self.dirname, tilename(ilon, ilat) + '.HGT'))
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_height(self):
+        T = TileStore(self.dirname, maxtile=2)
+        lon = np.random.uniform(-2, 0, 1000)
+        lat = np.random.uniform(47, 49, 1000)
+        h = T.height(lon, lat)
+        np.testing.assert_allclose(h, 100*lon + 20*lat + 1000, atol=1e-9)
+        # lru bound
+        self.assertEqual(T.stats()['open'], 2)
+        # missing tile
+        self.assertEqual(T.height(np.array([5.5]), np.array([48.5]))[0], 0)
+
+    def test_profiles(self):
+        T = TileStore(self.dirname)
+        pa = np.array([[-1.9, 47.2], [-0.5, 48.9]])
+        pb = np.array([[-0.1, 48.8], [-1.5, 47.1]])
+        h, lon, lat = T.profiles(pa, pb, Npt=50)
+        self.assertEqual(h.shape, (2, 50))
+        np.testing.assert_allclose(h, 100*lon + 20*lat + 1000, atol=1e-9)
+        g = T.grid((-1.5, -0.5, 47.5, 48.5), 11, 5)
+        np.testing.assert_allclose(g[0, 0], 100*(-1.5) + 20*48.5 + 1000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from pylayers.gis.demtile import tilename
+from pylayers.gis.ezone import Ezone
+
+
+def m(x, y, inverse=False):
+    """ identity projection (lon,lat) <-> (x,y)
+    """
+    return np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+
+
+class TestEzoneTiles(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        # 4 adjacent tiles sampling the plane h = 100*lon + 20*lat
+        n = 21
+        for ilon in [-2, -1]:
+            for ilat in [47, 48]:
+                lon = np.linspace(ilon, ilon + 1, n)[None, :]
+                lat = np.linspace(ilat + 1, ilat, n)[:, None]
+                h = np.round(100*lon + 20*lat + 1000).astype('>i2')
+                h.tofile(os.path.join(self.dirname, tilename(ilon, ilat) + '.HGT'))
+        # multi-tile zone : no hgts, heights come from the store only
+        self.E = Ezone.__new__(Ezone)
+        self.E.m = m
+        self.E.extent = (-2., 0., 47., 49.)
+        self.E.usetiles(self.dirname)
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def plane(self, lon, lat):
+        return 100*lon + 20*lat + 1000
+
+    def test_profiles(self):
+        pa = np.array([[-1.9, 47.2], [-0.5, 48.9]])
+        pb = np.array([[-0.1, 48.8], [-1.5, 47.1]])
+        height, d = self.E.profiles(pa, pb, Npt=50)
+        self.assertEqual(height.shape, (2, 50))
+        s = np.linspace(0, 1, 50)[None, :]
+        lon = pa[:, 0][:, None] + (pb - pa)[:, 0][:, None]*s
+        lat = pa[:, 1][:, None] + (pb - pa)[:, 1][:, None]*s
+        np.testing.assert_allclose(height, self.plane(lon, lat), atol=1e-6)
+
+    def test_profile(self):
+        data = self.E.profile((-1.9, 47.2), (-0.1, 48.8), Npt=50)
+        lon = np.linspace(-1.9, -0.1, 50)
+        lat = np.linspace(47.2, 48.8, 50)
+        np.testing.assert_allclose(data['height'], self.plane(lon, lat), atol=1e-6)
+
+    def test_route(self):
+        # heights read by route
+        lh = []
+        getheight = self.E.getheight
+
+        def spy(lon, lat, source='srtm'):
+            lh.append(getheight(lon, lat, source=source))
+            return lh[-1]
+        self.E.getheight = spy
+        pb = np.array([[-0.1, 48.8], [-1.5, 47.1]])
+        L, lon, lat = self.E.route(np.array([-1.9, 47.2]), pb, Nr=20)
+        self.assertEqual(lon.shape, (2, 20))
+        np.testing.assert_allclose(lon[:, -1], pb[:, 0])
+        self.assertEqual(len(lh), 1)
+        np.testing.assert_allclose(lh[0], self.plane(lon, lat), atol=1e-6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import networkx as nx
+import scipy.sparse as sparse
+import pylayers.gis.laybin as laybin
+
+
+class TestLaybin(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_graph(self):
+        Gi = nx.DiGraph(name='Gi')
+        Gi.pos = {}
+        for i in [(-1,), (2, 1), (3, 1, 2), (3, 2, 1)]:
+            Gi.add_node(i)
+            Gi.pos[i] = (float(len(i)), 1.)
+        Gi.add_edge((-1,), (2, 1), output={(3, 1, 2): 0.5})
+        Gi.add_edge((2, 1), (3, 1, 2), output={})
+        Gt = nx.Graph(name='Gt')
+        Gt.add_node(0, hash='abc')
+        Gt.add_node(1, indoor=True)
+        Gt.add_edge(0, 1, segment=[3])
+
+        darr = {}
+        dattr = {}
+        for name, G in [('Gi', Gi), ('Gt', Gt)]:
+            a, dattr[name + '_attr'] = laybin.graph2arr(G, prefix=name + '_')
+            darr.update(a)
+        darr.update(laybin.sparse2arr(sparse.lil_matrix(np.eye(3)), prefix='sp_'))
+        path = os.path.join(self.dirname, 'bin')
+        laybin.write(path, darr, {'hash': 'abc'}, dattr)
+
+        meta, darr = laybin.read(path)
+        self.assertEqual(meta['hash'], 'abc')
+        self.assertTrue(isinstance(darr['Gi_nodes'], np.memmap))
+        Gi2 = laybin.arr2graph(darr, laybin.readattr(path, 'Gi_attr'), prefix='Gi_')
+        Gt2 = laybin.arr2graph(darr, laybin.readattr(path, 'Gt_attr'), prefix='Gt_')
+        self.assertTrue(Gi2.is_directed())
+        self.assertEqual(set(Gi2.edges()), set(Gi.edges()))
+        self.assertEqual(Gi2[(-1,)][(2, 1)]['output'], {(3, 1, 2): 0.5})
+        self.assertEqual(Gi2.pos, Gi.pos)
+        self.assertEqual(Gt2.nodes[0]['hash'], 'abc')
+        self.assertEqual(Gt2[1][0]['segment'], [3])
+        self.assertFalse(hasattr(Gt2, 'pos'))
+        M = laybin.arr2sparse(darr, prefix='sp_')
+        self.assertTrue((M.toarray() == np.eye(3)).all())
+
+    def test_version(self):
+        path = os.path.join(self.dirname, 'bin')
+        laybin.write(path, {'a': np.arange(3)}, {})
+        laybin.VERSION += 1
+        try:
+            meta, darr = laybin.read(path)
+        finally:
+            laybin.VERSION -= 1
+        self.assertTrue(meta is None)
+
+if __name__ == '__main__':
+    unittest.main()
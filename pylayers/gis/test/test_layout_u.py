@@ -44,6 +44,43 @@ class TestLayout(unittest.TestCase):
         L = Layout('defstr.lay')
         L.build()
 
+    def test_build_nproc(self):
+        L = Layout('defstr.lay')
+        L.build()
+        L2 = Layout('defstr.lay')
+        L2.build(nproc=2)
+        self.assertEqual(list(L.Gv.edges()),list(L2.Gv.edges()))
+        self.assertEqual(list(L.Gi.edges()),list(L2.Gi.edges()))
+        self.assertEqual(L.ddiff.keys(),L2.ddiff.keys())
+        for e in L.Gi.edges():
+            self.assertEqual(L.Gi[e[0]][e[1]]['output'].keys(),
+                             L2.Gi[e[0]][e[1]]['output'].keys())
+        self.assertTrue('outputGi' in L2.tbuild)
+
+    def test_rebuild(self):
+        L = Layout('defstr.lay')
+        L.build()
+        L.edit_seg(1,data={'name':'METAL'})
+        L.rebuild()
+        L2 = Layout('defstr.lay')
+        L2.edit_seg(1,data={'name':'METAL'})
+        L2.build()
+        self.assertEqual(set(L.Gi.edges()),set(L2.Gi.edges()))
+        for e in L.Gi.edges():
+            self.assertEqual(L.Gi[e[0]][e[1]]['output'],
+                             L2.Gi[e[0]][e[1]]['output'])
+
+    def test_loadbin(self):
+        L = Layout('defstr.lay',bbuild=True)
+        L2 = Layout('defstr.lay',bgraphs=True)
+        self.assertTrue(isinstance(L2.pt,np.memmap))
+        self.assertTrue((L2.tahe==L.tahe).all())
+        self.assertEqual(set(L2.Gs.edges()),set(L.Gs.edges()))
+        self.assertEqual(set(L2.Gi.edges()),set(L.Gi.edges()))
+        for e in L.Gi.edges():
+            self.assertEqual(L.Gi[e[0]][e[1]]['output'],
+                             L2.Gi[e[0]][e[1]]['output'])
+
     def test_cleanup(self):
         L1.add_fnod(p=(10,10))
         L1.cleanup()
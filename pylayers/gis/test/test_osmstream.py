@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from pylayers.gis.osmparser import osmstream
+
+OSM = """<?xml version="1.0"?>
+<osm version="0.6">
+<node id="5" lon="0.0" lat="0.0"/>
+<node id="2" lon="1.0" lat="0.0"/>
+<node id="9" lon="1.0" lat="1.0"><tag k="a" v="b"/></node>
+<node id="3" lon="0.0" lat="1.0"/>
+<node id="7" lon="5.0" lat="5.0"/>
+<way id="1"><nd ref="5"/><nd ref="2"/><nd ref="9"/><nd ref="3"/><nd ref="5"/>
+<tag k="building" v="yes"/></way>
+<way id="2"><nd ref="9"/><nd ref="7"/><tag k="building" v="yes"/></way>
+<way id="3"><nd ref="5"/><nd ref="9"/><tag k="highway" v="path"/></way>
+</osm>
+"""
+
+
+class TestOsmStream(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.fileosm = os.path.join(self.dirname, 'test.osm')
+        with open(self.fileosm, 'w') as fd:
+            fd.write(OSM)
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_all(self):
+        d = osmstream(self.fileosm, chunk=2)
+        self.assertEqual(d['tahe'].shape, (2, 6))
+        self.assertEqual(len(d['tags']), 3)
+        np.testing.assert_equal(d['osmid'], [2, 3, 5, 7, 9])
+
+    def test_bbox(self):
+        d = osmstream(self.fileosm, typ='outdoor', bbox=[-1, -1, 2, 2])
+        # way 2 has a node outside bbox, way 3 is not a building
+        self.assertEqual(len(d['tags']), 1)
+        ll = d['lonlat'][d['tahe']]
+        # closed polygon of 4 unit segments
+        L = np.sqrt(np.sum((ll[1] - ll[0])**2, axis=1))
+        np.testing.assert_allclose(L, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2486,14 +2486,13 @@ class Body(PyLayers):
         lmd = 0.075
         for k in range (self.ncyl):
             if k not in cyl:
+                # self.sl is a float array
+                kta  = int(self.sl[k,0])
+                khe  = int(self.sl[k,1])
                 if topos  == True:
-                    kta  = self.sl[k,0]
-                    khe  = self.sl[k,1]
                     C = self.topos[:,kta]
                     D = self.topos[:,khe]
                 else:
-                    kta  = self.sl[k,0]
-                    khe  = self.sl[k,1]
                     C = self.d[:,kta,frameId]
                     D = self.d[:,khe,frameId]
 
@@ -2643,6 +2642,191 @@ class Body(PyLayers):
             link_vis[k] =  sum(inter)
         return link_vis
 
+    def setccs_frames(self, frames=[]):
+        """ set cylinder coordinate systems for a set of frames
+
+        Parameters
+        ----------
+
+        frames : list or np.array
+            frame ids (default all frames)
+
+        Returns
+        -------
+
+        accs : ndarray (nc,3,3,nf)
+            same layout as the mocap ccs (_ccs), accs[:,:,:,k] is the ccs
+            of setccs(frameId=frames[k])
+
+        """
+        if len(frames) == 0:
+            frames = np.arange(self.nframes)
+        frames = np.asarray(frames)
+        if self.mocapccs:
+            self.accs = self._ccs[:, :, :, frames]
+        else:
+            nc = self.ncyl
+            nf = len(frames)
+            kta = self.sl[:, 0].astype(int)
+            khe = self.sl[:, 1].astype(int)
+            # pA, pB : 3 x nc x nf
+            pA = self.d[:, kta, :][:, :, frames]
+            pB = self.d[:, khe, :][:, :, frames]
+            vg = self.vg[:, np.newaxis, frames] * np.ones((1, nc, 1))
+            # T : (nc x nf) x 3 x 3
+            T = geu.onb(pA.reshape(3, -1), pB.reshape(3, -1), vg.reshape(3, -1))
+            self.accs = T.reshape(nc, nf, 3, 3).transpose(0, 2, 3, 1)
+        return self.accs
+
+    def setdcs_frames(self, frames=[]):
+        """ set device coordinate systems for a set of frames
+
+        Parameters
+        ----------
+
+        frames : list or np.array
+            frame ids (default all frames)
+
+        Returns
+        -------
+
+        adcs : dictionnary
+            adcs[dev] is a (3,4,nf) array, adcs[dev][:,:,k] is the dcs of
+            setdcs(topos=False,frameId=frames[k])
+
+        """
+        if len(frames) == 0:
+            frames = np.arange(self.nframes)
+        frames = np.asarray(frames)
+        accs = self.setccs_frames(frames)
+        self.adcs = {}
+        for dev in self.dev.keys():
+            if self.dev[dev]['status'] == 'simulated':
+                Id = int(self.dcyl[self.dev[dev]['cyl']])
+                alpha = self.dev[dev]['a'] * np.pi / 180.
+                l = self.dev[dev]['l']
+                h = self.dev[dev]['h']
+                kta = int(self.sl[Id, 0])
+                khe = int(self.sl[Id, 1])
+                Rcyl = self.sl[Id, 2]
+                # pta, phe : 3 x nf
+                pta = self.d[:, kta, frames]
+                phe = self.d[:, khe, frames]
+                lmax = np.sqrt(np.sum((phe - pta) ** 2, axis=0))
+                # CCS : 3 x 3 x nf
+                CCS = accs[Id, :, :, :]
+                # rotation of alpha around the cylinder axis
+                u = np.cos(alpha) * CCS[:, 0, :] + np.sin(alpha) * CCS[:, 1, :]
+                v = -np.sin(alpha) * CCS[:, 0, :] + np.cos(alpha) * CCS[:, 1, :]
+                w = CCS[:, 2, :]
+                origin = pta + w * (l * lmax) + u * (Rcyl + h)
+                self.adcs[dev] = np.concatenate((origin[:, np.newaxis, :],
+                                                 u[:, np.newaxis, :],
+                                                 v[:, np.newaxis, :],
+                                                 w[:, np.newaxis, :]), axis=1)
+            else:
+                # mp : nf x nmarkers x 3
+                mp = self._f[frames][:, self.dev[dev]['uc3d'], :]
+                if len(self.dev[dev]['uc3d']) > 2:
+                    vm = np.diff(mp, axis=1)[:, :3, :]
+                    mvm = np.sqrt(np.sum(vm * vm, axis=1))
+                    T = vm / mvm[:, np.newaxis, :]
+                    T[:, :, 2] = np.cross(T[:, :, 0], T[:, :, 1])
+                    T[:, :, 1] = np.cross(T[:, :, 0], T[:, :, 2])
+                    Tn = T / np.sqrt(np.sum(T * T, axis=1))[:, np.newaxis, :]
+                    Tn = Tn.transpose(1, 2, 0)
+                    mp0 = mp[:, 0, :].T
+                else:
+                    if 'asscyl' not in self.dev[dev]:
+                        # find the closest cylinder to the device
+                        c0 = self.sl[:, 0].astype(int)
+                        c1 = self.sl[:, 1].astype(int)
+                        pta = self.d[:, c0, 0]
+                        phe = self.d[:, c1, 0]
+                        de = self._f[0, self.dev[dev]['uc3d'][0], :][np.newaxis]
+                        dtad = np.sqrt(np.sum((pta - de.T) ** 2, axis=0))
+                        dhed = np.sqrt(np.sum((phe - de.T) ** 2, axis=0))
+                        mta = np.min(dtad)
+                        mhe = np.min(dhed)
+                        if mta < mhe:
+                            um = np.where(dtad == mta)[0]
+                        else:
+                            um = np.where(dhed == mhe)[0]
+                        self.dev[dev]['asscyl'] = um[0]
+                    mp0 = np.mean(mp, axis=1).T
+                    Tn = accs[self.dev[dev]['asscyl'], :, :, :]
+                self.adcs[dev] = np.concatenate((mp0[:, np.newaxis, :], Tn), axis=1)
+        return self.adcs
+
+    def body_link_frames(self, frames=[], cyl=[]):
+        """ body links shadowing for a set of frames
+
+        Parameters
+        ----------
+
+        frames : list or np.array
+            frame ids (default all frames)
+        cyl : list
+            exclusion list of cylinders
+
+        Returns
+        -------
+
+        link_vis : np.array (nf,nlinks)
+            number of cylinders intersecting the link
+        clearance : np.array (nf,nlinks)
+            minimal distance between the link and the cylinders surface
+            (negative when the link goes through a cylinder)
+        kcyl : np.array (nf,nlinks)
+            closest cylinder
+
+        Notes
+        -----
+
+        The link / cylinder axis distance is the one of intersectBody
+        (clipped parametrization of dmin3d) evaluated for all the frames,
+        links and cylinders at once. self.links is the list of device
+        couples (as in body_link).
+
+        See Also
+        --------
+
+        pylayers.mobility.ban.body.Body.intersectBody
+        pylayers.mobility.ban.DeuxSeg.dmin3d
+
+        """
+        if len(frames) == 0:
+            frames = np.arange(self.nframes)
+        frames = np.asarray(frames)
+        adcs = self.setdcs_frames(frames)
+        ldev = list(self.dev.keys())
+        self.links = list(itt.combinations(ldev, 2))
+        if len(self.links) == 0:
+            z = np.zeros((len(frames), 0))
+            return z.astype(int), z, z.astype(int)
+        ia, ib = np.array(list(itt.combinations(range(len(ldev)), 2))).T
+        # P : 3 x ndev x nf
+        P = np.array([adcs[dev][:, 0, :] for dev in ldev]).transpose(1, 0, 2)
+        A = P[:, ia, :]
+        B = P[:, ib, :]
+        kc = np.array([k for k in range(self.ncyl) if k not in cyl], dtype=int)
+        C = self.d[:, self.sl[kc, 0].astype(int), :][:, :, frames]
+        D = self.d[:, self.sl[kc, 1].astype(int), :][:, :, frames]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # alpha, beta : nlinks x ncyl x nf
+            alpha, beta, dmin = seg.dmin3d(A, B, C, D)
+            alpha = np.clip(alpha, 0, 1)
+            beta = np.clip(beta, 0, 1)
+            dmin = np.sqrt(seg.dist(A, B, C, D, alpha, beta)[1])
+        r = self.sl[kc, 2][np.newaxis, :, np.newaxis]
+        link_vis = np.sum(dmin < r, axis=1).T
+        dc = dmin - r
+        dc[np.isnan(dc)] = np.inf
+        u = np.argmin(dc, axis=1)
+        clearance = np.min(dc, axis=1).T
+        kcyl = kc[u].T
+        return link_vis, clearance, kcyl
+
 
     def cylinder_basis_k(self, frameId):
         """ cylinder basis k
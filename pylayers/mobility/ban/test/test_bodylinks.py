@@ -0,0 +1,35 @@
+import unittest
+import numpy as np
+from pylayers.mobility.ban.body import Body
+
+
+class TestBodyLinkFrames(unittest.TestCase):
+
+    def setUp(self):
+        self.B = Body()
+        self.frames = np.arange(0, self.B.nframes, max(1, self.B.nframes // 10))
+
+    def test_dcs(self):
+        adcs = self.B.setdcs_frames(self.frames)
+        for k, f in enumerate(self.frames):
+            self.B.setccs(frameId=f)
+            self.B.setdcs(topos=False, frameId=f)
+            for dev in self.B.dev:
+                np.testing.assert_allclose(adcs[dev][:, :, k], self.B.dcs[dev])
+
+    def test_links(self):
+        vis, clearance, kcyl = self.B.body_link_frames(self.frames)
+        nl = len(self.B.links)
+        self.assertEqual(vis.shape, (len(self.frames), nl))
+        self.assertTrue(np.all((vis > 0) == (clearance < 0)))
+        for k, f in enumerate(self.frames):
+            self.B.setccs(frameId=f)
+            self.B.setdcs(topos=False, frameId=f)
+            for l, link in enumerate(self.B.links):
+                A = self.B.dcs[link[0]][:, 0]
+                B = self.B.dcs[link[1]][:, 0]
+                inter = self.B.intersectBody(A, B, topos=False, frameId=f)
+                self.assertEqual(np.sum(inter) > 0, vis[k, l] > 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import numpy as np
+from pylayers.mobility.transit.crowd import Crowd
+
+
+class TestCrowd(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        # corridor 0 < y < 4 along x, closed at both ends
+        self.pta = np.array([[-1, 0], [-1, 4], [-1, 0], [41, 0]]).T
+        self.phe = np.array([[41, 0], [41, 4], [-1, 4], [41, 4]]).T
+
+    def test_neighbours(self):
+        p = np.random.rand(2, 300) * 20
+        C = Crowd(p, p)
+        i, j, d = C.neighbours(3)
+        D = np.sqrt(np.sum((p[:, None, :] - p[:, :, None]) ** 2, axis=0))
+        np.fill_diagonal(D, np.inf)
+        bi, bj = np.where(D < 3)
+        self.assertEqual(sorted(zip(i, j)), sorted(zip(bi, bj)))
+        np.testing.assert_allclose(d, p[:, j] - p[:, i])
+
+    def test_corridor(self):
+        # two groups crossing in the corridor
+        N = 100
+        x = np.hstack((np.random.uniform(0, 8, N // 2), np.random.uniform(32, 40, N // 2)))
+        y = np.random.uniform(0.5, 3.5, N)
+        dest = np.vstack((40 - x, y))
+        C = Crowd(np.vstack((x, y)), dest, walls=(self.pta, self.phe),
+                  behaviors=['seek', 'containment', 'interpenetration'])
+        t, P = C.run(60, dt=0.1)
+        self.assertTrue(np.all(P[:, 1, :] > 0) and np.all(P[:, 1, :] < 4))
+        self.assertTrue(np.mean(C.done) > 0.9)
+
+    def test_separation(self):
+        # loop version of SteeringBehavior.Separation
+        N = 200
+        p = np.random.rand(2, N) * 15
+        C = Crowd(p, p)
+        C.v = np.random.randn(2, N) * 0.3
+        C.ly = C.v / np.sqrt(np.sum(C.v ** 2, axis=0))
+        i, j, d = C.neighbours()
+        acc = C.separation(i, j, d)
+        for a in range(N):
+            ref = np.zeros(2)
+            sd = 6.0 * np.sqrt(np.sum(C.v[:, a] ** 2)) / C.max_speed[a]
+            for b in range(N):
+                sep = p[:, b] - p[:, a]
+                dist = np.sqrt(np.sum(sep ** 2))
+                if b != a and np.dot(C.ly[:, a], sep) > -C.radius[a] and dist < min(sd, 6):
+                    f = -sep / dist ** 2
+                    ref = ref + 0.5 * np.array([f[1], -f[0]])
+            np.testing.assert_allclose(acc[:, a], ref, atol=1e-12)
+
+    def test_waypoints(self):
+        wp = [np.array([[5, 5, 0], [0, 3, 3]]), np.array([[30], [1]])]
+        C = Crowd(np.array([[0, 30], [1, 3]]), wp, walls=(self.pta, self.phe))
+        C.run(60, dt=0.1)
+        self.assertTrue(C.done.all())
+        self.assertEqual(list(C.iwp), [2, 3])
+        self.assertTrue(np.allclose(C.p[:, 0], [0, 3], atol=2 * C.radius[0]))
+
+if __name__ == '__main__':
+    unittest.main()
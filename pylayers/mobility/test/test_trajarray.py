@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+from pylayers.mobility.trajectory import Trajectory, Trajectories, TrajArray
+
+
+class TestTrajArray(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.T = Trajectories()
+        for k in range(10):
+            n = np.random.randint(5, 100)
+            t = np.random.rand() * 10 + 0.1 * np.arange(n)
+            traj = Trajectory().generate(t=t, pt=np.random.randn(n, 3), ID=str(k))
+            self.T.append(traj)
+
+    def test_interp(self):
+        V = self.T.view()
+        t = np.random.rand(300) * 25
+        Y = V.interp(t)
+        self.assertEqual(Y.shape, (10, 300, len(V.cols)))
+        for i, traj in enumerate(self.T):
+            tk = np.asarray(traj.time())
+            out = (t < tk[0]) | (t > tk[-1])
+            for c, col in enumerate(V.cols):
+                ref = np.interp(t, tk, traj[col].values)
+                ref[out] = np.nan
+                np.testing.assert_allclose(Y[i, :, c], ref)
+
+    def test_posvel(self):
+        V = TrajArray(list(self.T))
+        t = np.array([12.])
+        P = V.pos(t, bound='clip')
+        W = V.vel(t, bound='clip')
+        self.assertFalse(np.any(np.isnan(P)))
+        for i, traj in enumerate(self.T):
+            tk = np.asarray(traj.time())
+            tc = np.clip(t, tk[0], tk[-1])
+            self.assertTrue(np.allclose(P[i, 0, 0], np.interp(tc, tk, traj['x'].values)))
+            self.assertTrue(np.allclose(W[i, 0, 1], np.interp(tc, tk, traj['vy'].values)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+from pylayers.mobility.transit.wallindex import WallIndex
+
+
+class TestWallIndex(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.pta = np.random.rand(2, 100) * 30
+        self.phe = self.pta + np.random.randn(2, 100) * 4
+        self.W = WallIndex(self.pta, self.phe, cellsize=1.5)
+
+    def test_feelers(self):
+        N = 500
+        p = np.random.rand(2, N) * 30
+        vr = np.random.randn(2, N) * 2
+        i, u, inter, nw = self.W.feelers(p, vr)
+        # loop version of Containment.test_intersection
+        lhit = []
+        lu = []
+        for k in range(N):
+            best = np.inf
+            for s in range(self.pta.shape[1]):
+                p1 = self.pta[:, s]
+                p2 = self.phe[:, s]
+                den = vr[1, k] * (p2[0] - p1[0]) - vr[0, k] * (p2[1] - p1[1])
+                if den == 0:
+                    continue
+                ua = (vr[0, k] * (p1[1] - p[1, k]) - vr[1, k] * (p1[0] - p[0, k])) / den
+                ub = ((p2[0] - p1[0]) * (p1[1] - p[1, k]) - (p2[1] - p1[1]) * (p1[0] - p[0, k])) / den
+                if 0 < ua < 1 and 0 < ub < 1:
+                    best = min(best, ub)
+            if best < np.inf:
+                lhit.append(k)
+                lu.append(best)
+        self.assertEqual(list(i), lhit)
+        np.testing.assert_allclose(u, lu)
+        np.testing.assert_allclose(inter, p[:, i] + u * vr[:, i])
+
+    def test_containment(self):
+        p = np.random.rand(2, 200) * 30
+        a = np.random.rand(200) * 2 * np.pi
+        ly = np.vstack((np.cos(a), np.sin(a)))
+        acc, hit, inter = self.W.containment(p, ly, np.zeros(200))
+        self.assertTrue(np.all(acc[:, ~hit] == 0))
+        self.assertTrue(np.all(np.isnan(inter[:, ~hit])))
+        # the acceleration always has a backward component
+        self.assertTrue(np.all(np.sum(acc[:, hit] * ly[:, hit], axis=0) < 0))
+
+if __name__ == '__main__':
+    unittest.main()
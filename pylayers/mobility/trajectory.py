@@ -8,6 +8,12 @@ Trajectories Class
 .. autoclass:: Trajectories
     :members:
 
+TrajArray Class
+===============
+
+.. autoclass:: TrajArray
+    :members:
+
 """
 try:
     from mayavi import mlab
@@ -167,6 +173,28 @@ class Trajectories(PyLayers,list):
         T.time()
         return T
 
+    def view(self, typ='ag', cols=['x', 'y', 'z', 'vx', 'vy', 'vz', 's']):
+        """ array view of the trajectories
+
+        Parameters
+        ----------
+
+        typ : string
+            'ag' | 'ap' | '' (all trajectories)
+        cols : list
+            stored columns
+
+        Returns
+        -------
+
+        V : TrajArray
+            positions and velocities of all the trajectories are obtained at
+            any time vector with V.interp (no DataFrame is resampled)
+
+        """
+        lt = [t for t in self if (typ == '') or (t.typ == typ)]
+        return TrajArray(lt, cols=cols)
+
     def time(self,unit='s'):
         """ extract time from a trajectory
 
@@ -862,6 +890,155 @@ class Trajectory(PyLayers,pd.DataFrame):
         #     ax.text(self['x'][k],self['y'][k],str(self.index[k].strftime("%M:%S")))
         #     ax.plot(self['x'][k],self['y'][k],'*r')
         #     plt.draw()
+class TrajArray(PyLayers):
+    """ array view of a set of trajectories
+
+    The samples of all the trajectories are stacked once into flat arrays,
+    the trajectories are then interpolated at any time vector in one
+    vectorized call.
+
+    Attributes
+    ----------
+
+    ID : list
+        trajectories ID
+    name : list
+        trajectories name
+    cols : list
+        columns of the interpolated values
+    tk : np.array (,Ns)
+        time samples of all the trajectories (s)
+    X : np.array (Ns x Ncol)
+        values of the columns at tk
+    ptr : np.array (,Ntraj+1)
+        samples of trajectory i are tk[ptr[i]:ptr[i+1]]
+    tmin : np.array (,Ntraj)
+    tmax : np.array (,Ntraj)
+
+    Notes
+    -----
+
+    The sample times are shifted by i*span for trajectory i, hence the
+    samples of all the trajectories can be found by a single searchsorted
+    on the sorted array of shifted times.
+
+    Examples
+    --------
+
+    >>> t1 = Trajectory().generate(t=np.linspace(0,10,11),pt=np.vstack((np.arange(11.),np.zeros(11),np.zeros(11))).T)
+    >>> t2 = Trajectory().generate(t=np.linspace(2,8,13),pt=np.vstack((np.zeros(13),np.arange(13.),np.zeros(13))).T)
+    >>> V = TrajArray([t1,t2])
+    >>> P = V.pos(np.array([2.5,5.25]))
+    >>> assert P.shape == (2,2,3)
+    >>> assert np.allclose(P[0,:,0],[2.5,5.25])
+    >>> assert np.allclose(P[1,:,1],[1,6.5])
+
+    """
+    def __init__(self, lt, cols=['x', 'y', 'z', 'vx', 'vy', 'vz', 's']):
+        """
+
+        Parameters
+        ----------
+
+        lt : list
+            list of Trajectory (or Trajectories)
+        cols : list
+            columns to be stored (missing columns are 0)
+
+        """
+        self.ID = [t.ID for t in lt]
+        self.name = [t.name for t in lt]
+        self.cols = list(cols)
+        ltk = []
+        lX = []
+        count = []
+        for t in lt:
+            tk = np.asarray(t.time(), dtype=float)
+            X = np.zeros((len(tk), len(self.cols)))
+            for k, c in enumerate(self.cols):
+                if c in t.columns:
+                    X[:, k] = t[c].values
+            ltk.append(tk)
+            lX.append(X)
+            count.append(len(tk))
+        self.ptr = np.hstack((0, np.cumsum(count))).astype(int)
+        self.tk = np.hstack(ltk)
+        self.X = np.vstack(lX)
+        self.tmin = np.array([t[0] for t in ltk])
+        self.tmax = np.array([t[-1] for t in ltk])
+        # shifted times (sorted)
+        self.t0 = np.min(self.tk)
+        self.span = 2 ** np.ceil(np.log2(np.max(self.tk) - self.t0 + 1))
+        row = np.repeat(np.arange(len(count)), count)
+        self._key = self.tk - self.t0 + row * self.span
+
+    def __repr__(self):
+        st = 'TrajArray : ' + str(len(self.ID)) + ' trajectories, '
+        st = st + str(len(self.tk)) + ' samples\n'
+        st = st + 'columns : ' + ' '.join(self.cols) + '\n'
+        for k in range(len(self.ID)):
+            st = st + '  ' + str(self.name[k]) + ' (' + str(self.ID[k]) + ') : '
+            st = st + '%3.2f - %3.2f s\n' % (self.tmin[k], self.tmax[k])
+        return st
+
+    def interp(self, t, cols=[], bound='nan'):
+        """ interpolate all the trajectories at a common time vector
+
+        Parameters
+        ----------
+
+        t : float | np.array (,Nt)
+            time (s)
+        cols : list
+            interpolated columns (default all)
+        bound : string
+            'nan' : nan outside [tmin,tmax] of a trajectory
+            'clip' : first or last sample outside [tmin,tmax]
+
+        Returns
+        -------
+
+        Y : np.array (Ntraj x Nt x len(cols))
+
+        """
+        t = np.atleast_1d(np.asarray(t, dtype=float))
+        if cols == []:
+            ic = np.arange(len(self.cols))
+        else:
+            ic = np.array([self.cols.index(c) for c in cols])
+        Ntraj = len(self.ptr) - 1
+        Nt = len(t)
+        row = np.repeat(np.arange(Ntraj), Nt)
+        tq = np.tile(t, Ntraj)
+        # index of the sample preceding tq in its trajectory
+        k = np.searchsorted(self._key, tq - self.t0 + row * self.span, side='right') - 1
+        k0 = self.ptr[row]
+        k1 = self.ptr[row + 1] - 1
+        k = np.clip(k, k0, np.maximum(k1 - 1, k0))
+        kn = np.minimum(k + 1, k1)
+        dt = self.tk[kn] - self.tk[k]
+        w = np.where(dt > 0, (tq - self.tk[k]) / np.where(dt > 0, dt, 1), 0)
+        w = np.clip(w, 0, 1)[:, None]
+        Y = (1 - w) * self.X[k][:, ic] + w * self.X[kn][:, ic]
+        if bound == 'nan':
+            out = (tq < self.tmin[row]) | (tq > self.tmax[row])
+            Y[out, :] = np.nan
+        return Y.reshape(Ntraj, Nt, len(ic))
+
+    def pos(self, t, bound='nan'):
+        """ positions (Ntraj x Nt x 3) at time t
+        """
+        return self.interp(t, cols=['x', 'y', 'z'], bound=bound)
+
+    def vel(self, t, bound='nan'):
+        """ velocities (Ntraj x Nt x 3) at time t
+        """
+        return self.interp(t, cols=['vx', 'vy', 'vz'], bound=bound)
+
+    def __call__(self, t, bound='nan'):
+        return self.pos(t, bound=bound)
+
+
 def importsn(_filename='pos.csv'):
     """ import simulnet csv file
 
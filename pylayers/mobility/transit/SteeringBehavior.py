@@ -439,9 +439,18 @@ class Containment:
 
         steering
 
+        Notes
+        -----
+
+        If the world has a wall index (see World.add_walls) the front
+        feelers of all the boids are tested at once by World.containment.
+
         """
 
         the_world = boid.world
+        if getattr(the_world, 'wallindex', None) is not None:
+            acceleration, boid.intersection = the_world.containment(boid)
+            return acceleration
         walls = the_world.obstacles(boid)
         acceleration = vec3()
         front_intersect = left_intersect = right_intersect = False
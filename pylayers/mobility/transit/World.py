@@ -3,6 +3,7 @@ from math import pi, sin, cos
 import os
 import pdb
 from pylayers.mobility.transit.vec3 import vec3
+from pylayers.mobility.transit.wallindex import WallIndex
 import pylayers.util.plotutil as plu
 import numpy as np
 import sys
@@ -56,6 +57,8 @@ class World:
     update_boid
     obstacles
     add_wall
+    add_walls
+    containment
 
     """
     def __init__(self, **args):
@@ -63,6 +66,9 @@ class World:
         self._boids = {}
         self._obstacles = {}
         self._zones = {}
+        # wall index (see add_walls) and batched containment results
+        self.wallindex = None
+        self._containment = {}
 
     def boids(self, boid, distance=2):
         """
@@ -142,6 +148,74 @@ class World:
                     else:
                         the_obstacles[tile] = [(line_start, line_end)]
 
+    def add_walls(self, pta, phe, cellsize=2.0):
+        """ add wall segments and build the wall index
+
+        Parameters
+        ----------
+
+        pta : np.array (2,Nw)
+        phe : np.array (2,Nw)
+        cellsize : float
+            cell size of the wall index
+
+        Notes
+        -----
+
+        The walls are also added to the obstacle tiles (see add_wall) which
+        are used by InterpenetrationConstraint. Walls of a Layout are
+        obtained with wallindex.layoutwalls.
+
+        """
+        pta = np.asarray(pta, dtype=float)[:2, :]
+        phe = np.asarray(phe, dtype=float)[:2, :]
+        for k in range(pta.shape[1]):
+            self.add_wall(tuple(pta[:, k]), tuple(phe[:, k]))
+        if self.wallindex is not None:
+            pta = np.hstack((self.wallindex.pta, pta))
+            phe = np.hstack((self.wallindex.phe, phe))
+        self.wallindex = WallIndex(pta, phe, cellsize=cellsize)
+        self._containment = {}
+
+    def containment(self, boid):
+        """ containment acceleration of a boid
+
+        Parameters
+        ----------
+
+        boid
+
+        Returns
+        -------
+
+        acceleration : vec3
+        intersection : vec3 | None
+
+        Notes
+        -----
+
+        The feelers of all the boids are tested against the wall index in
+        one pass. The result of a boid is reused as long as its position,
+        heading and speed are unchanged, hence the batch is evaluated once
+        per mechanical update of the boids.
+
+        """
+        state = (boid.position.x, boid.position.y,
+                 boid.localy.x, boid.localy.y, boid.velocity.length())
+        if boid not in self._containment or self._containment[boid][0] != state:
+            lboids = [b for tile in self._boids for b in self._boids[tile]]
+            if boid not in lboids:
+                lboids.append(boid)
+            lstate = [(b.position.x, b.position.y,
+                       b.localy.x, b.localy.y, b.velocity.length()) for b in lboids]
+            a = np.array(lstate).T
+            acc, hit, inter = self.wallindex.containment(a[0:2, :], a[2:4, :], a[4, :])
+            self._containment = {}
+            for k, b in enumerate(lboids):
+                ik = vec3(inter[0, k], inter[1, k]) if hit[k] else None
+                self._containment[b] = (lstate[k], vec3(acc[0, k], acc[1, k]), ik)
+        return self._containment[boid][1:]
+
     def zones(self, boid):
         """
         Parameters
@@ -0,0 +1,488 @@
+#-*- coding:Utf-8 -*-
+from __future__ import print_function
+"""
+.. currentmodule:: pylayers.mobility.transit.crowd
+
+Array-backed crowd engine
+=========================
+
+A Crowd holds the state of all the agents in a few (2,N) arrays
+(position, velocity, heading, destination) instead of one Person process
+and several vec3 per agent. At each time step the steering behaviors of
+SteeringBehavior (Seek, Containment, Separation, Queuing and
+InterpenetrationConstraint) are evaluated for all the agents at once :
+
++ neighbour pairs are obtained from a cell list rebuilt at each step
+  (agents sorted by cell, CSR storage, half stencil of 5 cells)
++ walls are stored in a WallIndex, the containment feelers and the wall
+  interpenetration tests only consider the walls of the crossed cells
+
+The integration of acceleration, velocity and position is the one of
+Person.move.
+
+.. autosummary::
+    :members:
+
+"""
+import doctest
+import logging
+import numpy as np
+from pylayers.util.project import *
+from pylayers.util.spatialindex import _ranges
+from pylayers.mobility.transit.wallindex import WallIndex
+
+logger = logging.getLogger(__name__)
+
+# cell list half stencil (the (0,0) cell is treated apart)
+_STENCIL = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+
+def _norm(v):
+    """ norm of (2,N) vectors
+    """
+    return np.sqrt(v[0, :] ** 2 + v[1, :] ** 2)
+
+
+def _truncate(v, vmax):
+    """ truncate (2,N) vectors to a maximal norm
+    """
+    n = _norm(v)
+    scale = np.where(n > vmax, vmax / np.maximum(n, 1e-12), 1.)
+    return v * scale
+
+
+class Crowd(PyLayers):
+    """ structure of arrays crowd engine
+
+    Attributes
+    ----------
+
+    N : int
+        number of agents
+    p : np.array (2,N)
+        positions
+    v : np.array (2,N)
+        velocities
+    a : np.array (2,N)
+        accelerations
+    ly : np.array (2,N)
+        heading (localy of Person), localx is (ly[1],-ly[0])
+    dest : np.array (2,N)
+        current destination
+    wp : np.array (2,Nw)
+        waypoints of all the agents, the waypoints of agent i are
+        wp[:,wptr[i]:wptr[i+1]]
+    iwp : np.array (,N)
+        index in wp of the current destination
+    done : np.array (,N) bool
+        agent has reached its last waypoint and stops
+    radius, max_speed, desired_speed, max_acceleration : np.array (,N)
+    behaviors : list
+        'seek','containment','separation','queuing','interpenetration'
+    rn : float
+        neighbourhood radius of the cell list (separation distance)
+    t : float
+        simulation time
+    npairs : int
+        number of neighbour pairs of the last step
+
+    Examples
+    --------
+
+    >>> p = np.array([[0.,10.],[0.,0.]])
+    >>> C = Crowd(p,[np.array([[10.],[0.]]),np.array([[0.],[0.]])])
+    >>> t,P = C.run(20,dt=0.1)
+    >>> assert P.shape == (200,2,2)
+    >>> assert C.done.all()
+
+    """
+
+    def __init__(self, p, wp, walls=(), radius=0.8 / (2 * np.pi),
+                 max_speed=0.8, desired_speed=0.8, max_acceleration=2.0,
+                 rn=6.0, wallcell=2.0,
+                 behaviors=['seek', 'containment', 'separation',
+                            'interpenetration']):
+        """
+
+        Parameters
+        ----------
+
+        p : np.array (2,N)
+            initial positions
+        wp : np.array (2,N) | list
+            destinations, or list of N waypoint arrays (2,Nk)
+        walls : tuple | WallIndex
+            (pta,phe) walls segments (see layoutwalls and thwall2seg)
+        radius : float | np.array (,N)
+        max_speed : float | np.array (,N)
+        desired_speed : float | np.array (,N)
+        max_acceleration : float | np.array (,N)
+        rn : float
+            neighbourhood radius
+        wallcell : float
+            cell size of the wall index
+        behaviors : list
+
+        """
+        self.p = np.array(p, dtype=float)[:2, :]
+        self.N = self.p.shape[1]
+        N = self.N
+        self.v = np.zeros((2, N))
+        self.a = np.zeros((2, N))
+        self.ly = np.vstack((np.zeros(N), np.ones(N)))
+
+        self.radius = np.broadcast_to(np.asarray(radius, dtype=float), (N,)).copy()
+        self.max_speed = np.broadcast_to(np.asarray(max_speed, dtype=float), (N,)).copy()
+        self.desired_speed = np.broadcast_to(np.asarray(desired_speed, dtype=float), (N,)).copy()
+        self.max_acceleration = np.broadcast_to(np.asarray(max_acceleration, dtype=float), (N,)).copy()
+
+        self.rn = rn
+        self.behaviors = list(behaviors)
+        self.setwaypoints(wp)
+
+        if isinstance(walls, WallIndex):
+            self.walls = walls
+        elif len(walls) > 0 and np.shape(walls[0])[1] > 0:
+            self.walls = WallIndex(walls[0], walls[1], cellsize=wallcell)
+        else:
+            self.walls = None
+        if self.walls is not None:
+            self.pta = self.walls.pta
+            self.phe = self.walls.phe
+        else:
+            self.pta = np.zeros((2, 0))
+            self.phe = np.zeros((2, 0))
+
+        self.t = 0.
+        self.npairs = 0
+
+    def __repr__(self):
+        st = 'Crowd : ' + str(self.N) + ' agents\n'
+        st = st + 't : ' + str(self.t) + ' s\n'
+        st = st + 'behaviors : ' + ' '.join(self.behaviors) + '\n'
+        st = st + 'walls : ' + str(self.pta.shape[1]) + '\n'
+        st = st + 'done : ' + str(np.sum(self.done)) + '\n'
+        st = st + 'neighbour pairs : ' + str(self.npairs)
+        return st
+
+    def setwaypoints(self, wp):
+        """ set the waypoints of the agents
+
+        Parameters
+        ----------
+
+        wp : np.array (2,N) | list
+            destinations, or list of N waypoint arrays (2,Nk)
+
+        """
+        if isinstance(wp, np.ndarray):
+            wp = [wp[:2, k:k + 1] for k in range(wp.shape[1])]
+        assert len(wp) == self.N, 'one waypoint array per agent is expected'
+        count = np.array([np.shape(w)[1] for w in wp], dtype=int)
+        assert (count > 0).all(), 'at least one waypoint per agent'
+        self.wp = np.hstack([np.asarray(w, dtype=float)[:2, :] for w in wp])
+        self.wptr = np.hstack((0, np.cumsum(count)))
+        self.iwp = self.wptr[:-1].copy()
+        self.dest = self.wp[:, self.iwp]
+        self.done = np.zeros(self.N, dtype=bool)
+
+    def neighbours(self, rn=0):
+        """ neighbour pairs from a cell list
+
+        Parameters
+        ----------
+
+        rn : float
+            neighbourhood radius (default self.rn)
+
+        Returns
+        -------
+
+        i : np.array
+            agent index
+        j : np.array
+            neighbour index
+        d : np.array (2,Npairs)
+            p[:,j] - p[:,i]
+
+        Notes
+        -----
+
+        The agents are sorted by cell (cell size rn). Each unordered pair
+        is found once with the half stencil and then mirrored, hence
+        (i,j) and (j,i) are both returned.
+
+        Examples
+        --------
+
+        >>> C = Crowd(np.array([[0.,1.,5.],[0.,0.,0.]]),np.zeros((2,3)))
+        >>> i,j,d = C.neighbours(2)
+        >>> assert sorted(zip(i,j)) == [(0,1),(1,0)]
+
+        """
+        if rn == 0:
+            rn = self.rn
+        p = self.p
+        x0 = np.min(p[0, :])
+        y0 = np.min(p[1, :])
+        ix = ((p[0, :] - x0) / rn).astype(int)
+        iy = ((p[1, :] - y0) / rn).astype(int)
+        nx = np.max(ix) + 1
+        ny = np.max(iy) + 1
+        c = ix + nx * iy
+        order = np.argsort(c, kind='mergesort')
+        count = np.bincount(c, minlength=nx * ny)
+        ptr = np.hstack((0, np.cumsum(count)))
+        # the pairs are searched in the sorted order (contiguous cells)
+        c = c[order]
+        ix = ix[order]
+        iy = iy[order]
+        x = p[0, order]
+        y = p[1, order]
+
+        li = []
+        lj = []
+        # same cell : pairs (u,w) with u < w
+        u = np.arange(self.N)
+        lid, ind = _ranges(u + 1, ptr[c + 1] - u - 1)
+        li.append(lid)
+        lj.append(ind)
+        # neighbour cells of the half stencil
+        for dx, dy in _STENCIL:
+            jx = ix + dx
+            jy = iy + dy
+            u = np.where((jx >= 0) & (jx < nx) & (jy >= 0) & (jy < ny))[0]
+            cj = jx[u] + nx * jy[u]
+            lid, ind = _ranges(ptr[cj], ptr[cj + 1] - ptr[cj])
+            li.append(u[lid])
+            lj.append(ind)
+        i = np.hstack(li)
+        j = np.hstack(lj)
+        dx = x[j] - x[i]
+        dy = y[j] - y[i]
+        u = np.where(dx * dx + dy * dy < rn * rn)[0]
+        i = order[i[u]]
+        j = order[j[u]]
+        d = np.vstack((dx[u], dy[u]))
+        return np.hstack((i, j)), np.hstack((j, i)), np.hstack((d, -d))
+
+    def seek(self):
+        """ Seek behavior for all the agents
+
+        Returns
+        -------
+
+        acc : np.array (2,N)
+        arrived : np.array (,N) bool
+
+        """
+        disp = self.dest - self.p
+        n = _norm(disp)
+        desired = disp / np.maximum(n, 1e-12) * self.desired_speed
+        return desired - self.v, n < 2 * self.radius
+
+    def containment(self):
+        """ Containment behavior for all the agents (front feeler)
+
+        Returns
+        -------
+
+        acc : np.array (2,N)
+
+        See Also
+        --------
+
+        WallIndex.containment
+
+        """
+        if self.walls is None:
+            return np.zeros((2, self.N))
+        return self.walls.containment(self.p, self.ly, _norm(self.v))[0]
+
+    def separation(self, i, j, d):
+        """ Separation behavior for all the agents
+
+        Parameters
+        ----------
+
+        i, j, d : neighbour pairs (see neighbours)
+
+        Returns
+        -------
+
+        acc : np.array (2,N)
+
+        """
+        dist2 = d[0, :] ** 2 + d[1, :] ** 2
+        sepd = 6.0 * _norm(self.v) / self.max_speed
+        u = np.where(dist2 < (sepd ** 2)[i])[0]
+        i = i[u]
+        d = d[:, u]
+        dist2 = dist2[u]
+        front = (self.ly[0, i] * d[0, :] + self.ly[1, i] * d[1, :]) > -self.radius[i]
+        i = i[front]
+        f = -d[:, front] / np.maximum(dist2[front], 1e-9)
+        acc = np.vstack((np.bincount(i, 0.5 * f[1, :], minlength=self.N),
+                         np.bincount(i, -0.5 * f[0, :], minlength=self.N)))
+        return acc
+
+    def queuing(self, i, j, d):
+        """ Queuing behavior for all the agents
+
+        Parameters
+        ----------
+
+        i, j, d : neighbour pairs (see neighbours)
+
+        Returns
+        -------
+
+        acc : np.array (2,N)
+
+        """
+        speed = _norm(self.v)
+        dist = np.sqrt(d[0, :] ** 2 + d[1, :] ** 2)
+        ly = self.ly[:, i]
+        yl = ly[0, :] * d[0, :] + ly[1, :] * d[1, :]
+        cond = ((dist < 4) & (yl > 0) & (yl > dist * np.cos(np.pi / 8)) &
+                (speed[j] < speed[i]))
+        slow = np.zeros(self.N, dtype=bool)
+        slow[i[cond]] = True
+        return -self.ly * np.where(slow, speed / self.max_speed, 0.)
+
+    def interpenetration(self, i, j, d):
+        """ InterpenetrationConstraint for all the agents
+
+        Parameters
+        ----------
+
+        i, j, d : neighbour pairs (see neighbours)
+
+        Returns
+        -------
+
+        dp : np.array (2,N)
+            position corrections
+
+        """
+        dp = np.zeros((2, self.N))
+        dist = np.sqrt(d[0, :] ** 2 + d[1, :] ** 2)
+        rij = self.radius[i] + self.radius[j]
+        u = np.where(dist < rij)[0]
+        if len(u) > 0:
+            s = (rij[u] - dist[u]) / np.maximum(dist[u], 1e-12)
+            dp[0, :] += np.bincount(i[u], -d[0, u] * s, minlength=self.N)
+            dp[1, :] += np.bincount(i[u], -d[1, u] * s, minlength=self.N)
+        if self.walls is None:
+            return dp
+        r = self.radius
+        p = self.p
+        il, iw = self.walls.near(p, r)
+        if len(il) == 0:
+            return dp
+        P = p[:, il]
+        a = self.pta[:, iw]
+        w = self.phe[:, iw] - a
+        uu = (((P[0, :] - a[0, :]) * w[0, :] + (P[1, :] - a[1, :]) * w[1, :]) /
+              np.maximum(w[0, :] ** 2 + w[1, :] ** 2, 1e-12))
+        nv = P - (a + uu * w)
+        dn = _norm(nv)
+        rl = r[il]
+        hit = (uu > 0) & (uu < 1) & (dn < rl)
+        s = np.where(hit, (rl - dn) / np.maximum(dn, 1e-12), 0.)
+        dp[0, :] += np.bincount(il, nv[0, :] * s, minlength=self.N)
+        dp[1, :] += np.bincount(il, nv[1, :] * s, minlength=self.N)
+        # wall extremities for the agents which have not found a wall
+        found = np.zeros(self.N, dtype=bool)
+        found[il[hit]] = True
+        for pt in (self.pta[:, iw], self.phe[:, iw]):
+            off = P - pt
+            do = _norm(off)
+            s = np.where(~found[il] & (do < rl), (rl - do) / np.maximum(do, 1e-12), 0.)
+            dp[0, :] += np.bincount(il, off[0, :] * s, minlength=self.N)
+            dp[1, :] += np.bincount(il, off[1, :] * s, minlength=self.N)
+        return dp
+
+    def step(self, dt=0.1):
+        """ advance all the agents of one time step
+
+        Parameters
+        ----------
+
+        dt : float
+            time step (interval of Person)
+
+        """
+        moving = ~self.done
+        acc = np.zeros((2, self.N))
+        dp = np.zeros((2, self.N))
+        arrived = np.zeros(self.N, dtype=bool)
+        bpairs = any([b in self.behaviors for b in
+                      ['separation', 'queuing', 'interpenetration']])
+        if bpairs:
+            i, j, d = self.neighbours()
+            self.npairs = len(i)
+        if 'seek' in self.behaviors:
+            a, arrived = self.seek()
+            acc += a
+        if 'containment' in self.behaviors:
+            acc += self.containment()
+        if 'separation' in self.behaviors:
+            acc += self.separation(i, j, d)
+        if 'queuing' in self.behaviors:
+            acc += self.queuing(i, j, d)
+        if 'interpenetration' in self.behaviors:
+            dp = self.interpenetration(i, j, d)
+
+        self.p = self.p + dp * moving
+        self.a = _truncate(acc, self.max_acceleration) * moving
+        self.v = _truncate(self.v + self.a * dt, self.max_speed) * moving
+        speed = _norm(self.v)
+        u = speed > 0.2
+        self.ly[:, u] = self.v[:, u] / speed[u]
+        self.p = self.p + self.v * dt
+        self.t = self.t + dt
+
+        # next waypoint
+        u = np.where(arrived & moving)[0]
+        if len(u) > 0:
+            last = self.iwp[u] + 1 >= self.wptr[u + 1]
+            self.done[u[last]] = True
+            self.v[:, u[last]] = 0
+            un = u[~last]
+            self.iwp[un] += 1
+            self.dest[:, un] = self.wp[:, self.iwp[un]]
+
+    def run(self, tmax, dt=0.1, decim=1):
+        """ run the simulation
+
+        Parameters
+        ----------
+
+        tmax : float
+            duration (s)
+        dt : float
+            time step
+        decim : int
+            positions are stored every decim steps
+
+        Returns
+        -------
+
+        t : np.array (,Nt)
+        P : np.array (Nt,2,N)
+            positions
+
+        """
+        nstep = int(np.round(tmax / dt))
+        lt = []
+        lp = []
+        for k in range(nstep):
+            self.step(dt)
+            if (k % decim) == 0:
+                lt.append(self.t)
+                lp.append(self.p.copy())
+        return np.array(lt), np.array(lp)
+
+if __name__ == "__main__":
+    doctest.testmod()
@@ -0,0 +1,258 @@
+#-*- coding:Utf-8 -*-
+from __future__ import print_function
+"""
+.. currentmodule:: pylayers.mobility.transit.wallindex
+
+Wall index for steering behaviors
+=================================
+
+A WallIndex stores the walls of a Layout in a SegGrid and evaluates the
+feelers of the Containment behavior for a whole set of agents in one
+pass : the candidate walls of each feeler are the walls of the grid cells
+crossed by the feeler, and all the (feeler,wall) intersections are
+computed at once.
+
+.. autosummary::
+    :members:
+
+"""
+import doctest
+import logging
+import numpy as np
+from pylayers.util.project import *
+from pylayers.util.spatialindex import SegGrid
+
+logger = logging.getLogger(__name__)
+
+# max front distance to consider (FCHK of SteeringBehavior)
+FCHK = 2.0
+
+
+def layoutwalls(L, thick=True):
+    """ wall segments of a Layout
+
+    Parameters
+    ----------
+
+    L : Layout
+        Layout with numpy arrays (pt, tahe, tsg, normal)
+    thick : boolean
+        if True each wall is replaced by the 3 sides (p1,p2),(p2,p3),(p3,p4)
+        of its thickness rectangle (as Layout.thwall), otherwise the
+        segment itself is used
+
+    Returns
+    -------
+
+    pta : np.array (2,Nw)
+    phe : np.array (2,Nw)
+
+    Notes
+    -----
+
+    Transition segments (doors) and 'AIR' segments are not walls.
+
+    """
+    keep = [not L.Gs.node[s]['transition'] and L.Gs.node[s]['name'] != 'AIR'
+            for s in L.tsg]
+    u = np.where(keep)[0]
+    ta = L.pt[:, L.tahe[0, u]]
+    he = L.pt[:, L.tahe[1, u]]
+    if not thick:
+        return ta, he
+    th = np.array([sum(L.sl[L.Gs.node[s]['name']]['lthick']) for s in L.tsg[u]])
+    dn = L.normal[:2, u] * th / 2.
+    p1 = ta + dn
+    p2 = he + dn
+    p3 = he - dn
+    p4 = ta - dn
+    return np.hstack((p1, p2, p3)), np.hstack((p2, p3, p4))
+
+
+def thwall2seg(walls):
+    """ convert Layout.thwall walls into segments
+
+    Parameters
+    ----------
+
+    walls : list
+        list of wall tuples (Transit.world format)
+
+    Returns
+    -------
+
+    pta : np.array (2,Ns)
+    phe : np.array (2,Ns)
+
+    Notes
+    -----
+
+    As in Simul.create_layout each wall polygon (p1,p2,p3,p4) gives the
+    segments (p1,p2),(p2,p3),(p3,p4).
+
+    Examples
+    --------
+
+    >>> pta,phe = thwall2seg([((0,0),(1,0),(1,1),(0,1))])
+    >>> assert pta.shape == (2,3)
+
+    """
+    lta = []
+    lhe = []
+    for wall in walls:
+        for ii in range(len(wall) - 1):
+            lta.append(wall[ii][:2])
+            lhe.append(wall[ii + 1][:2])
+    if len(lta) == 0:
+        return np.zeros((2, 0)), np.zeros((2, 0))
+    return np.array(lta, dtype=float).T, np.array(lhe, dtype=float).T
+
+
+class WallIndex(PyLayers):
+    """ grid index of wall segments
+
+    Attributes
+    ----------
+
+    pta : np.array (2,Nw)
+        walls tail
+    phe : np.array (2,Nw)
+        walls head
+    grid : SegGrid
+
+    Examples
+    --------
+
+    >>> W = WallIndex(np.array([[-5,2]]).T,np.array([[5,2]]).T)
+    >>> p = np.array([[0,0,0],[0,1,0]])
+    >>> ly = np.array([[0,0,1],[1,1,0]])
+    >>> acc,hit,inter = W.containment(p,ly,np.zeros(3))
+    >>> assert (hit == np.array([False,True,False])).all()
+    >>> assert np.allclose(inter[:,1],[0,2])
+    >>> assert np.allclose(acc[:,1],[4,-4])
+
+    """
+
+    def __init__(self, pta, phe, cellsize=2.0):
+        """
+
+        Parameters
+        ----------
+
+        pta : np.array (2,Nw)
+        phe : np.array (2,Nw)
+        cellsize : float
+            cell size of the grid (meters)
+
+        """
+        self.pta = np.asarray(pta, dtype=float)[:2, :]
+        self.phe = np.asarray(phe, dtype=float)[:2, :]
+        self.grid = SegGrid(self.pta, self.phe, cellsize=cellsize)
+
+    def __repr__(self):
+        st = 'WallIndex : ' + str(self.pta.shape[1]) + ' walls\n'
+        st = st + self.grid.__repr__()
+        return st
+
+    def near(self, p, r):
+        """ candidate (point,wall) pairs (see SegGrid.near)
+        """
+        return self.grid.near(p, r)
+
+    def feelers(self, p, vr):
+        """ closest wall intersected by a set of feelers
+
+        Parameters
+        ----------
+
+        p : np.array (2,N)
+            feelers origin
+        vr : np.array (2,N)
+            feelers vector
+
+        Returns
+        -------
+
+        i : np.array
+            index of the feelers which intersect a wall
+        u : np.array
+            fraction of the feeler in front of the closest wall
+            (u_b of Containment.test_intersection)
+        inter : np.array (2,len(i))
+            intersection point
+        nw : np.array (2,len(i))
+            unit normal of the intersected wall (rotated tail - head)
+
+        """
+        il, iw = self.grid.pairs(p, p + vr)
+        if len(il) == 0:
+            return il, np.zeros(0), np.zeros((2, 0)), np.zeros((2, 0))
+        P = p[:, il]
+        VR = vr[:, il]
+        p1 = self.pta[:, iw]
+        w = self.phe[:, iw] - p1
+        den = VR[1, :] * w[0, :] - VR[0, :] * w[1, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ua = (VR[0, :] * (p1[1, :] - P[1, :]) - VR[1, :] * (p1[0, :] - P[0, :])) / den
+            ub = (w[0, :] * (p1[1, :] - P[1, :]) - w[1, :] * (p1[0, :] - P[0, :])) / den
+        u = np.where((den != 0) & (ua > 0) & (ua < 1) & (ub > 0) & (ub < 1))[0]
+        # closest wall of each feeler
+        u = u[np.lexsort((ub[u], il[u]))]
+        first = np.hstack((True, il[u][1:] != il[u][:-1]))
+        u = u[first[:len(u)]]
+        inter = p1[:, u] + ua[u] * w[:, u]
+        lw = np.sqrt(w[0, u] ** 2 + w[1, u] ** 2)
+        nw = np.vstack((w[1, u], -w[0, u])) / np.maximum(lw, 1e-12)
+        return il[u], ub[u], inter, nw
+
+    def containment(self, p, ly, speed):
+        """ Containment behavior for a set of agents
+
+        Parameters
+        ----------
+
+        p : np.array (2,N)
+            positions
+        ly : np.array (2,N)
+            unit headings (localy), localx is (ly[1],-ly[0])
+        speed : np.array (,N)
+
+        Returns
+        -------
+
+        acc : np.array (2,N)
+            acceleration
+        hit : np.array (,N) bool
+            the front feeler intersects a wall
+        inter : np.array (2,N)
+            intersection with the closest wall (nan if no hit)
+
+        Notes
+        -----
+
+        The front feeler is ly*(FCHK+0.5*speed). The closest wall gives
+        an acceleration (-ly +/- lx)/u**2, the sign depends on the side of
+        the wall normal in the agent frame (see Containment.calculate).
+
+        """
+        p = np.asarray(p, dtype=float)
+        ly = np.asarray(ly, dtype=float)
+        N = p.shape[1]
+        acc = np.zeros((2, N))
+        hit = np.zeros(N, dtype=bool)
+        inter = np.nan * np.ones((2, N))
+        i, u, pi, nw = self.feelers(p, ly * (FCHK + 0.5 * np.asarray(speed)))
+        if len(i) == 0:
+            return acc, hit, inter
+        q = pi + nw - p[:, i]
+        lyi = ly[:, i]
+        lx = np.vstack((lyi[1, :], -lyi[0, :]))
+        left = (lx[0, :] * q[0, :] + lx[1, :] * q[1, :]) <= 0
+        sf = 1. / np.maximum(u ** 2, 1e-9)
+        acc[:, i] = -lyi * sf + np.where(left, 1, -1) * lx * sf
+        hit[i] = True
+        inter[:, i] = pi
+        return acc, hit, inter
+
+if __name__ == "__main__":
+    doctest.testmod()
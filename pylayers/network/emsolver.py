@@ -41,7 +41,6 @@ from pylayers.util.project import *
 from pylayers.network.model import PLSmodel
 
 
-import pdb
 
 
 class EMSolver(object):
@@ -69,7 +68,10 @@ class EMSolver(object):
 
     EMS_method = { 'multiwall','raytracing'}
 
-
+    With the multiwall method, the wall losses and excess delays of a link
+    are only re-evaluated when one of its nodes has moved more than dmove
+    meters since the last evaluation (EMS_config dmove option, default 0 :
+    all the links are evaluated at each call).
 
     """
 
@@ -84,8 +86,12 @@ class EMSolver(object):
 
         self.EMS_method = self.ems_opt['method']
         self.sigmaTOA = float(self.toa_opt['sigmatoa']) # meters !!!!!!
+        # movement threshold (meters) for multiwall re-evaluation
+        self.dmove = float(self.ems_opt.get('dmove',0.))
 
         self.model = {}
+        # multiwall results of the last call, per RAT (see multiwall)
+        self._mw = {}
 
         self.L = L
 
@@ -140,6 +146,96 @@ class EMSolver(object):
                                    method = ratopt['method'])
 
 
+    def multiwall(self,p,e,RAT,model):
+        """ multiwall losses of a set of links
+
+        Parameters
+        ----------
+
+        p : dict
+            node positions {node : np.array (2,) or (3,)}
+        e : list
+            links [[n1,n2,typ],...] (see Network.links)
+        RAT : string
+        model : PLSmodel
+
+        Returns
+        -------
+
+        loss : np.array (Ne)
+            wall losses (dB, orthogonal polarization)
+        TOA : np.array (Ne)
+            excess delay (ns)
+        frees : np.array (Ne)
+            path loss (dB)
+        d : np.array (Ne)
+            distance (meters)
+
+        Notes
+        -----
+
+        Node positions are gathered in a contiguous array and all the links
+        which need an evaluation are passed in a single call to Losst.
+        A link is evaluated if it is new or if one of its nodes has moved
+        more than self.dmove since its last evaluation, otherwise the losses
+        of the previous call are reused. The distance and the path loss are
+        always evaluated.
+
+        2D positions are placed at mid height between L.zfloor and L.zceil.
+
+        """
+        nodes = list(p.keys())
+        P = np.zeros((len(nodes),3))
+        P[:,2] = (self.L.zfloor+self.L.zceil)/2.
+        for k,n in enumerate(nodes):
+            pn = np.ravel(p[n])[:3]
+            P[k,:len(pn)] = pn
+        dn = dict(zip(nodes,range(len(nodes))))
+        ie = np.array([[dn[l[0]],dn[l[1]]] for l in e],dtype=int).reshape(-1,2)
+        ia = ie[:,0]
+        ib = ie[:,1]
+        Ne = len(ie)
+
+        # previous evaluation
+        mw = self._mw.get(RAT,{})
+        loss = np.zeros(Ne)
+        TOA = np.zeros(Ne)
+        todo = np.ones(Ne,dtype=bool)
+        Pref = P.copy()
+        if len(mw) > 0:
+            # reference position of a node : position at its last evaluation
+            dref = dict(zip(mw['nodes'],range(len(mw['nodes']))))
+            kref = np.array([dref.get(n,-1) for n in nodes])
+            known = kref >= 0
+            Pref[known] = mw['P'][kref[known]]
+            moved = ~known | (np.sqrt(np.sum((P-Pref)**2,axis=1)) > self.dmove)
+            Pref[moved] = P[moved]
+            # links of the previous call
+            dlink = mw['dlink']
+            kl = np.array([dlink.get((l[0],l[1]),-1) for l in e],dtype=int)
+            old = kl >= 0
+            loss[old] = mw['loss'][kl[old]]
+            TOA[old] = mw['TOA'][kl[old]]
+            todo = ~old | moved[ia] | moved[ib]
+
+        u = np.where(todo)[0]
+        if len(u) > 0:
+            MW = lo.Losst(self.L,model.f,P[ia[u]].T,P[ib[u]].T)
+            loss[u] = MW[0][0]
+            TOA[u] = MW[2][0]
+
+        self._mw[RAT] = {'nodes':nodes,
+                         'P':Pref,
+                         'dlink':{(l[0],l[1]):k for k,l in enumerate(e)},
+                         'loss':loss,
+                         'TOA':TOA,
+                         'neval':len(u)}
+
+        # MW is 2D only now, distance and free space loss in the plane
+        d = np.sqrt(np.sum((P[ia,:2]-P[ib,:2])**2,axis=1))
+        frees = lo.PL(np.array([model.f]),P[ia,:2].T,P[ib,:2].T,model.rssnp)[0]
+        return loss,TOA,frees,d
+
     def solve(self,p,e,LDP,RAT,epwr,sens):
         """ computes and returns a LDP value 
 
@@ -209,58 +305,14 @@ class EMSolver(object):
 
         if self.EMS_method == 'multiwall':
 
-            dd = {} # distance dictionnary
             if len(e) > 0:
-
-                lp = np.array([np.array((p[e[i][0]],p[e[i][1]])) for i in range(len(e))])
-                # MW is 2D only now.
-                # This explain the following licenses
-                lp = lp[:,:,:2]
-                dim = lp.shape[2]
-                # d euclidian distance
-                d = np.sqrt(np.sum((lp[:,0]-lp[:,1])**2,axis=1))
-                slp = np.shape(lp)[1]
-
                 # evaluation of all LDPs
                 if LDP=='all':
-                    pa = np.vstack(p.values())
-                    lpa = len(pa)
-                    Pr = []
-                    TOA = []
-                    lsens = np.array(())
-                    loss = np.array(())
-                    frees = np.array(())
-                    lepwr = np.array(())
-
-                    for i in range(lpa-1):
-                        # excess time of flight + losses computation
-                        #
-                        # Losst returns 4 parameters
-                        #   Lo Lp Edo Edp
-                        #
-                        pdb.set_trace()
-                        MW = lo.Losst(self.L,model.f,pa[i+1:lpa,:dim].T,pa[i,:dim])
-                        # MW = lo.Loss0_v2(self.L,pa[i+1:lpa],model.f,pa[i])
-                        # loss free space
-
-                        frees=np.hstack((frees,
-                                         lo.PL(np.array([model.f]),
-                                         pa[i+1:lpa,:dim].T,
-                                         pa[i,:dim].reshape(2,1),
-                                         model.rssnp)[0] ))
-
-                        # Pr.extend(lepwr - MW[0] - frees)
-                        # WARNING : only one polarization is taken into
-                        # account here
-                        # save losses computation
-
-                        loss = np.hstack((loss,MW[0][0]))
-                        # save excess tof computation
-                        TOA  = np.hstack((TOA,MW[2][0]))
+                    loss,TOA,frees,d = self.multiwall(p,e,RAT,model)
 
                     # emmited power for the first nodes of computed edges
-                    lepwr1 = [epwr[i[0]][RAT] for i in e]
-                    lepwr2 = [epwr[i[1]][RAT] for i in e]
+                    lepwr1 = np.array([epwr[i[0]][RAT] for i in e])
+                    lepwr2 = np.array([epwr[i[1]][RAT] for i in e])
                     Pr = lepwr1 - loss - frees
 
                     # concatenate reverse link
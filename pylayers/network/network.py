@@ -207,6 +207,11 @@ class Network(PyLayers,nx.MultiDiGraph):
     pos : dictionnary
         keys  = node id
         value = node position
+    dirty : dictionnary
+        keys  = wstd
+        value = set of nodes moved since the last compute_LDPs
+    ldpcount : dictionnary
+        number of 'computed' and 'skipped' links in compute_LDPs
 
     Methods
     -------
@@ -253,6 +258,11 @@ class Network(PyLayers,nx.MultiDiGraph):
         self.idx = 0
         self.lidx = 0
         self.isPN=PN
+        # nodes moved since the last compute_LDPs, per wstd
+        # (a missing wstd means that all links have to be computed)
+        self.dirty={}
+        # number of computed and skipped links in compute_LDPs
+        self.ldpcount={'computed':0,'skipped':0}
 
     def __repr__(self):
 
@@ -719,6 +729,8 @@ class Network(PyLayers,nx.MultiDiGraph):
         self._get_edges_typ()
         # create lists of links
         self._get_llinks()
+        # all links have to be computed
+        self.dirty={}
 
     def _get_llinks(self):
         """ get list of links from the Network
@@ -982,6 +994,13 @@ class Network(PyLayers,nx.MultiDiGraph):
         wstd     : string
             A specific wstd which exists in the network ( if not , raises an error)
 
+        Notes
+        -----
+
+        Only the links with a node moved since the previous call (see
+        update_pos) are computed, the other ones keep their LDPs.
+        self.ldpcount counts the computed and skipped links.
+
         """
         # value    : list : [LDP value , LDP standard deviation] 
         # method    : ElectroMagnetic Solver method ( 'direct', 'Multiwall', 'PyRay'
@@ -992,6 +1011,19 @@ class Network(PyLayers,nx.MultiDiGraph):
         e=self.links[wstd]#self.SubNet[wstd].edges()
         re=self.relinks[wstd] # reverse link aka other direction of link
 
+        # only the links with a node moved since the last call
+        if wstd in self.dirty:
+            moved = self.dirty[wstd]
+            u = [k for k,l in enumerate(e) if (l[0] in moved) or (l[1] in moved)]
+            self.ldpcount['skipped'] += len(e)-len(u)
+            if len(u) < len(e):
+                e = [e[k] for k in u]
+                re = [re[k] for k in u]
+        self.dirty[wstd] = set()
+        if len(e) == 0:
+            return
+        self.ldpcount['computed'] += len(e)
+
         lp,lt, d, v= self.EMS.solve(p,e,'all',wstd,epwr,sens)
         lD=[{'Pr':lp[i],'TOA':lt[np.mod(i,len(e))] ,'d':d[np.mod(i,len(e))],'vis':v[i]} for i in range(len(d))]
         self.update_LDPs(iter(e+re),wstd,lD)
@@ -1045,6 +1077,12 @@ class Network(PyLayers,nx.MultiDiGraph):
         p    : np.array  ( or a list of )
             node position 
 
+        Notes
+        -----
+
+        The nodes whose ground truth position changes are marked as moved
+        for compute_LDPs (self.dirty).
+
         Todo
         ----
 
@@ -1062,6 +1100,11 @@ class Network(PyLayers,nx.MultiDiGraph):
                 nowd=dict(zip(n,[now]*len(n)))
             else :
                 raise TypeError('n and p must have the same length')
+            # nodes which have actually moved
+            if p_pe=='p':
+                moved = [k for k in d if not np.array_equal(self.node[k].get('p'),d[k])]
+                for w in self.dirty:
+                    self.dirty[w].update(moved)
             # update position
             nx.set_node_attributes(self,p_pe,d)        
             # update time of ground truth position
@@ -0,0 +1,71 @@
+import unittest
+import numpy as np
+import pylayers.antprop.loss as lo
+from pylayers.gis.layout import Layout
+from pylayers.network.emsolver import EMSolver
+from pylayers.network.model import PLSmodel
+
+
+class TestMultiwall(unittest.TestCase):
+
+    def setUp(self):
+        self.L = Layout('defstr.lay')
+        self.EMS = EMSolver(L=self.L)
+        self.model = PLSmodel(f=2.4)
+        xmin, xmax, ymin, ymax = self.L.ax
+        np.random.seed(1)
+        self.p = {str(k): np.array([xmin + (xmax - xmin) * np.random.rand(),
+                                    ymin + (ymax - ymin) * np.random.rand()])
+                  for k in range(5)}
+        self.e = [['0', '1', 'rat'], ['0', '2', 'rat'], ['1', '3', 'rat'],
+                  ['2', '3', 'rat']]
+        self.z = (self.L.zfloor + self.L.zceil) / 2.
+
+    def losst(self, l):
+        pa = np.hstack((self.p[l[0]], self.z))
+        pb = np.hstack((self.p[l[1]], self.z))
+        MW = lo.Losst(self.L, self.model.f, pa[:, None], pb[:, None])
+        return MW[0][0][0], MW[2][0][0]
+
+    def test_losst(self):
+        loss, TOA, frees, d = self.EMS.multiwall(self.p, self.e, 'rat', self.model)
+        for k, l in enumerate(self.e):
+            lk, tk = self.losst(l)
+            self.assertAlmostEqual(loss[k], lk)
+            self.assertAlmostEqual(TOA[k], tk)
+            self.assertAlmostEqual(d[k], np.linalg.norm(self.p[l[0]] - self.p[l[1]]))
+        self.assertEqual(self.EMS._mw['rat']['neval'], len(self.e))
+
+    def test_dmove(self):
+        self.EMS.dmove = 0.5
+        loss0, TOA0, frees0, d0 = self.EMS.multiwall(self.p, self.e, 'rat', self.model)
+        # node 0 moves less than dmove, node 3 moves more
+        self.p['0'] = self.p['0'] + np.array([0.1, 0.])
+        self.p['3'] = self.p['3'] + np.array([1., 1.])
+        loss, TOA, frees, d = self.EMS.multiwall(self.p, self.e, 'rat', self.model)
+        self.assertEqual(self.EMS._mw['rat']['neval'], 2)
+        self.assertEqual(loss[0], loss0[0])
+        self.assertEqual(TOA[1], TOA0[1])
+        for k in [2, 3]:
+            lk, tk = self.losst(self.e[k])
+            self.assertAlmostEqual(loss[k], lk)
+            self.assertAlmostEqual(TOA[k], tk)
+        # distances are always evaluated
+        self.assertAlmostEqual(d[0], np.linalg.norm(self.p['0'] - self.p['1']))
+        # the small moves of node 0 add up
+        self.p['0'] = self.p['0'] + np.array([0.45, 0.])
+        self.EMS.multiwall(self.p, self.e, 'rat', self.model)
+        self.assertEqual(self.EMS._mw['rat']['neval'], 2)
+
+    def test_newlink(self):
+        self.EMS.dmove = 100.
+        self.EMS.multiwall(self.p, self.e, 'rat', self.model)
+        e = self.e + [['1', '4', 'rat']]
+        loss, TOA, frees, d = self.EMS.multiwall(self.p, e, 'rat', self.model)
+        self.assertEqual(self.EMS._mw['rat']['neval'], 1)
+        lk, tk = self.losst(e[-1])
+        self.assertAlmostEqual(loss[-1], lk)
+        self.assertAlmostEqual(TOA[-1], tk)
+
+if __name__ == '__main__':
+    unittest.main()
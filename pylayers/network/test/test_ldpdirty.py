@@ -0,0 +1,69 @@
+import unittest
+import numpy as np
+from pylayers.network.network import Network
+
+
+class FakeEMS(object):
+    """ EMSolver stub which records the solved links
+    """
+    def __init__(self):
+        self.le = []
+
+    def solve(self, p, e, LDP, RAT, epwr, sens):
+        self.le.append([(l[0], l[1]) for l in e])
+        Ne = len(e)
+        # the value depends on the call number
+        Pr = len(self.le) * np.ones(2 * Ne)
+        TOA = len(self.le) * np.ones(Ne)
+        d = np.array([np.linalg.norm(p[l[0]] - p[l[1]]) for l in e])
+        return Pr, TOA, np.hstack((d, d)), np.ones(2 * Ne, dtype=bool)
+
+
+class TestLDPDirty(unittest.TestCase):
+
+    def setUp(self):
+        self.EMS = FakeEMS()
+        self.N = Network(EMS=self.EMS)
+        for k in range(4):
+            self.N.add_node(k, wstd=['rat'], p=np.array([k, 0.]),
+                            typ='ag', grp=str(k),
+                            epwr={'rat': 0.}, sens={'rat': -90.})
+        self.N._get_wstd()
+        self.N._get_grp()
+        self.N._connect()
+        self.Ne = len(self.N.links['rat'])
+
+    def Pr(self, a, b):
+        return self.N.SubNet['rat'][a][b]['rat']['Pr']
+
+    def test_dirty(self):
+        N = self.N
+        N.compute_LDPs('rat')
+        self.assertEqual(len(self.EMS.le[-1]), self.Ne)
+        # unchanged position : nothing to compute
+        N.update_pos(1, np.array([1., 0.]))
+        N.compute_LDPs('rat')
+        self.assertEqual(len(self.EMS.le), 1)
+        # a single node moves : only its incident links are solved
+        N.update_pos(0, np.array([0., 5.]))
+        N.compute_LDPs('rat')
+        self.assertEqual(len(self.EMS.le), 2)
+        self.assertEqual(sorted([tuple(sorted(l)) for l in self.EMS.le[-1]]),
+                         [(0, 1), (0, 2), (0, 3)])
+        self.assertEqual(self.Pr(0, 2), 2)
+        self.assertEqual(self.Pr(3, 0), 2)
+        # the other links keep their LDPs
+        self.assertEqual(self.Pr(1, 2), 1)
+        self.assertEqual(self.Pr(3, 2), 1)
+        self.assertEqual(N.ldpcount['computed'], self.Ne + 3)
+        self.assertEqual(N.ldpcount['computed'] + N.ldpcount['skipped'],
+                         3 * self.Ne)
+        # _connect resets dirty : all the links are computed
+        N._connect()
+        N.compute_LDPs('rat')
+        self.assertEqual(len(self.EMS.le[-1]), self.Ne)
+        self.assertEqual(N.ldpcount['computed'] + N.ldpcount['skipped'],
+                         4 * self.Ne)
+
+if __name__ == '__main__':
+    unittest.main()
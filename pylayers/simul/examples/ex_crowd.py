@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+#
+# Array-backed crowd engine : 10000 agents in an office floor
+#
+# The floor is made of 2 x 20 rows of 40 rooms (8 x 6 m) along corridors,
+# each room wall has a door gap. Walls of a Layout can be used instead with
+# walls = thwall2seg(L.thwall(0,0)).
+#
+# The time of a step is compared to the time step (interval of Person)
+# to check that the simulation runs faster than real time.
+#
+from __future__ import print_function
+import time
+import numpy as np
+from pylayers.mobility.transit.crowd import Crowd
+
+N = 10000
+dt = 0.1
+W = 8.
+H = 6.
+nx = 40
+ny = 20
+
+lta = []
+lhe = []
+for ix in range(nx + 1):
+    for iy in range(ny):
+        x = ix * W
+        y = iy * (H + 2)
+        lta += [(x, y), (x, y + 0.6 * H)]
+        lhe += [(x, y + 0.4 * H), (x, y + H)]
+for iy in range(ny + 1):
+    y = iy * (H + 2)
+    lta += [(0, y), (0, y - 2)]
+    lhe += [(nx * W, y), (nx * W, y - 2)]
+pta = np.array(lta).T
+phe = np.array(lhe).T
+
+p = np.vstack((np.random.rand(N) * nx * W, np.random.rand(N) * ny * (H + 2)))
+dest = np.vstack((np.random.rand(N) * nx * W, np.random.rand(N) * ny * (H + 2)))
+C = Crowd(p, dest, walls=(pta, phe))
+
+nstep = 100
+t0 = time.time()
+t, P = C.run(nstep * dt, dt=dt, decim=10)
+tstep = (time.time() - t0) / nstep
+print(C)
+print('step : %.1f ms for %d agents, %.1f x faster than real time' %
+      (tstep * 1e3, N, dt / tstep))
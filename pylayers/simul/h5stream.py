@@ -0,0 +1,245 @@
+#-*- coding:Utf-8 -*-
+from __future__ import print_function
+"""
+.. currentmodule:: pylayers.simul.h5stream
+
+Streaming HDF5 writer
+=====================
+
+An H5Stream keeps an HDF5 file open during a simulation and appends the
+results of link evaluations to chunked, compressed and resizable
+datasets. Records are buffered in memory and written by blocks.
+
+File organisation ::
+
+    <filename>.h5
+        |/<group>/rec    records (one row per link evaluation)
+        |/<group>/<key>  concatenation of the variable length arrays
+        |                (alphak, tauk, ...) of all the records
+
+The variable length arrays of record i are
+<key>[rec['k0'][i]:rec['k0'][i]+rec['nk'][i]].
+
+.. autosummary::
+    :members:
+
+"""
+import time
+import doctest
+import logging
+import numpy as np
+import pandas as pd
+import h5py
+from pylayers.util.project import *
+
+logger = logging.getLogger(__name__)
+
+_str = h5py.special_dtype(vlen=str)
+
+# record of a link evaluation along a trajectory (see Simul.run)
+DTYPE = np.dtype([('t', float),
+                  ('id_a', _str), ('id_b', _str), ('wstd', _str),
+                  ('x_a', float), ('y_a', float), ('z_a', float),
+                  ('x_b', float), ('y_b', float), ('z_b', float),
+                  ('d', float), ('eng', float),
+                  ('fcghz', float), ('fbminghz', float), ('fbmaxghz', float),
+                  ('nf', int),
+                  ('sig_id', _str), ('ray_id', _str),
+                  ('Ct_id', _str), ('H_id', _str),
+                  ('k0', np.int64), ('nk', np.int64)])
+
+
+class H5Stream(PyLayers):
+    """ buffered writer of appendable HDF5 datasets
+
+    Attributes
+    ----------
+
+    filename : string
+        HDF5 file name (full path)
+    dtype : np.dtype
+        record type (fields k0 and nk are filled by the writer)
+    nbuf : int
+        number of buffered records before a flush
+    tflush : float
+        maximum time (s) between 2 flushes
+    chunk : int
+        chunk size of the datasets
+    compression : string
+        HDF5 compression filter ('gzip','lzf' or None)
+    mode : string
+        file mode, 'a' appends to an existing file, 'w' truncates it
+
+    Examples
+    --------
+
+    >>> import tempfile,os
+    >>> filename = os.path.join(tempfile.mkdtemp(),'stream.h5')
+    >>> with H5Stream(filename,nbuf=2) as S:
+    ...     for k in range(5):
+    ...         S.append('B2B',{'t':k,'id_a':'a','id_b':'b','nk':0},
+    ...                  alphak=np.ones(k),tauk=np.arange(k))
+    >>> S = H5Stream(filename)
+    >>> df = S.todf('B2B')
+    >>> ak = S.getarrays('B2B',3)['alphak']
+    >>> S.close()
+    >>> assert len(df) == 5
+    >>> assert len(ak) == 3
+
+    """
+    def __init__(self, filename, dtype=DTYPE, nbuf=1000, tflush=60.,
+                 chunk=1024, compression='gzip', mode='a'):
+        """ object constructor
+        """
+        self.filename = filename
+        self.dtype = dtype
+        self.nbuf = nbuf
+        self.tflush = tflush
+        self.chunk = chunk
+        self.compression = compression
+        self.fh5 = h5py.File(filename, mode)
+        # {group : [list of records, {key : list of arrays}]}
+        self._buf = {}
+        # number of buffered records
+        self._nrec = 0
+        # {group : number of written + buffered elements of variable arrays}
+        self._nk = {}
+        self._tlast = time.time()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        st = 'H5Stream : ' + self.filename + '\n'
+        if self.fh5:
+            for grp in self.fh5:
+                st = st + '  ' + grp + ' : ' + str(self.fh5[grp]['rec'].shape[0]) + ' records\n'
+        st = st + '  buffered : ' + str(self._nrec) + ' records\n'
+        return st
+
+    def _dataset(self, g, name, dtype):
+        """ get or create an appendable dataset
+        """
+        if name not in g:
+            g.create_dataset(name, shape=(0,), maxshape=(None,),
+                             chunks=(self.chunk,), dtype=dtype,
+                             compression=self.compression)
+        return g[name]
+
+    def append(self, grp, rec, **kwargs):
+        """ append a record
+
+        Parameters
+        ----------
+
+        grp : string
+            group name (e.g. link type 'OB','B2B','B2I','I2I')
+        rec : dict
+            record fields (missing fields are 0 or '')
+        kwargs : np.array
+            variable length arrays of the record, all with the same length
+
+        """
+        if grp not in self._buf:
+            self._buf[grp] = [[], {}]
+            if grp in self.fh5:
+                lk = [k for k in self.fh5[grp] if k != 'rec']
+                self._nk[grp] = self.fh5[grp][lk[0]].shape[0] if len(lk) > 0 else 0
+            else:
+                self._nk[grp] = 0
+        lrec, darr = self._buf[grp]
+        nk = 0
+        for k in kwargs:
+            a = np.ravel(kwargs[k])
+            nk = len(a)
+            darr.setdefault(k, []).append(a)
+        rec = dict(rec)
+        rec['k0'] = self._nk[grp]
+        rec['nk'] = nk
+        self._nk[grp] = self._nk[grp] + nk
+        lrec.append(tuple([rec.get(f, '' if self.dtype[f] == object else 0)
+                           for f in self.dtype.names]))
+        self._nrec = self._nrec + 1
+        if ((self._nrec >= self.nbuf) or
+            (time.time() - self._tlast > self.tflush)):
+            self.flush()
+
+    def flush(self):
+        """ write the buffered records
+        """
+        for grp in self._buf:
+            lrec, darr = self._buf[grp]
+            if len(lrec) == 0:
+                continue
+            g = self.fh5.require_group(grp)
+            rec = np.array(lrec, dtype=self.dtype)
+            ds = self._dataset(g, 'rec', self.dtype)
+            n0 = ds.shape[0]
+            ds.resize((n0 + len(rec),))
+            ds[n0:] = rec
+            for k in darr:
+                a = np.hstack(darr[k])
+                ds = self._dataset(g, k, a.dtype)
+                n0 = ds.shape[0]
+                ds.resize((n0 + len(a),))
+                ds[n0:] = a
+            self._buf[grp] = [[], {}]
+        self._nrec = 0
+        self._tlast = time.time()
+        self.fh5.flush()
+
+    def close(self):
+        """ flush and close the file
+        """
+        if self.fh5:
+            self.flush()
+            self.fh5.close()
+            self.fh5 = None
+
+    def read(self, grp):
+        """ read the records of a group
+
+        Returns
+        -------
+
+        rec : np.array
+            structured array of records
+
+        """
+        self.flush()
+        return self.fh5[grp]['rec'][:]
+
+    def getarrays(self, grp, i):
+        """ variable length arrays of record i
+
+        Returns
+        -------
+
+        dict
+            {key : np.array}
+
+        """
+        self.flush()
+        g = self.fh5[grp]
+        rec = g['rec'][i]
+        k0 = rec['k0']
+        k1 = k0 + rec['nk']
+        return {k: g[k][k0:k1] for k in g if k != 'rec'}
+
+    def todf(self, grp):
+        """ records of a group as a DataFrame indexed by time
+        """
+        rec = self.read(grp)
+        df = pd.DataFrame(rec)
+        for c in df.columns:
+            if self.dtype[c] == object:
+                df[c] = [x.decode() if isinstance(x, bytes) else x for x in df[c]]
+        df['typ'] = grp
+        df = df.set_index('t')
+        return df
+
+if __name__ == "__main__":
+    doctest.testmod()
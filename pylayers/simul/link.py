@@ -47,6 +47,7 @@ import tqdm
 import copy
 import h5py
 import pdb
+from multiprocessing import cpu_count
 
 logger = logging.getLogger(__name__)
 
@@ -1458,6 +1459,8 @@ class DLink(Link):
                 If -1 : neither ceil nor floor reflection (2D case)
         ra_vectorized: boolean (True)
             if True used the (2015 new) vectorized approach to determine 2drays
+        ra_nfchunk : int (0)
+            number of frequency points evaluated at once by Rays.eval (0 : all)
         progressbar: str
             None: no progress bar
             python : progress bar in ipython
@@ -1503,6 +1506,7 @@ class DLink(Link):
                    'ra_vectorized': True,
                    'ra_ceil_H': [],
                    'ra_number_mirror_cf': 1,
+                   'ra_nfchunk': 0,
                    'force': True,
                    'bt': True,
                    'si_reverb': 4,
@@ -1704,7 +1708,7 @@ class DLink(Link):
             # Find an other criteria in order to decide if the R has
             # already been evaluated
 
-            C = R.eval(self.fGHz)
+            C = R.eval(self.fGHz,nfchunk=kwargs['ra_nfchunk'])
             # ...save Ct
             self.save(C,'Ct',self.dexist['Ct']['grpname'],force = kwargs['force'])
 
@@ -1746,6 +1750,171 @@ class DLink(Link):
         self.checkh5()
 
 
+    def eval_many(self,lab,nproc=1,**kwargs):
+        """ batch evaluation of a list of links on the current Layout
+
+        Parameters
+        ----------
+
+        lab : list
+            list of (a,b) tuples of link extremities (np.ndarray (3,))
+        nproc : int
+            number of worker processes (default 1 : evaluated in process,
+            0 : one process per cpu). Evaluated in process if the fork
+            start method is not available.
+        cutoff : int
+            signature cutoff (default self.cutoff)
+        threshold : float
+            signature threshold (default self.threshold)
+        save : boolean (True)
+            save the evaluated links in the Links h5 file
+        cache : boolean (False)
+            use the persistent signature cache (see Signatures.run)
+
+        Other keywords (diffraction, nD, nR, nT, bt, ra_ceil_H,
+        ra_number_mirror_cf, rm_aw) are those of DLink.eval
+
+        Returns
+        -------
+
+        lH : list
+            list of Tchannel in the order of lab. None for links
+            without any ray.
+
+        Notes
+        -----
+
+        Links are grouped by (ca,cb) cycle pair so that signatures are
+        evaluated once per cycle pair. Each group is evaluated by a worker
+        which shares the Layout already loaded in this process (inherited
+        on fork, nothing is pickled, see pyutil.forkcontext). Workers never access the h5 file :
+        results are sent back and saved here, sequentially, which avoids
+        any concurrent access to the Links h5 file.
+
+        At the end of the evaluation the link is positionned on the last
+        link of lab.
+
+        Examples
+        --------
+
+        >>> from pylayers.simul.link import *
+        >>> DL = DLink(L='defstr.lay')
+        >>> lab = [(DL.a,DL.b),(DL.b,DL.a)]
+        >>> lH = DL.eval_many(lab,nproc=2)
+
+        See Also
+        --------
+
+        pylayers.simul.link.DLink.eval
+        pylayers.simul.link.evalgroup_func
+
+        """
+        defaults = {'diffraction': True,
+                    'ra_ceil_H': [],
+                    'ra_number_mirror_cf': 1,
+                    'bt': True,
+                    'nD': 2,
+                    'nR': 10,
+                    'nT': 10,
+                    'rm_aw': True,
+                    'save': True,
+                    'cache': False,
+                    'cutoff': self.cutoff,
+                    'threshold': self.threshold,
+                    'delay_excess_max_ns': self.delay_excess_max_ns
+                   }
+
+        for key, value in defaults.items():
+            if key not in kwargs:
+                kwargs[key] = value
+
+        if kwargs['ra_ceil_H'] == []:
+            if self.L.typ == 'indoor':
+                kwargs['ra_ceil_H'] = self.L.maxheight
+            else:
+                kwargs['ra_ceil_H'] = 0
+
+        #
+        # group links by cycle pair
+        #
+        dgroup = {}
+        for k,(a,b) in enumerate(lab):
+            if len(a) == 2:
+                a = np.r_[a,1.0]
+            if len(b) == 2:
+                b = np.r_[b,1.0]
+            ca = self.L.pt2cy(a)
+            cb = self.L.pt2cy(b)
+            if (ca,cb) not in dgroup:
+                dgroup[(ca,cb)] = []
+            dgroup[(ca,cb)].append((k,a,b))
+
+        lgroup = [(c[0],c[1],dgroup[c]) for c in dgroup]
+        logger.info(" eval_many : %d links in %d cycle pairs",len(lab),len(lgroup))
+
+        #
+        # data shared with the workers
+        #
+        global _bL, _bAa, _bAb, _bTa, _bTb, _bfGHz, _bkwargs
+
+        _bL = self.L
+        _bAa = self.Aa
+        _bAb = self.Ab
+        _bTa = self.Ta
+        _bTb = self.Tb
+        _bfGHz = self.fGHz
+        _bkwargs = kwargs
+
+        tic = time.time()
+        if nproc == 0:
+            nproc = cpu_count()
+        ctx = pyu.forkcontext()
+        try:
+            if (nproc == 1) or (len(lgroup) < 2) or (ctx is None):
+                res = [evalgroup_func(g) for g in lgroup]
+            else:
+                pool = ctx.Pool(nproc)
+                try:
+                    res = pool.map(evalgroup_func,lgroup)
+                finally:
+                    pool.close()
+                    pool.join()
+        finally:
+            _bL = _bAa = _bAb = _bTa = _bTb = _bfGHz = _bkwargs = None
+        toc = time.time()
+        logger.info(" eval_many : evaluation in %d sec",toc-tic)
+
+        lH = [None]*len(lab)
+        cutoff = kwargs['cutoff']
+        threshold = kwargs['threshold']
+        for Si,lres in res:
+            Si.L = self.L
+            bsig = True
+            for k,a,b,r2d,R,C,H in lres:
+                lH[k] = H
+                if not kwargs['save']:
+                    continue
+                # position the link (update ca/cb and h5 group names)
+                self.a = a
+                self.b = b
+                self._cutoff = cutoff
+                self._threshold = threshold
+                self.checkh5()
+                if bsig:
+                    self.save(Si,'sig',self.dexist['sig']['grpname'],force=True)
+                    bsig = False
+                if R is None:
+                    continue
+                self.save(r2d,'ray2',self.dexist['ray2']['grpname'],force=True)
+                self.save(R,'ray',self.dexist['ray']['grpname'],force=True)
+                self.save(C,'Ct',self.dexist['Ct']['grpname'],force=True)
+                self.save(H,'H',self.dexist['H']['grpname'],force=True)
+                self.checkh5()
+
+        logger.info(" eval_many : saved in %d sec",time.time()-toc)
+
+        return lH
+
     def adp(self,imax=1000):
         """ construct the angular delay profile
 
@@ -2649,6 +2818,68 @@ class DLink(Link):
                 self.cutoff = 2
         return self.cutoff
 
+def evalgroup_func(args):
+    """ evaluate all the links of a given cycle pair
+
+    Parameters
+    ----------
+
+    args : tuple
+        (ca,cb,lk) where lk is a list of (k,a,b)
+
+    Returns
+    -------
+
+    (Si,lres) : Signatures of the cycle pair and list of
+                (k,a,b,r2d,R,C,H)
+
+    Notes
+    -----
+
+    This function is used by DLink.eval_many. The Layout, antennas
+    and evaluation parameters are read from the module global variables
+    _bL, _bAa, _bAb, _bTa, _bTb, _bfGHz and _bkwargs.
+
+    """
+    ca, cb, lk = args
+    kwargs = _bkwargs
+
+    Si = Signatures(_bL, ca, cb,
+                    cutoff = kwargs['cutoff'],
+                    threshold = kwargs['threshold'])
+    Si.run(cutoff = kwargs['cutoff'],
+           diffraction = kwargs['diffraction'],
+           threshold = kwargs['threshold'],
+           delay_excess_max_ns = kwargs['delay_excess_max_ns'],
+           nD = kwargs['nD'],
+           nR = kwargs['nR'],
+           nT = kwargs['nT'],
+           progress = False,
+           bt = kwargs['bt'],
+           cache = kwargs['cache'])
+
+    lres = []
+    for k,a,b in lk:
+        r2d = Si.raysv(a,b)
+        R = r2d.to3D(_bL, H=kwargs['ra_ceil_H'], N=kwargs['ra_number_mirror_cf'])
+        if kwargs['rm_aw']:
+            R = R.remove_aw(_bL)
+        if R.nray == 0:
+            logger.warning(" eval_many : no ray between %s and %s",str(a),str(b))
+            lres.append((k,a,b,r2d,None,None,None))
+            continue
+        R.locbas(_bL)
+        R.fillinter(_bL)
+        C = R.eval(_bfGHz)
+        C.locbas(Ta=_bTa, Tb=_bTb)
+        H = C.prop2tran(a=_bAa, b=_bAb, Friis=True)
+        lres.append((k,a,b,r2d,R,C,H))
+
+    # the Layout is not sent back to DLink.eval_many
+    Si.L = None
+
+    return (Si,lres)
+
 if (__name__ == "__main__"):
     #plt.ion()
     doctest.testmod()
@@ -47,6 +47,7 @@ from pylayers.gis.layout import Layout
 from pylayers.antprop.slab import Slab
 from pylayers.util.utilnet import str2bool
 from pylayers.mobility.transit.World import world
+from pylayers.mobility.transit.wallindex import layoutwalls
 #from pylayers.util.pymysqldb import Database as DB
 from pylayers.util.project import *
 from pylayers.util.save import *
@@ -179,10 +180,9 @@ class Simul(object):  # Sympy 3
         #
         # Create Layout
         #
-        walls = self.L.thwall(0, 0)
-        for wall in walls:
-            for ii in range(0, len(wall) - 1):
-                self.the_world.add_wall(wall[ii], wall[ii + 1])
+        # walls (same segments as L.thwall) with the wall index used by
+        # the Containment behavior
+        self.the_world.add_walls(*layoutwalls(self.L))
 
     def create_agent(self):
         """ create simulation's Agents
@@ -27,6 +27,7 @@ from pylayers.measures.cormoran import *
 from pylayers.util.project import *
 # Handle UWB measurements
 import pylayers.mobility.trajectory as tr
+from pylayers.simul.h5stream import H5Stream
 from pylayers.mobility.ban.body import *
 from pylayers.antprop.statModel import *
 import pandas as pd
@@ -114,6 +115,7 @@ class Simul(PyLayers):
         self.DL.cutoff=cutoff
 
         self.filename = 'simultraj_' + self.filetraj + '.h5'
+        self.filestream = 'simultraj_' + self.filetraj + '_stream.h5'
 
         # data is a panda container which is initialized 
         #
@@ -462,9 +464,25 @@ class Simul(PyLayers):
         replace_data: boolean (True)
             if True , reference id of all already simulated link will be erased
                 and replace by new simulation id
+            (stream : the streamed HDF5 file is truncated at the start of
+            the run, otherwise the records are appended)
 
         fGHz : np.array
             frequency in GHz
+        stream : boolean (False)
+            if True, results (including alpha_k and tau_k) are appended to
+            the streamed HDF5 file self.filestream (see loadstream)
+            instead of the DataFrame store of self.filename
+        nbuf : int (1000)
+            number of link evaluations buffered before writing (stream)
+
+        Notes
+        -----
+
+        With stream=True the HDF5 file is opened once for the whole run and
+        the records are written by blocks in chunked and compressed
+        datasets (one group per link type), the memory does not grow with
+        the duration of the trajectory.
 
 
         Examples
@@ -492,7 +510,9 @@ class Simul(PyLayers):
                     'DLkwargs':{},
                     'replace_data':True,
                     'fmod':'force',
-                    'fGHz':np.array([2.45])
+                    'fGHz':np.array([2.45]),
+                    'stream':False,
+                    'nbuf':1000
                     }
 
         for k in defaults:
@@ -508,6 +528,8 @@ class Simul(PyLayers):
         I2I = kwargs.pop('I2I')
         fmod = kwargs.pop('fmod')
         self.fGHz = kwargs.pop('fGHz')
+        stream = kwargs.pop('stream')
+        nbuf = kwargs.pop('nbuf')
 
         self.todo.update({'OB':OB,'B2B':B2B,'B2I':B2I,'I2I':I2I})
 
@@ -593,6 +615,34 @@ class Simul(PyLayers):
             ta = kwargs['t']
             it = range(len(ta))
 
+        writer = None
+        if stream:
+            filestream = pyu.getlong(self.filestream, pstruc['DIRLNK'])
+            if kwargs['replace_data']:
+                mode = 'w'
+            else:
+                mode = 'a'
+            writer = H5Stream(filestream, nbuf=nbuf, mode=mode)
+        try:
+            self._run(ta, it, lt, wstd, links, fmod, DLkwargs, writer)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def _run(self, ta, it, lt, wstd, links, fmod, DLkwargs, writer):
+        """ loop over time, wireless standards and links of run
+
+        Parameters
+        ----------
+
+        ta : np.array
+            time values
+        it : list
+            time index in evaluation order
+        writer : H5Stream | None
+            if None, results are saved with savepd
+
+        """
         ## Start to loop over time
         ##   ut : counter
         ##   t  : time value (s)
@@ -642,6 +692,26 @@ class Simul(PyLayers):
                         # Get alphak an tauk
                         self._ak = self.DL.H.ak
                         self._tk = self.DL.H.tk
+                        if writer is not None:
+                            pa = self.N.node[na]['p']
+                            pb = self.N.node[nb]['p']
+                            rec = {'t': t,
+                                   'id_a': na, 'id_b': nb, 'wstd': w,
+                                   'x_a': pa[0], 'y_a': pa[1], 'z_a': pa[2],
+                                   'x_b': pb[0], 'y_b': pb[1], 'z_b': pb[2],
+                                   'd': self.N.edge[na][nb]['d'],
+                                   'eng': eng,
+                                   'fcghz': self.N.node[na]['wstd'][w]['fcghz'],
+                                   'fbminghz': self.fGHz[0],
+                                   'fbmaxghz': self.fGHz[-1],
+                                   'nf': len(self.fGHz),
+                                   'sig_id': self.DL.dexist['sig']['grpname'],
+                                   'ray_id': self.DL.dexist['ray']['grpname'],
+                                   'Ct_id': self.DL.dexist['Ct']['grpname'],
+                                   'H_id': self.DL.dexist['H']['grpname']}
+                            writer.append(typ, rec,
+                                          alphak=self._ak, tauk=self._tk)
+                            continue
                         aktk_id = str(ut) + '_' + na + '_' + nb + '_' + w
                         # this is a dangerous way to proceed ! 
                         # the id as a finite number of characters
@@ -751,6 +821,30 @@ class Simul(PyLayers):
         store.append('df',df)
         store.close()
 
+    def loadstream(self, typ=[]):
+        """ load the results of streamed runs in self.data
+
+        Parameters
+        ----------
+
+        typ : list
+            link types to load ([] : all)
+
+        Notes
+        -----
+
+        alpha_k and tau_k of the i-th link evaluation of a link type are
+        read with H5Stream.getarrays(typ,i)
+
+        """
+        filestream = pyu.getlong(self.filestream, pstruc['DIRLNK'])
+        with H5Stream(filestream) as S:
+            if typ == []:
+                typ = list(S.fh5.keys())
+            self.data = pd.concat([S.todf(g) for g in typ])
+        self.data.index.name='t'
+        self.data = self.data.sort_index()
+
     def loadpd(self):
         """ load data from previous simulations
         """
@@ -0,0 +1,19 @@
+from pylayers.simul.link import *
+import time
+
+fGHz = np.linspace(4.5,5.5,51)
+L = Layout('defstr.lay')
+DL = DLink(L=L, fGHz=fGHz)
+a0 = DL.a
+b0 = DL.b
+lab = [(a0,b0),(a0+np.array([0.1,0,0]),b0),(b0,a0)]
+tic = time.time()
+lH = DL.eval_many(lab,nproc=2,cutoff=3,diffraction=False)
+toc = time.time()
+print(toc-tic)
+assert len(lH)==len(lab)
+# compare with the single link evaluation
+DL.a = a0
+DL.b = b0
+DL.eval(force=True,cutoff=3,diffraction=False,si_progress=False)
+assert np.allclose(np.sort(DL.H.taud),np.sort(lH[0].taud))
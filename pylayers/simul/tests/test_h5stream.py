@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from pylayers.simul.h5stream import H5Stream
+
+
+class TestH5Stream(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dirname, 'stream.h5')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_append(self):
+        S = H5Stream(self.filename, nbuf=7, chunk=4)
+        for k in range(20):
+            typ = 'B2B' if k % 2 else 'B2I'
+            S.append(typ, {'t': 0.1*k, 'id_a': 'a%d' % k, 'id_b': 'b', 'wstd': 'ieee802154'},
+                     alphak=np.arange(k, dtype=float), tauk=np.arange(k)+0.5)
+        # buffered records are not written yet
+        self.assertEqual(S.fh5['B2B']['rec'].shape[0] + S.fh5['B2I']['rec'].shape[0], 14)
+        S.close()
+        # reopen and append
+        with H5Stream(self.filename) as S:
+            S.append('B2B', {'t': 2., 'id_a': 'c', 'id_b': 'd'},
+                     alphak=np.ones(3), tauk=np.ones(3))
+        with H5Stream(self.filename) as S:
+            df = S.todf('B2B')
+            self.assertEqual(len(df), 11)
+            self.assertEqual(df['id_a'].values[2], 'a5')
+            d = S.getarrays('B2B', 2)
+            self.assertTrue((d['alphak'] == np.arange(5)).all())
+            self.assertTrue((d['tauk'] == np.arange(5)+0.5).all())
+            d = S.getarrays('B2B', 10)
+            self.assertTrue((d['alphak'] == np.ones(3)).all())
+
+    def test_truncate(self):
+        for k in range(2):
+            with H5Stream(self.filename, mode='w') as S:
+                S.append('B2B', {'t': 0., 'id_a': 'a', 'id_b': 'b'},
+                         alphak=np.ones(2), tauk=np.ones(2))
+        with H5Stream(self.filename) as S:
+            self.assertEqual(len(S.todf('B2B')), 1)
+            self.assertTrue((S.getarrays('B2B', 0)['alphak'] == np.ones(2)).all())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3906,6 +3906,83 @@ def intersect3(a, b, pg, u1, u2, l1, l2,binter=False):
         return visi,None
 
 
+def intersect3p(a, b, pg, u1, u2, l1, l2):
+    """ Intersection of N lines and N 3D rectangle screens (pairwise)
+
+    Parameters
+    ----------
+
+    a  : np.array (3,N) of floats
+        transmiter coordinates
+    b  : np.array (3,N) of floats
+        receiver coordinates
+    pg  : np.array (3,N) of floats
+        center of gravity of the screen
+    u1  : np.array (3,N) of floats
+        unitary vector along first dimension
+    u2  : np.array (3,N) or (3,1) of floats
+        unitary vector along second dimension
+    l1   : np.array (,N)
+        length along first dimension in meters
+    l2   : np.array (,N)
+        length along second dimension in meters
+
+    Returns
+    -------
+
+    bool : np.array (,N)
+        True   => line k intersects screen k (occultation)
+
+    Notes
+    -----
+
+    This is the diagonal of intersect3. It is used when the candidate
+    (link,screen) pairs have been selected by a spatial index.
+
+    Examples
+    --------
+
+    >>> a = np.array([[1,0,1]]).T
+    >>> b = np.array([[10,0,1]]).T
+    >>> pg = np.array([[5,0,0]]).T
+    >>> u1 = np.array([[0,1,0]]).T
+    >>> u2 = np.array([[0,0,1]]).T
+    >>> l1 = np.array([3])
+    >>> l2 = np.array([3])
+    >>> bo = intersect3p(a,b,pg,u1,u2,l1,l2)
+    >>> assert bo[0]
+
+    See Also
+    --------
+
+    pylayers.util.geomutil.intersect3
+    pylayers.gis.layout.Layout.angleonlink3
+
+    """
+    N = a.shape[1]
+    visi = np.zeros(N, dtype=bool)
+    if N == 0:
+        return visi
+
+    ba = b - a
+    u2 = u2 + np.zeros((3, N))
+    # A : (N,3,3)
+    A = np.concatenate((ba.T[:, :, None],
+                        -u1.T[:, :, None],
+                        -u2.T[:, :, None]), axis=2)
+    c = (pg - a).T
+    detA = np.linalg.det(A)
+    boolvalid = ~ (np.isclose(detA, 0))
+    if boolvalid.any():
+        x = np.linalg.solve(A[boolvalid], c[boolvalid][:, :, None])[:, :, 0]
+        condseg = (x[:, 0] > 1) | (x[:, 0] < 0)
+        cond1 = np.abs(x[:, 1]) > l1[boolvalid] / 2.
+        cond2 = np.abs(x[:, 2]) > l2[boolvalid] / 2.
+        visi[boolvalid] = ~(condseg | cond1 | cond2)
+
+    return visi
+
+
 def intersect(a, b, c, d):
     """ check if segment AB intersects segment CD in 2D 
 
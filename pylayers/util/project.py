@@ -194,6 +194,7 @@ pstruc['DIRR3D'] = os.path.join('output','r3d')
 pstruc['DIRCT'] = os.path.join('output','Ct')
 pstruc['DIRH'] = os.path.join('output','H')
 pstruc['DIRLNK'] = 'output'
+pstruc['DIRSIGC'] = os.path.join('output','sigcache')
 pstruc['DIRBODY'] = 'body'
 pstruc['DIRGIS'] = 'gis'
 pstruc['DIRC3D'] = os.path.join('body','c3d')
@@ -47,6 +47,7 @@ r"""
     has_colours
     printout
     in_ipynb
+    forkcontext
 
 """
 from __future__ import print_function
@@ -57,6 +58,7 @@ import scipy as sp
 import matplotlib.pylab as plt
 import doctest
 import logging
+import multiprocessing as mp
 #from   bitstring  import BitString
 import datetime as dat
 from pylayers.util.project import *
@@ -1917,6 +1919,36 @@ def in_ipynb():
         return False
 
 
+def forkcontext():
+    """ multiprocessing context using the fork start method
+
+    Returns
+    -------
+
+    ctx : multiprocessing context
+        None if fork is not available (Windows)
+
+    Notes
+    -----
+
+    Worker functions which read module globals set by the parent process
+    just before the creation of the pool (Layout.build, DLink.eval_many,
+    Coverage.cover, coverfan) only see these globals if the workers are
+    forked. The default start method is spawn on Windows and macOS and
+    forkserver on Linux with python >= 3.14, hence the explicit context.
+    Callers fall back to a sequential evaluation when None is returned.
+
+    """
+    try:
+        if 'fork' in mp.get_all_start_methods():
+            return mp.get_context('fork')
+    except AttributeError:
+        # python 2 : fork is the only start method on posix
+        if os.name == 'posix':
+            return mp
+    return None
+
+
 def npextract(y,s):
     """  access a numpy MDA while keeping number of axis
 
@@ -0,0 +1,399 @@
+#-*- coding:Utf-8 -*-
+from __future__ import print_function
+"""
+.. currentmodule:: pylayers.util.spatialindex
+
+Uniform grid spatial index
+==========================
+
+A SegGrid stores, for each cell of a regular 2D grid, the list of segments
+crossing that cell (CSR storage). A set of links is then walked through the
+grid and only the segments of the crossed cells are returned as candidates.
+
+The cells crossed by a segment or a link (the supercover of the segment)
+are obtained in a vectorized way : the segment is first clipped to the grid
+bounding box, then each crossing of a vertical (resp. horizontal) grid line
+adds the two cells which share the crossed edge.
+
+.. autosummary::
+    :members:
+
+"""
+import numpy as np
+import doctest
+import logging
+from pylayers.util.project import *
+
+logger = logging.getLogger(__name__)
+
+
+def _ranges(start, count):
+    """ concatenation of the integer ranges [start[k],start[k]+count[k][
+
+    Parameters
+    ----------
+
+    start : np.array (,N)
+    count : np.array (,N)
+
+    Returns
+    -------
+
+    lid : np.array (,sum(count))
+        range index
+    val : np.array (,sum(count))
+        values
+
+    Examples
+    --------
+
+    >>> lid,val = _ranges(np.array([3,10]),np.array([2,3]))
+    >>> assert (val == np.array([3,4,10,11,12])).all()
+    >>> assert (lid == np.array([0,0,1,1,1])).all()
+
+    """
+    count = np.maximum(count, 0).astype(int)
+    lid = np.repeat(np.arange(len(count)), count)
+    offset = np.arange(np.sum(count)) - np.repeat(np.cumsum(count) - count, count)
+    val = np.repeat(start, count) + offset
+    return lid, val.astype(int)
+
+
+class SegGrid(PyLayers):
+    """ uniform grid index of 2D segments
+
+    Attributes
+    ----------
+
+    x0, y0 : float
+        lower left corner of the grid
+    cs : float
+        cell size (meters)
+    nx, ny : int
+        number of cells along x and y
+    cellptr : np.array (,nx*ny+1)
+        cellseg[cellptr[c]:cellptr[c+1]] are the segments of cell c
+    cellseg : np.array
+        segment indices (numpy numbering, i.e. index in tahe)
+    Ns : int
+        number of segments
+
+    """
+
+    def __init__(self, pta, phe, cellsize=0, grid=None):
+        """
+
+        Parameters
+        ----------
+
+        pta : np.array (2,Ns)
+            segments tail
+        phe : np.array (2,Ns)
+            segments head
+        cellsize : float
+            if 0 cellsize is chosen in order to have about one segment per
+            cell on average
+        grid : dict
+            grid previously obtained with todict (the index is not rebuilt)
+
+        Examples
+        --------
+
+        >>> pta = np.array([[0,0],[2,0]]).T
+        >>> phe = np.array([[0,10],[2,10]]).T
+        >>> G = SegGrid(pta,phe,cellsize=1)
+        >>> il,iseg = G.pairs(np.array([[-1],[5]]),np.array([[1],[5]]))
+        >>> assert (iseg == np.array([0])).all()
+        >>> G2 = SegGrid(pta,phe,grid=G.todict())
+        >>> assert (G2.pairs(np.array([[-1],[5]]),np.array([[1],[5]]))[1] == iseg).all()
+
+        """
+        pta = np.asarray(pta, dtype=float)
+        phe = np.asarray(phe, dtype=float)
+        self.Ns = pta.shape[1]
+
+        if grid is not None:
+            for k in ['x0', 'y0', 'cs']:
+                self.__dict__[k] = float(grid[k])
+            for k in ['nx', 'ny']:
+                self.__dict__[k] = int(grid[k])
+            self.cellptr = np.asarray(grid['cellptr'])
+            self.cellseg = np.asarray(grid['cellseg'])
+            return
+
+        xmin = min(np.min(pta[0, :]), np.min(phe[0, :]))
+        xmax = max(np.max(pta[0, :]), np.max(phe[0, :]))
+        ymin = min(np.min(pta[1, :]), np.min(phe[1, :]))
+        ymax = max(np.max(pta[1, :]), np.max(phe[1, :]))
+
+        if cellsize == 0:
+            area = max((xmax - xmin) * (ymax - ymin), 1e-6)
+            cellsize = np.sqrt(area / self.Ns)
+            lseg = np.sqrt(np.sum((phe - pta) ** 2, axis=0))
+            cellsize = max(cellsize, np.median(lseg))
+        cellsize = max(cellsize, 1e-3)
+
+        # a small margin guarantees that all extremities are strictly inside
+        self.cs = cellsize
+        self.x0 = xmin - 0.5 * cellsize
+        self.y0 = ymin - 0.5 * cellsize
+        self.nx = int(np.ceil((xmax - self.x0) / cellsize + 0.5))
+        self.ny = int(np.ceil((ymax - self.y0) / cellsize + 0.5))
+
+        iseg, icell = self.cells(pta, phe)
+        # remove duplicated (segment,cell) pairs
+        code = np.unique(icell * self.Ns + iseg)
+        icell = code // self.Ns
+        iseg = code % self.Ns
+        # CSR storage (code is sorted by cell)
+        count = np.bincount(icell, minlength=self.nx * self.ny)
+        self.cellptr = np.hstack((0, np.cumsum(count)))
+        self.cellseg = iseg
+
+    def __repr__(self):
+        st = 'SegGrid : ' + str(self.Ns) + ' segments\n'
+        st = st + 'cell size : ' + str(self.cs) + '\n'
+        st = st + 'nx x ny : ' + str(self.nx) + ' x ' + str(self.ny) + '\n'
+        nseg = np.diff(self.cellptr)
+        st = st + 'max segments per cell : ' + str(np.max(nseg)) + '\n'
+        return st
+
+    def todict(self):
+        """ grid arrays and parameters (see grid argument of SegGrid)
+        """
+        return {'x0': self.x0, 'y0': self.y0, 'cs': self.cs,
+                'nx': self.nx, 'ny': self.ny,
+                'cellptr': self.cellptr, 'cellseg': self.cellseg}
+
+    def clip(self, p1, p2):
+        """ clip links to the grid bounding box (Liang-Barsky)
+
+        Parameters
+        ----------
+
+        p1 : np.array (2,N)
+        p2 : np.array (2,N)
+
+        Returns
+        -------
+
+        u : np.array
+            index of links intersecting the grid
+        q1 : np.array (2,len(u))
+            clipped extremities in cell units
+        q2 : np.array (2,len(u))
+            clipped extremities in cell units
+
+        """
+        # cell units
+        x1 = (p1[0, :] - self.x0) / self.cs
+        y1 = (p1[1, :] - self.y0) / self.cs
+        x2 = (p2[0, :] - self.x0) / self.cs
+        y2 = (p2[1, :] - self.y0) / self.cs
+        dx = x2 - x1
+        dy = y2 - y1
+
+        t0 = np.zeros(len(x1))
+        t1 = np.ones(len(x1))
+        valid = np.ones(len(x1), dtype=bool)
+        for p, q in ((-dx, x1), (dx, self.nx - x1), (-dy, y1), (dy, self.ny - y1)):
+            zero = (p == 0)
+            valid = valid & ~(zero & (q < 0))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                r = q / p
+            neg = (p < 0) & ~zero
+            pos = (p > 0) & ~zero
+            t0 = np.where(neg, np.maximum(t0, r), t0)
+            t1 = np.where(pos, np.minimum(t1, r), t1)
+
+        valid = valid & (t0 <= t1)
+        u = np.where(valid)[0]
+        q1 = np.vstack((x1[u] + t0[u] * dx[u], y1[u] + t0[u] * dy[u]))
+        q2 = np.vstack((x1[u] + t1[u] * dx[u], y1[u] + t1[u] * dy[u]))
+        return u, q1, q2
+
+    def cells(self, p1, p2):
+        """ cells crossed by a set of segments or links
+
+        Parameters
+        ----------
+
+        p1 : np.array (2,N)
+        p2 : np.array (2,N)
+
+        Returns
+        -------
+
+        il : np.array
+            link index
+        ic : np.array
+            cell index (ix + nx*iy)
+
+        Notes
+        -----
+
+        The returned pairs may contain duplicates.
+
+        """
+        u, q1, q2 = self.clip(p1, p2)
+        x1, y1 = q1
+        x2, y2 = q2
+        dx = x2 - x1
+        dy = y2 - y1
+
+        lil = [u, u]
+        lix = [np.floor(x1), np.floor(x2)]
+        liy = [np.floor(y1), np.floor(y2)]
+
+        # crossing of vertical lines x = k
+        kmin = np.floor(np.minimum(x1, x2)) + 1
+        kmax = np.ceil(np.maximum(x1, x2)) - 1
+        lid, k = _ranges(kmin, kmax - kmin + 1)
+        if len(lid) > 0:
+            t = (k - x1[lid]) / dx[lid]
+            iy = np.floor(y1[lid] + t * dy[lid])
+            lil = lil + [u[lid], u[lid]]
+            lix = lix + [k - 1, k]
+            liy = liy + [iy, iy]
+
+        # crossing of horizontal lines y = k
+        kmin = np.floor(np.minimum(y1, y2)) + 1
+        kmax = np.ceil(np.maximum(y1, y2)) - 1
+        lid, k = _ranges(kmin, kmax - kmin + 1)
+        if len(lid) > 0:
+            t = (k - y1[lid]) / dy[lid]
+            ix = np.floor(x1[lid] + t * dx[lid])
+            lil = lil + [u[lid], u[lid]]
+            lix = lix + [ix, ix]
+            liy = liy + [k - 1, k]
+
+        il = np.hstack(lil).astype(int)
+        ix = np.clip(np.hstack(lix), 0, self.nx - 1).astype(int)
+        iy = np.clip(np.hstack(liy), 0, self.ny - 1).astype(int)
+        ic = ix + self.nx * iy
+        return il, ic
+
+    def pairs(self, p1, p2):
+        """ candidate (link,segment) pairs
+
+        Parameters
+        ----------
+
+        p1 : np.array (2,N)
+        p2 : np.array (2,N)
+
+        Returns
+        -------
+
+        il : np.array
+            link index
+        iseg : np.array
+            segment index (index in tahe)
+
+        Notes
+        -----
+
+        Pairs are unique and sorted by link index then by segment index.
+        All the segments actually crossing a link belong to the returned
+        pairs.
+
+        """
+        il, ic = self.cells(p1, p2)
+        if len(il) == 0:
+            return np.array([], dtype=int), np.array([], dtype=int)
+        code = np.unique(il * self.nx * self.ny + ic)
+        il = code // (self.nx * self.ny)
+        ic = code % (self.nx * self.ny)
+        start = self.cellptr[ic]
+        count = self.cellptr[ic + 1] - start
+        lid, ind = _ranges(start, count)
+        code = np.unique(il[lid] * self.Ns + self.cellseg[ind])
+        return code // self.Ns, code % self.Ns
+
+    def near(self, p, r):
+        """ candidate (point,segment) pairs around a set of points
+
+        Parameters
+        ----------
+
+        p : np.array (2,N)
+            points
+        r : float | np.array (,N)
+            half size of the square box around each point
+
+        Returns
+        -------
+
+        ip : np.array
+            point index
+        iseg : np.array
+            segment index
+
+        Notes
+        -----
+
+        Pairs are unique and sorted by point index then by segment index.
+        All the segments at a distance lower than r from a point belong
+        to the returned pairs.
+
+        Examples
+        --------
+
+        >>> pta = np.array([[0,0],[2,0]]).T
+        >>> phe = np.array([[0,10],[2,10]]).T
+        >>> G = SegGrid(pta,phe,cellsize=1)
+        >>> ip,iseg = G.near(np.array([[0.2,1.5],[5,5]]),0.3)
+        >>> assert (ip == np.array([0,1])).all()
+        >>> assert (iseg == np.array([0,1])).all()
+
+        """
+        p = np.asarray(p, dtype=float)
+        r = np.broadcast_to(np.asarray(r, dtype=float), (p.shape[1],))
+        ix0 = np.clip(np.floor((p[0, :] - r - self.x0) / self.cs), 0, self.nx - 1).astype(int)
+        ix1 = np.clip(np.floor((p[0, :] + r - self.x0) / self.cs), 0, self.nx - 1).astype(int)
+        iy0 = np.clip(np.floor((p[1, :] - r - self.y0) / self.cs), 0, self.ny - 1).astype(int)
+        iy1 = np.clip(np.floor((p[1, :] + r - self.y0) / self.cs), 0, self.ny - 1).astype(int)
+        # cells of the boxes
+        lip, lic = [], []
+        for dx in range(np.max(ix1 - ix0) + 1):
+            for dy in range(np.max(iy1 - iy0) + 1):
+                u = np.where((ix0 + dx <= ix1) & (iy0 + dy <= iy1))[0]
+                lip.append(u)
+                lic.append(ix0[u] + dx + self.nx * (iy0[u] + dy))
+        ip = np.hstack(lip)
+        ic = np.hstack(lic)
+        start = self.cellptr[ic]
+        count = self.cellptr[ic + 1] - start
+        lid, ind = _ranges(start, count)
+        code = np.unique(ip[lid] * self.Ns + self.cellseg[ind])
+        return code // self.Ns, code % self.Ns
+
+    def inbox(self, xmin, xmax, ymin, ymax):
+        """ segments of the cells overlapping a box
+
+        Parameters
+        ----------
+
+        xmin, xmax, ymin, ymax : float
+
+        Returns
+        -------
+
+        iseg : np.array
+            unique segment index
+
+        """
+        ix0 = int(np.clip(np.floor((xmin - self.x0) / self.cs), 0, self.nx - 1))
+        ix1 = int(np.clip(np.floor((xmax - self.x0) / self.cs), 0, self.nx - 1))
+        iy0 = int(np.clip(np.floor((ymin - self.y0) / self.cs), 0, self.ny - 1))
+        iy1 = int(np.clip(np.floor((ymax - self.y0) / self.cs), 0, self.ny - 1))
+        ix, iy = np.meshgrid(np.arange(ix0, ix1 + 1), np.arange(iy0, iy1 + 1))
+        ic = (ix + self.nx * iy).ravel()
+        start = self.cellptr[ic]
+        count = self.cellptr[ic + 1] - start
+        lid, ind = _ranges(start, count)
+        return np.unique(self.cellseg[ind])
+
+
+if __name__ == "__main__":
+    doctest.testmod()
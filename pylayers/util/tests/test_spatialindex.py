@@ -0,0 +1,43 @@
+# -*- coding:Utf-8 -*-
+import unittest
+import numpy as np
+import pylayers.util.geomutil as geu
+from pylayers.util.spatialindex import SegGrid
+from numpy.testing import (TestCase, assert_equal, assert_)
+
+class TestSegGrid(TestCase):
+    def test_pairs(self):
+        print("testing SegGrid.pairs against brute force")
+        np.random.seed(0)
+        Ns = 300
+        N = 400
+        pta = 100*np.random.rand(2,Ns)
+        phe = pta + 3*np.random.randn(2,Ns)
+        G = SegGrid(pta,phe)
+        p1 = 140*np.random.rand(2,N)-20
+        p2 = 140*np.random.rand(2,N)-20
+        il,iseg = G.pairs(p1,p2)
+        cand = set(zip(il,iseg))
+        assert_(len(cand) < N*Ns)
+        # brute force 2D intersection
+        for k in range(N):
+            A = p1[:,[k]]+np.zeros((2,Ns))
+            B = p2[:,[k]]+np.zeros((2,Ns))
+            bo = geu.intersect(A,B,pta,phe)
+            for s in np.where(bo)[0]:
+                assert_((k,s) in cand)
+
+    def test_intersect3p(self):
+        print("testing geomutil.intersect3p")
+        a = np.array([[1,0,1],[1,0,1]]).T
+        b = np.array([[10,0,1],[2,-1,1]]).T
+        pg = np.array([[5,0,0],[5,0,0]]).T
+        u1 = np.array([[0,1,0],[0,1,0]]).T
+        u2 = np.array([[0,0,1]]).T
+        l1 = np.array([3,3])
+        l2 = np.array([3,3])
+        bo = geu.intersect3p(a,b,pg,u1,u2,l1,l2)
+        assert_equal(bo,np.array([True,False]))
+
+if __name__ == "__main__":
+    unittest.main()